@@ -0,0 +1,225 @@
+"""Per-user athlete profile: running training aggregates for the coach prompt.
+
+Rather than re-reading raw sessions on every chat, each written session is
+folded into an ``AthleteProfile`` row: training age, weekly frequency and
+per-muscle-group set counts, and per-exercise working weights, estimated 1RM
+PRs and a short e1RM history. ``profile_digest`` renders it as a block of a
+few hundred tokens for the system prompt. Deleting a session rebuilds the
+profile from scratch (aggregates such as PRs cannot be un-applied).
+"""
+import json
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List, Optional
+
+from sqlmodel import Session, select
+
+from backend.models import AthleteProfile, Exercise, SessionExercise, TrainingSession, TrainingSet
+from backend.session_index import MUSCLE_GROUPS, muscle_group
+
+WEEKS_KEPT = 12         # weekly buckets kept for frequency and balance
+HISTORY_KEPT = 6        # per-exercise e1RM points kept for trends
+RECENT_WEEKS = 4        # window for frequency and weak points
+MAIN_LIFTS_SHOWN = 5
+TREND_THRESHOLD = 0.02  # e1RM change below this reads as "flat"
+WEAK_SHARE = 0.10       # muscle groups under this share of recent sets are weak points
+STREAM_ROWS = 2000      # rows fetched at a time when rebuilding from the full history
+
+
+def estimated_1rm(weight: float, reps: int) -> float:
+    """Epley estimate; 0 for bodyweight or empty sets."""
+    if not weight or not reps or reps <= 0:
+        return 0.0
+    return weight if reps == 1 else weight * (1 + reps / 30)
+
+
+def _week_key(date: datetime) -> str:
+    return (date - timedelta(days=date.weekday())).strftime("%Y-%m-%d")
+
+
+def apply_session(data: dict, date: datetime, exercises: List[dict]):
+    """Fold one session (``[{name, category, sets: [{weight, reps}]}]``) into ``data``."""
+    iso = date.isoformat()
+    data["first_date"] = min(data.get("first_date") or iso, iso)
+    data["last_date"] = max(data.get("last_date") or iso, iso)
+
+    weeks = data.setdefault("weeks", {})
+    week = weeks.setdefault(_week_key(date), {"sessions": 0, "sets": {}})
+    week["sessions"] += 1
+    for key in sorted(weeks)[:-WEEKS_KEPT]:
+        del weeks[key]
+
+    lifts = data.setdefault("lifts", {})
+    for exercise in exercises:
+        sets = [s for s in exercise["sets"] if (s.get("reps") or 0) > 0]
+        if not sets:
+            continue
+        group = muscle_group(exercise["name"], exercise.get("category") or "")
+        if group and _week_key(date) in weeks:
+            week["sets"][group] = week["sets"].get(group, 0) + len(sets)
+
+        top = max(sets, key=lambda s: (estimated_1rm(s["weight"], s["reps"]), s["weight"], s["reps"]))
+        e1rm = round(estimated_1rm(top["weight"], top["reps"]), 1)
+        lift = lifts.setdefault(exercise["name"], {"sessions": 0, "best_e1rm": 0.0, "best_reps": 0, "history": []})
+        lift["sessions"] += 1
+        if e1rm > lift["best_e1rm"]:
+            lift.update(best_e1rm=e1rm, pr_weight=top["weight"], pr_reps=top["reps"], pr_date=iso)
+        lift["best_reps"] = max(lift["best_reps"], max(s["reps"] for s in sets))
+        if iso >= lift.get("last_date", ""):
+            lift.update(last_date=iso, working_weight=top["weight"], working_reps=top["reps"])
+        lift["history"] = sorted(lift["history"] + [[iso, e1rm]])[-HISTORY_KEPT:]
+
+
+def _iter_sessions(db: Session, user_id: int, session_id: Optional[int] = None) -> Iterator[tuple]:
+    """``(date, exercises)`` per session, oldest first, streamed from one joined query."""
+    query = (
+        select(TrainingSession.id, TrainingSession.date, SessionExercise.id, Exercise.name,
+               Exercise.category, TrainingSet.weight, TrainingSet.reps)
+        .join(SessionExercise, SessionExercise.session_id == TrainingSession.id)
+        .join(Exercise, Exercise.id == SessionExercise.exercise_id)
+        .join(TrainingSet, TrainingSet.session_exercise_id == SessionExercise.id, isouter=True)
+        .where(TrainingSession.user_id == user_id)
+        .order_by(TrainingSession.date, TrainingSession.id, SessionExercise.id, TrainingSet.id)
+        .execution_options(yield_per=STREAM_ROWS)
+    )
+    if session_id is not None:
+        query = query.where(TrainingSession.id == session_id)
+
+    current, session, exercises = None, None, {}
+    for sid, date, se_id, name, category, weight, reps in db.exec(query):
+        if sid != current:
+            if session is not None:
+                yield session
+            current, session, exercises = sid, (date, []), {}
+        if se_id not in exercises:
+            exercises[se_id] = {"name": name, "category": category, "sets": []}
+            session[1].append(exercises[se_id])
+        if reps is not None:
+            exercises[se_id]["sets"].append({"weight": weight or 0, "reps": reps})
+    if session is not None:
+        yield session
+
+
+def _load_sessions(db: Session, user_id: int, session_id: Optional[int] = None) -> List[tuple]:
+    return list(_iter_sessions(db, user_id, session_id))
+
+
+def _get(db: Session, user_id: int) -> Optional[AthleteProfile]:
+    return db.exec(select(AthleteProfile).where(AthleteProfile.user_id == user_id)).first()
+
+
+def rebuild_profile(db: Session, user_id: int) -> AthleteProfile:
+    """Recompute a profile from all of the user's sessions."""
+    profile = _get(db, user_id) or AthleteProfile(user_id=user_id)
+    data: dict = {}
+    count = 0
+    for date, exercises in _iter_sessions(db, user_id):
+        apply_session(data, date, exercises)
+        count += 1
+    profile.data = json.dumps(data)
+    profile.sessions_count = count
+    profile.updated_at = datetime.utcnow()
+    db.add(profile)
+    db.commit()
+    return profile
+
+
+def record_session(db: Session, training_session: TrainingSession) -> AthleteProfile:
+    """Fold a newly written session into the user's profile."""
+    profile = _get(db, training_session.user_id)
+    if profile is None:
+        return rebuild_profile(db, training_session.user_id)
+    data = json.loads(profile.data)
+    sessions = _load_sessions(db, training_session.user_id, training_session.id)
+    for date, exercises in sessions:
+        apply_session(data, date, exercises)
+    profile.data = json.dumps(data)
+    profile.sessions_count += len(sessions)
+    profile.updated_at = datetime.utcnow()
+    db.add(profile)
+    db.commit()
+    return profile
+
+
+def _trend(history: List[list]) -> str:
+    points = [e1rm for _, e1rm in history if e1rm]
+    if len(points) < 3:
+        return ""
+    recent = sum(points[-2:]) / 2
+    earlier = sum(points[:-2][-2:]) / len(points[:-2][-2:])
+    change = (recent - earlier) / earlier
+    if abs(change) < TREND_THRESHOLD:
+        return " · flat"
+    return f" · {'↑' if change > 0 else '↓'} {change:+.0%}"
+
+
+def _fmt(value: float) -> str:
+    return f"{value:g}"
+
+
+def render_digest(data: dict, sessions_count: int, now: Optional[datetime] = None) -> str:
+    """Short markdown profile block; empty when there is no history."""
+    if not sessions_count or not data.get("first_date"):
+        return ""
+    now = now or datetime.utcnow()
+    first = datetime.fromisoformat(data["first_date"])
+    last = datetime.fromisoformat(data["last_date"])
+    weeks_training = max(1, (now - first).days // 7)
+
+    cutoff = _week_key(now - timedelta(weeks=RECENT_WEEKS - 1))
+    recent = [w for key, w in data.get("weeks", {}).items() if key >= cutoff]
+    recent_sessions = sum(w["sessions"] for w in recent)
+    lines = [
+        "## Athlete profile",
+        f"- Training for {weeks_training} weeks ({sessions_count} sessions); "
+        f"last {RECENT_WEEKS} weeks: {recent_sessions / RECENT_WEEKS:.1f} sessions/week; "
+        f"last session {(now - last).days} days ago",
+    ]
+
+    from backend.mcp_server import EXERCISE_DATABASE
+    compounds = {e["name"].lower() for group in EXERCISE_DATABASE.values() for e in group.get("compound", [])}
+    lifts = sorted(data.get("lifts", {}).items(),
+                   key=lambda kv: (kv[0].lower() in compounds, kv[1]["sessions"]), reverse=True)
+    if lifts:
+        lines.append("- Main lifts (last top set · best estimated 1RM · trend):")
+        for name, lift in lifts[:MAIN_LIFTS_SHOWN]:
+            if lift["best_e1rm"]:
+                best = f"e1RM {_fmt(lift['best_e1rm'])} kg (PR {_fmt(lift['pr_weight'])} kg × {lift['pr_reps']}, {lift['pr_date'][:10]})"
+                working = f"{_fmt(lift['working_weight'])} kg × {lift['working_reps']}"
+            else:
+                best = f"best {lift['best_reps']} reps"
+                working = f"{lift['working_reps']} reps"
+            lines.append(f"  - {name}: {working} · {best}{_trend(lift['history'])}")
+
+    group_sets: Dict[str, int] = defaultdict(int)
+    for week in recent:
+        for group, count in week["sets"].items():
+            group_sets[group] += count
+    total = sum(group_sets.values())
+    if total >= 10:
+        weak = sorted((group_sets.get(g, 0) / total, g) for g in MUSCLE_GROUPS)
+        weak = [f"{g} ({share:.0%} of sets)" for share, g in weak if share < WEAK_SHARE][:3]
+        if weak:
+            lines.append(f"- Weak points (last {RECENT_WEEKS} weeks): {', '.join(weak)}")
+    return "\n".join(lines)
+
+
+def profile_digest(db: Session, user_id: int, now: Optional[datetime] = None) -> str:
+    """The user's profile block for the system prompt, building the profile if needed."""
+    profile = _get(db, user_id)
+    if profile is None:
+        if not db.exec(select(TrainingSession.id).where(TrainingSession.user_id == user_id)).first():
+            return ""
+        profile = rebuild_profile(db, user_id)
+    return render_digest(json.loads(profile.data), profile.sessions_count, now)
+
+
+def working_weights(db: Session, user_id: int) -> Dict[str, float]:
+    """Normalized exercise name -> weight of the last top set, from the user's profile."""
+    from backend.exercise_resolver import normalize_exercise_name
+
+    profile = _get(db, user_id)
+    if profile is None:
+        return {}
+    return {normalize_exercise_name(name): lift["working_weight"]
+            for name, lift in json.loads(profile.data).get("lifts", {}).items() if lift.get("working_weight")}
@@ -0,0 +1,95 @@
+"""Benchmark exercise selection on a catalog-sized exercise list.
+
+Builds a synthetic catalog of N exercises spread over the muscle groups and
+equipment types, then times one workout's worth of group selections with
+the former per-call list comprehensions and with the selection index:
+
+    python -m backend.benchmarks.exercise_selection --catalog 1500 --runs 200
+"""
+import argparse
+import random
+import statistics
+import time
+
+from backend.exercise_selection import BODY_PART_GROUPS, SelectionIndex
+from backend.mcp_server import EXERCISE_DATABASE, GOAL_MUSCLE_MAP
+
+EQUIPMENT = ["barbell", "dumbbell", "cable", "leverage machine", "body weight", "kettlebell", "band", "other"]
+REQUESTS = [
+    ("full_body_hypertrophy", None),
+    ("push", ["dumbbell", "bench"]),
+    ("legs", ["kettlebell"]),
+    ("pull", ["cable", "machine"]),
+]
+
+
+def make_catalog(size: int, seed: int = 0) -> list:
+    """(name, body_part, equipment, mechanic, category) rows like CatalogExercise."""
+    rng = random.Random(seed)
+    body_parts = list(BODY_PART_GROUPS)
+    return [
+        (f"Catalog Exercise {i}", rng.choice(body_parts), rng.choice(EQUIPMENT),
+         rng.choice(["compound", "isolation"]), "strength")
+        for i in range(size)
+    ]
+
+
+def legacy_database(rows: list) -> dict:
+    """EXERCISE_DATABASE extended with the catalog, as the list-comprehension code would need it."""
+    database = {group: {m: list(data.get(m, [])) for m in ("compound", "isolation")}
+                for group, data in EXERCISE_DATABASE.items()}
+    for name, body_part, equipment, mechanic, _ in rows:
+        group = BODY_PART_GROUPS[body_part]
+        database[group][mechanic].append({"name": name, "category": group.title(), "equipment": [equipment]})
+    return database
+
+
+def legacy_select(database: dict, group: str, count: int, equipment) -> list:
+    compounds, isolations = database[group]["compound"], database[group]["isolation"]
+    if equipment:
+        eq_set = {e.lower() for e in equipment} | {"bodyweight"}
+        compounds = [e for e in compounds if any(eq in eq_set for eq in e["equipment"])]
+        isolations = [e for e in isolations if any(eq in eq_set for eq in e["equipment"])]
+    return (compounds + isolations)[:count]
+
+
+def indexed_select(index: SelectionIndex, group: str, count: int, equipment) -> list:
+    return (index.candidates(group, "compound", equipment, count)
+            + index.candidates(group, "isolation", equipment, count))[:count]
+
+
+def run(catalog: int, runs: int) -> dict:
+    rows = make_catalog(catalog)
+    started = time.perf_counter()
+    index = SelectionIndex(EXERCISE_DATABASE, rows)
+    build_ms = (time.perf_counter() - started) * 1000
+    database = legacy_database(rows)
+
+    report = {"build_ms": build_ms, "exercises": index.size}
+    for label, select, source in (("legacy", legacy_select, database), ("indexed", indexed_select, index)):
+        times = []
+        for _ in range(runs):
+            for goal, equipment in REQUESTS:
+                started = time.perf_counter()
+                for group in GOAL_MUSCLE_MAP[goal]:
+                    select(source, group, 3, equipment)
+                times.append(time.perf_counter() - started)
+        report[label] = statistics.median(times) * 1000
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--catalog", type=int, default=1500)
+    parser.add_argument("--runs", type=int, default=200)
+    args = parser.parse_args()
+
+    report = run(args.catalog, args.runs)
+    print(f"Exercise selection over {report['exercises']} exercises (index built in {report['build_ms']:.1f} ms)")
+    print(f"  legacy  {report['legacy']:8.3f} ms per workout")
+    print(f"  indexed {report['indexed']:8.3f} ms per workout")
+    print(f"  speedup {report['legacy'] / report['indexed']:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""Benchmark the bulk history import on a generated Strong-style CSV export.
+
+Writes N sets (sessions of 5 exercises x 4 sets, some exercise names unknown
+so they are created) to a CSV file and imports it into a scratch SQLite
+file: once timed, once again to time duplicate detection, and once for a
+second user under tracemalloc for the peak memory (traced runs are slower):
+
+    python -m backend.benchmarks.history_import --sets 100000
+"""
+import argparse
+import csv
+import os
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+from sqlmodel import Session, SQLModel, create_engine, func, select
+
+from backend.history_import import import_history
+from backend.models import Exercise, TrainingSet, User
+
+EXERCISES = ["Bench Press (Barbell)", "Squat (Barbell)", "Deadlift (Barbell)", "Overhead Press (Barbell)",
+             "Lat Pulldown (Cable)", "Bicep Curl (Dumbbell)", "Leg Press", "Seated Row (Cable)"]
+
+
+def make_csv(path: str, sets: int, per_exercise: int = 4, per_session: int = 5):
+    start = datetime(2015, 1, 1, 18)
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["Date", "Workout Name", "Duration", "Exercise Name", "Set Order", "Weight", "Reps",
+                         "Distance", "Seconds", "Notes"])
+        written, session = 0, 0
+        while written < sets:
+            date = (start + timedelta(days=session)).strftime("%Y-%m-%d %H:%M:%S")
+            for e in range(per_session):
+                name = EXERCISES[(session + e) % len(EXERCISES)]
+                for order in range(1, per_exercise + 1):
+                    if written == sets:
+                        break
+                    writer.writerow([date, "Workout", "1h 5m", name, order, 40 + session % 50, 8, 0, 0, ""])
+                    written += 1
+            session += 1
+
+
+def run(sets: int) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "strong.csv")
+        make_csv(path, sets)
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        SQLModel.metadata.create_all(engine)
+        with Session(engine) as db:
+            db.add_all([User(name="Bench", email="bench@example.com", password_hash="x"),
+                        Exercise(name="Bench Press", category="Chest"), Exercise(name="Squat", category="Legs")])
+            db.commit()
+            user_id = db.exec(select(User.id)).one()
+
+        report = {"file_mb": os.path.getsize(path) / 1e6}
+        for label in ("import", "reimport"):
+            started = time.perf_counter()
+            with open(path, "rb") as stream:
+                summary = list(import_history(engine, user_id, stream, "csv"))[-1]
+            report[label] = {"seconds": time.perf_counter() - started, **summary}
+        with Session(engine) as db:
+            report["stored_sets"] = db.exec(select(func.count(TrainingSet.id))).one()
+
+        with Session(engine) as db:
+            db.add(User(name="Traced", email="traced@example.com", password_hash="x"))
+            db.commit()
+            traced_id = db.exec(select(func.max(User.id))).one()
+        tracemalloc.start()
+        with open(path, "rb") as stream:
+            for _ in import_history(engine, traced_id, stream, "csv"):
+                pass
+        report["peak_mb"] = tracemalloc.get_traced_memory()[1] / 1e6
+        tracemalloc.stop()
+        engine.dispose()
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sets", type=int, default=100_000)
+    args = parser.parse_args()
+
+    report = run(args.sets)
+    first, again = report["import"], report["reimport"]
+    print(f"History import of {args.sets} sets ({report['file_mb']:.1f} MB CSV)")
+    print(f"  import   {first['seconds']:6.2f} s  {args.sets / first['seconds']:9.0f} sets/s  "
+          f"peak {report['peak_mb']:.1f} MB  ({first['sessions']} sessions, "
+          f"{first['exercises_created']} exercises created)")
+    print(f"  reimport {again['seconds']:6.2f} s  {again['duplicates']} duplicate sessions skipped, "
+          f"{again['sets']} sets added")
+    print(f"  stored   {report['stored_sets']} sets")
+
+
+if __name__ == "__main__":
+    main()
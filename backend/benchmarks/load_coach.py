@@ -0,0 +1,313 @@
+"""Concurrent load driver for the /coach/chat SSE endpoint.
+
+Opens N authenticated chat streams at once and reports time-to-first-token,
+inter-token latency, backend CPU and event-loop lag. With ``--spawn`` it
+starts the stub LLM server and a backend on a scratch database itself, so the
+whole run is offline:
+
+    python -m backend.benchmarks.load_coach --spawn --concurrency 20 --requests 100
+
+Against an already running backend (CPU sampling needs ``--server-pid``):
+
+    python -m backend.benchmarks.load_coach --base-url http://127.0.0.1:8000 --concurrency 10
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+import httpx
+
+PROMPT = "Create a push workout for me"
+
+
+@dataclass
+class StreamResult:
+    ok: bool = False
+    status: int = 0
+    ttft: Optional[float] = None
+    total: float = 0.0
+    gaps: List[float] = field(default_factory=list)
+    events: int = 0
+    error: str = ""
+
+
+def percentile(values: List[float], q: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(q / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def parse_histogram(text: str, name: str):
+    """(sum, count, {le: cumulative}) for an unlabelled histogram in Prometheus text."""
+    total = count = 0.0
+    buckets = {}
+    for line in text.splitlines():
+        if line.startswith(f"{name}_sum"):
+            total = float(line.rsplit(" ", 1)[1])
+        elif line.startswith(f"{name}_count"):
+            count = float(line.rsplit(" ", 1)[1])
+        elif line.startswith(f"{name}_bucket"):
+            le = line.split('le="', 1)[1].split('"', 1)[0]
+            buckets[le] = float(line.rsplit(" ", 1)[1])
+    return total, count, buckets
+
+
+class CpuSampler:
+    """Samples utime+stime of a process from /proc (Linux only)."""
+
+    def __init__(self, pid: Optional[int]):
+        self.pid = pid
+        self.ticks = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+        self.samples: List[float] = []
+        self.cpu_seconds = 0.0
+        self._task = None
+
+    def _cpu_seconds(self) -> Optional[float]:
+        try:
+            with open(f"/proc/{self.pid}/stat") as f:
+                fields = f.read().rsplit(")", 1)[1].split()
+            return (int(fields[11]) + int(fields[12])) / self.ticks
+        except (OSError, IndexError, ValueError):
+            return None
+
+    async def _run(self, interval: float):
+        last_cpu, last_t = self._cpu_seconds(), time.monotonic()
+        while True:
+            await asyncio.sleep(interval)
+            cpu, now = self._cpu_seconds(), time.monotonic()
+            if cpu is None or last_cpu is None:
+                return
+            self.samples.append(100 * (cpu - last_cpu) / (now - last_t))
+            self.cpu_seconds += cpu - last_cpu
+            last_cpu, last_t = cpu, now
+
+    def start(self, interval: float = 0.5):
+        if self.pid:
+            self._task = asyncio.create_task(self._run(interval))
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+
+async def get_token(client: httpx.AsyncClient) -> str:
+    email = f"bench-{uuid.uuid4().hex[:8]}@example.com"
+    response = await client.post("/auth/register", json={"name": "Bench", "email": email, "password": "bench"})
+    response.raise_for_status()
+    return response.json()["access_token"]
+
+
+async def run_stream(client: httpx.AsyncClient, token: str, model_source: str) -> StreamResult:
+    result = StreamResult()
+    start = time.monotonic()
+    last = None
+    try:
+        async with client.stream(
+            "POST", "/coach/chat",
+            json={"question": PROMPT, "session_ids": [], "model_source": model_source},
+            headers={"Authorization": f"Bearer {token}"},
+        ) as response:
+            result.status = response.status_code
+            if response.status_code != 200:
+                result.error = f"HTTP {response.status_code}"
+                return result
+            async for line in response.aiter_lines():
+                if not line.startswith("data: "):
+                    continue
+                event = json.loads(line[6:])
+                now = time.monotonic()
+                result.events += 1
+                if event.get("type") == "error":
+                    result.error = event.get("text", "error")
+                if event.get("type") in ("content", "thinking"):
+                    if result.ttft is None:
+                        result.ttft = now - start
+                    elif last is not None:
+                        result.gaps.append(now - last)
+                    last = now
+                if event.get("type") == "done":
+                    result.ok = not result.error
+    except httpx.HTTPError as e:
+        result.error = f"{type(e).__name__}: {e}"
+    result.total = time.monotonic() - start
+    return result
+
+
+async def run_load(base_url: str, concurrency: int, requests: int, model_source: str,
+                   server_pid: Optional[int] = None, timeout: float = 120) -> dict:
+    limits = httpx.Limits(max_connections=concurrency + 4, max_keepalive_connections=concurrency + 4)
+    async with httpx.AsyncClient(base_url=base_url, timeout=timeout, limits=limits) as client:
+        tokens = await asyncio.gather(*(get_token(client) for _ in range(concurrency)))
+        lag_before = parse_histogram((await client.get("/metrics")).text, "event_loop_lag_seconds")
+
+        queue: asyncio.Queue = asyncio.Queue()
+        for i in range(requests):
+            queue.put_nowait(i)
+        results: List[StreamResult] = []
+
+        async def worker(token: str):
+            while True:
+                try:
+                    queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                results.append(await run_stream(client, token, model_source))
+
+        cpu = CpuSampler(server_pid)
+        cpu.start()
+        started = time.monotonic()
+        await asyncio.gather(*(worker(t) for t in tokens))
+        elapsed = time.monotonic() - started
+        await cpu.stop()
+
+        lag_after = parse_histogram((await client.get("/metrics")).text, "event_loop_lag_seconds")
+
+    ttfts = [r.ttft for r in results if r.ttft is not None]
+    gaps = [g for r in results for g in r.gaps]
+    lag_count = lag_after[1] - lag_before[1]
+    lag_over_50ms = (lag_count - (lag_after[2].get("0.05", 0) - lag_before[2].get("0.05", 0))) if lag_count else 0
+
+    def summary(values):
+        return {"p50": percentile(values, 50), "p95": percentile(values, 95), "p99": percentile(values, 99),
+                "max": max(values) if values else None}
+
+    return {
+        "concurrency": concurrency,
+        "requests": len(results),
+        "ok": sum(r.ok for r in results),
+        "errors": sorted({r.error for r in results if r.error})[:5],
+        "elapsed_s": elapsed,
+        "streams_per_s": len(results) / elapsed if elapsed else 0,
+        "ttft_s": summary(ttfts),
+        "inter_token_s": summary(gaps),
+        "stream_total_s": summary([r.total for r in results]),
+        "frames_per_stream": summary([r.events for r in results if r.ok]),
+        "server_cpu_pct": {
+            "mean": sum(cpu.samples) / len(cpu.samples),
+            "max": max(cpu.samples),
+            "cpu_ms_per_stream": 1000 * cpu.cpu_seconds / len(results),
+        } if cpu.samples and results else None,
+        "event_loop_lag_s": {
+            "mean": (lag_after[0] - lag_before[0]) / lag_count if lag_count else None,
+            "samples": int(lag_count),
+            "over_50ms": int(lag_over_50ms),
+        },
+    }
+
+
+def format_report(report: dict) -> str:
+    def ms(value):
+        return "-" if value is None else f"{value * 1000:.1f}ms"
+
+    lines = [
+        f"streams: {report['ok']}/{report['requests']} ok at concurrency {report['concurrency']} "
+        f"in {report['elapsed_s']:.1f}s ({report['streams_per_s']:.2f}/s)",
+    ]
+    for key, label in (("ttft_s", "TTFT"), ("inter_token_s", "inter-token"), ("stream_total_s", "stream total")):
+        s = report[key]
+        lines.append(f"{label:>13}: p50 {ms(s['p50'])}  p95 {ms(s['p95'])}  p99 {ms(s['p99'])}  max {ms(s['max'])}")
+    frames = report["frames_per_stream"]
+    if frames["p50"] is not None:
+        lines.append(f"{'frames':>13}: p50 {frames['p50']}  max {frames['max']} per stream")
+    cpu = report["server_cpu_pct"]
+    lines.append(f"{'server CPU':>13}: " + (
+        f"mean {cpu['mean']:.0f}%  max {cpu['max']:.0f}%  {cpu['cpu_ms_per_stream']:.1f}ms per stream"
+        if cpu else "n/a (no --server-pid)"))
+    lag = report["event_loop_lag_s"]
+    lines.append(f"{'loop lag':>13}: mean {ms(lag['mean'])}  >50ms {lag['over_50ms']}/{lag['samples']} samples")
+    if report["errors"]:
+        lines.append(f"{'errors':>13}: " + "; ".join(report["errors"]))
+    return "\n".join(lines)
+
+
+async def _wait_ready(url: str, timeout: float = 30):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            try:
+                await client.get(url)
+                return
+            except httpx.TransportError:
+                await asyncio.sleep(0.2)
+    raise RuntimeError(f"{url} did not come up within {timeout}s")
+
+
+def spawn(args) -> tuple:
+    """Start the stub LLM and a backend on a scratch database; returns (procs, base_url, pid)."""
+    stub_url = f"http://127.0.0.1:{args.stub_port}"
+    db_dir = tempfile.mkdtemp(prefix="coach-bench-")
+    env = dict(
+        os.environ,
+        DATABASE_URL=f"sqlite:///{os.path.join(db_dir, 'bench.db')}",
+        OPENROUTER_API_KEY="stub",
+        OPENROUTER_BASE_URL=f"{stub_url}/v1",
+        OPENROUTER_FALLBACK_MODELS="",
+        POLLINATIONS_URL=f"{stub_url}/openai/chat/completions",
+        OLLAMA_HOST=stub_url,
+        QUOTE_REFILL_INTERVAL_S="3600",
+    )
+    stub_cmd = [sys.executable, "-m", "backend.benchmarks.stub_llm_server", "--port", str(args.stub_port),
+                "--ttft-ms", str(args.ttft_ms), "--tokens-per-sec", str(args.tokens_per_sec),
+                "--response-tokens", str(args.response_tokens), "--error-rate", str(args.error_rate)]
+    backend_cmd = [sys.executable, "-m", "uvicorn", "backend.main:app", "--host", "127.0.0.1",
+                   "--port", str(args.backend_port), "--log-level", "warning"]
+    quiet = {"stdout": subprocess.DEVNULL, "stderr": subprocess.DEVNULL}
+    procs = [subprocess.Popen(stub_cmd, env=env, **quiet), subprocess.Popen(backend_cmd, env=env, **quiet)]
+    return procs, f"http://127.0.0.1:{args.backend_port}", procs[1].pid, stub_url
+
+
+async def main_async(args) -> dict:
+    procs = []
+    base_url, pid = args.base_url, args.server_pid
+    try:
+        if args.spawn:
+            procs, base_url, pid, stub_url = spawn(args)
+            await _wait_ready(f"{stub_url}/api/tags")
+            await _wait_ready(f"{base_url}/metrics")
+        return await run_load(base_url, args.concurrency, args.requests or args.concurrency,
+                              args.model_source, server_pid=pid)
+    finally:
+        for proc in procs:
+            proc.terminate()
+        for proc in procs:
+            proc.wait(timeout=10)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--server-pid", type=int, default=None, help="backend PID for CPU sampling")
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--requests", type=int, default=0, help="total streams (default: one per worker)")
+    parser.add_argument("--model-source", choices=("web", "local"), default="web")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    spawn_group = parser.add_argument_group("spawned stub + backend")
+    spawn_group.add_argument("--spawn", action="store_true")
+    spawn_group.add_argument("--backend-port", type=int, default=8765)
+    spawn_group.add_argument("--stub-port", type=int, default=9100)
+    spawn_group.add_argument("--ttft-ms", type=float, default=300)
+    spawn_group.add_argument("--tokens-per-sec", type=float, default=40)
+    spawn_group.add_argument("--response-tokens", type=int, default=120)
+    spawn_group.add_argument("--error-rate", type=float, default=0.0)
+    args = parser.parse_args(argv)
+
+    report = asyncio.run(main_async(args))
+    print(json.dumps(report, indent=2) if args.json else format_report(report))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+"""Local stub LLM server speaking the OpenRouter/OpenAI and Ollama streaming protocols.
+
+Used by the coach load tests so they run offline (Pi, CI) with controllable
+latency, token rate and error injection. Point the backend at it with:
+
+    OPENROUTER_API_KEY=stub OPENROUTER_BASE_URL=http://127.0.0.1:9100/v1 \\
+    POLLINATIONS_URL=http://127.0.0.1:9100/v1/chat/completions \\
+    OLLAMA_HOST=http://127.0.0.1:9100
+
+Run:
+    python -m backend.benchmarks.stub_llm_server --port 9100 --ttft-ms 300 --tokens-per-sec 40
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+import uuid
+from dataclasses import dataclass
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+WORDS = (
+    "Focus on progressive overload this week. Start with compound lifts, keep two "
+    "reps in reserve on the heavy sets, and rest two to three minutes between them. "
+    "Finish with accessory work for the muscles you have been neglecting. "
+).split()
+
+# Scripted coach pipeline: one tool per iteration, then the explanation
+TOOL_SCRIPT = [
+    ("get_training_recommendations", {}),
+    ("design_workout", {"goal": "push", "experience_level": "intermediate"}),
+    ("create_workout_template", {
+        "name": "Stub Push Day",
+        "exercises": [
+            {"name": "Bench Press", "category": "Chest", "sets": [{"goal_weight": 60, "goal_reps": 8}] * 3},
+            {"name": "Overhead Press", "category": "Shoulders", "sets": [{"goal_weight": 40, "goal_reps": 8}] * 3},
+        ],
+    }),
+]
+
+
+@dataclass
+class StubConfig:
+    ttft_ms: float = 300
+    tokens_per_sec: float = 40
+    response_tokens: int = 120
+    error_rate: float = 0.0          # fraction of requests answered with HTTP 500
+    midstream_error_rate: float = 0.0  # fraction of streams that emit an error event halfway
+    tool_calls: bool = True          # follow TOOL_SCRIPT when the request offers tools
+    tool_arg_chunks: int = 4         # split tool-call arguments over this many deltas
+
+
+CONFIG = StubConfig()
+app = FastAPI(title="Stub LLM")
+
+
+def _tokens(n: int):
+    for i in range(n):
+        yield WORDS[i % len(WORDS)] + " "
+
+
+def _next_tool(messages: list):
+    """The next scripted tool, based on how many tool results the conversation has."""
+    done = sum(1 for m in messages if m.get("role") == "tool")
+    return TOOL_SCRIPT[done] if done < len(TOOL_SCRIPT) else None
+
+
+async def _pace(start: float, index: int):
+    """Sleep so that token `index` goes out at ttft + index / rate."""
+    due = start + CONFIG.ttft_ms / 1000 + index / max(CONFIG.tokens_per_sec, 0.001)
+    delay = due - time.monotonic()
+    if delay > 0:
+        await asyncio.sleep(delay)
+
+
+def _fail_midstream() -> bool:
+    return random.random() < CONFIG.midstream_error_rate
+
+
+@app.post("/v1/chat/completions")
+@app.post("/openai/chat/completions")
+async def openai_chat(request: Request):
+    body = await request.json()
+    if random.random() < CONFIG.error_rate:
+        return JSONResponse({"error": {"message": "stub injected failure"}}, status_code=500)
+
+    messages = body.get("messages", [])
+    tool = _next_tool(messages) if (CONFIG.tool_calls and body.get("tools")) else None
+    model = body.get("model", "stub")
+    fail_at = CONFIG.response_tokens // 2 if _fail_midstream() else None
+
+    def chunk(delta: dict, finish=None) -> str:
+        return "data: " + json.dumps({
+            "id": "chatcmpl-stub",
+            "object": "chat.completion.chunk",
+            "model": model,
+            "choices": [{"index": 0, "delta": delta, "finish_reason": finish}],
+        }) + "\n\n"
+
+    async def stream():
+        start = time.monotonic()
+        if tool:
+            name, args = tool
+            raw = json.dumps(args)
+            size = max(1, len(raw) // CONFIG.tool_arg_chunks + 1)
+            pieces = [raw[i:i + size] for i in range(0, len(raw), size)] or ["{}"]
+            call_id = f"call_{uuid.uuid4().hex[:8]}"
+            for i, piece in enumerate(pieces):
+                await _pace(start, i)
+                tc = {"index": 0, "function": {"arguments": piece}}
+                if i == 0:
+                    tc.update({"id": call_id, "type": "function"})
+                    tc["function"]["name"] = name
+                yield chunk({"tool_calls": [tc]})
+            yield chunk({}, finish="tool_calls")
+        else:
+            count = 0
+            for i, tok in enumerate(_tokens(CONFIG.response_tokens)):
+                if fail_at is not None and i == fail_at:
+                    yield "data: " + json.dumps({"error": {"message": "stub mid-stream failure"}}) + "\n\n"
+                    return
+                await _pace(start, i)
+                count += 1
+                yield chunk({"content": tok})
+            yield chunk({}, finish="stop")
+            yield "data: " + json.dumps({
+                "id": "chatcmpl-stub", "choices": [],
+                "usage": {"prompt_tokens": sum(len(str(m.get("content", ""))) // 4 for m in messages),
+                          "completion_tokens": count, "cost": 0},
+            }) + "\n\n"
+        yield "data: [DONE]\n\n"
+
+    return StreamingResponse(stream(), media_type="text/event-stream")
+
+
+@app.post("/api/chat")
+async def ollama_chat(request: Request):
+    body = await request.json()
+    if random.random() < CONFIG.error_rate:
+        return JSONResponse({"error": "stub injected failure"}, status_code=500)
+
+    model = body.get("model", "stub")
+    messages = body.get("messages", [])
+    tool = _next_tool(messages) if (CONFIG.tool_calls and body.get("tools")) else None
+
+    def line(message: dict, done=False, **extra) -> str:
+        return json.dumps({
+            "model": model,
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "message": {"role": "assistant", **message},
+            "done": done,
+            **extra,
+        }) + "\n"
+
+    async def stream():
+        start = time.monotonic()
+        count = 0
+        if tool:
+            await _pace(start, 0)
+            name, args = tool
+            yield line({"content": "", "tool_calls": [{"function": {"name": name, "arguments": args}}]})
+        else:
+            for i, tok in enumerate(_tokens(CONFIG.response_tokens)):
+                await _pace(start, i)
+                count += 1
+                yield line({"content": tok})
+        yield line({"content": ""}, done=True, done_reason="stop", eval_count=count,
+                   prompt_eval_count=0, total_duration=int((time.monotonic() - start) * 1e9))
+
+    if body.get("stream", True) is False:
+        # Non-streaming request: collapse the stream into one message
+        parts = [json.loads(part) async for part in stream()]
+        content = "".join(p["message"].get("content", "") for p in parts)
+        final = parts[-1]
+        final["message"] = {"role": "assistant", "content": content,
+                            **({"tool_calls": parts[0]["message"]["tool_calls"]} if tool else {})}
+        return JSONResponse(final)
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+
+@app.get("/api/tags")
+async def ollama_tags():
+    return {"models": [{"name": "stub", "model": "stub"}]}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--ttft-ms", type=float, default=CONFIG.ttft_ms)
+    parser.add_argument("--tokens-per-sec", type=float, default=CONFIG.tokens_per_sec)
+    parser.add_argument("--response-tokens", type=int, default=CONFIG.response_tokens)
+    parser.add_argument("--error-rate", type=float, default=CONFIG.error_rate)
+    parser.add_argument("--midstream-error-rate", type=float, default=CONFIG.midstream_error_rate)
+    parser.add_argument("--no-tool-calls", action="store_true")
+    args = parser.parse_args(argv)
+
+    CONFIG.ttft_ms = args.ttft_ms
+    CONFIG.tokens_per_sec = args.tokens_per_sec
+    CONFIG.response_tokens = args.response_tokens
+    CONFIG.error_rate = args.error_rate
+    CONFIG.midstream_error_rate = args.midstream_error_rate
+    CONFIG.tool_calls = not args.no_tool_calls
+
+    import uvicorn
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
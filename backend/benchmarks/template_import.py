@@ -0,0 +1,143 @@
+"""Benchmark template writes: bulk writer vs the former commit-per-row loop.
+
+Imports a generated template with N exercises (half of them unknown, so they
+are created) into a scratch SQLite file and reports wall time and SQL
+statement counts per import, then the rows written by typical edits with
+the in-place diff update compared to deleting and recreating everything:
+
+    python -m backend.benchmarks.template_import --exercises 50 --runs 20
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+from sqlalchemy import event
+from sqlmodel import Session, SQLModel, create_engine, select
+
+from backend.models import Exercise, TemplateExercise, TemplateSet, User, WorkoutTemplate
+from backend.template_writer import ExerciseSpec, SetSpec, update_template_in_place, write_template
+
+
+def make_specs(count: int, run: int, sets: int = 4) -> list:
+    """``count`` exercises; odd ones are new for every run so the writer has to create them."""
+    return [
+        ExerciseSpec(
+            name=f"Seeded Exercise {i}" if i % 2 == 0 else f"New Exercise {run}-{i}",
+            category="Benchmark",
+            sets=[SetSpec(goal_weight=20 + i, goal_reps=8) for _ in range(sets)],
+        )
+        for i in range(count)
+    ]
+
+
+def legacy_import(db: Session, user_id: int, name: str, specs: list) -> int:
+    """The pre-bulk write path: one lookup per exercise and a commit per row."""
+    template = WorkoutTemplate(name=name, user_id=user_id)
+    db.add(template)
+    db.commit()
+    db.refresh(template)
+    for order, spec in enumerate(specs):
+        exercise = db.exec(select(Exercise).where(Exercise.name == spec.name)).first()
+        if not exercise:
+            exercise = Exercise(name=spec.name, category=spec.category, is_custom=True, user_id=user_id)
+            db.add(exercise)
+            db.commit()
+            db.refresh(exercise)
+        tex = TemplateExercise(template_id=template.id, exercise_id=exercise.id, order=order)
+        db.add(tex)
+        db.commit()
+        db.refresh(tex)
+        for s in spec.sets:
+            db.add(TemplateSet(template_exercise_id=tex.id, goal_weight=s.goal_weight, goal_reps=s.goal_reps))
+    db.commit()
+    db.refresh(template)
+    return template.id
+
+
+def run(exercises: int, runs: int) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        SQLModel.metadata.create_all(engine)
+        statements = [0]
+        event.listen(engine, "before_cursor_execute", lambda *args: statements.__setitem__(0, statements[0] + 1))
+
+        with Session(engine) as db:
+            user = User(name="bench", email="bench@example.com", password_hash="x")
+            db.add(user)
+            db.add_all(Exercise(name=f"Seeded Exercise {i}", category="Benchmark") for i in range(exercises))
+            db.commit()
+            user_id = user.id
+
+        report = {}
+        for label, write in (
+            ("legacy", lambda db, r: legacy_import(db, user_id, f"Legacy {r}", make_specs(exercises, r))),
+            ("bulk", lambda db, r: write_template(db, user_id, f"Bulk {r}", make_specs(exercises, r + runs))),
+        ):
+            times, counts = [], []
+            for r in range(runs):
+                with Session(engine) as db:
+                    statements[0] = 0
+                    started = time.perf_counter()
+                    write(db, r)
+                    times.append(time.perf_counter() - started)
+                    counts.append(statements[0])
+            report[label] = {
+                "median_ms": statistics.median(times) * 1000,
+                "statements": statistics.median(counts),
+            }
+        return report
+
+
+EDITS = {
+    "reorder two exercises": lambda specs: [specs[1], specs[0]] + specs[2:],
+    "change one set": lambda specs: [ExerciseSpec(exercise_id=specs[0].exercise_id,
+                                                  sets=[SetSpec(99, 3)] + specs[0].sets[1:])] + specs[1:],
+    "add an exercise": lambda specs: specs + [ExerciseSpec(exercise_id=specs[0].exercise_id, sets=[SetSpec(10, 10)])],
+    "remove an exercise": lambda specs: specs[:-1],
+}
+
+
+def edit_volume(exercises: int) -> dict:
+    """Rows written per typical edit: in-place diff vs delete-and-recreate."""
+    engine = create_engine("sqlite://")
+    SQLModel.metadata.create_all(engine)
+    with Session(engine) as db:
+        user = User(name="bench", email="bench@example.com", password_hash="x")
+        db.add(user)
+        db.commit()
+        read = write_template(db, user.id, "Edits", make_specs(exercises, 0))
+        base = [ExerciseSpec(exercise_id=e.exercise.id, sets=[SetSpec(s.goal_weight, s.goal_reps) for s in e.sets])
+                for e in read.exercises]
+        report = {}
+        for label, edit in EDITS.items():
+            template = db.get(WorkoutTemplate, read.id)
+            edited = edit(base)
+            _, diff = update_template_in_place(db, template, user.id, "Edits", edited)
+            # delete every stored row, insert every submitted one
+            replaced = sum(1 + len(spec.sets) for spec in base) + sum(1 + len(spec.sets) for spec in edited)
+            report[label] = {"diff": diff.rows_written, "replace": replaced}
+            update_template_in_place(db, db.get(WorkoutTemplate, read.id), user.id, "Edits", base)
+        return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--exercises", type=int, default=50)
+    parser.add_argument("--runs", type=int, default=20)
+    args = parser.parse_args()
+
+    report = run(args.exercises, args.runs)
+    print(f"Template import, {args.exercises} exercises x 4 sets, median of {args.runs} runs")
+    for label, row in report.items():
+        print(f"  {label:<7} {row['median_ms']:8.1f} ms  {row['statements']:6.0f} statements")
+    print(f"  speedup {report['legacy']['median_ms'] / report['bulk']['median_ms']:.1f}x")
+
+    print(f"\nRows written per edit ({args.exercises} exercises)")
+    for label, row in edit_volume(args.exercises).items():
+        print(f"  {label:<22} diff {row['diff']:4d}   replace-all {row['replace']:4d}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+"""Server-side storage for coach conversations.
+
+Turns are stored append-only. Once a conversation grows past
+``COMPACT_AFTER`` unsummarized messages, the oldest ones are folded into a
+compact extractive summary in a single step, so the prompt prefix (system
+prompt + summary) only changes at compaction points and stays cacheable by
+the provider in between.
+"""
+import re
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from sqlmodel import Session, select
+
+from backend.models import Conversation, ConversationMessage
+
+# Compact once this many messages are outside the summary...
+COMPACT_AFTER = 16
+# ...keeping this many recent messages verbatim
+KEEP_RECENT = 6
+# Hard cap for the summary; oldest lines are dropped first
+SUMMARY_MAX_CHARS = 3000
+LINE_MAX_CHARS = 220
+
+THINK_BLOCK = re.compile(r"<think>.*?(</think>|$)", re.DOTALL)
+TEMPLATE_BLOCK = re.compile(r"<workout_template>.*?(</workout_template>|$)", re.DOTALL)
+
+
+def get_conversation(db: Session, conversation_id: int, user_id: int) -> Optional[Conversation]:
+    return db.exec(
+        select(Conversation).where(
+            Conversation.id == conversation_id,
+            Conversation.user_id == user_id,
+        )
+    ).first()
+
+
+def create_conversation(db: Session, user_id: int, first_question: str) -> Conversation:
+    title = first_question.strip().splitlines()[0][:60] if first_question.strip() else "New conversation"
+    conversation = Conversation(user_id=user_id, title=title)
+    db.add(conversation)
+    db.commit()
+    db.refresh(conversation)
+    return conversation
+
+
+def append_message(db: Session, conversation: Conversation, role: str, content: str,
+                   thinking: Optional[str] = None) -> ConversationMessage:
+    message = ConversationMessage(
+        conversation_id=conversation.id,
+        role=role,
+        content=content,
+        thinking=thinking or None,
+    )
+    conversation.updated_at = datetime.utcnow()
+    db.add(message)
+    db.add(conversation)
+    db.commit()
+    db.refresh(message)
+    return message
+
+
+def split_assistant_output(full_content: str) -> Tuple[str, str]:
+    """Separate raw streamed output into (visible content, thinking)."""
+    thinking = "\n".join(
+        m.group(0).replace("<think>", "").replace("</think>", "").strip()
+        for m in THINK_BLOCK.finditer(full_content)
+    )
+    content = TEMPLATE_BLOCK.sub("", THINK_BLOCK.sub("", full_content)).strip()
+    return content, thinking
+
+
+def recent_messages(db: Session, conversation: Conversation) -> List[ConversationMessage]:
+    """Messages not yet folded into the summary, oldest first."""
+    return db.exec(
+        select(ConversationMessage)
+        .where(
+            ConversationMessage.conversation_id == conversation.id,
+            ConversationMessage.id > conversation.summary_through_id,
+        )
+        .order_by(ConversationMessage.id)
+    ).all()
+
+
+def _summary_line(message: ConversationMessage) -> str:
+    text = " ".join(message.content.split())
+    # First sentence is usually the gist; fall back to a hard cut
+    first = re.split(r"(?<=[.!?])\s", text, maxsplit=1)[0]
+    if len(first) > LINE_MAX_CHARS:
+        first = first[:LINE_MAX_CHARS].rstrip() + "…"
+    who = "User" if message.role == "user" else "Coach"
+    return f"- {who}: {first}"
+
+
+def _join_summary(lines: List[str]) -> str:
+    while lines and sum(len(line) + 1 for line in lines) > SUMMARY_MAX_CHARS:
+        lines.pop(0)
+    return "\n".join(lines)
+
+
+def compact(db: Session, conversation: Conversation) -> bool:
+    """Fold old messages into the summary once enough have accumulated."""
+    pending = recent_messages(db, conversation)
+    if len(pending) <= COMPACT_AFTER:
+        return False
+
+    to_fold = pending[:-KEEP_RECENT]
+    lines = (conversation.summary or "").splitlines()
+    lines += [_summary_line(m) for m in to_fold]
+    conversation.summary = _join_summary(lines)
+    conversation.summary_through_id = to_fold[-1].id
+    db.add(conversation)
+    db.commit()
+    return True
+
+
+def delete_message(db: Session, conversation: Conversation, message_id: int) -> bool:
+    """Remove one stored message so it is no longer sent to the model.
+
+    A message already folded into the summary takes its summary line with it:
+    the summary is rebuilt from the folded messages that remain.
+    """
+    message = db.exec(
+        select(ConversationMessage).where(
+            ConversationMessage.id == message_id,
+            ConversationMessage.conversation_id == conversation.id,
+        )
+    ).first()
+    if message is None:
+        return False
+
+    db.delete(message)
+    if message_id <= conversation.summary_through_id:
+        folded = db.exec(
+            select(ConversationMessage)
+            .where(
+                ConversationMessage.conversation_id == conversation.id,
+                ConversationMessage.id <= conversation.summary_through_id,
+                ConversationMessage.id != message_id,
+            )
+            .order_by(ConversationMessage.id)
+        ).all()
+        conversation.summary = _join_summary([_summary_line(m) for m in folded]) or None
+    conversation.updated_at = datetime.utcnow()
+    db.add(conversation)
+    db.commit()
+    return True
+
+
+def prompt_history(db: Session, conversation: Conversation) -> Tuple[Optional[str], List[Tuple[str, str]]]:
+    """(summary, [(role, content), ...]) in the internal llm_messages role format."""
+    history = []
+    for m in recent_messages(db, conversation):
+        history.append(("human" if m.role == "user" else "ai", m.content))
+    return conversation.summary, history
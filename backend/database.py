@@ -4,17 +4,22 @@ from sqlmodel import SQLModel, create_engine, Session
 # Use absolute path for the database file
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 sqlite_file_name = os.path.join(BASE_DIR, "data", "database.db")
-sqlite_url = f"sqlite:///{sqlite_file_name}"
+# DATABASE_URL lets benchmarks and tooling point at a scratch database
+sqlite_url = os.environ.get("DATABASE_URL", f"sqlite:///{sqlite_file_name}")
 
 connect_args = {"check_same_thread": False}
-engine = create_engine(sqlite_url, echo=True, connect_args=connect_args)
+# SQL echo writes synchronously to stdout; opt in with SQL_ECHO=1 when debugging queries
+engine = create_engine(sqlite_url, echo=os.environ.get("SQL_ECHO", "0") == "1", connect_args=connect_args)
 
 def create_db_and_tables():
     # Import models explicitly to ensure they are registered with SQLModel.metadata
     from backend.models import (
         User, Exercise, TrainingSession, SessionExercise, TrainingSet, 
-        WorkoutTemplate, TemplateExercise, TemplateSet, GarminCredentials, HeartRateLog
+        WorkoutTemplate, TemplateExercise, TemplateSet, GarminCredentials, HeartRateLog,
+        Conversation, ConversationMessage, MotivationQuote, AthleteProfile,
+        CatalogExercise, CatalogLookup, MediaAsset, ExerciseTarget
     )
+    import backend.exercise_resolver  # noqa: F401  keeps Exercise.normalized_name in sync
     SQLModel.metadata.create_all(engine)
 
 def get_session():
@@ -0,0 +1,254 @@
+"""Local exercise catalog: bulk-imported ExerciseDB data with full-text search.
+
+``import_catalog`` loads a JSON dump (``backend/data/exercises.json`` by
+default) into the ``CatalogExercise`` table in one transaction and rebuilds
+an FTS5 index over name, target and body part. Both ExerciseDB records
+(``bodyPart``/``target``/``gifUrl``) and free-exercise-db records
+(``primaryMuscles``/``images``) are accepted. Startup imports the dump when
+the catalog is empty or the file is newer than the last import.
+
+``search`` answers from SQLite in milliseconds. When the local result is
+short and a RapidAPI key is configured, ``lookup`` reads through to the live
+API once per query per ``CATALOG_LIVE_TTL_S`` and merges the results into
+the catalog, so later lookups (and offline runs) are served locally.
+
+    EXERCISE_CATALOG_PATH    JSON dump to import (default backend/data/exercises.json)
+    CATALOG_IMAGE_BASE       prefix for relative image paths in the dump
+    CATALOG_LIVE_TTL_S       how long a live lookup result stays fresh (default 7 days)
+
+Run ``python -m backend.exercise_catalog [path]`` to re-import manually.
+"""
+import json
+import logging
+import os
+import re
+import sys
+import time
+import weakref
+from datetime import datetime, timedelta
+from typing import Iterable, List, Optional
+
+import httpx
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+from sqlmodel import Session, func, select
+
+from backend.models import CatalogExercise, CatalogLookup
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "exercises.json")
+CATALOG_PATH = os.environ.get("EXERCISE_CATALOG_PATH", DEFAULT_PATH)
+IMAGE_BASE = os.environ.get(
+    "CATALOG_IMAGE_BASE", "https://raw.githubusercontent.com/yuhonas/free-exercise-db/main/exercises/"
+)
+LIVE_TTL_S = float(os.environ.get("CATALOG_LIVE_TTL_S", str(7 * 24 * 3600)))
+LIVE_TIMEOUT_S = 5.0
+FTS_TABLE = "catalogexercise_fts"
+
+# free-exercise-db muscles -> ExerciseDB body parts
+MUSCLE_BODY_PART = {
+    "abdominals": "waist", "abductors": "upper legs", "adductors": "upper legs", "glutes": "upper legs",
+    "hamstrings": "upper legs", "quadriceps": "upper legs", "calves": "lower legs",
+    "biceps": "upper arms", "triceps": "upper arms", "forearms": "lower arms",
+    "chest": "chest", "lats": "back", "middle back": "back", "lower back": "back", "traps": "back",
+    "shoulders": "shoulders", "neck": "neck",
+}
+# Words the coach uses for categories -> terms the catalog indexes
+QUERY_ALIASES = {
+    "core": ["waist", "abdominals", "abs"],
+    "abs": ["waist", "abdominals", "abs"],
+    "legs": ["legs", "quadriceps", "hamstrings", "glutes", "calves"],
+    "arms": ["arms", "biceps", "triceps", "forearms"],
+    "push": ["chest", "shoulders", "triceps"],
+    "pull": ["back", "lats", "biceps"],
+}
+
+_fts_ready: "weakref.WeakSet[Engine]" = weakref.WeakSet()
+
+
+def _engine(engine: Optional[Engine]) -> Engine:
+    if engine is not None:
+        return engine
+    from backend.database import engine as default_engine
+    return default_engine
+
+
+def ensure_fts(engine: Optional[Engine] = None):
+    """Create the FTS5 index over the catalog table (external content) if missing."""
+    engine = _engine(engine)
+    if engine in _fts_ready:
+        return
+    with engine.begin() as conn:
+        conn.execute(text(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+            "name, target, body_part, content='catalogexercise', content_rowid='rowid')"
+        ))
+    _fts_ready.add(engine)
+
+
+def normalize(record: dict, source: str = "dump") -> Optional[dict]:
+    """Map an ExerciseDB or free-exercise-db record onto CatalogExercise columns."""
+    name = (record.get("name") or "").strip()
+    if not name:
+        return None
+    primary = record.get("primaryMuscles") or []
+    target = record.get("target") or (primary[0] if primary else "")
+    body_part = record.get("bodyPart") or MUSCLE_BODY_PART.get(target, "")
+    if not body_part and record.get("category") == "cardio":
+        body_part = "cardio"
+
+    media_url = record.get("gifUrl")
+    if not media_url and record.get("images"):
+        image = record["images"][0]
+        media_url = image if image.startswith("http") else IMAGE_BASE + image
+
+    instructions = record.get("instructions") or ""
+    if isinstance(instructions, list):
+        instructions = "\n".join(instructions)
+    return {
+        "id": str(record.get("id") or name),
+        "name": name,
+        "body_part": body_part,
+        "target": target,
+        "equipment": record.get("equipment") or "",
+        "category": record.get("category") or "",
+        "level": record.get("level") or "",
+        "mechanic": record.get("mechanic") or "",
+        "secondary_muscles": ", ".join(record.get("secondaryMuscles") or []),
+        "instructions": instructions,
+        "media_url": media_url,
+        "source": source,
+        "updated_at": datetime.utcnow(),
+    }
+
+
+def _upsert(engine: Engine, records: Iterable[dict], source: str) -> int:
+    """INSERT OR REPLACE ``records`` in one transaction and rebuild the FTS index."""
+    rows = [row for row in (normalize(r, source) for r in records) if row]
+    if not rows:
+        return 0
+    ensure_fts(engine)
+    columns = list(rows[0])
+    statement = text(
+        f"INSERT OR REPLACE INTO catalogexercise ({', '.join(columns)}) "
+        f"VALUES ({', '.join(':' + c for c in columns)})"
+    )
+    with engine.begin() as conn:
+        conn.execute(statement, rows)  # executemany
+        conn.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES('rebuild')"))
+    from backend import exercise_selection
+    exercise_selection.invalidate(engine)
+    return len(rows)
+
+
+def import_catalog(path: str = CATALOG_PATH, engine: Optional[Engine] = None) -> int:
+    """Bulk-import a JSON dump (a list of exercise records); returns the number of rows written."""
+    engine = _engine(engine)
+    started = time.perf_counter()
+    with open(path, encoding="utf-8") as f:
+        records = json.load(f)
+    count = _upsert(engine, records, "dump")
+    logger.info(f"[catalog] Imported {count} exercises from {path} in {(time.perf_counter() - started) * 1000:.0f}ms")
+    return count
+
+
+def ensure_catalog(path: str = CATALOG_PATH, engine: Optional[Engine] = None) -> int:
+    """Import the dump at startup if the catalog is empty or the file changed since the last import."""
+    engine = _engine(engine)
+    ensure_fts(engine)
+    if not os.path.exists(path):
+        return 0
+    with Session(engine) as session:
+        last_import = session.exec(
+            select(func.max(CatalogExercise.updated_at)).where(CatalogExercise.source == "dump")
+        ).one()
+    if last_import is not None and datetime.utcfromtimestamp(os.path.getmtime(path)) <= last_import:
+        return 0
+    return import_catalog(path, engine)
+
+
+def _match_expression(query: str) -> str:
+    """FTS5 MATCH expression: every word must match (as a prefix), aliases widen a word."""
+    groups = []
+    for word in re.findall(r"[a-z0-9]+", query.lower()):
+        terms = QUERY_ALIASES.get(word, [word])
+        groups.append("(" + " OR ".join(f'"{t}"*' for t in terms) + ")")
+    return " AND ".join(groups)
+
+
+def search(query: Optional[str] = None, limit: int = 10, engine: Optional[Engine] = None) -> List[CatalogExercise]:
+    """Catalog exercises best matching ``query`` (body part matches rank first), or the first ``limit``."""
+    engine = _engine(engine)
+    ensure_fts(engine)
+    with Session(engine) as session:
+        if not query or not _match_expression(query):
+            return list(session.exec(select(CatalogExercise).order_by(CatalogExercise.name).limit(limit)))
+        # bm25 column weights: name, target, body_part
+        rows = session.exec(
+            text(
+                f"SELECT c.id FROM {FTS_TABLE} f JOIN catalogexercise c ON c.rowid = f.rowid "
+                f"WHERE {FTS_TABLE} MATCH :match ORDER BY bm25({FTS_TABLE}, 1.0, 2.0, 3.0), c.name LIMIT :limit"
+            ).bindparams(match=_match_expression(query), limit=limit)
+        ).all()
+        ids = [row[0] for row in rows]
+        if not ids:
+            return []
+        by_id = {ex.id: ex for ex in session.exec(select(CatalogExercise).where(CatalogExercise.id.in_(ids)))}
+        return [by_id[i] for i in ids if i in by_id]
+
+
+def _fetch_live(query: Optional[str], limit: int) -> list:
+    """ExerciseDB via RapidAPI: body part first, then name search. Empty without a key."""
+    api_key = os.environ.get("RAPID_API_KEY")
+    if not api_key:
+        return []
+    api_host = os.environ.get("RAPID_API_HOST", "exercisedb.p.rapidapi.com")
+    headers = {"x-rapidapi-key": api_key, "x-rapidapi-host": api_host}
+    params = {"limit": limit}
+    with httpx.Client(timeout=LIVE_TIMEOUT_S, headers=headers) as client:
+        if not query:
+            response = client.get(f"https://{api_host}/exercises", params=params)
+            return response.json() if response.status_code == 200 else []
+        q = query.lower()
+        response = client.get(f"https://{api_host}/exercises/bodyPart/{q}", params=params)
+        if response.status_code != 200 or not response.json():
+            response = client.get(f"https://{api_host}/exercises/name/{q}", params=params)
+        return response.json() if response.status_code == 200 else []
+
+
+def lookup(query: Optional[str] = None, limit: int = 10, engine: Optional[Engine] = None) -> List[CatalogExercise]:
+    """Read-through search: local first, live ExerciseDB for short results not fetched within the TTL."""
+    from backend import metrics
+
+    engine = _engine(engine)
+    results = search(query, limit, engine)
+    if len(results) >= limit or not os.environ.get("RAPID_API_KEY"):
+        metrics.CATALOG_LOOKUPS.inc(source="local")
+        return results
+
+    key = (query or "").strip().lower()
+    with Session(engine) as session:
+        seen = session.get(CatalogLookup, key)
+        if seen is not None and datetime.utcnow() - seen.fetched_at < timedelta(seconds=LIVE_TTL_S):
+            metrics.CATALOG_LOOKUPS.inc(source="cached")
+            return results
+    try:
+        fetched = _fetch_live(query, limit)
+    except (httpx.HTTPError, ValueError) as e:
+        logger.warning(f"[catalog] Live lookup for '{key}' failed, serving local results: {e}")
+        metrics.CATALOG_LOOKUPS.inc(source="error")
+        return results
+
+    _upsert(engine, fetched, "exercisedb")
+    with Session(engine) as session:
+        session.merge(CatalogLookup(query=key, fetched_at=datetime.utcnow(), hits=len(fetched)))
+        session.commit()
+    metrics.CATALOG_LOOKUPS.inc(source="live")
+    return search(query, limit, engine) if fetched else results
+
+
+if __name__ == "__main__":
+    from backend.database import create_db_and_tables
+    create_db_and_tables()
+    print(f"Imported {import_catalog(sys.argv[1] if len(sys.argv) > 1 else CATALOG_PATH)} exercises")
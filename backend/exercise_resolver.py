@@ -0,0 +1,290 @@
+"""Resolve free-text exercise names to Exercise rows.
+
+LLM output and imports name the same exercise many ways ("Bench press",
+"Barbell Bench Press", "bench presses", "DB curl"). Every template write and
+the coach's plan extraction resolve names here instead of running their own
+``==``/``ilike`` queries, so one exercise is not duplicated as several
+custom ones.
+
+``Exercise.normalized_name`` (indexed) is kept in sync by ORM listeners. An
+in-process ``ExerciseIndex`` per database answers lookups in three steps,
+each scoped to global exercises plus the requesting user's own (global
+wins ties):
+
+1. exact normalized name, a dict hit;
+2. alias key: synonyms expanded (db -> dumbbell, rdl -> romanian deadlift)
+   and default words dropped ("barbell", "standard"), used only when it
+   points at a single exercise;
+3. fuzzy: trigram Jaccard similarity of at least ``FUZZY_THRESHOLD`` over
+   the candidates sharing a trigram, the same numbers and the same
+   ``MODIFIER_WORDS`` (so "Decline Bench Press" never lands on "Incline
+   Bench Press": fuzzy matching only absorbs spelling and wording slips).
+
+The index is built with one query on first use and then updated from
+committed inserts, updates and deletes of Exercise rows.
+"""
+import difflib
+import re
+import threading
+import weakref
+from collections import Counter
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.orm import object_session
+from sqlmodel import Session, select
+
+from backend.models import Exercise
+
+FUZZY_THRESHOLD = 0.6
+
+SYNONYMS = {
+    "db": "dumbbell", "dbs": "dumbbell", "bb": "barbell", "kb": "kettlebell",
+    "ohp": "overhead press", "rdl": "romanian deadlift", "sldl": "stiff leg deadlift",
+    "pullup": "pull up", "pushup": "push up", "chinup": "chin up", "situp": "sit up",
+    "ez": "ez bar", "bw": "bodyweight",
+}
+# Words that rarely distinguish exercises: "Barbell Bench Press" is the bench press
+DEFAULT_WORDS = {"barbell", "standard", "regular", "conventional", "flat", "the", "a", "with"}
+# Words that make a different exercise: a fuzzy match must carry exactly the same ones
+MODIFIER_WORDS = {
+    "incline", "decline", "front", "back", "rear", "seated", "standing", "lying", "close", "wide",
+    "narrow", "reverse", "single", "one", "high", "low", "upper", "lower", "overhead", "hammer",
+    "sumo", "romanian", "stiff", "bulgarian", "split", "pause", "deficit", "dumbbell", "cable",
+    "machine", "kettlebell", "smith", "band", "bodyweight",
+}
+
+_PENDING_KEY = "exercise_index_changes"
+
+
+def normalize_exercise_name(name: str) -> str:
+    """Lowercase, strip punctuation and trailing plurals for matching."""
+    words = re.sub(r"[^a-z0-9 ]+", " ", (name or "").lower()).split()
+    return " ".join(w[:-1] if len(w) > 3 and w.endswith("s") and not w.endswith("ss") else w for w in words)
+
+
+def alias_key(normalized: str) -> str:
+    """Normalized name with synonyms expanded and default words dropped."""
+    words = " ".join(SYNONYMS.get(w, w) for w in normalized.split()).split()
+    kept = [w for w in words if w not in DEFAULT_WORDS]
+    return " ".join(kept or words)
+
+
+@lru_cache(maxsize=4096)
+def _modifier(word: str) -> Optional[str]:
+    """The modifier ``word`` spells, allowing a typo ("inclne" -> "incline")."""
+    if word in MODIFIER_WORDS:
+        return word
+    if len(word) < 6:
+        return None  # "power"/"lower", "thigh"/"high": too short to tell a typo from another word
+    close = difflib.get_close_matches(word, MODIFIER_WORDS, n=1, cutoff=0.85)
+    return close[0] if close else None
+
+
+def _modifiers(key: str) -> Set[str]:
+    return {m for m in map(_modifier, key.split()) if m}
+
+
+def trigrams(text: str) -> Set[str]:
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+@dataclass(frozen=True)
+class Entry:
+    id: int
+    user_id: Optional[int]
+    name: str
+    category: str
+    normalized: str
+
+
+@dataclass(frozen=True)
+class Match:
+    exercise_id: int
+    how: str  # "exact", "alias" or "fuzzy"
+    score: float = 1.0
+
+
+class ExerciseIndex:
+    """Exact, alias and trigram lookups over one database's exercises, per scope (None = global)."""
+
+    def __init__(self, entries: Iterable[Entry] = ()):
+        self._lock = threading.RLock()
+        self.entries: Dict[int, Entry] = {}
+        self._exact: Dict[Tuple[Optional[int], str], int] = {}
+        self._alias: Dict[Tuple[Optional[int], str], Set[int]] = {}
+        self._grams: Dict[str, Set[int]] = {}
+        for entry in entries:
+            self.add(entry)
+
+    def add(self, entry: Entry):
+        with self._lock:
+            if entry.id in self.entries:
+                self.remove(entry.id)
+            self.entries[entry.id] = entry
+            scope = entry.user_id
+            # Keep the oldest row for a duplicated name, as the database order would
+            current = self._exact.get((scope, entry.normalized))
+            if current is None or entry.id < current:
+                self._exact[(scope, entry.normalized)] = entry.id
+            self._alias.setdefault((scope, alias_key(entry.normalized)), set()).add(entry.id)
+            for gram in trigrams(entry.normalized):
+                self._grams.setdefault(gram, set()).add(entry.id)
+
+    def remove(self, exercise_id: int):
+        with self._lock:
+            entry = self.entries.pop(exercise_id, None)
+            if entry is None:
+                return
+            scope = entry.user_id
+            if self._exact.get((scope, entry.normalized)) == exercise_id:
+                del self._exact[(scope, entry.normalized)]
+                others = [e.id for e in self.entries.values()
+                          if e.user_id == scope and e.normalized == entry.normalized]
+                if others:
+                    self._exact[(scope, entry.normalized)] = min(others)
+            self._alias.get((scope, alias_key(entry.normalized)), set()).discard(exercise_id)
+            for gram in trigrams(entry.normalized):
+                self._grams.get(gram, set()).discard(exercise_id)
+
+    def match(self, name: str, user_id: Optional[int]) -> Optional[Match]:
+        """Best match for ``name`` among global exercises and ``user_id``'s own."""
+        normalized = normalize_exercise_name(name)
+        if not normalized:
+            return None
+        scopes = (None, user_id) if user_id is not None else (None,)
+        with self._lock:
+            for scope in scopes:
+                hit = self._exact.get((scope, normalized))
+                if hit is not None:
+                    return Match(hit, "exact")
+            key = alias_key(normalized)
+            for scope in scopes:
+                ids = self._alias.get((scope, key))
+                if ids and len(ids) == 1:
+                    return Match(next(iter(ids)), "alias")
+            return self._fuzzy(key, scopes)
+
+    def _fuzzy(self, key: str, scopes) -> Optional[Match]:
+        grams = trigrams(key)
+        numbers = re.findall(r"\d+", key)
+        modifiers = _modifiers(key)
+        shared: Counter = Counter()
+        for gram in grams:
+            shared.update(self._grams.get(gram, ()))
+        best = None
+        for exercise_id, common in shared.items():
+            entry = self.entries[exercise_id]
+            if entry.user_id not in scopes or re.findall(r"\d+", entry.normalized) != numbers:
+                continue  # "45 degree" and "30 degree" variants are different exercises
+            if _modifiers(alias_key(entry.normalized)) != modifiers:
+                continue  # incline/decline, front/back squat... differ by one word but not by movement
+            score = common / (len(grams) + len(trigrams(entry.normalized)) - common)
+            rank = (score, entry.user_id is None, -exercise_id)
+            if score >= FUZZY_THRESHOLD and (best is None or rank > best[0]):
+                best = (rank, Match(exercise_id, "fuzzy", round(score, 3)))
+        return best[1] if best else None
+
+    def known_names(self, user_id: Optional[int] = None) -> Dict[str, Tuple[str, str]]:
+        """normalized name -> (display name, category) in scope (all scopes when user_id is None)."""
+        with self._lock:
+            entries = sorted(self.entries.values(), key=lambda e: (e.user_id is not None, e.id))
+        known: Dict[str, Tuple[str, str]] = {}
+        for entry in entries:
+            if user_id is None or entry.user_id in (None, user_id):
+                known.setdefault(entry.normalized, (entry.name, entry.category))
+        return known
+
+
+def _entry(exercise: Exercise) -> Entry:
+    return Entry(exercise.id, exercise.user_id, exercise.name, exercise.category,
+                 exercise.normalized_name or normalize_exercise_name(exercise.name))
+
+
+_indexes: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+_indexes_lock = threading.Lock()
+
+
+def get_index(db: Session) -> ExerciseIndex:
+    """The index for ``db``'s database, built with one query on first use."""
+    engine = db.get_bind()
+    with _indexes_lock:
+        index = _indexes.get(engine)
+    if index is None:
+        rows = db.exec(select(Exercise.id, Exercise.user_id, Exercise.name, Exercise.category,
+                              Exercise.normalized_name)).all()
+        index = ExerciseIndex(Entry(i, u, n, c, norm or normalize_exercise_name(n)) for i, u, n, c, norm in rows)
+        with _indexes_lock:
+            index = _indexes.setdefault(engine, index)
+    return index
+
+
+def resolve(db: Session, names: Iterable[str], user_id: Optional[int]) -> Dict[str, Match]:
+    """normalized name -> Match for each name that resolves; unresolved names are left out."""
+    from backend import metrics
+
+    index = get_index(db)
+    matches = {}
+    for name in names:
+        normalized = normalize_exercise_name(name)
+        if not normalized or normalized in matches:
+            continue
+        match = index.match(name, user_id)
+        metrics.EXERCISE_RESOLUTIONS.inc(match=match.how if match else "none")
+        if match:
+            matches[normalized] = match
+    return matches
+
+
+def known_names(db: Session, user_id: Optional[int] = None) -> Dict[str, Tuple[str, str]]:
+    return get_index(db).known_names(user_id)
+
+
+def record_created(db: Session, exercises: Iterable[Exercise]):
+    """Queue rows inserted without the ORM unit of work (bulk inserts) for the index."""
+    db.info.setdefault(_PENDING_KEY, []).extend(("add", _entry(e)) for e in exercises)
+
+
+# --- Keep normalized_name and the index in sync with ORM writes ---
+
+@event.listens_for(Exercise, "before_insert")
+@event.listens_for(Exercise, "before_update")
+def _set_normalized_name(mapper, connection, target: Exercise):
+    target.normalized_name = normalize_exercise_name(target.name)
+
+
+def _queue(op: str):
+    def listener(mapper, connection, target: Exercise):
+        session = object_session(target)
+        if session is not None:
+            session.info.setdefault(_PENDING_KEY, []).append((op, _entry(target)))
+    return listener
+
+
+event.listen(Exercise, "after_insert", _queue("add"))
+event.listen(Exercise, "after_update", _queue("add"))
+event.listen(Exercise, "after_delete", _queue("remove"))
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_pending(session):
+    changes: List = session.info.pop(_PENDING_KEY, None)
+    if not changes:
+        return
+    with _indexes_lock:
+        index = _indexes.get(session.get_bind())
+    if index is None:
+        return  # built from the database on first use
+    for op, entry in changes:
+        if op == "add":
+            index.add(entry)
+        else:
+            index.remove(entry.id)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_pending(session):
+    session.info.pop(_PENDING_KEY, None)
@@ -0,0 +1,245 @@
+"""Precomputed exercise selection index for workout design and recommendations.
+
+``design_workout_logic`` picks exercises per muscle group and movement type
+(compound or isolation) that fit the available equipment. Rather than
+filtering EXERCISE_DATABASE with list comprehensions on every call, the
+curated exercises and the local catalog (``CatalogExercise``, about 900
+exercises from the bundled dump) are indexed once per database:
+
+- each exercise gets an equipment bitmask (``EQUIPMENT_BITS``); it fits when
+  any of its bits is available, as the curated lists always treated it;
+- candidates are stored per (muscle group, movement type) in priority order,
+  curated exercises first in their listed order, then the catalog by name,
+  with their masks in a NumPy array, so filtering is one vectorised ``&``
+  and filtered orders are memoised per mask;
+- a user's history (sessions per exercise from the athlete profile) moves
+  exercises they already train to the front, most trained first.
+
+``group_of`` maps a logged exercise to its muscle group through the same
+index for the recommendation code. The index is rebuilt after a catalog
+import (``invalidate``).
+"""
+import json
+import threading
+import weakref
+from dataclasses import dataclass
+from functools import reduce
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import OperationalError
+from sqlmodel import Session, select
+
+from backend.exercise_resolver import normalize_exercise_name
+from backend.models import AthleteProfile
+
+MOVEMENTS = ("compound", "isolation")
+
+EQUIPMENT_BITS = {
+    "bodyweight": 1 << 0,
+    "barbell": 1 << 1,
+    "dumbbell": 1 << 2,
+    "bench": 1 << 3,
+    "cable": 1 << 4,
+    "machine": 1 << 5,
+    "kettlebell": 1 << 6,
+    "band": 1 << 7,
+    "other": 1 << 8,
+}
+ALL_EQUIPMENT = reduce(lambda a, b: a | b, EQUIPMENT_BITS.values())
+
+# Catalog and user wording -> EQUIPMENT_BITS keys (anything else is "other")
+EQUIPMENT_ALIASES = {
+    "body only": "bodyweight", "body weight": "bodyweight", "none": "bodyweight", "no equipment": "bodyweight",
+    "barbells": "barbell", "e-z curl bar": "barbell", "ez barbell": "barbell", "olympic barbell": "barbell",
+    "trap bar": "barbell", "dumbbells": "dumbbell", "benches": "bench", "cables": "cable",
+    "machines": "machine", "leverage machine": "machine", "smith machine": "machine", "sled machine": "machine",
+    "kettlebells": "kettlebell", "bands": "band", "resistance band": "band",
+}
+
+# Catalog body parts -> EXERCISE_DATABASE muscle groups
+BODY_PART_GROUPS = {
+    "chest": "chest", "back": "back", "shoulders": "shoulders",
+    "upper legs": "legs", "lower legs": "legs", "upper arms": "arms", "lower arms": "arms", "waist": "core",
+}
+# Catalog categories that are not resistance exercises
+SKIPPED_CATEGORIES = {"stretching", "cardio", "plyometrics"}
+# Catalog equipment that is not for training sets
+SKIPPED_EQUIPMENT = {"foam roll"}
+# Name words that mark a multi-joint lift when the catalog has no "mechanic"
+COMPOUND_WORDS = {
+    "press", "row", "squat", "deadlift", "lunge", "dip", "pull", "chin", "clean", "snatch", "thrust", "push",
+}
+
+_MAX_MEMOISED_MASKS = 256
+
+
+def equipment_mask(equipment: Iterable[str]) -> int:
+    """Bitmask for a list of equipment names."""
+    mask = 0
+    for item in equipment:
+        key = (item or "").strip().lower()
+        key = EQUIPMENT_ALIASES.get(key, key)
+        mask |= EQUIPMENT_BITS.get(key, EQUIPMENT_BITS["other"])
+    return mask
+
+
+def available_mask(equipment: Optional[Iterable[str]]) -> int:
+    """Equipment the user has: everything when unspecified, bodyweight always."""
+    if not equipment:
+        return ALL_EQUIPMENT
+    return equipment_mask(equipment) | EQUIPMENT_BITS["bodyweight"]
+
+
+@dataclass(frozen=True)
+class Candidate:
+    name: str
+    category: str
+    equipment: Tuple[str, ...]
+
+    def as_dict(self) -> dict:
+        return {"name": self.name, "category": self.category, "equipment": list(self.equipment)}
+
+
+class _Bucket:
+    """Candidates of one (muscle group, movement type) in priority order."""
+
+    def __init__(self, candidates: List[Candidate]):
+        self.candidates = candidates
+        self.masks = np.array([equipment_mask(c.equipment) for c in candidates], dtype=np.int64)
+        self.position = {}
+        for i, candidate in enumerate(candidates):
+            self.position.setdefault(normalize_exercise_name(candidate.name), i)
+        self._by_mask: Dict[int, np.ndarray] = {}
+
+    def available(self, mask: int) -> np.ndarray:
+        order = self._by_mask.get(mask)
+        if order is None:
+            order = np.flatnonzero(self.masks & mask)
+            if len(self._by_mask) < _MAX_MEMOISED_MASKS:
+                self._by_mask[mask] = order
+        return order
+
+    def select(self, mask: int, limit: int, history: Optional[Dict[str, int]] = None) -> List[Candidate]:
+        """Up to ``limit`` fitting candidates; ones in ``history`` first, most trained first."""
+        order = self.available(mask)
+        familiar = []
+        for name, count in (history or {}).items():
+            i = self.position.get(name)
+            if i is not None and count > 0 and self.masks[i] & mask:
+                familiar.append((-count, i))
+        picked = [i for _, i in sorted(familiar)][:limit]
+        if len(picked) < limit:
+            taken = set(picked)
+            for i in order[:limit + len(taken)]:
+                if int(i) not in taken:
+                    picked.append(int(i))
+                    if len(picked) == limit:
+                        break
+        return [self.candidates[i] for i in picked]
+
+
+class SelectionIndex:
+    def __init__(self, curated: dict, catalog_rows: Iterable[tuple] = ()):
+        buckets: Dict[Tuple[str, str], List[Candidate]] = {}
+        seen = set()
+        self.groups: Dict[str, str] = {}  # normalized name -> muscle group
+        for group, data in curated.items():
+            for movement in MOVEMENTS:
+                for ex in data.get(movement, []):
+                    candidate = Candidate(ex["name"], ex["category"], tuple(ex["equipment"]))
+                    self._add(buckets, seen, group, movement, candidate)
+
+        for name, body_part, equipment, mechanic, category in sorted(catalog_rows):
+            group = BODY_PART_GROUPS.get((body_part or "").lower())
+            equipment = (equipment or "").lower()
+            if not group or (category or "").lower() in SKIPPED_CATEGORIES or equipment in SKIPPED_EQUIPMENT:
+                continue
+            movement = (mechanic or "").lower()
+            if movement not in MOVEMENTS:
+                words = set(normalize_exercise_name(name).split())
+                movement = "compound" if words & COMPOUND_WORDS else "isolation"
+            candidate = Candidate(name, group.title(), (equipment or "other",))
+            self._add(buckets, seen, group, movement, candidate)
+
+        self.buckets = {key: _Bucket(candidates) for key, candidates in buckets.items()}
+        self.group_names = list(dict.fromkeys(group for group, _ in self.buckets))
+        self.size = len(seen)
+
+    def _add(self, buckets, seen, group: str, movement: str, candidate: Candidate):
+        key = normalize_exercise_name(candidate.name)
+        if key in seen:
+            return
+        seen.add(key)
+        buckets.setdefault((group, movement), []).append(candidate)
+        self.groups[key] = group
+
+    def candidates(self, group: str, movement: str, equipment: Optional[Iterable[str]] = None,
+                   limit: int = 10, history: Optional[Dict[str, int]] = None) -> List[dict]:
+        bucket = self.buckets.get((group, movement))
+        if bucket is None:
+            return []
+        return [c.as_dict() for c in bucket.select(available_mask(equipment), limit, history)]
+
+    def group_of(self, name: str, category: str = "") -> Optional[str]:
+        """Muscle group of a logged exercise: by category first, then by indexed name."""
+        cat = (category or "").lower()
+        if cat:
+            for group in self.group_names:
+                if cat in group or group in cat:
+                    return group
+        return self.groups.get(normalize_exercise_name(name))
+
+
+_indexes: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+_lock = threading.Lock()
+
+
+def _engine(engine: Optional[Engine]) -> Engine:
+    if engine is not None:
+        return engine
+    from backend.database import engine as default_engine
+    return default_engine
+
+
+def _catalog_rows(engine: Engine) -> list:
+    try:
+        with engine.connect() as conn:
+            return conn.execute(text(
+                "SELECT name, body_part, equipment, mechanic, category FROM catalogexercise"
+            )).all()
+    except OperationalError:
+        return []  # no catalog table yet: curated exercises only
+
+
+def get_index(engine: Optional[Engine] = None) -> SelectionIndex:
+    """The selection index for ``engine``'s database, built on first use."""
+    from backend.mcp_server import EXERCISE_DATABASE
+
+    engine = _engine(engine)
+    with _lock:
+        index = _indexes.get(engine)
+        if index is None:
+            index = _indexes[engine] = SelectionIndex(EXERCISE_DATABASE, _catalog_rows(engine))
+    return index
+
+
+def invalidate(engine: Engine):
+    """Drop the index of ``engine`` so the next selection sees a changed catalog."""
+    with _lock:
+        _indexes.pop(engine, None)
+
+
+def user_history(user_id: Optional[int], engine: Optional[Engine] = None) -> Dict[str, int]:
+    """normalized exercise name -> sessions it was trained in, from the user's athlete profile."""
+    if user_id is None:
+        return {}
+    try:
+        with Session(_engine(engine)) as db:
+            data = db.exec(select(AthleteProfile.data).where(AthleteProfile.user_id == user_id)).first()
+    except OperationalError:
+        return {}
+    lifts = json.loads(data or "{}").get("lifts", {})
+    return {normalize_exercise_name(name): lift.get("sessions", 0) for name, lift in lifts.items()}
@@ -0,0 +1,153 @@
+"""Next-session targets per user and exercise (progressive overload).
+
+Every logged session updates one ``ExerciseTarget`` row per exercise it
+contains: the estimated 1RM of the top set, the working sets (completed
+sets, without warm-ups lighter than ``WORKING_SET_SHARE`` of the top
+weight) and a suggested weight and reps for repeating the same rep target.
+Templates are served with a target per exercise, re-suggested for the
+template's own goal reps, so starting a workout needs neither a history
+scan nor an LLM call to fill in weights:
+
+- within ``REP_WINDOW`` reps of the last working sets, double progression:
+  add ``WEIGHT_STEP`` once every working set reached the goal reps,
+  otherwise repeat the weight (bodyweight exercises add a rep instead);
+- for a different rep range, the Epley weight for the goal reps plus one
+  rep in reserve, from the last estimated 1RM.
+"""
+import json
+import math
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from sqlmodel import Session, delete, select
+
+from backend.athlete_profile import STREAM_ROWS, estimated_1rm
+from backend.models import (
+    ExerciseTarget, ExerciseTargetRead, SessionExercise, TargetSet, TrainingSession, TrainingSet,
+    WorkoutTemplateRead,
+)
+
+WORKING_SET_SHARE = 0.8
+WEIGHT_STEP = 2.5
+REP_WINDOW = 2
+
+
+def working_sets(sets: Iterable[Tuple[float, int, bool]]) -> List[Tuple[float, int]]:
+    """(weight, reps) of the working sets among ``(weight, reps, completed)``; completed ones if any."""
+    sets = list(sets)
+    sets = [(weight or 0, reps) for weight, reps, _ in ([s for s in sets if s[2]] or sets) if (reps or 0) > 0]
+    if not sets:
+        return []
+    top = max(weight for weight, _ in sets)
+    return [(weight, reps) for weight, reps in sets if weight >= top * WORKING_SET_SHARE]
+
+
+def suggest(last_sets: List[Tuple[float, int]], e1rm: float, goal_reps: Optional[int] = None) -> Tuple[float, int]:
+    """(weight, reps) for the next session, aiming at ``goal_reps`` (default: the best set's reps)."""
+    if not last_sets:
+        return 0, goal_reps or 0
+    top = max(weight for weight, _ in last_sets)
+    reps_at_top = min(reps for weight, reps in last_sets if weight == top)
+    goal = goal_reps or max(reps for weight, reps in last_sets if weight == top)
+    if abs(reps_at_top - goal) <= REP_WINDOW or not e1rm:
+        if top == 0:
+            return 0, max(goal, reps_at_top + 1)
+        return (top + WEIGHT_STEP, goal) if reps_at_top >= goal else (top, goal)
+    weight = e1rm / (1 + (goal + 1) / 30)
+    return math.floor(weight / WEIGHT_STEP) * WEIGHT_STEP, goal
+
+
+def _apply(target: ExerciseTarget, date: datetime, sets: List[Tuple[float, int, bool]]) -> bool:
+    """Fold one session's sets into ``target``; False when there are no working sets."""
+    working = working_sets(sets)
+    if not working:
+        return False
+    target.e1rm = round(max(estimated_1rm(weight, reps) for weight, reps in working), 1)
+    target.last_date = date
+    target.last_sets = json.dumps(working)
+    target.suggested_weight, target.suggested_reps = suggest(working, target.e1rm)
+    target.updated_at = datetime.utcnow()
+    return True
+
+
+def _session_sets(db: Session, user_id: int, session_id: Optional[int] = None) -> Iterator[tuple]:
+    """``(session date, exercise_id, sets)`` per session and exercise, oldest first, streamed from one query."""
+    query = (
+        select(TrainingSession.id, TrainingSession.date, SessionExercise.exercise_id,
+               TrainingSet.weight, TrainingSet.reps, TrainingSet.completed)
+        .join(SessionExercise, SessionExercise.session_id == TrainingSession.id)
+        .join(TrainingSet, TrainingSet.session_exercise_id == SessionExercise.id)
+        .where(TrainingSession.user_id == user_id)
+        .order_by(TrainingSession.date, TrainingSession.id, SessionExercise.id, TrainingSet.id)
+        .execution_options(yield_per=STREAM_ROWS)
+    )
+    if session_id is not None:
+        query = query.where(TrainingSession.id == session_id)
+    current, grouped = None, {}
+    for sid, date, exercise_id, weight, reps, completed in db.exec(query):
+        if sid != current:
+            yield from grouped.values()
+            current, grouped = sid, {}
+        grouped.setdefault(exercise_id, (date, exercise_id, []))[2].append((weight, reps, completed))
+    yield from grouped.values()
+
+
+def record_session(db: Session, training_session: TrainingSession):
+    """Update the user's targets for the exercises of a newly written session."""
+    user_id = training_session.user_id
+    entries = list(_session_sets(db, user_id, training_session.id))
+    if not entries:
+        return
+    existing = {t.exercise_id: t for t in db.exec(
+        select(ExerciseTarget).where(ExerciseTarget.user_id == user_id,
+                                     ExerciseTarget.exercise_id.in_([e[1] for e in entries]))
+    )}
+    for date, exercise_id, sets in entries:
+        target = existing.get(exercise_id)
+        if target is not None and target.last_date > date:
+            continue  # a back-dated log does not replace a newer session
+        target = target or ExerciseTarget(user_id=user_id, exercise_id=exercise_id, last_date=date)
+        if _apply(target, date, sets):
+            db.add(target)
+    db.commit()
+
+
+def rebuild_targets(db: Session, user_id: int):
+    """Recompute all of a user's targets from their sessions (after a delete)."""
+    latest: Dict[int, tuple] = {}
+    for date, exercise_id, sets in _session_sets(db, user_id):
+        if working_sets(sets):
+            latest[exercise_id] = (date, sets)
+    db.exec(delete(ExerciseTarget).where(ExerciseTarget.user_id == user_id))
+    for exercise_id, (date, sets) in latest.items():
+        target = ExerciseTarget(user_id=user_id, exercise_id=exercise_id, last_date=date)
+        _apply(target, date, sets)
+        db.add(target)
+    db.commit()
+
+
+def attach_targets(db: Session, user_id: int, templates: List[WorkoutTemplateRead]) -> List[WorkoutTemplateRead]:
+    """Fill ``target`` of every template exercise the user has history for, with one query."""
+    exercise_ids = {tex.exercise.id for template in templates for tex in template.exercises}
+    if not exercise_ids:
+        return templates
+    targets = {t.exercise_id: t for t in db.exec(
+        select(ExerciseTarget).where(ExerciseTarget.user_id == user_id,
+                                     ExerciseTarget.exercise_id.in_(exercise_ids))
+    )}
+    for template in templates:
+        for tex in template.exercises:
+            target = targets.get(tex.exercise.id)
+            if target is None:
+                continue
+            last_sets = [tuple(s) for s in json.loads(target.last_sets)]
+            goal_reps = next((s.goal_reps for s in tex.sets if s.goal_reps), None)
+            weight, reps = suggest(last_sets, target.e1rm, goal_reps)
+            tex.target = ExerciseTargetRead(
+                e1rm=target.e1rm,
+                last_date=target.last_date,
+                last_sets=[TargetSet(weight=w, reps=r) for w, r in last_sets],
+                suggested_weight=weight,
+                suggested_reps=reps,
+            )
+    return templates
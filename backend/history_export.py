@@ -0,0 +1,208 @@
+"""Streaming export of a user's history: sessions, sets, templates, exercises.
+
+Rows are read with ``yield_per`` (``EXPORT_BATCH_ROWS`` at a time) from a
+session owned by the generator, serialized one batch at a time and written
+in chunks of about ``EXPORT_CHUNK_BYTES``, optionally gzip-compressed on the
+fly, so memory stays flat however long the history is.
+
+Formats:
+
+- ``ndjson``: one JSON object per line;
+- ``csv``: a header row and one row per record (templates one row per set);
+- ``yaml``: one YAML document per record, dumped with libyaml's CSafeDumper
+  when PyYAML was built with it.
+
+Sets (``sets``) carry the session date and exercise name on every row, the
+same columns the history import accepts; templates are exported as
+documents in the ``/templates/import`` layout.
+"""
+import csv
+import io
+import itertools
+import json
+import os
+import zlib
+from datetime import datetime
+from typing import Callable, Dict, Iterable, Iterator, List
+
+import yaml
+from sqlalchemy.engine import Engine
+from sqlmodel import Session, func, select
+
+from backend.models import (
+    Exercise, SessionExercise, TemplateExercise, TemplateSet, TrainingSession, TrainingSet, WorkoutTemplate,
+)
+
+try:
+    from yaml import CSafeDumper as YamlDumper
+except ImportError:
+    from yaml import SafeDumper as YamlDumper
+
+BATCH_ROWS = int(os.environ.get("EXPORT_BATCH_ROWS", "1000"))
+CHUNK_BYTES = int(os.environ.get("EXPORT_CHUNK_BYTES", str(64 * 1024)))
+
+FORMATS = {
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "csv": ("text/csv", "csv"),
+    "yaml": ("application/yaml", "yaml"),
+}
+
+
+def _value(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def _records(rows: Iterable, columns: List[str]) -> Iterator[dict]:
+    for row in rows:
+        yield {column: _value(value) for column, value in zip(columns, row)}
+
+
+# --- Record sources: (columns, query) per kind, ordered for streaming ---
+
+SESSION_COLUMNS = ["id", "date", "duration_seconds", "exercises", "sets"]
+SET_COLUMNS = ["session_id", "date", "exercise", "category", "weight", "reps", "completed",
+               "rest_seconds", "set_duration", "goal_weight", "goal_reps"]
+TEMPLATE_COLUMNS = ["template_id", "template", "order", "exercise", "category", "goal_weight", "goal_reps"]
+EXERCISE_COLUMNS = ["id", "name", "category", "is_custom", "video_url", "instructions"]
+
+
+def _sessions(user_id: int):
+    exercises = (select(func.count(SessionExercise.id)).where(SessionExercise.session_id == TrainingSession.id)
+                 .scalar_subquery())
+    sets = (select(func.count(TrainingSet.id))
+            .join(SessionExercise, SessionExercise.id == TrainingSet.session_exercise_id)
+            .where(SessionExercise.session_id == TrainingSession.id).scalar_subquery())
+    return (select(TrainingSession.id, TrainingSession.date, TrainingSession.duration_seconds, exercises, sets)
+            .where(TrainingSession.user_id == user_id)
+            .order_by(TrainingSession.date, TrainingSession.id))
+
+
+def _sets(user_id: int):
+    return (select(TrainingSession.id, TrainingSession.date, Exercise.name, Exercise.category,
+                   TrainingSet.weight, TrainingSet.reps, TrainingSet.completed, TrainingSet.rest_seconds,
+                   TrainingSet.set_duration, TrainingSet.goal_weight, TrainingSet.goal_reps)
+            .join(SessionExercise, SessionExercise.session_id == TrainingSession.id)
+            .join(Exercise, Exercise.id == SessionExercise.exercise_id)
+            .join(TrainingSet, TrainingSet.session_exercise_id == SessionExercise.id)
+            .where(TrainingSession.user_id == user_id)
+            .order_by(TrainingSession.date, TrainingSession.id, SessionExercise.id, TrainingSet.id))
+
+
+def _templates(user_id: int):
+    return (select(WorkoutTemplate.id, WorkoutTemplate.name, TemplateExercise.order, Exercise.name,
+                   Exercise.category, TemplateSet.goal_weight, TemplateSet.goal_reps)
+            .join(TemplateExercise, TemplateExercise.template_id == WorkoutTemplate.id)
+            .join(Exercise, Exercise.id == TemplateExercise.exercise_id)
+            .join(TemplateSet, TemplateSet.template_exercise_id == TemplateExercise.id, isouter=True)
+            .where(WorkoutTemplate.user_id == user_id)
+            .order_by(WorkoutTemplate.id, TemplateExercise.order, TemplateExercise.id, TemplateSet.id))
+
+
+def _exercises(user_id: int):
+    return (select(Exercise.id, Exercise.name, Exercise.category, Exercise.is_custom, Exercise.video_url,
+                   Exercise.instructions)
+            .where((Exercise.user_id == None) | (Exercise.user_id == user_id))  # noqa: E711
+            .order_by(Exercise.id))
+
+
+KINDS: Dict[str, tuple] = {
+    "sessions": (SESSION_COLUMNS, _sessions),
+    "sets": (SET_COLUMNS, _sets),
+    "templates": (TEMPLATE_COLUMNS, _templates),
+    "exercises": (EXERCISE_COLUMNS, _exercises),
+}
+
+
+def template_documents(records: Iterable[dict]) -> Iterator[dict]:
+    """Group consecutive template rows into ``/templates/import`` documents (one template in memory at a time)."""
+    for _, rows in itertools.groupby(records, key=lambda r: r["template_id"]):
+        document, current = None, None
+        for row in rows:
+            if document is None:
+                document = {"name": row["template"], "exercises": []}
+            key = (row["order"], row["exercise"])
+            if current is None or current[0] != key:
+                exercise = {"name": row["exercise"], "category": row["category"], "sets": []}
+                document["exercises"].append(exercise)
+                current = (key, exercise)
+            if row["goal_reps"] is not None:
+                current[1]["sets"].append({"weight": row["goal_weight"], "reps": row["goal_reps"]})
+        yield document
+
+
+# --- Serializers: batches of records -> text ---
+
+def _ndjson(batches: Iterable[List[dict]], columns: List[str]) -> Iterator[str]:
+    for batch in batches:
+        yield "".join(json.dumps(record, ensure_ascii=False) + "\n" for record in batch)
+
+
+def _csv(batches: Iterable[List[dict]], columns: List[str]) -> Iterator[str]:
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=columns, extrasaction="ignore")
+    writer.writeheader()
+    for batch in batches:
+        writer.writerows(batch)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue()
+
+
+def _yaml(batches: Iterable[List[dict]], columns: List[str]) -> Iterator[str]:
+    for batch in batches:
+        yield yaml.dump_all(batch, Dumper=YamlDumper, explicit_start=True, sort_keys=False,
+                            allow_unicode=True, default_flow_style=False)
+
+
+SERIALIZERS: Dict[str, Callable] = {"ndjson": _ndjson, "csv": _csv, "yaml": _yaml}
+
+
+def _batched(records: Iterable[dict], size: int) -> Iterator[List[dict]]:
+    iterator = iter(records)
+    while batch := list(itertools.islice(iterator, size)):
+        yield batch
+
+
+def _counted(batches: Iterable[List[dict]], kind: str, fmt: str) -> Iterator[List[dict]]:
+    from backend import metrics
+
+    for batch in batches:
+        metrics.EXPORT_ROWS.inc(len(batch), kind=kind, format=fmt)
+        yield batch
+
+
+def _chunks(texts: Iterable[str], compress: bool) -> Iterator[bytes]:
+    """UTF-8 encode, coalesce into ~CHUNK_BYTES pieces and gzip on the fly when asked."""
+    gzip = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None
+    pending, size = [], 0
+    for text in texts:
+        if not text:
+            continue
+        data = text.encode("utf-8")
+        if gzip:
+            data = gzip.compress(data)
+        pending.append(data)
+        size += len(data)
+        if size >= CHUNK_BYTES:
+            yield b"".join(pending)
+            pending, size = [], 0
+    if gzip:
+        pending.append(gzip.flush())
+    if pending:
+        yield b"".join(pending)
+
+
+def stream_export(engine: Engine, user_id: int, kind: str, fmt: str, compress: bool = False) -> Iterator[bytes]:
+    """Bytes of the export, produced lazily; opens its own session for the life of the stream."""
+    columns, query = KINDS[kind]
+    with Session(engine) as db:
+        rows = db.exec(query(user_id).execution_options(yield_per=BATCH_ROWS))
+        records = _records(rows, columns)
+        if kind == "templates" and fmt != "csv":
+            records = template_documents(records)
+        yield from _chunks(SERIALIZERS[fmt](_counted(_batched(records, BATCH_ROWS), kind, fmt), columns), compress)
+
+
+def filename(kind: str, fmt: str, compress: bool) -> str:
+    return f"{kind}-{datetime.utcnow():%Y%m%d}.{FORMATS[fmt][1]}" + (".gz" if compress else "")
@@ -0,0 +1,402 @@
+"""Bulk import of training history exported by other tracking apps (or by us).
+
+The upload is parsed as a stream, one row at a time: CSV (header row),
+NDJSON (one object per line) or multi-document YAML (one document per
+set, parsed with libyaml's CSafeLoader when available), gzipped or not.
+Column names are matched loosely (``ALIASES``), which covers our own
+``/history/export/sets`` and the CSV exports of Strong, Hevy and FitNotes:
+one row per set with the session date, the exercise name and weight/reps.
+
+Rows sharing a session key (``session_id`` column or the date) form one
+TrainingSession; exports list a session's sets together and sessions in
+date order, and rows of the same session are merged within a batch. Every
+``IMPORT_BATCH_SETS`` sets the batch is written in one transaction:
+
+- exercise names resolved through ``template_writer.resolve_exercises``
+  (global and the user's own exercises; unknown names are created as custom
+  exercises), each distinct name once per import;
+- one executemany insert per table (sessions, session exercises, sets).
+
+A session is a duplicate, and skipped, when the user already has a session
+at the same date and time, so importing the same file again adds nothing.
+``import_history`` yields a progress dict after every batch and a final one
+(``done``) once the athlete profile, next-session targets and coach session
+index have been rebuilt for the imported history.
+"""
+import csv
+import gzip
+import io
+import json
+import logging
+import os
+import re
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from functools import lru_cache
+from typing import BinaryIO, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+import yaml
+from sqlalchemy import func, insert
+from sqlalchemy.engine import Engine
+from sqlmodel import Session, select
+
+from backend import athlete_profile, exercise_targets, session_index
+from backend.exercise_resolver import normalize_exercise_name
+from backend.models import Exercise, SessionExercise, TrainingSession, TrainingSet
+from backend.template_writer import ExerciseSpec, newest_ids, resolve_exercises
+
+try:
+    from yaml import CSafeLoader as YamlLoader
+except ImportError:
+    from yaml import SafeLoader as YamlLoader
+
+logger = logging.getLogger(__name__)
+
+BATCH_SETS = int(os.environ.get("IMPORT_BATCH_SETS", "5000"))
+LBS_TO_KG = 0.45359237
+
+FORMATS = ("csv", "ndjson", "yaml")
+EXTENSIONS = {".csv": "csv", ".ndjson": "ndjson", ".jsonl": "ndjson", ".json": "ndjson",
+              ".yaml": "yaml", ".yml": "yaml"}
+
+# Field -> accepted column names (lowercase, non-alphanumerics as "_")
+ALIASES = {
+    "date": ("date", "start_time", "workout_date", "datetime", "timestamp", "start"),
+    "end": ("end_time", "end"),
+    "session": ("session_id", "workout_id", "session"),
+    "exercise": ("exercise", "exercise_name", "exercise_title", "name"),
+    "category": ("category", "muscle_group", "body_part"),
+    "weight": ("weight", "weight_kg", "weight_kgs"),
+    "weight_lbs": ("weight_lbs", "weight_lb"),
+    "reps": ("reps", "repetitions"),
+    "completed": ("completed", "done"),
+    "rest_seconds": ("rest_seconds", "rest"),
+    "set_duration": ("set_duration", "duration_seconds", "seconds", "time"),
+    "duration": ("workout_duration", "session_duration", "duration"),
+    "goal_weight": ("goal_weight",),
+    "goal_reps": ("goal_reps",),
+}
+_FIELDS = {alias: name for name, aliases in ALIASES.items() for alias in aliases}
+DATE_FORMATS = ("%Y-%m-%d %H:%M:%S", "%Y-%m-%d %H:%M", "%Y-%m-%d", "%d %b %Y, %H:%M", "%d %b %Y %H:%M",
+                "%m/%d/%Y %H:%M", "%m/%d/%Y", "%d.%m.%Y %H:%M", "%d.%m.%Y")
+_DURATION = re.compile(r"^(?:(\d+)\s*h)?\s*(?:(\d+)\s*m(?:in)?)?\s*(?:(\d+)\s*s)?$")
+
+
+class ImportFormatError(ValueError):
+    """The upload is not valid CSV, NDJSON or YAML."""
+
+
+@dataclass
+class ParsedSession:
+    date: datetime
+    duration: int = 0
+    # normalized exercise name -> (name, category, raw rows of its sets)
+    exercises: Dict[str, Tuple[str, str, List[dict]]] = field(default_factory=dict)
+
+
+@dataclass
+class ImportProgress:
+    rows: int = 0
+    sessions: int = 0
+    sets: int = 0
+    exercises_created: int = 0
+    duplicates: int = 0
+    skipped: int = 0
+
+    def as_dict(self, done: bool = False) -> dict:
+        return {**self.__dict__, "done": done}
+
+
+# --- Parsing: bytes -> rows (dicts with canonical field names) ---
+
+def detect_format(filename: Optional[str], head: bytes) -> str:
+    """Format from the file extension (``.gz`` stripped), else from the first character."""
+    name = (filename or "").lower()
+    if name.endswith(".gz"):
+        name = name[:-3]
+    extension = os.path.splitext(name)[1]
+    if extension in EXTENSIONS:
+        return EXTENSIONS[extension]
+    first = head.lstrip(b"\xef\xbb\xbf \t\r\n")[:1]
+    return {b"{": "ndjson", b"-": "yaml", b"%": "yaml"}.get(first, "csv")
+
+
+def open_text(stream: BinaryIO) -> io.TextIOWrapper:
+    """Text view of a seekable binary upload, transparently gunzipped."""
+    magic = stream.read(2)
+    stream.seek(0)
+    if magic == b"\x1f\x8b":
+        stream = gzip.GzipFile(fileobj=stream, mode="rb")
+    return io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+
+
+def _csv_rows(text: io.TextIOBase) -> Iterator[dict]:
+    reader = csv.reader(text)
+    header = next(reader, [])
+    columns = [(i, _field(name)) for i, name in enumerate(header) if _field(name) is not None]
+    for row in reader:
+        yield {name: row[i] for i, name in columns if i < len(row)}
+
+
+def _documents(text: io.TextIOBase, fmt: str) -> Iterator[dict]:
+    if fmt == "ndjson":
+        for line in text:
+            if line.strip():
+                yield json.loads(line)
+    elif fmt == "yaml":
+        for document in yaml.load_all(text, Loader=YamlLoader):
+            if isinstance(document, list):
+                yield from document
+            elif document is not None:
+                yield document
+    else:
+        raise ImportFormatError(f"Unsupported format: {fmt}")
+
+
+@lru_cache(maxsize=256)
+def _field(column: str) -> Optional[str]:
+    return _FIELDS.get(re.sub(r"[^a-z0-9]+", "_", str(column).lower()).strip("_"))
+
+
+def parse_rows(text: io.TextIOBase, fmt: str) -> Iterator[dict]:
+    """Rows with canonical field names; unknown columns are dropped."""
+    try:
+        if fmt == "csv":
+            yield from _csv_rows(text)
+            return
+        for document in _documents(text, fmt):
+            if isinstance(document, dict):
+                yield {_field(k): v for k, v in document.items() if _field(k) is not None}
+    except (csv.Error, json.JSONDecodeError, yaml.YAMLError, UnicodeDecodeError) as e:
+        raise ImportFormatError(f"Invalid {fmt}: {e}")
+
+
+@lru_cache(maxsize=4096)
+def _parse_date_text(value: str) -> Optional[datetime]:
+    try:
+        parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        parsed = None
+        for fmt in DATE_FORMATS:
+            try:
+                parsed = datetime.strptime(value, fmt)
+                break
+            except ValueError:
+                continue
+    return parsed.replace(tzinfo=None) if parsed else None
+
+
+def parse_date(value) -> Optional[datetime]:
+    if isinstance(value, datetime):
+        return value.replace(tzinfo=None)
+    if isinstance(value, date):  # unquoted YAML dates
+        return datetime(value.year, value.month, value.day)
+    if value is None or str(value).strip() == "":
+        return None
+    return _parse_date_text(str(value).strip())
+
+
+def _number(value, default=None) -> Optional[float]:
+    if value is None or value == "":
+        return default
+    if isinstance(value, (int, float)):
+        return value
+    if not isinstance(value, str):
+        return default  # nested values such as {"kg": 100} are not a number
+    try:
+        return float(value)
+    except ValueError:
+        try:
+            return float(str(value).strip().replace(",", "."))  # decimal comma
+        except ValueError:
+            return default
+
+
+def parse_seconds(value) -> int:
+    """Seconds from 3600, "1h 5m", "45m", "1:05:00" or "05:00"; 0 when unreadable."""
+    if value is None or value == "":
+        return 0
+    number = _number(value)
+    if number is not None:
+        return int(number)
+    text = str(value or "").strip().lower()
+    if ":" in text:
+        parts = [_number(p, 0) for p in text.split(":")]
+        return int(sum(p * 60 ** i for i, p in enumerate(reversed(parts))))
+    match = _DURATION.match(text)
+    if not text or not match:
+        return 0
+    hours, minutes, seconds = (int(g or 0) for g in match.groups())
+    return hours * 3600 + minutes * 60 + seconds
+
+
+def _flag(value, default: bool = True) -> bool:
+    if isinstance(value, bool):
+        return value
+    if value is None or str(value).strip() == "":
+        return default
+    return str(value).strip().lower() not in ("false", "0", "no", "n")
+
+
+def _set_row(row: dict) -> dict:
+    weight = _number(row.get("weight"))
+    if weight is None and row.get("weight_lbs") not in (None, ""):
+        weight = round(_number(row["weight_lbs"], 0) * LBS_TO_KG, 2)
+    goal_reps = _number(row.get("goal_reps"))
+    return {
+        "weight": weight or 0,
+        "reps": int(_number(row.get("reps"), 0)),
+        "completed": _flag(row.get("completed")),
+        "rest_seconds": parse_seconds(row.get("rest_seconds")),
+        "set_duration": parse_seconds(row.get("set_duration")),
+        "goal_weight": _number(row.get("goal_weight")),
+        "goal_reps": int(goal_reps) if goal_reps is not None else None,
+    }
+
+
+def group_sessions(rows: Iterable[dict], progress: ImportProgress,
+                   batch_sets: int = BATCH_SETS) -> Iterator[List[ParsedSession]]:
+    """Batches of sessions holding about ``batch_sets`` sets; rows without a date or exercise are skipped."""
+    batch: Dict[tuple, ParsedSession] = {}
+    names: Dict[str, str] = {}  # raw name -> normalized, once per distinct name
+    sets, last_key = 0, None
+    for row in rows:
+        progress.rows += 1
+        started = parse_date(row.get("date"))
+        name = str(row.get("exercise") or "").strip()
+        normalized = names.get(name)
+        if normalized is None:
+            normalized = names[name] = normalize_exercise_name(name)
+        if started is None or not normalized:
+            progress.skipped += 1
+            continue
+        key = (str(row.get("session") or ""), started)
+        if key != last_key and sets >= batch_sets:
+            yield list(batch.values())
+            batch, sets = {}, 0
+        last_key = key
+        session = batch.get(key)
+        if session is None:
+            session = batch[key] = ParsedSession(started)
+        if not session.duration:
+            end = parse_date(row.get("end"))
+            session.duration = (parse_seconds(row.get("duration"))
+                                or (int((end - started).total_seconds()) if end and end > started else 0))
+        entry = session.exercises.setdefault(normalized, (name, str(row.get("category") or "Uncategorized"), []))
+        entry[2].append(row)  # converted in write_batch, only for sessions that are not duplicates
+        sets += 1
+    if batch:
+        yield list(batch.values())
+
+
+# --- Writing: one transaction per batch ---
+
+def _exercise_ids(db: Session, user_id: int, sessions: List[ParsedSession], known: Dict[str, int],
+                  progress: ImportProgress):
+    """Fill ``known`` (normalized name -> exercise id) for the batch's new names, creating missing exercises."""
+    wanted: Dict[str, Tuple[str, str]] = {}
+    for session in sessions:
+        for key, (name, category, _) in session.exercises.items():
+            if key not in known:
+                wanted.setdefault(key, (name, category))
+    if not wanted:
+        return
+    newest = db.exec(select(func.max(Exercise.id))).one() or 0
+    found = resolve_exercises(db, [ExerciseSpec(name=n, category=c) for n, c in wanted.values()], user_id)
+    for key in wanted:
+        known[key] = found[key].id
+        progress.exercises_created += found[key].id > newest
+
+
+def write_batch(db: Session, user_id: int, sessions: List[ParsedSession], known: Dict[str, int],
+                existing: Set[datetime], progress: ImportProgress):
+    """Insert the batch's new sessions with one executemany per table and commit."""
+    fresh = []
+    for session in sessions:
+        if session.date in existing:
+            progress.duplicates += 1
+        else:
+            existing.add(session.date)
+            fresh.append(session)
+    if not fresh:
+        return
+    _exercise_ids(db, user_id, fresh, known, progress)
+
+    # Core inserts: plain executemany without the ORM's per-row bookkeeping
+    db.execute(insert(TrainingSession.__table__), [
+        {"user_id": user_id, "date": s.date, "duration_seconds": s.duration} for s in fresh
+    ])
+    session_ids = newest_ids(db, TrainingSession.id, TrainingSession.user_id == user_id, len(fresh))
+    exercise_rows = [(session_id, known[key], rows)
+                     for session_id, session in zip(session_ids, fresh)
+                     for key, (_, _, rows) in session.exercises.items()]
+    db.execute(insert(SessionExercise.__table__), [
+        {"session_id": session_id, "exercise_id": exercise_id} for session_id, exercise_id, _ in exercise_rows
+    ])
+    row_ids = newest_ids(db, SessionExercise.id, SessionExercise.session_id >= session_ids[0], len(exercise_rows))
+    set_rows = [{**_set_row(row), "session_exercise_id": row_id}
+                for row_id, (_, _, rows) in zip(row_ids, exercise_rows) for row in rows]
+    db.execute(insert(TrainingSet.__table__), set_rows)
+    db.commit()
+    progress.sessions += len(fresh)
+    progress.sets += len(set_rows)
+
+
+def import_history(engine: Engine, user_id: int, stream: BinaryIO, fmt: Optional[str] = None,
+                   filename: Optional[str] = None, batch_sets: Optional[int] = None) -> Iterator[dict]:
+    """Import a seekable upload, yielding progress after each batch and a final ``done`` summary."""
+    from backend import metrics
+
+    if fmt is None:
+        fmt = detect_format(filename, stream.read(64))
+        stream.seek(0)
+    if fmt not in FORMATS:
+        raise ImportFormatError(f"Unsupported format: {fmt}")
+    progress, error = ImportProgress(), None
+    with Session(engine) as db:
+        existing = set(db.exec(select(TrainingSession.date).where(TrainingSession.user_id == user_id)).all())
+        known: Dict[str, int] = {}
+        rows = parse_rows(open_text(stream), fmt)
+        try:
+            for batch in group_sessions(rows, progress, batch_sets or BATCH_SETS):
+                write_batch(db, user_id, batch, known, existing, progress)
+                yield progress.as_dict()
+        except ImportFormatError as e:
+            error = str(e)  # batches written so far are kept
+        except Exception as e:
+            logger.exception(f"History import for user {user_id} failed")
+            db.rollback()
+            error = f"Import failed: {e}"
+        finally:
+            # Also when the client goes away mid-stream: derived data must follow what was written
+            if progress.sessions:
+                athlete_profile.rebuild_profile(db, user_id)
+                exercise_targets.rebuild_targets(db, user_id)
+                session_index.forget_user(db, user_id)
+    metrics.HISTORY_IMPORT_SETS.inc(progress.sets, outcome="imported")
+    metrics.HISTORY_IMPORT_SETS.inc(progress.skipped, outcome="skipped")
+    logger.info(f"Imported history for user {user_id}: {progress.sessions} sessions, {progress.sets} sets, "
+                f"{progress.duplicates} duplicate sessions, {progress.skipped} rows skipped")
+    summary = progress.as_dict(done=True)
+    if error:
+        summary["error"] = error
+    yield summary
+
+
+def main():
+    import argparse
+
+    from backend.database import engine
+
+    parser = argparse.ArgumentParser(description="Import a training history file for a user.")
+    parser.add_argument("path")
+    parser.add_argument("--user-id", type=int, required=True)
+    parser.add_argument("--format", choices=FORMATS)
+    args = parser.parse_args()
+    with open(args.path, "rb") as stream:
+        for update in import_history(engine, args.user_id, stream, args.format, args.path):
+            print(json.dumps(update))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,492 @@
+"""Latency-aware routing across OpenAI-compatible streaming chat providers.
+
+The router keeps rolling time-to-first-token (TTFT) and error statistics per
+provider/model, trips a circuit breaker on repeated failures, can hedge a
+second provider when the first one is slow to produce a token, and fails over
+to the next provider as long as nothing user-visible has been emitted yet.
+"""
+import asyncio
+import json
+import logging
+import os
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+import httpx
+
+from backend import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class LLMUnavailableError(Exception):
+    """Raised when no provider could produce (or finish) a response."""
+
+
+class ProviderError(Exception):
+    """A single provider attempt failed."""
+
+    def __init__(self, provider: str, message: str):
+        super().__init__(f"{provider}: {message}")
+        self.provider = provider
+
+
+@dataclass
+class Provider:
+    name: str
+    url: str
+    model: str
+    headers: Dict[str, str] = field(default_factory=dict)
+    supports_tools: bool = False
+    # Model id sent upstream when it differs from the label used for stats
+    payload_model: Optional[str] = None
+    extra_payload: Dict = field(default_factory=dict)
+
+    @property
+    def key(self) -> Tuple[str, str]:
+        return (self.name, self.model)
+
+    def build_payload(self, messages: list, tools: Optional[list] = None) -> dict:
+        payload = {
+            "messages": messages,
+            "model": self.payload_model or self.model,
+            "stream": True,
+            **self.extra_payload,
+        }
+        if tools and self.supports_tools:
+            payload["tools"] = tools
+        return payload
+
+
+class ProviderStats:
+    """Rolling TTFT and error-rate window for one provider/model."""
+
+    def __init__(self, window: int = 50):
+        self.ttfts = deque(maxlen=window)
+        self.outcomes = deque(maxlen=window)  # 1 = failure, 0 = success
+
+    def record_success(self, ttft: Optional[float]):
+        if ttft is not None:
+            self.ttfts.append(ttft)
+        self.outcomes.append(0)
+
+    def record_failure(self):
+        self.outcomes.append(1)
+
+    @property
+    def ttft_p50(self) -> Optional[float]:
+        if not self.ttfts:
+            return None
+        ordered = sorted(self.ttfts)
+        return ordered[len(ordered) // 2]
+
+    @property
+    def error_rate(self) -> float:
+        if not self.outcomes:
+            return 0.0
+        return sum(self.outcomes) / len(self.outcomes)
+
+    def score(self) -> float:
+        """Expected TTFT penalised by error rate; untried providers score 0."""
+        p50 = self.ttft_p50
+        if p50 is None:
+            return 0.0
+        return p50 * (1 + 4 * self.error_rate)
+
+
+class CircuitBreaker:
+    """Opens after N consecutive failures, half-opens after a cooldown.
+
+    ``available`` only reads the state (used to rank candidates); ``allow`` is
+    called when a request is actually started and hands out the single
+    half-open probe, which is returned by a recorded outcome or ``release``.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 3, cooldown: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = 0.0
+        self.state = self.CLOSED
+        self.probe_in_flight = False
+
+    def available(self) -> bool:
+        if self.state == self.CLOSED:
+            return True
+        if self.state == self.OPEN and time.monotonic() - self.opened_at < self.cooldown:
+            return False
+        return not self.probe_in_flight
+
+    def allow(self) -> bool:
+        if self.state == self.CLOSED:
+            return True
+        if not self.available():
+            return False
+        # Let exactly one probe request through
+        self.state = self.HALF_OPEN
+        self.probe_in_flight = True
+        return True
+
+    def release(self):
+        """The probe ended without an outcome (cancelled); the next request may probe."""
+        self.probe_in_flight = False
+
+    def record_success(self):
+        self.failures = 0
+        self.state = self.CLOSED
+        self.probe_in_flight = False
+
+    def record_failure(self):
+        self.failures += 1
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+        self.probe_in_flight = False
+
+
+_DONE = object()
+
+
+class _Failure:
+    def __init__(self, error: Exception):
+        self.error = error
+
+
+class _Attempt:
+    """One in-flight provider request pumping parsed events into a queue."""
+
+    def __init__(self, router: "LLMRouter", client: httpx.AsyncClient, provider: Provider, payload: dict):
+        self.provider = provider
+        self.breaker = router.breakers[provider.key]
+        self.started = time.monotonic()
+        self.ttft: Optional[float] = None
+        self.finished: Optional[float] = None
+        self.chunks = 0
+        self.usage: Dict = {}
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=256)
+        self.task = asyncio.create_task(self._run(router, client, payload))
+
+    async def _run(self, router: "LLMRouter", client: httpx.AsyncClient, payload: dict):
+        try:
+            async for event in router._provider_events(client, self.provider, payload):
+                if event["type"] == "usage":
+                    self.usage = event["usage"]
+                    continue
+                if self.ttft is None:
+                    self.ttft = time.monotonic() - self.started
+                self.chunks += 1
+                await self.queue.put(event)
+            self.finished = time.monotonic()
+            await self.queue.put(_DONE)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            await self.queue.put(_Failure(e))
+
+    async def next(self):
+        return await self.queue.get()
+
+    def cancel(self):
+        self.task.cancel()
+        self.breaker.release()
+
+
+class LLMRouter:
+    def __init__(
+        self,
+        providers: List[Provider],
+        hedge_after: Optional[float] = None,
+        timeout: float = 90.0,
+        breaker_threshold: int = 3,
+        breaker_cooldown: float = 30.0,
+        window: int = 50,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        self.providers = providers
+        self.hedge_after = hedge_after
+        self.timeout = timeout
+        self.transport = transport
+        self.stats: Dict[Tuple[str, str], ProviderStats] = {
+            p.key: ProviderStats(window) for p in providers
+        }
+        self.breakers: Dict[Tuple[str, str], CircuitBreaker] = {
+            p.key: CircuitBreaker(breaker_threshold, breaker_cooldown) for p in providers
+        }
+
+    def candidates(self, tools: Optional[list] = None, messages: Optional[list] = None) -> List[Provider]:
+        """Providers whose breaker allows traffic, best first.
+
+        Tool-capable providers stay ahead when tools are requested; within a
+        tier the order follows observed latency and error rate, falling back to
+        configuration order for ties (e.g. before any traffic). Inside a tool
+        loop (the conversation carries tool calls or results) only tool-capable
+        providers are eligible. Breaker states are not changed here.
+        """
+        in_tool_loop = any(m.get("role") == "tool" or m.get("tool_calls") for m in messages or [])
+        allowed = [p for p in self.providers
+                   if self.breakers[p.key].available() and (p.supports_tools or not in_tool_loop)]
+
+        def rank(item):
+            order, p = item
+            tier = 0 if (not tools or p.supports_tools) else 1
+            return (tier, self.stats[p.key].score(), order)
+
+        return [p for _, p in sorted(enumerate(allowed), key=rank)]
+
+    def _start(self, client: httpx.AsyncClient, candidates: List[Provider], messages: list,
+               tools: Optional[list]) -> Optional[_Attempt]:
+        """Start a request on the next candidate its breaker lets through (taking the half-open probe)."""
+        while candidates:
+            provider = candidates.pop(0)
+            if self.breakers[provider.key].allow():
+                return _Attempt(self, client, provider, provider.build_payload(messages, tools))
+        return None
+
+    def snapshot(self) -> list:
+        """Current per-provider stats, for logging and debugging."""
+        return [
+            {
+                "provider": p.name,
+                "model": p.model,
+                "ttft_p50": self.stats[p.key].ttft_p50,
+                "error_rate": round(self.stats[p.key].error_rate, 3),
+                "breaker": self.breakers[p.key].state,
+            }
+            for p in self.providers
+        ]
+
+    def _record_success(self, attempt: _Attempt):
+        self.stats[attempt.provider.key].record_success(attempt.ttft)
+        self.breakers[attempt.provider.key].record_success()
+        usage = attempt.usage or {}
+        metrics.record_llm_stream(
+            attempt.provider.name,
+            attempt.provider.model,
+            started=attempt.started,
+            first_token_at=attempt.started + attempt.ttft if attempt.ttft is not None else None,
+            finished=attempt.finished or time.monotonic(),
+            # Fall back to streamed chunk count when the provider reports no usage
+            completion_tokens=usage.get("completion_tokens") or attempt.chunks,
+            prompt_tokens=usage.get("prompt_tokens") or 0,
+            cost=usage.get("cost") or 0.0,
+        )
+
+    def _record_failure(self, attempt: _Attempt, error: Exception):
+        logger.warning(f"[llm_router] {attempt.provider.name}/{attempt.provider.model} failed: {error}")
+        self.stats[attempt.provider.key].record_failure()
+        self.breakers[attempt.provider.key].record_failure()
+        metrics.LLM_REQUESTS.inc(provider=attempt.provider.name, model=attempt.provider.model, outcome="error")
+
+    async def _provider_events(self, client: httpx.AsyncClient, provider: Provider, payload: dict) -> AsyncIterator[dict]:
+        """Parse one provider's SSE stream into content / tool_call events."""
+        try:
+            async with client.stream(
+                "POST", provider.url, json=payload, headers=provider.headers, timeout=self.timeout
+            ) as response:
+                if response.status_code != 200:
+                    error_body = await response.aread()
+                    raise ProviderError(
+                        provider.name,
+                        f"status {response.status_code}: {error_body.decode('utf-8', errors='replace')[:200]}",
+                    )
+                async for line in response.aiter_lines():
+                    line = line.strip()
+                    if not line or not line.startswith("data: "):
+                        continue
+                    if line == "data: [DONE]":
+                        break
+                    try:
+                        data = json.loads(line[6:])
+                    except json.JSONDecodeError:
+                        continue
+                    if "error" in data:
+                        error = data["error"]
+                        message = error.get("message", "Unknown API error") if isinstance(error, dict) else str(error)
+                        raise ProviderError(provider.name, message)
+                    if data.get("usage"):
+                        yield {"type": "usage", "usage": data["usage"]}
+                    if data.get("choices"):
+                        delta = data["choices"][0].get("delta", {})
+                        content = delta.get("content")
+                        if content:
+                            yield {"type": "content", "text": content}
+                        for tc_delta in delta.get("tool_calls") or []:
+                            yield {"type": "tool_call", "delta": tc_delta}
+        except httpx.HTTPError as e:
+            raise ProviderError(provider.name, f"{type(e).__name__}: {e}") from e
+
+    async def _first_token(self, client, attempts: List[_Attempt], candidates: List[Provider], messages, tools):
+        """Wait for the first token across attempts, hedging / failing over as needed.
+
+        Returns (winning attempt, first event) or (None, last error).
+        """
+        pending = {asyncio.ensure_future(a.next()): a for a in attempts}
+        hedge_timeout = self.hedge_after if (self.hedge_after and candidates) else None
+        last_error: Optional[Exception] = None
+        try:
+            while pending:
+                done, _ = await asyncio.wait(pending, timeout=hedge_timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    # Primary is slow: race a second provider against it
+                    hedge_timeout = None
+                    hedge = self._start(client, candidates, messages, tools)
+                    if hedge is not None:
+                        logger.info(f"[llm_router] No token after {self.hedge_after}s, "
+                                    f"hedging with {hedge.provider.name}/{hedge.provider.model}")
+                        pending[asyncio.ensure_future(hedge.next())] = hedge
+                    continue
+
+                for fut in done:
+                    attempt = pending.pop(fut)
+                    event = fut.result()
+                    if isinstance(event, _Failure):
+                        last_error = event.error
+                        self._record_failure(attempt, event.error)
+                        continue
+                    # First token (or an empty but successful response) wins
+                    for other_fut, other in pending.items():
+                        other_fut.cancel()
+                        other.cancel()
+                        metrics.LLM_REQUESTS.inc(provider=other.provider.name, model=other.provider.model, outcome="hedge_cancelled")
+                    pending.clear()
+                    return attempt, event
+
+                if not pending and candidates:
+                    # Everything in flight failed before a token: fail over
+                    retry = self._start(client, candidates, messages, tools)
+                    if retry is not None:
+                        logger.info(f"[llm_router] Failing over to {retry.provider.name}/{retry.provider.model}")
+                        pending[asyncio.ensure_future(retry.next())] = retry
+        finally:
+            # Only non-empty when we were cancelled (client went away) mid-race
+            for fut, attempt in pending.items():
+                fut.cancel()
+                attempt.cancel()
+                metrics.LLM_REQUESTS.inc(provider=attempt.provider.name, model=attempt.provider.model, outcome="cancelled")
+        return None, last_error
+
+    async def stream(self, messages: list, tools: Optional[list] = None) -> AsyncIterator[dict]:
+        """Stream events from the best available provider.
+
+        Yields dicts of type ``provider`` (once per attempt that wins the
+        first-token race), ``content``, ``tool_call`` (raw OpenAI delta) and
+        ``reset`` (a failover happened after tool-call deltas were yielded;
+        discard accumulated tool-call state). Raises LLMUnavailableError when
+        every provider failed or a failure happened after content was emitted.
+        """
+        candidates = self.candidates(tools, messages)
+        if not candidates:
+            raise LLMUnavailableError("All LLM providers are temporarily unavailable (circuit open).")
+
+        emitted_content = False
+        emitted_tool_calls = False
+        last_error: Optional[Exception] = None
+
+        async with httpx.AsyncClient(transport=self.transport) as client:
+            while candidates:
+                first = self._start(client, candidates, messages, tools)
+                if first is None:
+                    break
+                winner, first_event = await self._first_token(client, [first], candidates, messages, tools)
+                if winner is None:
+                    last_error = first_event
+                    break
+
+                try:
+                    if emitted_tool_calls:
+                        yield {"type": "reset"}
+                        emitted_tool_calls = False
+                    yield {
+                        "type": "provider",
+                        "provider": winner.provider.name,
+                        "model": winner.provider.model,
+                        "supports_tools": winner.provider.supports_tools and bool(tools),
+                        "ttft": winner.ttft,
+                    }
+                    event = first_event
+                    while event is not _DONE:
+                        if isinstance(event, _Failure):
+                            raise event.error
+                        if event["type"] == "content":
+                            emitted_content = True
+                        elif event["type"] == "tool_call":
+                            emitted_tool_calls = True
+                        yield event
+                        event = await winner.next()
+                    self._record_success(winner)
+                    return
+                except (asyncio.CancelledError, GeneratorExit):
+                    # The consumer stopped reading (client disconnect); finally aborts the request
+                    metrics.LLM_REQUESTS.inc(provider=winner.provider.name, model=winner.provider.model, outcome="cancelled")
+                    raise
+                except ProviderError as e:
+                    # Mid-stream failure
+                    last_error = e
+                    self._record_failure(winner, e)
+                    if emitted_content:
+                        raise LLMUnavailableError(f"Stream interrupted: {e}") from e
+                    logger.info(f"[llm_router] Mid-stream failure before content, failing over: {e}")
+                finally:
+                    winner.cancel()
+
+        raise LLMUnavailableError(f"All LLM providers failed. Last error: {last_error}")
+
+
+def build_default_providers() -> List[Provider]:
+    """Providers configured from the environment, in preference order."""
+    providers = []
+    openrouter_key = os.environ.get("OPENROUTER_API_KEY", "")
+    if openrouter_key:
+        base_url = os.environ.get("OPENROUTER_BASE_URL", "https://openrouter.ai/api/v1")
+        headers = {
+            "Authorization": f"Bearer {openrouter_key}",
+            "Content-Type": "application/json",
+            "HTTP-Referer": "https://antigravity.fitness",
+            "X-Title": "Antigravity Fitness",
+        }
+        models = [os.environ.get("OPENROUTER_MODEL", "meta-llama/llama-3.1-8b-instruct")]
+        # Optional comma-separated list of backup models on the same provider
+        models += [m.strip() for m in os.environ.get("OPENROUTER_FALLBACK_MODELS", "").split(",") if m.strip()]
+        for model in models:
+            providers.append(Provider(
+                name="openrouter",
+                url=f"{base_url}/chat/completions",
+                model=model,
+                headers=headers,
+                supports_tools=True,
+                # Ask OpenRouter to report token usage and cost in the final chunk
+                extra_payload={"temperature": 0.7, "usage": {"include": True}},
+            ))
+
+    providers.append(Provider(
+        name="pollinations",
+        url=os.environ.get("POLLINATIONS_URL", "https://text.pollinations.ai/openai/chat/completions"),
+        model="pollinations/openai",
+        payload_model="openai",
+        headers={"Content-Type": "application/json"},
+    ))
+    return providers
+
+
+_router: Optional[LLMRouter] = None
+
+
+def get_llm_router() -> LLMRouter:
+    """Process-wide router so stats and breakers persist across requests."""
+    global _router
+    if _router is None:
+        hedge_ms = int(os.environ.get("LLM_HEDGE_AFTER_MS", "0"))
+        _router = LLMRouter(
+            build_default_providers(),
+            hedge_after=hedge_ms / 1000 if hedge_ms > 0 else None,
+            breaker_threshold=int(os.environ.get("LLM_BREAKER_FAILURES", "3")),
+            breaker_cooldown=float(os.environ.get("LLM_BREAKER_COOLDOWN_S", "30")),
+        )
+        logger.info(f"[llm_router] Providers: {[(p.name, p.model) for p in _router.providers]}")
+    return _router
@@ -0,0 +1,181 @@
+"""Non-blocking structured logging.
+
+Records are put on an in-memory queue by a ``QueueHandler`` and written by a
+``QueueListener`` thread, so file I/O never runs on the event loop. Each line
+is a JSON object carrying the current request id; large payloads are capped
+and verbose traces are sampled. Log files rotate by size and rotated files are
+gzip-compressed.
+
+    LOG_FILE               path of the JSON log (default backend/data/backend_debug.log)
+    LOG_LEVEL              root level (default INFO)
+    LOG_MAX_BYTES          rotate after this many bytes (default 10 MB)
+    LOG_BACKUPS            rotated files to keep (default 5)
+    LOG_PAYLOAD_MAX_CHARS  cap for payload fields (default 2000)
+    LOG_TRACE_SAMPLE_RATE  fraction of verbose traces logged with payload (default 0.1)
+"""
+import atexit
+import contextvars
+import gzip
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import shutil
+import sys
+import time
+import uuid
+from typing import Any, Optional
+
+LOG_FILE = os.environ.get(
+    "LOG_FILE", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "backend_debug.log")
+)
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO").upper()
+LOG_MAX_BYTES = int(os.environ.get("LOG_MAX_BYTES", str(10 * 1024 * 1024)))
+LOG_BACKUPS = int(os.environ.get("LOG_BACKUPS", "5"))
+PAYLOAD_MAX_CHARS = int(os.environ.get("LOG_PAYLOAD_MAX_CHARS", "2000"))
+TRACE_SAMPLE_RATE = float(os.environ.get("LOG_TRACE_SAMPLE_RATE", "0.1"))
+
+request_id_var: contextvars.ContextVar[str] = contextvars.ContextVar("request_id", default="-")
+
+# Attributes every LogRecord has; anything else came in via ``extra=``
+_RESERVED = set(logging.LogRecord("", 0, "", 0, "", (), None).__dict__) | {"message", "asctime", "request_id"}
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def truncate(value: Any, limit: int = None) -> str:
+    """String form of ``value`` cut to ``limit`` characters, noting how much was dropped."""
+    limit = PAYLOAD_MAX_CHARS if limit is None else limit
+    text = value if isinstance(value, str) else json.dumps(value, default=str)
+    if len(text) <= limit:
+        return text
+    return f"{text[:limit]}...(+{len(text) - limit} chars)"
+
+
+def log_trace(logger: logging.Logger, message: str, payload: Any, sample_rate: float = None, **fields):
+    """Log a verbose trace; only a sampled fraction carries the (capped) payload.
+
+    The payload is serialized here, on the caller's side, because it may be
+    mutated after the call while the record waits in the queue.
+    """
+    if not logger.isEnabledFor(logging.INFO):
+        return
+    rate = TRACE_SAMPLE_RATE if sample_rate is None else sample_rate
+    if random.random() < rate:
+        fields["payload"] = truncate(payload)
+    elif isinstance(payload, (list, tuple, dict, str)):
+        fields["payload_items"] = len(payload)
+    logger.info(message, extra=fields)
+
+
+class RequestIdFilter(logging.Filter):
+    """Stamps the current request id onto records before they are queued."""
+
+    def filter(self, record):
+        record.request_id = request_id_var.get()
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "request_id": getattr(record, "request_id", "-"),
+            "msg": truncate(record.getMessage()),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RESERVED and not key.startswith("_"):
+                entry[key] = value if isinstance(value, (int, float, bool)) or value is None else truncate(value)
+        if record.exc_info:
+            entry["exc"] = truncate(self.formatException(record.exc_info), PAYLOAD_MAX_CHARS * 2)
+        return json.dumps(entry, ensure_ascii=False)
+
+
+def _gzip_rotator(source: str, dest: str):
+    with open(source, "rb") as src, gzip.open(dest, "wb") as dst:
+        shutil.copyfileobj(src, dst)
+    os.remove(source)
+
+
+def rotating_file_handler(path: str, max_bytes: int = LOG_MAX_BYTES, backups: int = LOG_BACKUPS):
+    """Size-based rotation; rotated files become ``<path>.N.gz``."""
+    handler = logging.handlers.RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backups,
+                                                   encoding="utf-8", delay=True)
+    handler.namer = lambda name: name + ".gz"
+    handler.rotator = _gzip_rotator
+    return handler
+
+
+def setup_logging(log_file: str = LOG_FILE, level: str = LOG_LEVEL):
+    """Route all logging through a queue to a JSON file writer thread (idempotent)."""
+    global _listener
+    if _listener is not None:
+        return _listener
+
+    os.makedirs(os.path.dirname(os.path.abspath(log_file)), exist_ok=True)
+    file_handler = rotating_file_handler(log_file)
+    file_handler.setFormatter(JsonFormatter())
+    console = logging.StreamHandler(sys.stderr)
+    console.setLevel(logging.WARNING)
+    console.setFormatter(logging.Formatter("%(asctime)s - %(levelname)s - %(name)s - %(message)s"))
+
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+    queue_handler.addFilter(RequestIdFilter())
+
+    root = logging.getLogger()
+    root.setLevel(level)
+    root.addHandler(queue_handler)
+
+    _listener = logging.handlers.QueueListener(log_queue, file_handler, console, respect_handler_level=True)
+    _listener.start()
+    atexit.register(shutdown_logging)
+    return _listener
+
+
+def shutdown_logging():
+    """Flush queued records and stop the writer thread."""
+    global _listener
+    if _listener is None:
+        return
+    _listener.stop()
+    for handler in _listener.handlers:
+        handler.close()
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        if isinstance(handler, logging.handlers.QueueHandler):
+            root.removeHandler(handler)
+    _listener = None
+
+
+class RequestIdMiddleware:
+    """ASGI middleware: one id per HTTP request, taken from ``X-Request-ID`` or generated.
+
+    Plain ASGI rather than ``BaseHTTPMiddleware`` so streaming responses run
+    in the same task and keep the id for their whole lifetime.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        incoming = dict(scope.get("headers") or []).get(b"x-request-id", b"").decode("latin-1")
+        request_id = incoming[:64] or uuid.uuid4().hex[:12]
+        token = request_id_var.set(request_id)
+
+        async def send_with_id(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + [(b"x-request-id", request_id.encode("latin-1"))]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            request_id_var.reset(token)
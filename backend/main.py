@@ -1,22 +1,39 @@
+import asyncio
 from contextlib import asynccontextmanager
 from dotenv import load_dotenv
 import os
 
 load_dotenv()
 
+from backend.logging_config import setup_logging, RequestIdMiddleware
+setup_logging()
+
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from backend.database import create_db_and_tables
-from backend.routers import auth, users, exercises, sessions, coach, templates
+from backend.routers import auth, users, exercises, sessions, coach, templates, media, history
 from backend.seed import seed_exercises
+from backend.migrate_exercise_names import migrate_db as migrate_exercise_names
+from backend.migrate_exercise_targets import migrate_db as migrate_exercise_targets
+from backend import quote_pool, metrics, exercise_catalog
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     create_db_and_tables()
+    migrate_exercise_names()
+    migrate_exercise_targets()
     seed_exercises()
+    exercise_catalog.ensure_catalog()
+    quote_pool.load_pools()
+    refill_task = asyncio.create_task(quote_pool.refill_loop())
+    lag_task = asyncio.create_task(metrics.monitor_event_loop_lag())
     yield
+    refill_task.cancel()
+    lag_task.cancel()
 
 app = FastAPI(lifespan=lifespan)
+app.add_middleware(RequestIdMiddleware)
 
 # CORS configuration
 origins = [
@@ -30,6 +47,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Stream-ID", "X-Request-ID"],
 )
 
 app.include_router(auth.router)
@@ -38,7 +56,14 @@ app.include_router(exercises.router)
 app.include_router(sessions.router)
 app.include_router(coach.router)
 app.include_router(templates.router)
+app.include_router(media.router)
+app.include_router(history.router)
 
 @app.get("/")
 def read_root():
     return {"message": "Welcome to the Fitness App API"}
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def read_metrics():
+    """Prometheus text exposition of LLM and coach pipeline metrics."""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
@@ -7,9 +7,12 @@ from pydantic import BaseModel, Field
 from typing import List, Optional
 from sqlmodel import select, Session
 
+import logging
 import sys
 import os
 
+logger = logging.getLogger(__name__)
+
 # Add the project root to python path so we can import backend
 # backend/mcp_server.py -> backend/ -> project_root
 current_dir = os.path.dirname(os.path.abspath(__file__))
@@ -31,6 +34,8 @@ try:
         TemplateSet
     )
     from backend.routers.template_helper import save_generated_template
+    from backend.template_writer import ExerciseSpec, SetSpec, write_template
+    from backend import exercise_selection
 except ImportError:
     # If project_root/backend is where we are, maybe we need to append project_root's parent?
     sys.path.append(project_root)
@@ -46,6 +51,8 @@ except ImportError:
         TemplateSet
     )
     from backend.routers.template_helper import save_generated_template
+    from backend.template_writer import ExerciseSpec, SetSpec, write_template
+    from backend import exercise_selection
 
 
 # --- Pydantic Models for Tool Inputs ---
@@ -60,77 +67,40 @@ class ExerciseInput(BaseModel):
     sets: List[SetInput] = Field(..., description="List of sets to perform")
     video_url: Optional[str] = Field(None, description="URL for exercise demo/video from list_exercises tool")
 
-import httpx
 
 def list_exercises_logic(category: str = None) -> str:
-    """List available exercises using RapidAPI ExerciseDB."""
-    api_key = os.environ.get("RAPID_API_KEY")
-    api_host = os.environ.get("RAPID_API_HOST", "exercisedb.p.rapidapi.com")
-    
-    if not api_key:
-        return "Error: RAPID_API_KEY not found in environment variables."
-
-    headers = {
-        "x-rapidapi-key": api_key,
-        "x-rapidapi-host": api_host
-    }
-    
-    # Decide endpoint based on filter
-    # If category matches a "bodyPart" or "target", we can use specific endpoints.
-    # Otherwise we default to listing with a limit.
-    # Supported BodyParts: back, cardio, chest, lower arms, lower legs, neck, shoulders, upper arms, upper legs, waist
-    # Supported Targets: abductors, abs, adductors, biceps, calves, ...
-    
+    """List exercises from the local catalog (ExerciseDB dump + cached live lookups).
+
+    Answers offline; with RAPID_API_KEY set, short results read through to
+    ExerciseDB once per query per TTL (see backend/exercise_catalog.py).
+    """
+    from backend import exercise_catalog
+    from backend.media_cache import local_url
+
     try:
-        data = []
-        if category:
-            # Try to map category to bodyPart or target
-            # Simple heuristic: try bodyPart first
-            category_lower = category.lower()
-            url = f"https://{api_host}/exercises/bodyPart/{category_lower}"
-            response = httpx.get(url, headers=headers, params={"limit": 10})
-            
-            if response.status_code != 200 or not response.json():
-                # Fallback to name search if bodyPart fails
-                url = f"https://{api_host}/exercises/name/{category_lower}"
-                response = httpx.get(url, headers=headers, params={"limit": 10})
-                
-            if response.status_code == 200:
-                data = response.json()
-        else:
-            # List random exercises (or just the first N)
-            url = f"https://{api_host}/exercises"
-            response = httpx.get(url, headers=headers, params={"limit": 10})
-            if response.status_code == 200:
-                data = response.json()
-        
-        if not data:
-            return f"No exercises found for '{category}'."
-            
-        output = f"Found {len(data)} exercises via ExerciseDB:\n"
+        data = exercise_catalog.lookup(category, limit=10, engine=engine)
+    except Exception as e:
+        logger.warning(f"Error searching exercise catalog: {e}")
+        return f"Error executing tool: {str(e)}"
+
+    if not data:
+        return f"No exercises found for '{category}'."
+
+    output = f"Found {len(data)} exercises via ExerciseDB:\n"
+    with Session(engine) as session:
         for ex in data:
-            name = ex.get("name", "Unknown").title()
-            body_part = ex.get("bodyPart", "")
-            target = ex.get("target", "")
-            # ExerciseDB usually provides a gifUrl, we can include it or just a link to google
-            # The prompt requires a link for extended info. 
-            # We can use the gifUrl if valid, or generate a google search link.
-            # gifUrl example: https://v2.exercisedb.io/image/3_4_Sit-Up.gif
-            gif_url = ex.get("gifUrl", "")
-            
-            # Use gifUrl as the primary link if available, otherwise Google Search
-            if gif_url:
-                primary_link = gif_url
-                output += f"- {name} (Target: {target}, BodyPart: {body_part})\n  Visual: {primary_link}\n"
+            name = ex.name.title()
+            # Use the exercise image/gif as the primary link if available, otherwise Google Search
+            if ex.media_url:
+                # Served through the /media proxy, never straight from the remote host
+                output += (f"- {name} (Target: {ex.target}, BodyPart: {ex.body_part})\n"
+                           f"  Visual: {local_url(session, ex.media_url)}\n")
             else:
                 search_link = f"https://www.google.com/search?q={name.replace(' ', '+')}+exercise"
-                output += f"- {name} (Target: {target}, BodyPart: {body_part})\n  Info: {search_link}\n"
-                 
-        return output
+                output += f"- {name} (Target: {ex.target}, BodyPart: {ex.body_part})\n  Info: {search_link}\n"
+        session.commit()
 
-    except Exception as e:
-        print(f"Error calling RapidAPI: {e}")
-        return f"Error executing tool: {str(e)}"
+    return output
 
 def create_workout_template_logic(
     name: str, 
@@ -147,74 +117,19 @@ def create_workout_template_logic(
                 user = session.exec(select(User)).first()
                 if not user:
                     return "Error: No users found in database. Please create a user first."
-                print(f"User {user_id} not found, defaulting to user {user.id} ({user.username})")
+                logger.info(f"User {user_id} not found, defaulting to user {user.id} ({user.name})")
                 user_id = user.id
 
-            # 1. Create Template
-            template = WorkoutTemplate(name=name, user_id=user_id, is_ai_generated=True)
-            session.add(template)
-            session.commit()
-            session.refresh(template)
-            
-            # 2. Add Exercises
-            for order, ex_input in enumerate(exercises):
-                # Check if exercise exists
-                statement = select(Exercise).where(Exercise.name == ex_input.name)
-                exercise = session.exec(statement).first()
-                
-                if not exercise:
-                    # Create it
-                    # Logic to determine category if not provided? Default to 'Uncategorized'
-                    category = ex_input.category if ex_input.category else "Uncategorized"
-                    # Check if we have a video_url in the input? 
-                    # The ExerciseInput model currently doesn't have it. We should assume the LLM might pass it as description or separate field?
-                    # For now, let's just stick to name/category, but if we want to save the URL, 
-                    # we need to update ExerciseInput schema in this file too.
-                    
-                    # Let's assume the LLM passes the URL in the 'description' field if we reuse it, 
-                    # OR we need to update ExerciseInput.
-                    # Let's update ExerciseInput above first.
-                    exercise = Exercise(
-                        name=ex_input.name, 
-                        category=category, 
-                        is_custom=True,
-                        video_url=ex_input.video_url # Use the new video_url field
-                    )
-                    session.add(exercise)
-                    session.commit()
-                    session.refresh(exercise)
-                else:
-                    # Update video_url if it's missing and we have it
-                    if not exercise.video_url and ex_input.video_url:
-                        exercise.video_url = ex_input.video_url
-                        session.add(exercise)
-                        session.commit()
-                
-                # Create TemplateExercise linkage
-                template_ex = TemplateExercise(
-                    template_id=template.id,
-                    exercise_id=exercise.id,
-                    order=order
+            specs = [
+                ExerciseSpec(
+                    name=ex_input.name,
+                    category=ex_input.category or "Uncategorized",
+                    video_url=ex_input.video_url,  # served via the /media proxy
+                    sets=[SetSpec(goal_weight=s.goal_weight, goal_reps=s.goal_reps) for s in ex_input.sets],
                 )
-                session.add(template_ex)
-                session.commit()
-                session.refresh(template_ex)
-                
-                # Create Sets
-                for set_input in ex_input.sets:
-                    # Map reps/weight. If range (e.g. "8-12"), take lower bound or parse?
-                    # For simplicity, taking explicit or default 0
-                    # If set_input.reps is a string "8-12", pydantic model for SetInput currently says int or string?
-                    # Let's check SetInput definition.
-                    
-                    t_set = TemplateSet(
-                        template_exercise_id=template_ex.id,
-                        goal_reps=set_input.goal_reps,
-                        goal_weight=set_input.goal_weight
-                    )
-                    session.add(t_set)
-            
-            session.commit()
+                for ex_input in exercises
+            ]
+            write_template(session, user_id, name, specs, is_ai_generated=True)
             return f"Workout template '{name}' created successfully with {len(exercises)} exercises."
                 
         except Exception as e:
@@ -303,11 +218,14 @@ GOAL_MUSCLE_MAP = {
     "upper_body_strength": ["chest", "back", "shoulders"],
     "lower_body_hypertrophy": ["legs", "core"],
     "lower_body_strength": ["legs", "core"],
+    "upper_body_endurance": ["chest", "back", "shoulders", "arms"],
+    "lower_body_endurance": ["legs", "core"],
     "push": ["chest", "shoulders", "arms"],  # tricep-heavy arms
     "pull": ["back", "arms"],  # bicep-heavy arms
     "legs": ["legs", "core"],
     "full_body_strength": ["chest", "back", "legs", "shoulders"],
     "full_body_hypertrophy": ["chest", "back", "legs", "shoulders", "arms"],
+    "full_body_endurance": ["chest", "back", "legs", "shoulders", "arms"],
     "push_pull_legs": ["chest", "shoulders", "back", "legs"],  # balanced
 }
 
@@ -349,18 +267,17 @@ def _select_exercises_for_group(
     style: str,
     max_exercises: int = 2,
     equipment: list = None,
+    history: dict = None,
 ) -> list:
-    """Pick exercises for a muscle group: compounds first, then isolation."""
-    db = EXERCISE_DATABASE.get(group, {})
-    compounds = db.get("compound", [])
-    isolations = db.get("isolation", [])
-
-    # Filter by equipment if specified
-    if equipment:
-        eq_set = {e.lower() for e in equipment}
-        eq_set.add("bodyweight")  # always available
-        compounds = [e for e in compounds if any(eq in eq_set for eq in e["equipment"])]
-        isolations = [e for e in isolations if any(eq in eq_set for eq in e["equipment"])]
+    """Pick exercises for a muscle group: compounds first, then isolation.
+
+    Candidates come from the precomputed selection index (curated exercises,
+    then the local catalog), filtered by equipment and ranked by the user's
+    history.
+    """
+    index = exercise_selection.get_index(engine)
+    compounds = index.candidates(group, "compound", equipment, max_exercises, history)
+    isolations = index.candidates(group, "isolation", equipment, max_exercises, history)
 
     selected = []
     # Strength → mostly compounds; Hypertrophy → compound + isolation
@@ -390,10 +307,12 @@ def design_workout_logic(
     experience_level: str = "intermediate",
     available_minutes: int = 60,
     equipment: list = None,
+    user_id: int = None,
 ) -> str:
     """Design a workout using evidence-based programming strategies.
 
     Returns a JSON workout plan with exercises, sets, reps, and rationale.
+    With ``user_id``, exercises the user already trains are preferred.
     """
     goal_key = goal.lower().replace(" ", "_").replace("-", "_")
     if goal_key not in GOAL_MUSCLE_MAP:
@@ -416,10 +335,11 @@ def design_workout_logic(
     exercises_per_group = max(1, max_total_exercises // len(muscle_groups))
     leftover = max_total_exercises - exercises_per_group * len(muscle_groups)
 
+    history = exercise_selection.user_history(user_id, engine)
     exercises = []
     for i, group in enumerate(muscle_groups):
         count = exercises_per_group + (1 if i < leftover else 0)
-        selected = _select_exercises_for_group(group, style, count, equipment)
+        selected = _select_exercises_for_group(group, style, count, equipment, history)
         for ex in selected:
             sets_list = [{"goal_weight": 0, "goal_reps": scheme["reps"]} for _ in range(scheme["sets"])]
             exercises.append({
@@ -489,6 +409,7 @@ def get_training_recommendations_logic(user_id: int = 1) -> str:
 
         # --- 1. Muscle group recency analysis ---
         from datetime import datetime
+        selection = exercise_selection.get_index(engine)
         now = datetime.utcnow()
         muscle_group_last_trained = {}
         exercise_history = {}  # exercise_name -> list of (date, weight, reps)
@@ -500,20 +421,8 @@ def get_training_recommendations_logic(user_id: int = 1) -> str:
                 ).first()
                 if not ex:
                     continue
-                # Map exercise category to our muscle group keys
-                cat = ex.category.lower()
-                matched_group = None
-                for group_key in EXERCISE_DATABASE:
-                    if cat in group_key or group_key in cat:
-                        matched_group = group_key
-                        break
-                # Fallback: check if exercise name matches any in our DB
-                if not matched_group:
-                    for group_key, group_data in EXERCISE_DATABASE.items():
-                        all_names = [e["name"].lower() for e in group_data.get("compound", []) + group_data.get("isolation", [])]
-                        if ex.name.lower() in all_names:
-                            matched_group = group_key
-                            break
+                # Map exercise category (or its name) to our muscle group keys
+                matched_group = selection.group_of(ex.name, ex.category)
 
                 if matched_group:
                     if matched_group not in muscle_group_last_trained or ts.date > muscle_group_last_trained[matched_group]:
@@ -591,6 +500,32 @@ def get_training_recommendations_logic(user_id: int = 1) -> str:
         return _json.dumps(result, indent=2)
 
 
+def generate_program_logic(
+    goal: str = "hypertrophy",
+    weeks: int = 8,
+    days_per_week: int = 4,
+    experience_level: str = "intermediate",
+    available_minutes: int = 60,
+    equipment: list = None,
+    user_id: int = 1,
+) -> str:
+    """Generate and save a multi-week program; returns its compact JSON summary."""
+    from backend import program_generator
+
+    with Session(engine) as session:
+        try:
+            user = session.get(User, user_id) or session.exec(select(User)).first()
+            if not user:
+                return _json.dumps({"error": "No users found in database."})
+            summary = program_generator.create_program(
+                session, user.id, goal, weeks, days_per_week, experience_level, available_minutes, equipment
+            )
+            return _json.dumps(summary)
+        except Exception as e:
+            logger.exception(f"Error generating program: {e}")
+            return _json.dumps({"error": f"Error generating program: {e}"})
+
+
 # --- FastMCP Server Setup ---
 if FastMCP:
     mcp = FastMCP("Fitness Coach")
@@ -617,6 +552,7 @@ if FastMCP:
         experience_level: str = "intermediate",
         available_minutes: int = 60,
         equipment: list = None,
+        user_id: int = None,
     ) -> str:
         """Design a workout plan using evidence-based programming strategies.
         
@@ -629,8 +565,9 @@ if FastMCP:
             experience_level: beginner, intermediate, or advanced
             available_minutes: How many minutes the user has (default 60)
             equipment: Available equipment list (e.g. ["barbell", "dumbbell", "cable", "machine"])
+            user_id: Prefer exercises this user already trains (optional).
         """
-        return design_workout_logic(goal, experience_level, available_minutes, equipment)
+        return design_workout_logic(goal, experience_level, available_minutes, equipment, user_id)
 
     @mcp.tool()
     def get_training_recommendations(user_id: int = 1) -> str:
@@ -644,7 +581,34 @@ if FastMCP:
         """
         return get_training_recommendations_logic(user_id)
 
+    @mcp.tool()
+    def generate_program(
+        goal: str = "hypertrophy",
+        weeks: int = 8,
+        days_per_week: int = 4,
+        experience_level: str = "intermediate",
+        available_minutes: int = 60,
+        equipment: list = None,
+        user_id: int = 1,
+    ) -> str:
+        """Generate a multi-week training program (mesocycle) and save all of its templates.
+
+        Builds a weekly split, a week-by-week progression and deload weeks in one call.
+        Returns a compact summary (split, progression, deload weeks, template ids) to explain.
+
+        Args:
+            goal: strength, hypertrophy or endurance
+            weeks: Program length, 2-12 weeks (default 8)
+            days_per_week: Training days per week, 2-6 (default 4)
+            experience_level: beginner, intermediate, or advanced
+            available_minutes: Minutes per session (default 60)
+            equipment: Available equipment list (e.g. ["barbell", "dumbbell"])
+            user_id: The ID of the user (default: 1).
+        """
+        return generate_program_logic(goal, weeks, days_per_week, experience_level, available_minutes,
+                                      equipment, user_id)
+
     if __name__ == "__main__":
         mcp.run()
 else:
-    print("FastMCP not installed. Logic functions available, but MCP server cannot run standalone.")
+    logger.info("FastMCP not installed. Logic functions available, but MCP server cannot run standalone.")
@@ -0,0 +1,259 @@
+"""On-disk LRU cache behind the /media exercise media proxy.
+
+Exercise rows store ``/media/<key>`` instead of a remote GIF/video URL
+(``local_url`` registers the mapping in ``MediaAsset``). The first request
+for a key downloads the asset once (concurrent requests wait for the same
+download) into ``MEDIA_CACHE_DIR``; later requests are served from disk.
+Files are evicted least-recently-used first once the directory exceeds
+``MEDIA_CACHE_MAX_BYTES``; the access time of each file is the LRU clock,
+so the order survives restarts. Poster thumbnails (first frame, JPEG) are
+generated on demand when Pillow is installed and live in the same cache.
+
+    MEDIA_CACHE_DIR         cache directory (default backend/data/media)
+    MEDIA_CACHE_MAX_BYTES   size cap for the directory (default 512 MB)
+    MEDIA_MAX_FILE_BYTES    largest single asset that will be downloaded (default 32 MB)
+    MEDIA_ACCEL_PREFIX      nginx internal location for X-Accel-Redirect, e.g. /media-cache/ (default off)
+    MEDIA_POSTER_SIZE       longest side of poster thumbnails in px (default 320)
+    MEDIA_ALLOWED_HOSTS     comma-separated hosts whose media is proxied
+"""
+import asyncio
+import hashlib
+import logging
+import os
+import re
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, Optional
+from urllib.parse import urlparse
+
+import httpx
+from sqlalchemy.dialects.sqlite import insert
+from sqlmodel import Session
+
+from backend import metrics
+from backend.models import MediaAsset
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "media")
+CACHE_DIR = os.environ.get("MEDIA_CACHE_DIR", DEFAULT_DIR)
+CACHE_MAX_BYTES = int(os.environ.get("MEDIA_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+MAX_FILE_BYTES = int(os.environ.get("MEDIA_MAX_FILE_BYTES", str(32 * 1024 * 1024)))
+ACCEL_PREFIX = os.environ.get("MEDIA_ACCEL_PREFIX", "")
+POSTER_SIZE = int(os.environ.get("MEDIA_POSTER_SIZE", "320"))
+ALLOWED_HOSTS = {
+    h.strip().lower() for h in os.environ.get(
+        "MEDIA_ALLOWED_HOSTS",
+        "v2.exercisedb.io,exercisedb.p.rapidapi.com,static.exercisedb.dev,raw.githubusercontent.com",
+    ).split(",") if h.strip()
+}
+FETCH_TIMEOUT_S = 20.0
+PREFIX = "/media/"
+KEY_PATTERN = re.compile(r"^[0-9a-f]{24}(\.[a-z0-9]{1,5})?$")
+POSTER_SUFFIX = ".poster.jpg"
+
+
+class MediaUnavailableError(Exception):
+    """The upstream asset could not be fetched (or is too large to cache)."""
+
+
+def media_key(url: str) -> str:
+    """Stable cache key for ``url``: a digest plus the original extension (for content types)."""
+    ext = os.path.splitext(urlparse(url).path)[1].lower()
+    if not re.fullmatch(r"\.[a-z0-9]{1,5}", ext):
+        ext = ""
+    return hashlib.sha256(url.encode()).hexdigest()[:24] + ext
+
+
+def local_url(db: Session, url: Optional[str]) -> Optional[str]:
+    """``/media/<key>`` for remote media on an allowed host (registering it), else ``url`` unchanged.
+
+    The caller commits; registration is idempotent.
+    """
+    if not url or url.startswith(PREFIX):
+        return url
+    parsed = urlparse(url)
+    if parsed.scheme not in ("http", "https") or (parsed.hostname or "").lower() not in ALLOWED_HOSTS:
+        return url
+    key = media_key(url)
+    db.exec(insert(MediaAsset).values(key=key, url=url).on_conflict_do_nothing())
+    return PREFIX + key
+
+
+async def _check_host(request: httpx.Request):
+    """Refuse any request (including redirect hops) that leaves ALLOWED_HOSTS."""
+    if request.url.scheme not in ("http", "https") or request.url.host.lower() not in ALLOWED_HOSTS:
+        raise MediaUnavailableError(f"refusing to fetch media from {request.url.host}")
+
+
+class MediaCache:
+    """Size-capped LRU of downloaded media files in one directory."""
+
+    def __init__(self, directory: str = CACHE_DIR, max_bytes: int = CACHE_MAX_BYTES,
+                 max_file_bytes: int = MAX_FILE_BYTES, transport: Optional[httpx.AsyncBaseTransport] = None):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_file_bytes = max_file_bytes
+        self.transport = transport
+        self._entries: "OrderedDict[str, int]" = OrderedDict()  # file name -> size, oldest first
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._loaded = False
+
+    @property
+    def total_bytes(self) -> int:
+        return sum(self._entries.values())
+
+    def path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def _load(self):
+        """Rebuild the LRU order from the directory (access time = last use)."""
+        if self._loaded:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        files = []
+        for entry in os.scandir(self.directory):
+            if not entry.is_file():
+                continue
+            if entry.name.endswith(".tmp"):
+                os.unlink(entry.path)  # interrupted download
+                continue
+            stat = entry.stat()
+            files.append((stat.st_atime, entry.name, stat.st_size))
+        for _, name, size in sorted(files):
+            self._entries[name] = size
+        self._loaded = True
+        self._evict()
+
+    def _touch(self, name: str):
+        self._entries.move_to_end(name)
+        path = self.path(name)
+        try:
+            os.utime(path, (time.time(), os.stat(path).st_mtime))  # keep mtime: it backs Last-Modified
+        except OSError:
+            pass
+
+    def _add(self, name: str, size: int):
+        self._entries[name] = size
+        self._entries.move_to_end(name)
+        self._evict(keep=name)
+
+    def _evict(self, keep: Optional[str] = None):
+        while self.total_bytes > self.max_bytes and len(self._entries) > (1 if keep else 0):
+            name = next(iter(self._entries))
+            if name == keep:
+                self._entries.move_to_end(name)
+                continue
+            self._entries.pop(name)
+            try:
+                os.unlink(self.path(name))
+            except FileNotFoundError:
+                pass
+            metrics.MEDIA_CACHE_EVICTIONS.inc()
+
+    def cached(self, name: str) -> Optional[str]:
+        """Path of a cached file (marking it recently used), or None."""
+        self._load()
+        if name in self._entries and os.path.exists(self.path(name)):
+            self._touch(name)
+            return self.path(name)
+        self._entries.pop(name, None)
+        return None
+
+    async def get(self, db: Session, asset: MediaAsset) -> str:
+        """Path of ``asset`` on disk, downloading it first if needed (once for concurrent callers)."""
+        path = self.cached(asset.key)
+        if path:
+            metrics.MEDIA_CACHE_REQUESTS.inc(outcome="hit")
+            return path
+        lock = self._locks.setdefault(asset.key, asyncio.Lock())
+        try:
+            async with lock:
+                path = self.cached(asset.key)  # another request may have fetched it meanwhile
+                if path:
+                    metrics.MEDIA_CACHE_REQUESTS.inc(outcome="hit")
+                    return path
+                try:
+                    path = await self._download(db, asset)
+                except MediaUnavailableError:
+                    metrics.MEDIA_CACHE_REQUESTS.inc(outcome="error")
+                    raise
+                metrics.MEDIA_CACHE_REQUESTS.inc(outcome="miss")
+                return path
+        finally:
+            if not lock.locked():
+                self._locks.pop(asset.key, None)
+
+    async def _download(self, db: Session, asset: MediaAsset) -> str:
+        started = time.perf_counter()
+        final = self.path(asset.key)
+        tmp = final + ".tmp"
+        digest = hashlib.sha256()
+        size = 0
+        try:
+            async with httpx.AsyncClient(timeout=FETCH_TIMEOUT_S, transport=self.transport,
+                                         follow_redirects=True,
+                                         event_hooks={"request": [_check_host]}) as client:
+                async with client.stream("GET", asset.url) as response:
+                    if response.status_code != 200:
+                        raise MediaUnavailableError(f"upstream returned {response.status_code}")
+                    content_type = response.headers.get("content-type", "application/octet-stream")
+                    with open(tmp, "wb") as f:
+                        async for chunk in response.aiter_bytes():
+                            size += len(chunk)
+                            if size > self.max_file_bytes:
+                                raise MediaUnavailableError(f"asset exceeds {self.max_file_bytes} bytes")
+                            digest.update(chunk)
+                            f.write(chunk)
+            os.replace(tmp, final)
+        except httpx.HTTPError as e:
+            raise MediaUnavailableError(str(e)) from e
+        finally:
+            if os.path.exists(tmp):
+                os.unlink(tmp)
+
+        asset.content_type = content_type.split(";")[0].strip()
+        asset.etag = digest.hexdigest()[:32]
+        asset.size = size
+        asset.fetched_at = datetime.utcnow()
+        db.add(asset)
+        db.commit()
+        self._add(asset.key, size)
+        logger.info(f"[media] Cached {asset.url} ({size} bytes) in {(time.perf_counter() - started) * 1000:.0f}ms")
+        return final
+
+    async def poster(self, db: Session, asset: MediaAsset) -> Optional[str]:
+        """Path of a JPEG thumbnail of the asset's first frame; None without Pillow or for non-images."""
+        if Image is None:
+            return None
+        name = asset.key + POSTER_SUFFIX
+        path = self.cached(name)
+        if path:
+            return path
+        source = await self.get(db, asset)
+        try:
+            size = await asyncio.to_thread(_render_poster, source, self.path(name))
+        except OSError as e:  # not an image Pillow can read (e.g. a video)
+            logger.info(f"[media] No poster for {asset.key}: {e}")
+            return None
+        self._add(name, size)
+        return self.path(name)
+
+
+def _render_poster(source: str, target: str) -> int:
+    with Image.open(source) as img:
+        img.seek(0)
+        frame = img.convert("RGB")
+        frame.thumbnail((POSTER_SIZE, POSTER_SIZE))
+        frame.save(target + ".tmp", "JPEG", quality=80, optimize=True)
+    os.replace(target + ".tmp", target)
+    return os.path.getsize(target)
+
+
+cache = MediaCache()
@@ -0,0 +1,278 @@
+"""Minimal in-process metrics with Prometheus text exposition.
+
+Counters and histograms are keyed by label values and rendered by
+``render()`` for the ``/metrics`` endpoint. Kept dependency-free so the Pi
+image doesn't need prometheus_client.
+"""
+import asyncio
+import math
+import threading
+import time
+from typing import Dict, Iterable, List, Tuple
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 20, 30, 60, 90)
+FAST_LATENCY_BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 5)
+THROUGHPUT_BUCKETS = (1, 2, 5, 10, 20, 35, 50, 75, 100, 150, 250)
+COUNT_BUCKETS = (1, 2, 3, 4, 5, 6, 8, 10)
+FRAME_BUCKETS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+_lock = threading.Lock()
+_registry: List["_Metric"] = []
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Iterable[str], values: Iterable[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help_text: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        with _lock:
+            _registry.append(self)
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(n, "")) for n in self.labelnames)
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name, help_text, labelnames=()):
+        super().__init__(name, help_text, labelnames)
+        self.values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with _lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def get(self, **labels) -> float:
+        return self.values.get(self._key(labels), 0)
+
+    def render(self):
+        lines = super().render()
+        for key, value in sorted(self.values.items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        # key -> [bucket counts..., sum, count]
+        self.values: Dict[Tuple[str, ...], List[float]] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with _lock:
+            state = self.values.get(key)
+            if state is None:
+                state = self.values[key] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[i] += 1
+            state[-2] += value
+            state[-1] += 1
+
+    def count(self, **labels) -> int:
+        state = self.values.get(self._key(labels))
+        return int(state[-1]) if state else 0
+
+    def render(self):
+        lines = super().render()
+        for key, state in sorted(self.values.items()):
+            for i, bound in enumerate(self.buckets):
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {int(state[i])}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(state[-2])}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {int(state[-1])}")
+        return lines
+
+
+def render() -> str:
+    with _lock:
+        metrics = list(_registry)
+    lines = []
+    for metric in metrics:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# --- LLM metrics (recorded by the provider router and the local Ollama stream) ---
+
+LLM_TTFT = Histogram(
+    "llm_time_to_first_token_seconds", "Time from request to first streamed token.",
+    ("provider", "model"),
+)
+LLM_DURATION = Histogram(
+    "llm_request_duration_seconds", "Total duration of a streamed LLM response.",
+    ("provider", "model"),
+)
+LLM_THROUGHPUT = Histogram(
+    "llm_generation_tokens_per_second", "Completion tokens per second after the first token.",
+    ("provider", "model"), buckets=THROUGHPUT_BUCKETS,
+)
+LLM_REQUESTS = Counter(
+    "llm_requests_total", "LLM requests by outcome (success, error, hedge_cancelled, cancelled).",
+    ("provider", "model", "outcome"),
+)
+LLM_TOKENS = Counter(
+    "llm_tokens_total", "Prompt and completion tokens (provider-reported, else estimated).",
+    ("provider", "model", "kind"),
+)
+LLM_COST = Counter(
+    "llm_cost_usd_total", "Provider-reported cost in USD.",
+    ("provider", "model"),
+)
+
+# --- Coach pipeline metrics ---
+
+COACH_ITERATIONS = Histogram(
+    "coach_chat_iterations", "LLM round trips per web chat request.",
+    ("source",), buckets=COUNT_BUCKETS,
+)
+COACH_AUTOCORRECTIONS = Counter(
+    "coach_autocorrections_total", "Missing create_workout_template retries (must_create).",
+    ("provider", "model"),
+)
+COACH_TOOL_DURATION = Histogram(
+    "coach_tool_duration_seconds", "MCP tool execution latency.",
+    ("tool",),
+)
+COACH_TOOL_CALLS = Counter(
+    "coach_tool_calls_total", "MCP tool calls by outcome.",
+    ("tool", "outcome"),
+)
+COACH_SPECULATIVE_TOOLS = Counter(
+    "coach_speculative_tool_calls_total", "Read-only tools started mid-stream (used, discarded).",
+    ("tool", "outcome"),
+)
+SSE_FRAMES = Histogram(
+    "sse_frames_per_response", "SSE data frames written per streamed response.",
+    ("source",), buckets=FRAME_BUCKETS,
+)
+SSE_EVENTS = Histogram(
+    "sse_events_per_response", "Events produced per streamed response before coalescing.",
+    ("source",), buckets=FRAME_BUCKETS,
+)
+COACH_CANCELLED = Counter(
+    "coach_cancelled_generations_total", "Chat generations aborted because the client disconnected.",
+    ("source",),
+)
+COACH_STREAM_RESUMES = Counter(
+    "coach_stream_resumes_total", "Reconnects to a buffered chat stream (resumed, gone, unknown).",
+    ("outcome",),
+)
+STREAM_EVICTIONS = Counter(
+    "coach_stream_buffer_evictions_total", "Replay buffers dropped to stay under the memory cap.",
+)
+COACH_CONTEXT_SESSIONS = Histogram(
+    "coach_context_sessions", "Training sessions attached to a chat prompt (manual, auto).",
+    ("mode",), buckets=COUNT_BUCKETS,
+)
+COACH_FAST_PATH = Counter(
+    "coach_workout_fast_path_total", "Create-workout requests served by the server-side pipeline (used, fallback).",
+    ("outcome",),
+)
+COACH_OFFLINE = Counter(
+    "coach_offline_answers_total", "Chat answers served by the rule-based fallback.",
+    ("intent", "reason"),
+)
+COACH_OFFLINE_DURATION = Histogram(
+    "coach_offline_answer_seconds", "Time to build a rule-based fallback answer.",
+    (), buckets=FAST_LATENCY_BUCKETS,
+)
+COACH_MOTIVATE = Counter(
+    "coach_motivate_total", "Motivational quotes served by source (pool, fallback).",
+    ("source",),
+)
+COACH_MOTIVATE_DURATION = Histogram(
+    "coach_motivate_duration_seconds", "Time to serve /coach/motivate.",
+    (), buckets=FAST_LATENCY_BUCKETS,
+)
+EXERCISE_RESOLUTIONS = Counter(
+    "exercise_name_resolutions_total", "Exercise names resolved by the resolver (exact, alias, fuzzy, none).",
+    ("match",),
+)
+TEMPLATE_ROWS_WRITTEN = Counter(
+    "template_rows_written_total", "Template exercise/set rows written, by table and operation (insert, update, delete).",
+    ("table", "op"),
+)
+MEDIA_CACHE_REQUESTS = Counter(
+    "media_cache_requests_total", "Exercise media requests by cache outcome (hit, miss, error).",
+    ("outcome",),
+)
+MEDIA_CACHE_EVICTIONS = Counter(
+    "media_cache_evictions_total", "Media files removed from the on-disk cache to stay under its size cap.",
+)
+CATALOG_LOOKUPS = Counter(
+    "exercise_catalog_lookups_total", "Exercise catalog lookups by where they were answered (local, cached, live, error).",
+    ("source",),
+)
+EXPORT_ROWS = Counter(
+    "history_export_rows_total", "Records streamed by the history export, by kind and format.",
+    ("kind", "format"),
+)
+HISTORY_IMPORT_SETS = Counter(
+    "history_import_sets_total", "Set rows handled by the history import (imported, skipped).",
+    ("outcome",),
+)
+
+
+def record_llm_stream(provider: str, model: str, started: float, first_token_at, finished: float,
+                      completion_tokens: int, prompt_tokens: int = 0, cost: float = 0.0):
+    """Record one completed LLM stream."""
+    if first_token_at is not None:
+        LLM_TTFT.observe(first_token_at - started, provider=provider, model=model)
+        generation_time = finished - first_token_at
+        if completion_tokens > 1 and generation_time > 0:
+            LLM_THROUGHPUT.observe(completion_tokens / generation_time, provider=provider, model=model)
+    LLM_DURATION.observe(finished - started, provider=provider, model=model)
+    LLM_REQUESTS.inc(provider=provider, model=model, outcome="success")
+    if completion_tokens:
+        LLM_TOKENS.inc(completion_tokens, provider=provider, model=model, kind="completion")
+    if prompt_tokens:
+        LLM_TOKENS.inc(prompt_tokens, provider=provider, model=model, kind="prompt")
+    if cost:
+        LLM_COST.inc(cost, provider=provider, model=model)
+
+
+# --- Process health ---
+
+EVENT_LOOP_LAG = Histogram(
+    "event_loop_lag_seconds", "Delay of a periodic asyncio wake-up beyond its schedule.",
+    (), buckets=FAST_LATENCY_BUCKETS,
+)
+
+
+async def monitor_event_loop_lag(interval: float = 0.25):
+    """Background task: measure how late the loop runs a sleeping coroutine."""
+    while True:
+        scheduled = time.monotonic() + interval
+        await asyncio.sleep(interval)
+        EVENT_LOOP_LAG.observe(max(0.0, time.monotonic() - scheduled))
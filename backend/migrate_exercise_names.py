@@ -0,0 +1,25 @@
+from sqlmodel import Session, text
+from backend.database import engine
+from backend.exercise_resolver import normalize_exercise_name
+
+def migrate_db():
+    """Add and backfill the indexed exercise.normalized_name column (safe to run repeatedly)."""
+    with Session(engine) as session:
+        columns = [row[1] for row in session.exec(text("PRAGMA table_info(exercise)")).all()]
+        if not columns:
+            return  # fresh database: create_all builds the column and index
+        if "normalized_name" not in columns:
+            session.exec(text("ALTER TABLE exercise ADD COLUMN normalized_name VARCHAR"))
+            print("Added normalized_name column.")
+        session.exec(text("CREATE INDEX IF NOT EXISTS ix_exercise_normalized_name ON exercise (normalized_name)"))
+        rows = session.exec(text("SELECT id, name FROM exercise WHERE normalized_name IS NULL")).all()
+        if rows:
+            session.execute(
+                text("UPDATE exercise SET normalized_name = :normalized WHERE id = :id"),
+                [{"id": row[0], "normalized": normalize_exercise_name(row[1])} for row in rows],
+            )
+            print(f"Backfilled normalized_name for {len(rows)} exercises.")
+        session.commit()
+
+if __name__ == "__main__":
+    migrate_db()
@@ -0,0 +1,18 @@
+from sqlmodel import Session, select
+from backend.database import engine
+from backend.exercise_targets import rebuild_targets
+from backend.models import ExerciseTarget, TrainingSession
+
+def migrate_db():
+    """Build next-session targets for users with sessions logged before targets existed (safe to run repeatedly)."""
+    with Session(engine) as session:
+        if session.exec(select(ExerciseTarget.id)).first() is not None:
+            return
+        user_ids = session.exec(select(TrainingSession.user_id).distinct()).all()
+        for user_id in user_ids:
+            rebuild_targets(session, user_id)
+        if user_ids:
+            print(f"Built exercise targets for {len(user_ids)} users.")
+
+if __name__ == "__main__":
+    migrate_db()
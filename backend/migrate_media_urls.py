@@ -0,0 +1,22 @@
+from sqlmodel import Session, select
+from backend.database import engine, create_db_and_tables
+from backend.media_cache import local_url
+from backend.models import Exercise
+
+def migrate_db():
+    """Point existing exercises' remote GIF/video links at the local /media proxy."""
+    create_db_and_tables()
+    with Session(engine) as session:
+        exercises = session.exec(select(Exercise).where(Exercise.video_url != None)).all()
+        changed = 0
+        for exercise in exercises:
+            url = local_url(session, exercise.video_url)
+            if url != exercise.video_url:
+                exercise.video_url = url
+                session.add(exercise)
+                changed += 1
+        session.commit()
+        print(f"Rewrote {changed} of {len(exercises)} exercise media links.")
+
+if __name__ == "__main__":
+    migrate_db()
@@ -1,5 +1,6 @@
 from typing import Optional, List
 from datetime import datetime
+from sqlalchemy import UniqueConstraint
 from sqlmodel import Field, Relationship, SQLModel
 
 # Shared properties
@@ -54,6 +55,8 @@ class ExerciseBase(SQLModel):
 class Exercise(ExerciseBase, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
     user_id: Optional[int] = Field(default=None, foreign_key="user.id")
+    # Set from name on every write, see backend/exercise_resolver.py
+    normalized_name: Optional[str] = Field(default=None, index=True)
     
     user: Optional[User] = Relationship(back_populates="exercises")
     session_exercises: List["SessionExercise"] = Relationship(back_populates="exercise")
@@ -96,6 +99,21 @@ class TrainingSet(TrainingSetBase, table=True):
     
     session_exercise: SessionExercise = Relationship(back_populates="sets")
 
+# --- Training Targets ---
+
+class ExerciseTarget(SQLModel, table=True):
+    """Per-user, per-exercise next-session targets, updated as sessions are logged."""
+    __table_args__ = (UniqueConstraint("user_id", "exercise_id"),)
+    id: Optional[int] = Field(default=None, primary_key=True)
+    user_id: int = Field(foreign_key="user.id", index=True)
+    exercise_id: int = Field(foreign_key="exercise.id", index=True)
+    e1rm: float = 0
+    last_date: datetime
+    last_sets: str = "[]"  # JSON [[weight, reps], ...]: working sets of the last session
+    suggested_weight: float = 0
+    suggested_reps: int = 0
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+
 # --- Workout Template Models ---
 
 class WorkoutTemplate(SQLModel, table=True):
@@ -127,6 +145,83 @@ class TemplateSet(SQLModel, table=True):
     
     template_exercise: TemplateExercise = Relationship(back_populates="sets")
 
+# --- Coach Conversation Models ---
+
+class Conversation(SQLModel, table=True):
+    id: Optional[int] = Field(default=None, primary_key=True)
+    user_id: int = Field(foreign_key="user.id", index=True)
+    title: str = "New conversation"
+    # Older turns are folded into this summary so prompts stay bounded
+    summary: Optional[str] = None
+    summary_through_id: int = 0
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+
+    messages: List["ConversationMessage"] = Relationship(back_populates="conversation", sa_relationship_kwargs={"cascade": "all, delete", "order_by": "ConversationMessage.id"})
+
+class ConversationMessage(SQLModel, table=True):
+    id: Optional[int] = Field(default=None, primary_key=True)
+    conversation_id: int = Field(foreign_key="conversation.id", index=True)
+    role: str  # "user" or "assistant"
+    content: str
+    thinking: Optional[str] = None
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+
+    conversation: Conversation = Relationship(back_populates="messages")
+
+class MotivationQuote(SQLModel, table=True):
+    """Pre-generated post-workout quote waiting in a user's pool."""
+    id: Optional[int] = Field(default=None, primary_key=True)
+    user_id: int = Field(foreign_key="user.id", index=True)
+    text: str
+    # Set when the quote references a specific template
+    template_name: Optional[str] = None
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+
+class AthleteProfile(SQLModel, table=True):
+    """Running per-user training aggregates behind the coach's profile digest."""
+    id: Optional[int] = Field(default=None, primary_key=True)
+    user_id: int = Field(foreign_key="user.id", unique=True, index=True)
+    # JSON aggregates maintained by backend/athlete_profile.py
+    data: str = "{}"
+    sessions_count: int = 0
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+
+# --- Exercise Catalog (local ExerciseDB mirror) ---
+
+class CatalogExercise(SQLModel, table=True):
+    """Exercise reference data imported from an ExerciseDB-style dump or live lookups."""
+    id: str = Field(primary_key=True)
+    name: str = Field(index=True)
+    body_part: str = Field(default="", index=True)
+    target: str = ""
+    equipment: str = ""
+    category: str = ""
+    level: str = ""
+    mechanic: str = ""
+    secondary_muscles: str = ""  # comma-separated
+    instructions: str = ""
+    media_url: Optional[str] = None
+    source: str = "dump"  # "dump" or "exercisedb" (live lookup)
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+
+class CatalogLookup(SQLModel, table=True):
+    """Live ExerciseDB queries already merged into the catalog, for the read-through TTL."""
+    query: str = Field(primary_key=True)
+    fetched_at: datetime = Field(default_factory=datetime.utcnow)
+    hits: int = 0
+
+# --- Media Proxy ---
+
+class MediaAsset(SQLModel, table=True):
+    """Remote exercise media (GIFs, images, videos) served locally under /media/{key}."""
+    key: str = Field(primary_key=True)  # sha256(url)[:24] + file extension
+    url: str
+    content_type: Optional[str] = None
+    etag: Optional[str] = None  # sha256 of the last downloaded content
+    size: int = 0
+    fetched_at: Optional[datetime] = None
+
 # --- Pydantic Schemas for API ---
 
 class UserCreate(UserBase):
@@ -188,11 +283,23 @@ class TemplateExerciseCreate(SQLModel):
     exercise_id: int
     sets: List[TemplateSetCreate]
 
+class TargetSet(SQLModel):
+    weight: float
+    reps: int
+
+class ExerciseTargetRead(SQLModel):
+    e1rm: float
+    last_date: datetime
+    last_sets: List[TargetSet]
+    suggested_weight: float
+    suggested_reps: int
+
 class TemplateExerciseRead(SQLModel):
     id: int
     exercise: ExerciseRead
     order: int
     sets: List[TemplateSetRead]
+    target: Optional[ExerciseTargetRead] = None  # next-session suggestion from the user's history
 
 class WorkoutTemplateCreate(SQLModel):
     name: str
@@ -205,3 +312,22 @@ class WorkoutTemplateRead(SQLModel):
     updated_at: datetime
     exercises: List[TemplateExerciseRead]
 
+
+# --- Conversation Schemas ---
+
+class ConversationMessageRead(SQLModel):
+    id: int
+    role: str
+    content: str
+    thinking: Optional[str] = None
+    created_at: datetime
+
+class ConversationRead(SQLModel):
+    id: int
+    title: str
+    created_at: datetime
+    updated_at: datetime
+
+class ConversationDetail(ConversationRead):
+    summary: Optional[str] = None
+    messages: List[ConversationMessageRead]
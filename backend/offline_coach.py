@@ -0,0 +1,174 @@
+"""Rule-based coach answers for when no LLM answers in time.
+
+``with_deadline`` wraps a chat token stream: if no token arrives within the
+request's latency budget, or the router reports every provider unavailable
+before anything was said, the upstream stream is cancelled and an
+``OfflineAnswer`` is produced instead. Once a tool call has saved a template
+the budget no longer applies, since cancelling would leave the user with an
+answer that does not mention the write. ``offline_answer`` builds that answer
+in milliseconds from the deterministic pieces in mcp_server.py (training
+recommendations, ``design_workout_logic`` and ``SET_REP_SCHEMES``) for the
+common intents: design a workout, what to train today, am I stagnating.
+
+    COACH_LATENCY_BUDGET_S  seconds to wait for the first token (default 25, 0 = off)
+"""
+import asyncio
+import json
+import os
+import re
+import time
+from dataclasses import dataclass
+from typing import AsyncIterator, Callable, List, Optional, Sequence, Tuple, Union
+
+from backend.llm_router import LLMUnavailableError
+from backend.workout_pipeline import WorkoutIntent, classify_workout_request
+
+LATENCY_BUDGET_S = float(os.environ.get("COACH_LATENCY_BUDGET_S", "25"))
+
+TODAY = re.compile(r"\b(today|tonight|tomorrow|next (?:session|workout)|what should i (?:train|do)|which muscles?)\b", re.IGNORECASE)
+STAGNATION = re.compile(r"\b(stagnat\w*|plateau\w*|stuck|stall\w*|not (?:improving|progressing)|progress\w*)\b", re.IGNORECASE)
+DESIGN = re.compile(r"\b(workout|routine|plan|program|template|split)\b", re.IGNORECASE)
+
+OFFLINE_NOTICE = ("⚡ *Offline coach: the AI model didn't respond in time, so this answer comes "
+                  "from built-in training rules. Ask again later for a personalised reply.*\n\n")
+
+
+@dataclass
+class OfflineAnswer:
+    text: str
+    intent: str
+    reason: str  # "deadline" or "unavailable"
+
+
+def classify_offline_intent(question: str) -> str:
+    if STAGNATION.search(question):
+        return "stagnation"
+    if TODAY.search(question):
+        return "today"
+    if classify_workout_request(question) is not None or DESIGN.search(question):
+        return "design"
+    return "general"
+
+
+def _format_plan(plan: dict) -> str:
+    notes = plan["programming_notes"]
+    lines = [f"### {plan['name']}",
+             f"*{notes['scheme']} · ~{notes['estimated_duration_min']} min*", ""]
+    for exercise in plan["exercises"]:
+        lines.append(f"- **{exercise['name']}** ({exercise['category']}): "
+                     f"{len(exercise['sets'])} × {exercise['sets'][0]['goal_reps']}")
+    lines.append("")
+    lines.extend(f"- {p}" for p in notes["principles"])
+    return "\n".join(lines)
+
+
+def offline_answer(question: str, user_id: int, saved_templates: Sequence[str] = ()) -> tuple:
+    """(intent, markdown) for ``question`` using only local rules and the user's history.
+
+    ``saved_templates`` names templates the interrupted answer already saved.
+    """
+    from backend.mcp_server import (
+        SET_REP_SCHEMES, design_workout_logic, get_training_recommendations_logic,
+    )
+
+    intent = classify_offline_intent(question)
+    recs = json.loads(get_training_recommendations_logic(user_id=user_id))
+    focus = recs.get("suggested_focus", "full_body_hypertrophy")
+    parts = []
+
+    if intent == "stagnation":
+        stagnating = recs.get("stagnating_exercises", [])
+        if stagnating:
+            parts.append("**Lifts that have stalled** (same weight and reps for 3 sessions):")
+            parts.extend(f"- {s['exercise']}: stuck at {s['stuck_at']}. {s['suggestion']}" for s in stagnating)
+        else:
+            parts.append("No stalled lifts in your last sessions: weights or reps are still moving.")
+        strength = SET_REP_SCHEMES["strength"]["intermediate"]
+        hypertrophy = SET_REP_SCHEMES["hypertrophy"]["intermediate"]
+        parts.append(
+            "\n**Breaking a plateau:**\n"
+            "- Add 2.5 kg once every set hits its target reps; otherwise add a rep per set first\n"
+            f"- Rotate rep ranges for 3-4 weeks: a strength block ({strength['sets']}×{strength['reps']} @ RPE {strength['rpe_range']}) "
+            f"after a hypertrophy block ({hypertrophy['sets']}×{hypertrophy['reps']} @ RPE {hypertrophy['rpe_range']})\n"
+            "- Take a deload week (about half the volume) if several lifts stall at once"
+        )
+    elif intent == "today":
+        parts.append(f"**Recovery:** {recs.get('recovery_status', '')}")
+        neglected = recs.get("neglected_muscle_groups", [])
+        if neglected:
+            parts.append(f"**Not trained for 5+ days:** {', '.join(neglected)}")
+        plan = json.loads(design_workout_logic(**WorkoutIntent().design_args(focus), user_id=user_id))
+        parts.append(f"\n**Suggested session:**\n\n{_format_plan(plan)}")
+    elif intent == "design" and saved_templates:
+        parts.append("The workout was designed and saved before the AI model stopped responding; "
+                     "open it from your templates.")
+    elif intent == "design":
+        workout = classify_workout_request(question) or WorkoutIntent()
+        plan = json.loads(design_workout_logic(**workout.design_args(focus), user_id=user_id))
+        parts.append(_format_plan(plan))
+        parts.append("\n*Not saved as a template yet; ask again once the coach is back online to save it.*")
+    else:
+        parts.append(f"**Recovery:** {recs.get('recovery_status', '')}")
+        parts.append(f"**Suggested focus:** {focus.replace('_', ' ')}")
+        parts.append("\nI can answer workout design, what to train today and plateau questions offline; "
+                     "anything else needs the AI model.")
+
+    if saved_templates:
+        parts.append(f"\n✨ **Saved as a template:** {', '.join(saved_templates)}")
+    return intent, "\n".join(parts)
+
+
+async def with_deadline(tokens: AsyncIterator[str], question: str, user_id: int,
+                        budget: Optional[float] = None, saved_templates: Optional[List[str]] = None,
+                        fallback: Optional[Callable[[], Tuple[str, str]]] = None,
+                        ) -> AsyncIterator[Union[str, OfflineAnswer]]:
+    """Pass ``tokens`` through, or switch to an offline answer if the first one is too slow.
+
+    ``saved_templates`` is the list the upstream tool loop appends to; once it
+    is non-empty the deadline is lifted and the upstream answer is awaited.
+    ``fallback`` returns the (intent, markdown) to use instead of
+    ``offline_answer``; ``budget`` defaults to ``LATENCY_BUDGET_S``.
+    """
+    from backend import metrics
+
+    budget = LATENCY_BUDGET_S if budget is None else budget
+    saved = saved_templates if saved_templates is not None else []
+    iterator = tokens.__aiter__()
+    deadline = time.monotonic() + budget if budget > 0 else None
+    reason = None
+    while True:
+        step = asyncio.ensure_future(iterator.__anext__())
+        try:
+            while deadline is not None and not step.done():
+                await asyncio.wait({step}, timeout=max(0.0, deadline - time.monotonic()))
+                if step.done():
+                    break
+                if saved:
+                    deadline = None  # a template was written: let the answer finish and report it
+                elif time.monotonic() >= deadline:
+                    reason = "deadline"
+                    break
+            if reason is None:
+                token = await step
+        except StopAsyncIteration:
+            return
+        except LLMUnavailableError:
+            reason = "unavailable"
+        finally:
+            if not step.done():
+                # Cancelling the pending __anext__ closes the upstream LLM request
+                step.cancel()
+                await asyncio.wait({step})
+        if reason is not None:
+            break
+        deadline = None  # the answer has started; later tokens may take as long as they need
+        yield token
+
+    started = time.perf_counter()
+    if fallback is not None:
+        intent, text = fallback()
+    else:
+        intent, text = await asyncio.to_thread(offline_answer, question, user_id, list(saved))
+    metrics.COACH_OFFLINE.inc(intent=intent, reason=reason)
+    metrics.COACH_OFFLINE_DURATION.observe(time.perf_counter() - started)
+    yield OfflineAnswer(OFFLINE_NOTICE + text, intent, reason)
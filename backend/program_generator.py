@@ -0,0 +1,196 @@
+"""Multi-week training programs (mesocycles) built on ``design_workout_logic``.
+
+A program is a weekly split of training days, each designed once with
+``design_workout_logic`` (so equipment, experience and the user's exercise
+history apply), then repeated over the weeks with a progression:
+
+- the weeks are cut into blocks of about ``DELOAD_EVERY`` weeks, each
+  ending in a deload week (about half the sets, lighter loads, RPE 6);
+- strength days drop a rep and add load each week of a block, hypertrophy
+  days add a set (up to two), endurance days add reps; the target RPE
+  climbs through the block;
+- when a day repeats in a week (upper/lower twice, PPL twice), the second
+  one switches between strength and hypertrophy for some variation;
+- goal weights start from the athlete profile's working weights (0 when
+  unknown) and rise ``LOAD_STEP`` per loading week and per block.
+
+``create_program`` writes every template of the program with one
+``write_templates`` call and returns a compact summary (split, weekly
+scheme, deload weeks, template ids) for the coach to explain instead of
+every set of every template.
+"""
+import json
+import logging
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+from sqlmodel import Session
+
+from backend.athlete_profile import working_weights
+from backend.exercise_resolver import normalize_exercise_name
+from backend.template_writer import ExerciseSpec, SetSpec, write_templates
+
+logger = logging.getLogger(__name__)
+
+MIN_WEEKS, MAX_WEEKS = 2, 12
+MIN_DAYS, MAX_DAYS = 2, 6
+DELOAD_EVERY = 4
+LOAD_STEP = 0.025        # load increase per loading week (and per block)
+DELOAD_LOAD = 0.9        # share of the working weight in deload weeks
+MAX_EXTRA_SETS = 2
+PLATE_STEP = 2.5
+
+# Days per week -> (label, design_workout focus) per training day
+SPLITS = {
+    2: [("Full Body", "full_body"), ("Full Body", "full_body")],
+    3: [("Push", "push"), ("Pull", "pull"), ("Legs", "legs")],
+    4: [("Upper", "upper_body"), ("Lower", "lower_body"), ("Upper", "upper_body"), ("Lower", "lower_body")],
+    5: [("Push", "push"), ("Pull", "pull"), ("Legs", "legs"), ("Upper", "upper_body"), ("Lower", "lower_body")],
+    6: [("Push", "push"), ("Pull", "pull"), ("Legs", "legs")] * 2,
+}
+OTHER_STYLE = {"strength": "hypertrophy", "hypertrophy": "strength", "endurance": "endurance"}
+
+
+@dataclass
+class Day:
+    label: str
+    style: str
+    exercises: List[dict]  # design_workout exercises: name, category, sets
+    sets: int
+    reps: int
+    rpe_low: int
+
+
+@dataclass
+class Week:
+    number: int
+    deload: bool
+    step: int   # week within the block (0-based)
+    block: int
+
+
+@dataclass
+class Program:
+    name: str
+    goal: str
+    style: str
+    days: List[Day]
+    weeks: List[Week]
+    templates: List[Tuple[str, List[ExerciseSpec]]] = field(default_factory=list)
+
+
+def plan_weeks(weeks: int) -> List[Week]:
+    """Blocks of about DELOAD_EVERY weeks (sizes differ by at most one), each ending in a deload."""
+    blocks = max(1, round(weeks / DELOAD_EVERY))
+    sizes = [weeks // blocks + (1 if i < weeks % blocks else 0) for i in range(blocks)]
+    planned, number = [], 1
+    for block, size in enumerate(sizes):
+        for step in range(size):
+            planned.append(Week(number, step == size - 1, step, block))
+            number += 1
+    return planned
+
+
+def _round_weight(weight: float) -> float:
+    return round(weight / PLATE_STEP) * PLATE_STEP
+
+
+def week_scheme(day: Day, week: Week) -> Tuple[int, int, str, float]:
+    """(sets, reps, RPE, load factor) of ``day`` in ``week``."""
+    if week.deload:
+        return max(1, round(day.sets / 2)), day.reps, "6", DELOAD_LOAD
+    step = week.step
+    sets, reps = day.sets, day.reps
+    if day.style == "strength":
+        reps = max(2, reps - step)
+    elif day.style == "hypertrophy":
+        sets += min(step, MAX_EXTRA_SETS)
+    else:
+        reps += 2 * step
+    rpe = str(min(10, day.rpe_low + step))
+    return sets, reps, rpe, 1 + LOAD_STEP * (step + week.block)
+
+
+def plan_program(goal: str = "hypertrophy", weeks: int = 8, days_per_week: int = 4,
+                 experience_level: str = "intermediate", available_minutes: int = 60,
+                 equipment: Optional[list] = None, user_id: Optional[int] = None,
+                 weights: Optional[Dict[str, float]] = None, name: Optional[str] = None) -> Program:
+    """Design the split and expand it into one template per training day and week."""
+    from backend.mcp_server import SET_REP_SCHEMES, _detect_training_style, design_workout_logic
+    from backend.workout_pipeline import goal_for
+
+    weeks = min(MAX_WEEKS, max(MIN_WEEKS, int(weeks)))
+    days_per_week = min(MAX_DAYS, max(MIN_DAYS, int(days_per_week)))
+    style = _detect_training_style(goal)
+    level = experience_level if experience_level in SET_REP_SCHEMES[style] else "intermediate"
+    weights = weights or {}
+
+    days, designed, seen = [], {}, {}
+    for label, focus in SPLITS[days_per_week]:
+        occurrence = seen[label] = seen.get(label, 0) + 1
+        day_style = style if occurrence == 1 else OTHER_STYLE[style]
+        if (focus, day_style) not in designed:
+            plan = json.loads(design_workout_logic(goal_for(focus, day_style, focus), level, available_minutes,
+                                                   equipment, user_id))
+            designed[(focus, day_style)] = plan["exercises"]
+        scheme = SET_REP_SCHEMES[day_style][level]
+        suffix = f" {'AB'[occurrence - 1]}" if SPLITS[days_per_week].count((label, focus)) > 1 else ""
+        days.append(Day(f"{label}{suffix}", day_style, designed[(focus, day_style)], scheme["sets"],
+                        scheme["reps"], int(scheme["rpe_range"].split("-")[0])))
+
+    name = name or f"{style.title()} Mesocycle"
+    program = Program(name, goal, style, days, plan_weeks(weeks))
+    for week in program.weeks:
+        for number, day in enumerate(days, 1):
+            sets, reps, _, load = week_scheme(day, week)
+            specs = [
+                ExerciseSpec(
+                    name=ex["name"], category=ex["category"],
+                    sets=[SetSpec(goal_weight=_round_weight(weights.get(normalize_exercise_name(ex["name"]), 0) * load),
+                                  goal_reps=reps) for _ in range(sets)],
+                )
+                for ex in day.exercises
+            ]
+            title = f"{name} · W{week.number} D{number} {day.label}" + (" (Deload)" if week.deload else "")
+            program.templates.append((title, specs))
+    return program
+
+
+def summarize(program: Program, template_ids: List[int]) -> dict:
+    """Compact description of a written program for the coach to explain."""
+    return {
+        "name": program.name,
+        "goal": program.goal,
+        "style": program.style,
+        "weeks": len(program.weeks),
+        "days_per_week": len(program.days),
+        "deload_weeks": [w.number for w in program.weeks if w.deload],
+        "split": [
+            {"day": number, "label": day.label, "style": day.style,
+             "exercises": [ex["name"] for ex in day.exercises]}
+            for number, day in enumerate(program.days, 1)
+        ],
+        "progression": [
+            {"week": week.number, "phase": "deload" if week.deload else "loading",
+             "scheme": {day.style: "{}×{} @ RPE {}".format(*week_scheme(day, week)[:3]) for day in program.days}}
+            for week in program.weeks
+        ],
+        "templates_created": len(template_ids),
+        "template_ids": template_ids,
+        "principles": [
+            "Each block ends in a deload week: about half the sets at 90% load",
+            "Strength days: one rep fewer and more load each week; hypertrophy days: one more set (max +2)",
+            f"Goal weights start from your working weights and rise {LOAD_STEP:.1%} per week",
+        ],
+    }
+
+
+def create_program(db: Session, user_id: int, goal: str = "hypertrophy", weeks: int = 8, days_per_week: int = 4,
+                   experience_level: str = "intermediate", available_minutes: int = 60,
+                   equipment: Optional[list] = None, name: Optional[str] = None) -> dict:
+    """Plan a program, write all of its templates in one transaction and return the summary."""
+    program = plan_program(goal, weeks, days_per_week, experience_level, available_minutes, equipment,
+                           user_id, working_weights(db, user_id), name)
+    reads = write_templates(db, user_id, program.templates, is_ai_generated=True)
+    logger.info(f"Created program '{program.name}' for user {user_id}: {len(reads)} templates")
+    return summarize(program, [read.id for read in reads])
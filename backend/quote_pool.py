@@ -0,0 +1,236 @@
+"""Per-user pool of pre-generated motivational quotes.
+
+``/coach/motivate`` pops a quote from an in-memory pool mirrored in the
+MotivationQuote table, so serving one never waits on an LLM; the served row
+is deleted right away so a restart cannot hand it out again. A background
+task refills low pools with one batched LLM request per user while no coach
+chat is streaming, personalising quotes with recent stats and the user's
+template names.
+"""
+import asyncio
+import json
+import logging
+import os
+import random
+import re
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Deque, Dict, List, Optional, Tuple
+
+from sqlalchemy import delete
+from sqlmodel import Session, select
+
+from backend.database import engine
+from backend.models import MotivationQuote, TrainingSession, User, WorkoutTemplate
+
+logger = logging.getLogger(__name__)
+
+POOL_TARGET = int(os.environ.get("QUOTE_POOL_TARGET", "8"))
+POOL_LOW_WATERMARK = int(os.environ.get("QUOTE_POOL_LOW", "3"))
+REFILL_INTERVAL_S = float(os.environ.get("QUOTE_REFILL_INTERVAL_S", "300"))
+
+# user_id -> deque of (quote id, text, template_name)
+_pools: Dict[int, Deque[Tuple[int, str, Optional[str]]]] = {}
+_consumed: List[int] = []
+_active_streams = 0
+_wakeup: Optional[asyncio.Event] = None
+
+
+@contextmanager
+def foreground_activity():
+    """Mark a latency-sensitive request (coach chat) so refills wait for idle time."""
+    global _active_streams
+    _active_streams += 1
+    try:
+        yield
+    finally:
+        _active_streams -= 1
+
+
+def load_pools(session: Optional[Session] = None):
+    """Load stored quotes into memory (at startup)."""
+    _pools.clear()
+    own_session = session is None
+    session = session or Session(engine)
+    try:
+        for q in session.exec(select(MotivationQuote).order_by(MotivationQuote.id)).all():
+            _pools.setdefault(q.user_id, deque()).append((q.id, q.text, q.template_name))
+    finally:
+        if own_session:
+            session.close()
+
+
+def pool_size(user_id: int) -> int:
+    return len(_pools.get(user_id, ()))
+
+
+def take_quote(user_id: int, template_name: Optional[str] = None,
+               session: Optional[Session] = None) -> Optional[str]:
+    """Pop a ready quote, preferring one written for this template.
+
+    With a session the stored row is deleted at once (a primary-key delete);
+    without one it is queued and removed at the next refill.
+    """
+    pool = _pools.get(user_id)
+    if not pool:
+        request_refill()
+        return None
+
+    chosen = None
+    if template_name:
+        for entry in pool:
+            if entry[2] and entry[2].lower() == template_name.lower():
+                chosen = entry
+                break
+    if chosen is None:
+        # Generic quotes first; template-specific ones are kept for their template
+        chosen = next((e for e in pool if not e[2]), pool[0])
+    pool.remove(chosen)
+    if session is not None:
+        session.exec(delete(MotivationQuote).where(MotivationQuote.id == chosen[0]))
+        session.commit()
+    else:
+        _consumed.append(chosen[0])
+
+    if len(pool) < POOL_LOW_WATERMARK:
+        request_refill()
+    return chosen[1]
+
+
+def request_refill():
+    if _wakeup is not None:
+        _wakeup.set()
+
+
+def _flush_consumed(session: Session):
+    if not _consumed:
+        return
+    ids = list(_consumed)
+    _consumed.clear()
+    session.exec(delete(MotivationQuote).where(MotivationQuote.id.in_(ids)))
+    session.commit()
+
+
+def build_user_context(session: Session, user_id: int) -> Dict:
+    """Recent stats and template names used to personalise a batch."""
+    since = datetime.utcnow() - timedelta(days=14)
+    recent = session.exec(
+        select(TrainingSession).where(TrainingSession.user_id == user_id, TrainingSession.date >= since)
+    ).all()
+    templates = session.exec(
+        select(WorkoutTemplate.name).where(WorkoutTemplate.user_id == user_id).limit(5)
+    ).all()
+    total_minutes = sum(s.duration_seconds for s in recent) // 60
+    return {
+        "sessions_last_14_days": len(recent),
+        "minutes_last_14_days": total_minutes,
+        "avg_session_minutes": total_minutes // len(recent) if recent else 0,
+        "template_names": list(templates),
+    }
+
+
+def build_prompt(context: Dict, count: int) -> str:
+    return (
+        f"Write {count} different SHORT (1-2 sentences) motivational messages for a user who just finished a workout. "
+        f"Their recent training: {context['sessions_last_14_days']} sessions and "
+        f"{context['minutes_last_14_days']} minutes in the last 14 days "
+        f"(about {context['avg_session_minutes']} min per session). "
+        f"Their workout templates: {', '.join(context['template_names']) or 'none yet'}. "
+        "Make some quotes reference one of the templates by name and set \"template\" to that name; "
+        "others should be generic with \"template\": null. Be warm, personal, one emoji each. "
+        "Return ONLY a JSON array of objects like [{\"template\": null, \"quote\": \"...\"}]."
+    )
+
+
+def parse_quotes(raw: str, template_names: List[str]) -> List[Tuple[str, Optional[str]]]:
+    """Parse the LLM's JSON array, tolerating code fences and stray text."""
+    match = re.search(r"\[.*\]", raw, re.DOTALL)
+    if not match:
+        return []
+    try:
+        items = json.loads(match.group(0))
+    except json.JSONDecodeError:
+        return []
+    known = {t.lower(): t for t in template_names}
+    quotes = []
+    for item in items:
+        if isinstance(item, str):
+            text, template = item, None
+        elif isinstance(item, dict):
+            text, template = item.get("quote", ""), item.get("template")
+        else:
+            continue
+        text = str(text).strip()
+        if not text or len(text) > 300:
+            continue
+        template = known.get(str(template).lower()) if template else None
+        quotes.append((text, template))
+    return quotes
+
+
+async def generate_quotes(context: Dict, count: int) -> List[Tuple[str, Optional[str]]]:
+    """One batched LLM request for `count` quotes, via the provider router."""
+    from backend.llm_router import get_llm_router
+
+    messages = [
+        {"role": "system", "content": "You are an enthusiastic fitness coach. Keep responses very short."},
+        {"role": "user", "content": build_prompt(context, count)},
+    ]
+    raw = ""
+    async for event in get_llm_router().stream(messages):
+        if event["type"] == "content":
+            raw += event["text"]
+    return parse_quotes(raw, context["template_names"])
+
+
+def _users_needing_refill(session: Session) -> List[int]:
+    user_ids = session.exec(select(User.id)).all()
+    return [uid for uid in user_ids if pool_size(uid) < POOL_LOW_WATERMARK]
+
+
+def _store_quotes(session: Session, user_id: int, quotes: List[Tuple[str, Optional[str]]]):
+    rows = [MotivationQuote(user_id=user_id, text=text, template_name=template) for text, template in quotes]
+    session.add_all(rows)
+    session.commit()
+    pool = _pools.setdefault(user_id, deque())
+    for row in rows:
+        pool.append((row.id, row.text, row.template_name))
+
+
+async def refill_once():
+    """Top up every low pool, yielding to foreground chat streams."""
+    with Session(engine) as session:
+        _flush_consumed(session)
+        for user_id in _users_needing_refill(session):
+            while _active_streams:
+                await asyncio.sleep(1.0)
+            context = build_user_context(session, user_id)
+            try:
+                quotes = await generate_quotes(context, POOL_TARGET - pool_size(user_id))
+            except Exception as e:
+                logger.warning(f"[quote_pool] Refill for user {user_id} failed: {e}")
+                continue
+            if quotes:
+                _store_quotes(session, user_id, quotes)
+                logger.info(f"[quote_pool] Added {len(quotes)} quotes for user {user_id}")
+
+
+async def refill_loop():
+    """Background task started from the app lifespan."""
+    global _wakeup
+    _wakeup = asyncio.Event()
+    # Let startup finish before the first batch
+    await asyncio.sleep(random.uniform(5, 15))
+    while True:
+        try:
+            await refill_once()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"[quote_pool] Refill loop error: {e}")
+        try:
+            await asyncio.wait_for(_wakeup.wait(), timeout=REFILL_INTERVAL_S)
+        except asyncio.TimeoutError:
+            pass
+        _wakeup.clear()
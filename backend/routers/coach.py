@@ -1,8 +1,10 @@
+import asyncio
 import json
 import os
 import re
+import time
 from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, Header, HTTPException, Request
 from fastapi.responses import StreamingResponse
 from sqlmodel import Session, select
 from pydantic import BaseModel
@@ -11,17 +13,29 @@ import httpx
 from backend.database import get_session
 from backend.models import (
     User, TrainingSession, SessionExercise, TrainingSet, Exercise,
-    WorkoutTemplate, TemplateExercise, TemplateSet
+    WorkoutTemplate, TemplateExercise, TemplateSet,
+    Conversation, ConversationRead, ConversationDetail
 )
 from backend.auth import get_current_user
+from backend import metrics
+from backend.llm_router import get_llm_router, LLMUnavailableError
+from backend.conversation_store import (
+    get_conversation, create_conversation, append_message, delete_message, prompt_history,
+    split_assistant_output, compact,
+)
+from backend.quote_pool import take_quote, foreground_activity
+from backend.athlete_profile import profile_digest
+from backend.session_index import select_sessions
+from backend.offline_coach import OfflineAnswer, with_deadline
+from backend.sse import coalesce
+from backend.tool_calls import ToolCallAccumulator
+from backend.stream_buffer import ReplayGapError, parse_event_id, streams
+from backend.workout_extractor import extract_workout, known_exercise_names
+from backend.workout_pipeline import WorkoutIntent, classify_workout_request
 from .template_helper import save_generated_template
 
 import logging
-logging.basicConfig(
-    filename='backend_debug.log', 
-    level=logging.INFO, 
-    format='%(asctime)s - %(levelname)s - %(message)s'
-)
+from backend.logging_config import log_trace
 logger = logging.getLogger(__name__)
 
 # Import MCP tool logic for function calling
@@ -34,12 +48,45 @@ from backend.mcp_server import (
     create_workout_template_logic,
     design_workout_logic,
     get_training_recommendations_logic,
+    generate_program_logic,
     ExerciseInput as MCPExerciseInput,
     SetInput as MCPSetInput,
 )
 
 router = APIRouter(prefix="/coach", tags=["coach"])
 
+# Tools without side effects may start before the model finishes its turn
+SPECULATIVE_TOOLS = {"list_exercises", "design_workout", "get_training_recommendations"}
+
+# Below this, the local workout extractor defers to an LLM extraction call
+EXTRACTION_MIN_CONFIDENCE = float(os.environ.get("COACH_EXTRACTION_MIN_CONFIDENCE", "0.7"))
+
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "Connection": "keep-alive",
+    "X-Accel-Buffering": "no",
+}
+
+# Explicit formatting for weaker web models
+WEB_FORMATTING_PROMPT = (
+    "Keep your advice concise, well-structured, and motivating. "
+    "Always use proper markdown formatting: "
+    "use **bold** for emphasis, use bullet points (- ) for lists, "
+    "use numbered lists (1. 2. 3.) for steps, "
+    "and use headings (## ) to organize sections. "
+    "Write complete sentences. Never skip words or leave sentences incomplete. "
+    "Do NOT use <think> tags."
+)
+
+# Fast path: the server already ran recommend → design → save, the LLM only explains
+WORKOUT_EXPLANATION_PROMPT = (
+    "The workout the user asked for has already been designed from their training history "
+    "and saved as a template; the plan and the recommendations it is based on are below. "
+    "Present the workout briefly (exercises with sets × reps) and explain the programming rationale: "
+    "why this focus, the rep scheme and intensity, and how to progress. "
+    "Do not design a different plan. "
+)
+
 # OpenAI-format tool definitions for function calling
 OPENAI_TOOLS = [
     {
@@ -130,6 +177,46 @@ OPENAI_TOOLS = [
             }
         }
     },
+    {
+        "type": "function",
+        "function": {
+            "name": "generate_program",
+            "description": "Generate and save a multi-week training program (mesocycle: weekly split, progression and deload weeks) in one call. Use this instead of design_workout/create_workout_template when the user asks for a program spanning several weeks. Returns a compact summary to explain.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "goal": {
+                        "type": "string",
+                        "enum": ["strength", "hypertrophy", "endurance"],
+                        "description": "Training goal"
+                    },
+                    "weeks": {
+                        "type": "integer",
+                        "description": "Program length in weeks (2-12, default 8)"
+                    },
+                    "days_per_week": {
+                        "type": "integer",
+                        "description": "Training days per week (2-6, default 4)"
+                    },
+                    "experience_level": {
+                        "type": "string",
+                        "enum": ["beginner", "intermediate", "advanced"],
+                        "description": "User experience level"
+                    },
+                    "available_minutes": {
+                        "type": "integer",
+                        "description": "Available minutes per session (default 60)"
+                    },
+                    "equipment": {
+                        "type": "array",
+                        "items": {"type": "string"},
+                        "description": "Available equipment (barbell, dumbbell, cable, machine, bench)"
+                    }
+                },
+                "required": ["goal"]
+            }
+        }
+    },
     {
         "type": "function",
         "function": {
@@ -157,7 +244,10 @@ class ChatMessage(BaseModel):
 
 
 class ChatRequest(BaseModel):
-    messages: List[ChatMessage]
+    # Full history is only needed by legacy clients; new clients send a
+    # conversation_id and just the new question.
+    messages: List[ChatMessage] = []
+    conversation_id: Optional[int] = None
     session_ids: List[int] = []
     question: str
     model_source: str = "web"  # "web" or "local"
@@ -253,8 +343,17 @@ def get_available_sessions(
 
 
 def _execute_tool_call(func_name: str, func_args: dict, user_id: int) -> str:
-    """Execute an MCP tool and return the result string."""
-    print(f"[tool_call] Executing {func_name}({func_args})")
+    """Execute an MCP tool and return the result string, recording its latency."""
+    started = time.perf_counter()
+    result = _run_tool(func_name, func_args, user_id)
+    outcome = "error" if result.startswith(("Error", "Unknown tool")) else "success"
+    metrics.COACH_TOOL_DURATION.observe(time.perf_counter() - started, tool=func_name)
+    metrics.COACH_TOOL_CALLS.inc(tool=func_name, outcome=outcome)
+    return result
+
+
+def _run_tool(func_name: str, func_args: dict, user_id: int) -> str:
+    logger.info(f"[tool_call] Executing {func_name}", extra={"tool_args": func_args})
     try:
         if func_name == "list_exercises":
             return list_exercises_logic(func_args.get("category"))
@@ -279,6 +378,17 @@ def _execute_tool_call(func_name: str, func_args: dict, user_id: int) -> str:
                 experience_level=func_args.get("experience_level", "intermediate"),
                 available_minutes=func_args.get("available_minutes", 60),
                 equipment=func_args.get("equipment"),
+                user_id=user_id,
+            )
+        elif func_name == "generate_program":
+            return generate_program_logic(
+                goal=func_args.get("goal", "hypertrophy"),
+                weeks=func_args.get("weeks", 8),
+                days_per_week=func_args.get("days_per_week", 4),
+                experience_level=func_args.get("experience_level", "intermediate"),
+                available_minutes=func_args.get("available_minutes", 60),
+                equipment=func_args.get("equipment"),
+                user_id=user_id,
             )
         elif func_name == "get_training_recommendations":
             return get_training_recommendations_logic(
@@ -287,227 +397,280 @@ def _execute_tool_call(func_name: str, func_args: dict, user_id: int) -> str:
         else:
             return f"Unknown tool: {func_name}"
     except Exception as e:
-        print(f"[tool_call] Error executing {func_name}: {e}")
+        logger.exception(f"[tool_call] Error executing {func_name}: {e}")
         return f"Error executing tool: {e}"
 
 
-async def stream_web_llm(messages: list, system_prompt: str, user_id: int = 1):
-    """Stream from OpenRouter (primary) or Pollinations (fallback).
-    
-    OpenRouter: uses function calling for reliable template creation.
-    Pollinations: falls back to XML-tag-based template parsing.
-    """
-    logger.info(f"Starting stream_web_llm for user {user_id}")
-    
-    # Prepare messages — skip the first "system" tuple since we add it explicitly
+def _discard_speculative(speculative: dict):
+    """Drop speculative tool runs whose calls were superseded (the threads finish unobserved)."""
+    for name, _, task in speculative.values():
+        task.cancel()
+        metrics.COACH_SPECULATIVE_TOOLS.inc(tool=name, outcome="discarded")
+    speculative.clear()
+
+
+def _api_messages(messages: list, system_prompt: str) -> list:
+    """Convert internal (role, content) tuples to OpenAI-format messages."""
+    # Skip the first "system" tuple since we add it explicitly
     api_messages = [{"role": "system", "content": system_prompt}]
-    for msg in messages:
-        role_key = msg[0]
-        content = msg[1]
+    for role_key, content in messages:
         if role_key == "system":
             continue
         role = "assistant" if role_key == "ai" else "user"
         api_messages.append({"role": role, "content": content})
+    return api_messages
+
+
+async def stream_web_llm(messages: list, system_prompt: str, user_id: int = 1,
+                         saved_templates: Optional[list] = None):
+    """Stream from the best available provider via the LLM router.
     
-    openrouter_key = os.environ.get("OPENROUTER_API_KEY", "")
-    use_tools = bool(openrouter_key)  # Only OpenRouter supports tool calling
+    OpenRouter: uses function calling for reliable template creation.
+    Pollinations: falls back to XML-tag-based template parsing.
+    The router fails over between them and hedges slow providers.
+    Names of templates saved by tool calls are appended to ``saved_templates``.
+    """
+    logger.info(f"Starting stream_web_llm for user {user_id}")
+    api_messages = _api_messages(messages, system_prompt)
     
-    if openrouter_key:
-        model_name = os.environ.get("OPENROUTER_MODEL", "meta-llama/llama-3.1-8b-instruct")
-        logger.info(f"[OpenRouter] ✅ Using API key (key=...{openrouter_key[-6:]}) with model={model_name} | tools enabled")
-        url = "https://openrouter.ai/api/v1/chat/completions"
-        headers = {
-            "Authorization": f"Bearer {openrouter_key}",
-            "Content-Type": "application/json",
-            "HTTP-Referer": "https://antigravity.fitness", # Optional, for including your app on openrouter.ai rankings.
-            "X-Title": "Antigravity Fitness", # Optional. Shows in rankings on openrouter.ai.
-        }
-    else:
-        # Fallback when no OpenRouter key is provided
-        model_name = "pollinations/openai"
-        logger.info("[Fallback] No OpenRouter key found. Using Pollinations free API.")
-        url = "https://text.pollinations.ai/openai/chat/completions"
-        headers = {
-            "Content-Type": "application/json",
-        }
+    llm_router = get_llm_router()
+    max_iterations = 5
+    iteration = 0
+    provider_label = ("unknown", "unknown")
+    speculative = {}
+    emitted = False
 
-    async with httpx.AsyncClient() as client:
-        try:
-            max_iterations = 5
-            iteration = 0
-            
-            while iteration < max_iterations:
-                iteration += 1
-                
-                # Prepare payload for this iteration
-                if openrouter_key:
-                    payload = {
-                        "messages": api_messages,
-                        "model": model_name,
-                        "stream": True,
-                        "temperature": 0.7,
-                        "tools": OPENAI_TOOLS,
+    try:
+
+        while iteration < max_iterations:
+            iteration += 1
+
+            log_trace(logger, f"[stream_web_llm] Iteration {iteration} request messages", api_messages, iteration=iteration)
+
+            full_content = ""
+            supports_tools = False
+            # Track tool calls from streaming deltas for THIS iteration
+            tool_calls_acc = ToolCallAccumulator()
+            speculative = {}  # index -> (name, args, task) for read-only tools started mid-stream
+
+            async for event in llm_router.stream(api_messages, tools=OPENAI_TOOLS):
+                if event["type"] == "provider":
+                    supports_tools = event["supports_tools"]
+                    provider_label = (event["provider"], event["model"])
+                    logger.info(f"[stream_web_llm] Iteration {iteration}: {event['provider']}/{event['model']} (ttft={event['ttft']}, tools={supports_tools})")
+                elif event["type"] == "reset":
+                    # Router failed over after partial tool-call deltas; start over
+                    tool_calls_acc.reset()
+                    _discard_speculative(speculative)
+                elif event["type"] == "content":
+                    # Handle content tokens - yield immediately
+                    full_content += event["text"]
+                    emitted = True
+                    yield event["text"]
+                elif event["type"] == "tool_call":
+                    # Handle tool call deltas; start read-only tools as soon as their arguments close
+                    completed = tool_calls_acc.feed(event["delta"])
+                    if completed is not None and completed.name in SPECULATIVE_TOOLS:
+                        args = completed.parsed_arguments()
+                        if args is not None:
+                            logger.info(f"[stream_web_llm] Speculatively starting {completed.name}")
+                            speculative[completed.index] = (completed.name, args, asyncio.create_task(
+                                asyncio.to_thread(_execute_tool_call, completed.name, args, user_id)))
+
+            # End of stream for this iteration.
+
+            # If NO tool calls, we check if we missed one or are done.
+            if not tool_calls_acc:
+                # Heuristic: If user asked to create a template, and we didn't call the tool, prompt again.
+                # Check the last user message in the chain
+                last_user_content = ""
+                for m in reversed(api_messages):
+                    if m["role"] == "user":
+                        last_user_content = m["content"].lower()
+                        break
+
+                must_create = "create" in last_user_content and ("template" in last_user_content or "workout" in last_user_content)
+
+                logger.info(f"[stream_web_llm] Iteration {iteration}: Checking for missing tools. last_user_content='{last_user_content[:50]}...', must_create={must_create}")
+
+                # Only worth a retry when the serving provider can actually call tools
+                if must_create and supports_tools and iteration <= 2:
+                    logger.warning(f"[stream_web_llm] Iteration {iteration}: Missing mandatory tool call detected. Auto-correcting.")
+                    metrics.COACH_AUTOCORRECTIONS.inc(provider=provider_label[0], model=provider_label[1])
+                    # We must add the assistant's text response to history so context is preserved
+                    api_messages.append({"role": "assistant", "content": full_content})
+
+                    # Add correction prompt
+                    correction_msg = "You listed the exercises (or discussed them) but you did NOT call the `create_workout_template` tool. You MUST call this tool to strictly follow the protocol. Please call `create_workout_template` now."
+                    api_messages.append({"role": "user", "content": correction_msg})
+
+                    # Notify user of auto-correction (optional, but good for debugging/transparency)
+                    yield f"\n\n*(System: Auto-correcting to ensure template creation...)*\n\n"
+                    continue
+
+                # Otherwise, really done.
+                break
+
+            # If successful tool calls:
+            logger.info(f"[stream_web_llm] Iteration {iteration}: Processing {len(tool_calls_acc.calls)} tool call(s)")
+
+            # 1. Append Assistant Message with Tool Calls to history
+            assistant_tool_calls_json = []
+            for tc in tool_calls_acc.ordered():
+                assistant_tool_calls_json.append({
+                    "id": tc.id,
+                    "type": "function",
+                    "function": {
+                        "name": tc.name,
+                        "arguments": tc.arguments.text
                     }
+                })
+
+            # Note: The 'content' (if any) was already yielded to user. 
+            # Ideally we should also add it to the assistant message history if it existed.
+            # But for simplicity in tool loops, usually content is empty or just "Thinking...". 
+            # Let's assume content is negligible for the logic history or optional.
+            # OpenRouter/OpenAI usually expects the assistant message to match what was generated.
+            api_messages.append({
+                "role": "assistant",
+                "tool_calls": assistant_tool_calls_json
+            })
+
+            # 2. Execute Tools and Append Results (side-effecting tools only run now, in order)
+            for tc, tc_msg in zip(tool_calls_acc.ordered(), assistant_tool_calls_json):
+                func_name = tc_msg["function"]["name"]
+                func_args = tc.parsed_arguments() or {}
+
+                started = speculative.pop(tc.index, None)
+                if started is not None and started[:2] == (func_name, func_args):
+                    metrics.COACH_SPECULATIVE_TOOLS.inc(tool=func_name, outcome="used")
+                    result = await started[2]
                 else:
-                    payload = {
-                        "messages": api_messages,
-                        "model": "openai",
-                        "stream": True,
-                    }
-                
-                logger.info(f"[stream_web_llm] Iteration {iteration} request messages: {json.dumps(api_messages, default=str)}")
-
-                full_content = ""
-                async with client.stream("POST", url, json=payload, headers=headers, timeout=90.0) as response:
-                    if response.status_code != 200:
-                        error_body = await response.aread()
-                        logger.error(f"[stream_web_llm] Error {response.status_code}: {error_body.decode('utf-8', errors='replace')}")
-                        yield f"Error: LLM API returned status {response.status_code}. Please check your API key."
-                        return
-                    
-                    # Track tool calls from streaming deltas for THIS iteration
-                    tool_calls_acc = {}  # index -> {"id": ..., "name": ..., "arguments": ...}
-                    
-                    async for line in response.aiter_lines():
-                        line = line.strip()
-                        if not line:
-                            continue
-                        if line == "data: [DONE]":
-                            break
-                        if line.startswith("data: "):
-                            try:
-                                data = json.loads(line[6:])
-                                if "error" in data:
-                                    logger.error(f"[stream_web_llm] API error: {data['error']}")
-                                    yield f"Error: {data['error'].get('message', 'Unknown API error')}"
-                                    return
-                                    
-                                if "choices" in data and len(data["choices"]) > 0:
-                                    delta = data["choices"][0].get("delta", {})
-                                    
-                                    # Handle content tokens - yield immediately
-                                    content = delta.get("content")
-                                    if content:
-                                        full_content += content
-                                        yield content
-                                    
-                                    # Handle tool call deltas
-                                    tc_deltas = delta.get("tool_calls", [])
-                                    for tc_delta in tc_deltas:
-                                        idx = tc_delta.get("index", 0)
-                                        if idx not in tool_calls_acc:
-                                            tool_calls_acc[idx] = {
-                                                "id": tc_delta.get("id", ""),
-                                                "name": "",
-                                                "arguments": ""
-                                            }
-                                        if tc_delta.get("id"):
-                                            tool_calls_acc[idx]["id"] = tc_delta["id"]
-                                        func = tc_delta.get("function", {})
-                                        if func.get("name"):
-                                            tool_calls_acc[idx]["name"] += func["name"]
-                                        if func.get("arguments"):
-                                            tool_calls_acc[idx]["arguments"] += func["arguments"]
-                            except json.JSONDecodeError:
-                                pass
-                
-                # End of stream for this iteration.
-                
-                # If NO tool calls, we check if we missed one or are done.
-                if not tool_calls_acc:
-                    # Heuristic: If user asked to create a template, and we didn't call the tool, prompt again.
-                    # Check the last user message in the chain
-                    last_user_content = ""
-                    for m in reversed(api_messages):
-                        if m["role"] == "user":
-                            last_user_content = m["content"].lower()
-                            break
-                    
-                    must_create = "create" in last_user_content and ("template" in last_user_content or "workout" in last_user_content)
-                    
-                    logger.info(f"[stream_web_llm] Iteration {iteration}: Checking for missing tools. last_user_content='{last_user_content[:50]}...', must_create={must_create}")
+                    if started is not None:
+                        metrics.COACH_SPECULATIVE_TOOLS.inc(tool=started[0], outcome="discarded")
+                        started[2].cancel()
+                    # Off the event loop so other streams (and heartbeats) keep flowing
+                    result = await asyncio.to_thread(_execute_tool_call, func_name, func_args, user_id)
+                logger.info(f"[stream_web_llm] Tool {func_name} result: {result[:100]}...")
+                if func_name == "create_workout_template" and saved_templates is not None \
+                        and not result.startswith("Error"):
+                    saved_templates.append(func_args.get("name", "AI Workout"))
 
-                    if must_create and iteration <= 2:
-                        logger.warning(f"[stream_web_llm] Iteration {iteration}: Missing mandatory tool call detected. Auto-correcting.")
-                        # We must add the assistant's text response to history so context is preserved
-                        api_messages.append({"role": "assistant", "content": full_content})
-                        
-                        # Add correction prompt
-                        correction_msg = "You listed the exercises (or discussed them) but you did NOT call the `create_workout_template` tool. You MUST call this tool to strictly follow the protocol. Please call `create_workout_template` now."
-                        api_messages.append({"role": "user", "content": correction_msg})
-                        
-                        # Notify user of auto-correction (optional, but good for debugging/transparency)
-                        yield f"\n\n*(System: Auto-correcting to ensure template creation...)*\n\n"
-                        continue
-                    
-                    # Otherwise, really done.
-                    break
-                
-                # If successful tool calls:
-                logger.info(f"[stream_web_llm] Iteration {iteration}: Processing {len(tool_calls_acc)} tool call(s)")
-                
-                # 1. Append Assistant Message with Tool Calls to history
-                assistant_tool_calls_json = []
-                for idx in sorted(tool_calls_acc.keys()):
-                    tc = tool_calls_acc[idx]
-                    assistant_tool_calls_json.append({
-                        "id": tc["id"],
-                        "type": "function",
-                        "function": {
-                            "name": tc["name"],
-                            "arguments": tc["arguments"]
-                        }
-                    })
-                
-                # Note: The 'content' (if any) was already yielded to user. 
-                # Ideally we should also add it to the assistant message history if it existed.
-                # But for simplicity in tool loops, usually content is empty or just "Thinking...". 
-                # Let's assume content is negligible for the logic history or optional.
-                # OpenRouter/OpenAI usually expects the assistant message to match what was generated.
                 api_messages.append({
-                    "role": "assistant",
-                    "tool_calls": assistant_tool_calls_json
+                    "role": "tool",
+                    "tool_call_id": tc_msg["id"],
+                    "content": result
                 })
-                
-                # 2. Execute Tools and Append Results
-                for tc_msg in assistant_tool_calls_json:
-                    func_name = tc_msg["function"]["name"]
-                    try:
-                        func_args = json.loads(tc_msg["function"]["arguments"])
-                    except json.JSONDecodeError:
-                        func_args = {}
-                    
-                    result = _execute_tool_call(func_name, func_args, user_id)
-                    logger.info(f"[stream_web_llm] Tool {func_name} result: {result[:100]}...")
-                    
-                    api_messages.append({
-                        "role": "tool",
-                        "tool_call_id": tc_msg["id"],
-                        "content": result
-                    })
-                
-                # Loop continues to next iteration (sending all messages including tool results)
 
-        except Exception as e:
-            logger.error(f"[stream_web_llm] CRITICAL ERROR: {e}")
-            import traceback
-            traceback.print_exc()
-            yield f"Error: An unexpected error occurred in the AI Coach: {str(e)}"
+            # Loop continues to next iteration (sending all messages including tool results)
+
+    except LLMUnavailableError as e:
+        logger.error(f"[stream_web_llm] No provider available: {e} | stats={llm_router.snapshot()}")
+        if not emitted:
+            raise  # nothing said yet: the caller can answer offline instead
+        yield f"Error: The AI Coach is unavailable right now ({e}). Please try again shortly."
+    except Exception as e:
+        logger.exception(f"[stream_web_llm] CRITICAL ERROR: {e}")
+        yield f"Error: An unexpected error occurred in the AI Coach: {str(e)}"
+    finally:
+        _discard_speculative(speculative)
+        metrics.COACH_ITERATIONS.observe(iteration, source="web")
+
+
+def run_workout_pipeline(intent: WorkoutIntent, user_id: int, db: Session) -> dict:
+    """Run recommend → design → save server-side. Raises ValueError if a step fails."""
+    recommendations = json.loads(_execute_tool_call("get_training_recommendations", {}, user_id))
+    if "error" in recommendations:
+        raise ValueError(recommendations["error"])
+    design_args = intent.design_args(recommendations.get("suggested_focus"))
+    plan = json.loads(_execute_tool_call("design_workout", design_args, user_id))
+    template_id = save_generated_template(db, user_id, plan)
+    if not template_id:
+        raise ValueError("template could not be saved")
+    return {"recommendations": recommendations, "plan": plan, "template_id": template_id}
+
+
+async def _explanation_tokens(messages: list, system_prompt: str):
+    async for event in get_llm_router().stream(_api_messages(messages, system_prompt)):
+        if event["type"] == "content":
+            yield event["text"]
+
+
+async def stream_workout_fast_path(messages: list, system_prompt: str, intent: WorkoutIntent,
+                                   user_id: int, db: Session, saved_templates: list,
+                                   fallback_prompt: str, question: str):
+    """Create the workout deterministically, then stream only the LLM's explanation.
+
+    One LLM round trip instead of four; falls back to the tool loop when the
+    pipeline fails. Both are held to the first-token latency budget: past it
+    the explanation becomes a one-line summary of the saved plan, and the
+    tool loop the usual offline answer.
+    """
+    try:
+        result = await asyncio.to_thread(run_workout_pipeline, intent, user_id, db)
+    except ValueError as e:
+        logger.warning(f"[fast_path] Pipeline failed, falling back to the tool loop: {e}")
+        metrics.COACH_FAST_PATH.inc(outcome="fallback")
+        async for token in with_deadline(
+            stream_web_llm(messages, fallback_prompt, user_id=user_id, saved_templates=saved_templates),
+            question, user_id, saved_templates=saved_templates,
+        ):
+            yield token
+        return
+
+    metrics.COACH_FAST_PATH.inc(outcome="used")
+    plan = result["plan"]
+    saved_templates.append(plan["name"])
+    logger.info(f"[fast_path] Saved template {result['template_id']} ({plan['name']}) for user {user_id}")
+
+    context = (
+        f"\n\nRecommendations:\n{json.dumps(result['recommendations'])}"
+        f"\n\nSaved workout plan:\n{json.dumps(plan)}"
+    )
+    summary = f"Your **{plan['name']}** workout is ready: {plan['programming_notes']['scheme']}."
+    try:
+        # The plan is already saved, so a slow or missing explanation only costs the prose
+        async for token in with_deadline(_explanation_tokens(messages, system_prompt + context),
+                                         question, user_id, fallback=lambda: ("design", summary)):
+            yield token
+    finally:
+        metrics.COACH_ITERATIONS.observe(1, source="fast_path")
+
+    yield f"\n\n✨ **Workout Template Saved!**\n[View {plan['name']}]({os.environ.get('VITE_APP_URL', '')}/templates/{result['template_id']})"
 
 
 @router.post("/chat")
 async def chat(
     request: ChatRequest,
+    http_request: Request,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_session)
 ):
     """Stream a chat response from the chosen LLM source."""
     logger.info(f"Chat request from user {current_user.id}: {request.question} (model={request.model_source})")
+
+    # Server-held history: load the conversation, or start one for new chats
+    conversation = None
+    if request.conversation_id is not None:
+        conversation = get_conversation(db, request.conversation_id, current_user.id)
+        if not conversation:
+            raise HTTPException(status_code=404, detail="Conversation not found")
+    elif not request.messages:
+        conversation = create_conversation(db, current_user.id, request.question)
     
     # Fetch session context
     context_md = ""
-    if request.session_ids:
-        sessions_data = fetch_session_data(request.session_ids, current_user.id, db)
+    session_ids = request.session_ids
+    if not session_ids:
+        # Nothing picked by hand: retrieve the sessions most relevant to the question
+        session_ids = select_sessions(db, current_user.id, request.question)
+        metrics.COACH_CONTEXT_SESSIONS.observe(len(session_ids), mode="auto")
+        if session_ids:
+            logger.info(f"[context] Auto-selected sessions {session_ids} for user {current_user.id}")
+    else:
+        metrics.COACH_CONTEXT_SESSIONS.observe(len(session_ids), mode="manual")
+    if session_ids:
+        sessions_data = fetch_session_data(session_ids, current_user.id, db)
         context_md = format_sessions_as_markdown(sessions_data)
 
     # Build system prompt
@@ -523,6 +686,7 @@ async def chat(
         "Focus on hypertrophy and strength. "
         "Be specific and actionable in your advice. "
     )
+    base_prompt = system_prompt
     
     if use_function_calling:
         system_prompt += (
@@ -535,6 +699,7 @@ async def chat(
             "2. **Design**: Call `design_workout` with the appropriate goal (use the recommendation's `suggested_focus` if the user didn't specify). This returns a scientifically-backed plan.\n"
             "3. **Save**: Call `create_workout_template` with the exercises from the design_workout output.\n"
             "4. **Explain**: Briefly explain the programming rationale to the user (use the `programming_notes` from design_workout).\n"
+            "\n**Multi-week programs**: when the user asks for a program over several weeks, call `generate_program` once instead of designing and saving each day, then explain its summary.\n"
             "\n**IMPORTANT**: You can also use `list_exercises` to find video/gif URLs for exercises and pass them as `video_url`.\n"
             "\n**CRITICAL**: You MUST call `create_workout_template` to save the plan. Never just describe it in text.\n"
             "Keep your advice concise, well-structured, and motivating. "
@@ -560,55 +725,75 @@ async def chat(
         )
     else:
         # Web/Pollinations — explicit formatting for weaker models
-        system_prompt += (
-            "Keep your advice concise, well-structured, and motivating. "
-            "Always use proper markdown formatting: "
-            "use **bold** for emphasis, use bullet points (- ) for lists, "
-            "use numbered lists (1. 2. 3.) for steps, "
-            "and use headings (## ) to organize sections. "
-            "Write complete sentences. Never skip words or leave sentences incomplete. "
-            "Do NOT use <think> tags."
-        )
+        system_prompt += WEB_FORMATTING_PROMPT
 
-    if context_md:
-        system_prompt += f"\n\nHere is the user's workout history:\n\n{context_md}"
+    # "Create a workout" requests skip the tool loop (see stream_workout_fast_path)
+    workout_intent = classify_workout_request(request.question) if request.model_source == "web" else None
+    explanation_prompt = base_prompt + WORKOUT_EXPLANATION_PROMPT + WEB_FORMATTING_PROMPT
+
+    # Compact full-history profile, maintained as sessions are written
+    digest = profile_digest(db, current_user.id)
+    if digest:
+        system_prompt += f"\n\n{digest}"
+        explanation_prompt += f"\n\n{digest}"
 
     # Prepare messages for internal logic
-    llm_messages = [("system", system_prompt)]
-    for msg in request.messages:
-        if msg.role == "user":
-            llm_messages.append(("human", msg.content))
-        elif msg.role == "assistant":
-            llm_messages.append(("ai", msg.content))
-    llm_messages.append(("human", request.question))
-
-    async def generate():
-        """Stream tokens as SSE events."""
+    if conversation is not None:
+        # Summary goes last in the system prompt so the static prefix stays cacheable
+        summary, history = prompt_history(db, conversation)
+        if summary:
+            system_prompt += f"\n\nSummary of the earlier conversation:\n{summary}"
+            explanation_prompt += f"\n\nSummary of the earlier conversation:\n{summary}"
+        llm_messages = [("system", system_prompt)] + history
+        conversation_id = conversation.id
+    else:
+        llm_messages = [("system", system_prompt)]
+        for msg in request.messages:
+            if msg.role == "user":
+                llm_messages.append(("human", msg.content))
+            elif msg.role == "assistant":
+                llm_messages.append(("ai", msg.content))
+        conversation_id = None
+    # Sessions are retrieved per question, so they travel with the new turn rather
+    # than in the system prompt; stored history keeps the bare question
+    if context_md:
+        llm_messages.append(("human", f"Here is my relevant workout history:\n\n{context_md}\n\n"
+                                      f"My question: {request.question}"))
+    else:
+        llm_messages.append(("human", request.question))
+
+    async def generate(db: Session):
+        """Yield chat events as dicts; tracked() turns them into SSE frames."""
         try:
             full_content = ""
             in_thinking = False
             thinking_buffer = ""
             content_buffer = ""
+            saved_templates = []  # names of templates saved during this answer
+            offline = False  # answered by the rule-based fallback
+
+            if conversation_id is not None:
+                yield {'type': 'conversation', 'id': conversation_id}
             
             # Select the token generator based on source
             # Select the token generator based on source
             if request.model_source == "local":
                 # Send immediate feedback to keep connection alive
-                yield f"data: {json.dumps({'type': 'thinking', 'text': 'Initializing local AI...'})}\n\n"
+                yield {'type': 'thinking', 'text': 'Initializing local AI...'}
                 
                 try:
                     from langchain_ollama import ChatOllama
                     from langchain_core.tools import tool
                     from langchain_core.messages import HumanMessage, SystemMessage, AIMessage, ToolMessage
                 except ImportError as e:
-                    yield f"data: {json.dumps({'type': 'error', 'text': f'Missing dependency: {e}. Please run pip install langchain-ollama'})}\n\n"
+                    yield {'type': 'error', 'text': f'Missing dependency: {e}. Please run pip install langchain-ollama'}
                     return
 
                 # Import logic functions from mcp_server (which we ensured is importable)
                 try:
                     from backend.mcp_server import list_exercises_logic, create_workout_template_logic, ExerciseInput
                 except ImportError as e:
-                    yield f"data: {json.dumps({'type': 'error', 'text': f'Backend error: {e}'})}\n\n"
+                    yield {'type': 'error', 'text': f'Backend error: {e}'}
                     return
                 
                 # Wrap logic as LangChain tools
@@ -666,6 +851,10 @@ async def chat(
                         elif role == "ai":
                             lc_messages.append(AIMessage(content=content))
                     
+                    started = time.monotonic()
+                    first_token_at = None
+                    chunks = 0
+
                     # First call: see if it wants to use a tool
                     response = await llm_with_tools.ainvoke(lc_messages)
                     
@@ -694,24 +883,51 @@ async def chat(
                         # Stream the final response after tool execution
                         async for chunk in llm_with_tools.astream(lc_messages):
                             if chunk.content:
+                                if first_token_at is None:
+                                    first_token_at = time.monotonic()
+                                chunks += 1
                                 yield chunk.content
                     else:
                         # No tool calls, just yield the content we already got
                         # (We could have streamed from start, but we chose robustness)
+                        first_token_at = time.monotonic()
+                        chunks = len(response.content) // 4  # rough token estimate for a single block
                         yield response.content
                         if not response.content:
                             # Fallback if empty content (maybe thinking?)
                             pass
 
+                    metrics.record_llm_stream(
+                        "ollama", ollama_model,
+                        started=started,
+                        first_token_at=first_token_at,
+                        finished=time.monotonic(),
+                        completion_tokens=chunks,
+                    )
+
                 token_generator = local_stream()
 
+            elif workout_intent is not None:
+                token_generator = stream_workout_fast_path(
+                    llm_messages, explanation_prompt, workout_intent, current_user.id, db,
+                    saved_templates, fallback_prompt=system_prompt, question=request.question,
+                )
             else:
-                # Web / Pollinations — pass user_id for tool execution
-                token_generator = stream_web_llm(llm_messages, system_prompt, user_id=current_user.id)
+                # Web / Pollinations — pass user_id for tool execution. Past the latency
+                # budget (or with every provider down) the rule-based coach answers instead.
+                token_generator = with_deadline(
+                    stream_web_llm(llm_messages, system_prompt, user_id=current_user.id,
+                                   saved_templates=saved_templates),
+                    request.question, current_user.id, saved_templates=saved_templates,
+                )
 
 
             # Process tokens from the selected generator
             async for token in token_generator:
+                if isinstance(token, OfflineAnswer):
+                    offline = True
+                    yield {'type': 'offline', 'reason': token.reason, 'intent': token.intent}
+                    token = token.text
                 full_content += token
 
                 # Parse thinking tags in real-time
@@ -723,23 +939,23 @@ async def chat(
                         new_content = before_think[len(content_buffer):]
                         if new_content:
                             content_buffer = before_think
-                            yield f"data: {json.dumps({'type': 'content', 'text': new_content})}\n\n"
+                            yield {'type': 'content', 'text': new_content}
                     
                     thinking_start = full_content.split("<think>", 1)[1]
                     if "</think>" in thinking_start:
                         thinking_text = thinking_start.split("</think>", 1)[0]
                         in_thinking = False
-                        yield f"data: {json.dumps({'type': 'thinking', 'text': thinking_text})}\n\n"
+                        yield {'type': 'thinking', 'text': thinking_text}
                         
                         after_think = thinking_start.split("</think>", 1)[1]
                         if after_think:
                             content_buffer += after_think
-                            yield f"data: {json.dumps({'type': 'content', 'text': after_think})}\n\n"
+                            yield {'type': 'content', 'text': after_think}
                     else:
                         new_thinking = thinking_start[len(thinking_buffer):]
                         if new_thinking:
                             thinking_buffer = thinking_start
-                            yield f"data: {json.dumps({'type': 'thinking', 'text': new_thinking})}\n\n"
+                            yield {'type': 'thinking', 'text': new_thinking}
                 
                 elif in_thinking:
                     after_think_tag = full_content.split("<think>", 1)[1]
@@ -747,7 +963,7 @@ async def chat(
                         thinking_text = after_think_tag.split("</think>", 1)[0]
                         new_thinking = thinking_text[len(thinking_buffer):]
                         if new_thinking:
-                            yield f"data: {json.dumps({'type': 'thinking', 'text': new_thinking})}\n\n"
+                            yield {'type': 'thinking', 'text': new_thinking}
                         
                         in_thinking = False
                         thinking_buffer = ""
@@ -757,12 +973,12 @@ async def chat(
                             new_content = after_close[len(content_buffer):]
                             if new_content:
                                 content_buffer = after_close
-                                yield f"data: {json.dumps({'type': 'content', 'text': new_content})}\n\n"
+                                yield {'type': 'content', 'text': new_content}
                     else:
                         new_thinking = after_think_tag[len(thinking_buffer):]
                         if new_thinking:
                             thinking_buffer = after_think_tag
-                            yield f"data: {json.dumps({'type': 'thinking', 'text': new_thinking})}\n\n"
+                            yield {'type': 'thinking', 'text': new_thinking}
                 else:
                     # Logic for Template Parsing
                     # Only look at what we haven't processed yet
@@ -777,7 +993,7 @@ async def chat(
                             
                             # Yield anything before the template
                             if pre_temp_unproc:
-                                yield f"data: {json.dumps({'type': 'content', 'text': pre_temp_unproc})}\n\n"
+                                yield {'type': 'content', 'text': pre_temp_unproc}
                                 content_buffer += pre_temp_unproc
 
                             # Extract json
@@ -790,13 +1006,13 @@ async def chat(
                                 # Generate Link
                                 link_text = f"\n\n✨ **New Workout Created!**\n[View {template_data.get('name', 'Workout')}]({os.environ.get('VITE_APP_URL', '')}/templates/{template_id})"
                                 
-                                yield f"data: {json.dumps({'type': 'content', 'text': link_text})}\n\n"
+                                yield {'type': 'content', 'text': link_text}
                                 
                                 # Consume the template block
                                 content_buffer += start_marker + template_block + end_marker
 
                             except json.JSONDecodeError:
-                                yield f"data: {json.dumps({'type': 'content', 'text': '\n*(Error parsing generated template)*'})}\n\n"
+                                yield {'type': 'content', 'text': '\n*(Error parsing generated template)*'}
                                 content_buffer += start_marker + template_block + end_marker
 
                         else:
@@ -804,14 +1020,14 @@ async def chat(
                             # Yield pre-template stuff if we haven't
                             pre_temp_unproc = unprocessed.split(start_marker, 1)[0]
                             if pre_temp_unproc:
-                                yield f"data: {json.dumps({'type': 'content', 'text': pre_temp_unproc})}\n\n"
+                                yield {'type': 'content', 'text': pre_temp_unproc}
                                 content_buffer += pre_temp_unproc
                             # Wait for end marker
 
                     else:
                         # Normal content
                         if unprocessed:
-                            yield f"data: {json.dumps({'type': 'content', 'text': unprocessed})}\n\n"
+                            yield {'type': 'content', 'text': unprocessed}
                             content_buffer += unprocessed
 
             # --- Post-loop: final template extraction from full_content ---
@@ -819,7 +1035,7 @@ async def chat(
             # Do a final check on the complete accumulated text.
             start_marker = "<workout_template>"
             end_marker = "</workout_template>"
-            template_saved = False
+            template_saved = bool(saved_templates)
             
             if start_marker in full_content and end_marker in full_content:
                 try:
@@ -829,20 +1045,36 @@ async def chat(
                     if template_id:
                         template_saved = True
                         link_text = f"\n\n✨ **Workout Template Saved!**\n[View {template_data.get('name', 'Workout')}]({os.environ.get('VITE_APP_URL', '')}/templates/{template_id})"
-                        yield f"data: {json.dumps({'type': 'content', 'text': link_text})}\n\n"
-                        print(f"[post-loop] Template saved with ID {template_id}")
+                        yield {'type': 'content', 'text': link_text}
+                        logger.info(f"[post-loop] Template saved with ID {template_id}")
                 except (json.JSONDecodeError, IndexError) as ex:
-                    print(f"[post-loop] Template parse error: {ex}")
+                    logger.warning(f"[post-loop] Template parse error: {ex}")
             
             # Fallback: if no template saved and the text describes a workout, extract via LLM
-            if not template_saved and request.model_source == "web":
+            if not template_saved and request.model_source == "web" and not offline:
                 workout_keywords = any(kw in full_content.lower() for kw in [
                     "sets", "reps", "bench press", "squat", "deadlift",
                     "push-up", "pull-up", "overhead press", "curl", "row"
                 ])
                 if workout_keywords:
-                    print("[post-process] LLM described a workout but no template saved. Extracting...")
-                    yield f"data: {json.dumps({'type': 'content', 'text': chr(10) + chr(10) + '⏳ *Saving workout template...*'})}\n\n"
+                    # Try the deterministic extractor first; it avoids a second LLM round trip
+                    extract_start = time.perf_counter()
+                    extraction = extract_workout(full_content, known_exercise_names(db, current_user.id))
+                    logger.info(
+                        f"[post-process] Local extraction: confidence={extraction.confidence} "
+                        f"exercises={len(extraction.template['exercises'])} unmatched={extraction.unmatched} "
+                        f"in {(time.perf_counter() - extract_start) * 1000:.1f}ms"
+                    )
+                    if extraction.confidence >= EXTRACTION_MIN_CONFIDENCE:
+                        template_id = save_generated_template(db, current_user.id, extraction.template)
+                        if template_id:
+                            template_saved = True
+                            link_text = f"\n\n✨ **Workout Template Saved!**\n[View {extraction.template['name']}]({os.environ.get('VITE_APP_URL', '')}/templates/{template_id})"
+                            yield {'type': 'content', 'text': link_text}
+
+                if workout_keywords and not template_saved:
+                    logger.info("[post-process] LLM described a workout but no template saved. Extracting...")
+                    yield {'type': 'content', 'text': chr(10) + chr(10) + '⏳ *Saving workout template...*'}
                     
                     try:
                         extraction_prompt = [
@@ -883,33 +1115,135 @@ async def chat(
                                 
                                 if template_id:
                                     link_text = f"\n\n✨ **Workout Template Saved!**\n[View {template_data.get('name', 'Workout')}]({os.environ.get('VITE_APP_URL', '')}/templates/{template_id})"
-                                    yield f"data: {json.dumps({'type': 'content', 'text': link_text})}\n\n"
-                                    print(f"[post-process] Template saved with ID {template_id}")
+                                    yield {'type': 'content', 'text': link_text}
+                                    logger.info(f"[post-process] Template saved with ID {template_id}")
                                 else:
-                                    yield f"data: {json.dumps({'type': 'content', 'text': chr(10) + '*(Could not save template)*'})}\n\n"
+                                    yield {'type': 'content', 'text': chr(10) + '*(Could not save template)*'}
                             else:
-                                print(f"[post-process] Extraction API error: {extract_resp.status_code}")
+                                logger.warning(f"[post-process] Extraction API error: {extract_resp.status_code}")
                     except Exception as ex:
-                        print(f"[post-process] Extraction failed: {ex}")
-                        import traceback
-                        traceback.print_exc()
+                        logger.exception(f"[post-process] Extraction failed: {ex}")
             
-            yield f"data: {json.dumps({'type': 'done'})}\n\n"
+            # The question is stored with its answer, so a failed or cancelled
+            # turn leaves nothing behind to be replayed to the model
+            answer, thinking = split_assistant_output(full_content)
+            if conversation_id is not None and answer:
+                stored = get_conversation(db, conversation_id, current_user.id)
+                question = append_message(db, stored, "user", request.question)
+                reply = append_message(db, stored, "assistant", answer, thinking)
+                compact(db, stored)
+                yield {'type': 'saved', 'ids': [question.id, reply.id]}
+
+            yield {'type': 'done'}
 
+        except asyncio.CancelledError:
+            logger.info(f"[chat] Client disconnected; generation cancelled after {len(full_content)} chars")
+            raise
         except Exception as e:
-            yield f"data: {json.dumps({'type': 'error', 'text': str(e)})}\n\n"
+            yield {'type': 'error', 'text': str(e)}
+
+    async def tracked():
+        # Background quote refills hold off while a chat is generating. The
+        # generation outlives this response: a dropped client can resume it via
+        # /coach/chat/streams/{id}, and only an unresumed disconnect cancels it,
+        # so it works in its own session rather than the request's. The buffer
+        # pulls frames at the pace of its slowest reader, which keeps the
+        # coalesce queue as the backpressure point for upstream reads.
+        with foreground_activity(), Session(db.get_bind()) as task_db:
+            async for frame in coalesce(generate(task_db), source=request.model_source):
+                yield frame
 
+    buffer = streams.start(current_user.id, tracked())
     return StreamingResponse(
-        generate(),
+        buffer.follow(receive=http_request.receive),
         media_type="text/event-stream",
-        headers={
-            "Cache-Control": "no-cache",
-            "Connection": "keep-alive",
-            "X-Accel-Buffering": "no",
-        }
+        headers=SSE_HEADERS | {"X-Stream-ID": buffer.id},
+    )
+
+
+@router.get("/chat/streams/{stream_id}")
+async def resume_chat(
+    stream_id: str,
+    http_request: Request,
+    last_event_id: Optional[str] = Header(default=None),
+    current_user: User = Depends(get_current_user),
+):
+    """Reconnect to a chat stream: replay events after ``Last-Event-ID``, then follow it live."""
+    buffer = streams.get(stream_id, current_user.id)
+    if buffer is None:
+        metrics.COACH_STREAM_RESUMES.inc(outcome="unknown")
+        raise HTTPException(status_code=404, detail="Stream not found or expired")
+
+    event_stream, after = parse_event_id(last_event_id)
+    if event_stream not in (None, stream_id):
+        raise HTTPException(status_code=400, detail="Last-Event-ID belongs to a different stream")
+    try:
+        buffer.since(after)
+    except ReplayGapError as e:
+        metrics.COACH_STREAM_RESUMES.inc(outcome="gone")
+        raise HTTPException(status_code=410, detail=str(e))
+
+    metrics.COACH_STREAM_RESUMES.inc(outcome="resumed")
+    return StreamingResponse(
+        buffer.follow(after, receive=http_request.receive),
+        media_type="text/event-stream",
+        headers=SSE_HEADERS | {"X-Stream-ID": buffer.id},
     )
 
 
+@router.get("/conversations", response_model=List[ConversationRead])
+def list_conversations(
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_session)
+):
+    """Return the user's coach conversations, most recent first."""
+    return db.exec(
+        select(Conversation)
+        .where(Conversation.user_id == current_user.id)
+        .order_by(Conversation.updated_at.desc())  # type: ignore
+    ).all()
+
+
+@router.get("/conversations/{conversation_id}", response_model=ConversationDetail)
+def get_conversation_detail(
+    conversation_id: int,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_session)
+):
+    conversation = get_conversation(db, conversation_id, current_user.id)
+    if not conversation:
+        raise HTTPException(status_code=404, detail="Conversation not found")
+    return conversation
+
+
+@router.delete("/conversations/{conversation_id}")
+def delete_conversation(
+    conversation_id: int,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_session)
+):
+    conversation = get_conversation(db, conversation_id, current_user.id)
+    if not conversation:
+        raise HTTPException(status_code=404, detail="Conversation not found")
+    db.delete(conversation)
+    db.commit()
+    return {"ok": True}
+
+
+@router.delete("/conversations/{conversation_id}/messages/{message_id}")
+def delete_conversation_message(
+    conversation_id: int,
+    message_id: int,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_session)
+):
+    """Drop a stored turn so later answers no longer see it."""
+    conversation = get_conversation(db, conversation_id, current_user.id)
+    if not conversation or not delete_message(db, conversation, message_id):
+        raise HTTPException(status_code=404, detail="Message not found")
+    return {"ok": True}
+
+
 class MotivateRequest(BaseModel):
     duration_seconds: int = 0
     exercise_count: int = 0
@@ -932,50 +1266,23 @@ FALLBACK_QUOTES = [
 @router.post("/motivate")
 async def get_motivation(
     request: MotivateRequest,
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_session)
 ):
-    """Generate a short motivational phrase after a workout using LLM, with local fallback."""
-    import random
-
-    duration_min = request.duration_seconds // 60
-
-    prompt = (
-        f"The user just finished a workout. "
-        f"Duration: {duration_min} minutes. "
-        f"Exercises: {request.exercise_count}. "
-        f"Total sets: {request.total_sets}. "
-        f"{f'Template: {request.template_name}. ' if request.template_name else ''}"
-        f"Write a SHORT (1-2 sentences max) motivational and encouraging message. "
-        f"Be warm, personal, and use one emoji. Don't be generic. "
-        f"Reference the actual stats to make it feel personal."
-    )
-
-    openrouter_key = os.environ.get("OPENROUTER_API_KEY", "")
+    """Serve a pre-generated motivational quote, with local fallback.
 
-    if openrouter_key:
-        try:
-            url = "https://openrouter.ai/api/v1/chat/completions"
-            headers = {
-                "Authorization": f"Bearer {openrouter_key}",
-                "Content-Type": "application/json",
-            }
-            payload = {
-                "messages": [
-                    {"role": "system", "content": "You are an enthusiastic fitness coach. Keep responses very short."},
-                    {"role": "user", "content": prompt},
-                ],
-                "model": os.environ.get("OPENROUTER_MODEL", "nvidia/nemotron-nano-9b-v2:free"),
-                "temperature": 0.9,
-                "max_tokens": 100,
-            }
-            async with httpx.AsyncClient() as client:
-                resp = await client.post(url, json=payload, headers=headers, timeout=15.0)
-                if resp.status_code == 200:
-                    data = resp.json()
-                    content = data["choices"][0]["message"]["content"].strip()
-                    return {"quote": content}
-        except Exception as e:
-            print(f"[motivate] LLM error, falling back: {e}")
+    Quotes are produced ahead of time by the quote pool's background refill,
+    so this never waits on an LLM.
+    """
+    import random
 
-    # Fallback: pick a random local quote
-    return {"quote": random.choice(FALLBACK_QUOTES)}
+    started = time.perf_counter()
+    quote = take_quote(current_user.id, request.template_name, db)
+    source = "pool"
+    if not quote:
+        # Pool empty (new user, or no provider reachable yet): pick a local quote
+        quote = random.choice(FALLBACK_QUOTES)
+        source = "fallback"
+    metrics.COACH_MOTIVATE.inc(source=source)
+    metrics.COACH_MOTIVATE_DURATION.observe(time.perf_counter() - started)
+    return {"quote": quote}
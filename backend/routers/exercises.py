@@ -4,6 +4,7 @@ from sqlmodel import Session, select, col
 from backend.database import get_session
 from backend.models import Exercise, ExerciseCreate, ExerciseRead, User
 from backend.auth import get_current_user
+from backend.media_cache import local_url
 
 router = APIRouter(prefix="/exercises", tags=["exercises"])
 
@@ -28,6 +29,7 @@ async def create_exercise(
     db_exercise = Exercise.model_validate(exercise)
     db_exercise.user_id = current_user.id
     db_exercise.is_custom = True
+    db_exercise.video_url = local_url(session, db_exercise.video_url)
     session.add(db_exercise)
     session.commit()
     session.refresh(db_exercise)
@@ -0,0 +1,49 @@
+import json
+from typing import Literal, Optional
+
+from fastapi import APIRouter, Depends, File, UploadFile
+from fastapi.responses import StreamingResponse
+from sqlmodel import Session
+
+from backend import history_export, history_import
+from backend.auth import get_current_user
+from backend.database import get_session
+from backend.models import User
+
+router = APIRouter(prefix="/history", tags=["history"])
+
+
+@router.get("/export/{kind}")
+async def export_history(
+    kind: Literal["sessions", "sets", "templates", "exercises"],
+    format: Literal["ndjson", "csv", "yaml"] = "ndjson",
+    gzip: bool = False,
+    session: Session = Depends(get_session),
+    current_user: User = Depends(get_current_user)
+):
+    """Stream the user's full history of one kind; memory stays flat however long it is."""
+    media_type, _ = history_export.FORMATS[format]
+    headers = {"Content-Disposition": f'attachment; filename="{history_export.filename(kind, format, gzip)}"'}
+    return StreamingResponse(
+        history_export.stream_export(session.get_bind(), current_user.id, kind, format, gzip),
+        media_type="application/gzip" if gzip else media_type,
+        headers=headers,
+    )
+
+
+@router.post("/import")
+async def import_history(
+    file: UploadFile = File(...),
+    format: Optional[Literal["csv", "ndjson", "yaml"]] = None,
+    session: Session = Depends(get_session),
+    current_user: User = Depends(get_current_user)
+):
+    """Import sets from a CSV, NDJSON or YAML export (gzip allowed); streams NDJSON progress lines.
+
+    The format defaults to the file extension, else is guessed from the content.
+    Sessions the user already has (same date and time) are skipped.
+    """
+    progress = history_import.import_history(session.get_bind(), current_user.id, file.file, format,
+                                             file.filename)
+    return StreamingResponse((json.dumps(update) + "\n" for update in progress),
+                             media_type="application/x-ndjson")
@@ -0,0 +1,57 @@
+import os
+
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
+from fastapi.responses import FileResponse
+from sqlmodel import Session
+
+from backend import media_cache
+from backend.database import get_session
+from backend.models import MediaAsset
+
+router = APIRouter(prefix="/media", tags=["media"])
+
+# Keys are derived from the source URL, so the content behind one is stable
+CACHE_CONTROL = "public, max-age=604800"
+
+
+def _asset(key: str, session: Session) -> MediaAsset:
+    asset = session.get(MediaAsset, key) if media_cache.KEY_PATTERN.match(key) else None
+    if not asset:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Media not found")
+    return asset
+
+
+def _serve(request: Request, path: str, etag: str, media_type: str) -> Response:
+    """304 for a matching If-None-Match, else the file (nginx sendfile via X-Accel-Redirect when configured)."""
+    headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL, "Accept-Ranges": "bytes"}
+    if request.headers.get("if-none-match") in (etag, f"W/{etag}", "*"):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    if media_cache.ACCEL_PREFIX:
+        # nginx serves the file itself (sendfile, Range, HEAD); only headers go through Python
+        headers["X-Accel-Redirect"] = media_cache.ACCEL_PREFIX.rstrip("/") + "/" + os.path.basename(path)
+        return Response(headers=headers, media_type=media_type)
+    return FileResponse(path, media_type=media_type, headers=headers)
+
+
+@router.get("/{key}")
+async def get_media(key: str, request: Request, session: Session = Depends(get_session)):
+    """Exercise media from the local cache, fetched from its source on first use. Supports Range."""
+    asset = _asset(key, session)
+    try:
+        path = await media_cache.cache.get(session, asset)
+    except media_cache.MediaUnavailableError as e:
+        raise HTTPException(status_code=status.HTTP_502_BAD_GATEWAY, detail=f"Media unavailable: {e}")
+    return _serve(request, path, f'"{asset.etag}"', asset.content_type or "application/octet-stream")
+
+
+@router.get("/{key}/poster")
+async def get_poster(key: str, request: Request, session: Session = Depends(get_session)):
+    """Small JPEG of the first frame; 404 if thumbnails are unavailable (Pillow not installed)."""
+    asset = _asset(key, session)
+    try:
+        path = await media_cache.cache.poster(session, asset)
+    except media_cache.MediaUnavailableError as e:
+        raise HTTPException(status_code=status.HTTP_502_BAD_GATEWAY, detail=f"Media unavailable: {e}")
+    if not path:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No poster available")
+    return _serve(request, path, f'"{asset.etag}-poster"', "image/jpeg")
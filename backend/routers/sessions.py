@@ -7,6 +7,7 @@ from backend.models import (
     SessionExercise, TrainingSet, User
 )
 from backend.auth import get_current_user
+from backend import athlete_profile, exercise_targets, session_index
 
 router = APIRouter(prefix="/sessions", tags=["sessions"])
 
@@ -52,6 +53,10 @@ async def create_session(
             
     session.commit()
     session.refresh(db_session)
+    session_index.index_session(session, db_session)
+    athlete_profile.record_session(session, db_session)
+    exercise_targets.record_session(session, db_session)
+    session.refresh(db_session)
     return db_session
 
 @router.delete("/{session_id}")
@@ -70,4 +75,7 @@ async def delete_session(
         
     session.delete(db_session)
     session.commit()
+    session_index.unindex_session(session, current_user.id, session_id)
+    athlete_profile.rebuild_profile(session, current_user.id)
+    exercise_targets.rebuild_targets(session, current_user.id)
     return {"ok": True}
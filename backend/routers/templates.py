@@ -1,16 +1,17 @@
-from typing import List
+from typing import List, Optional
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.responses import PlainTextResponse
 from sqlmodel import Session, select
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from backend.database import get_session
 from backend.models import (
     WorkoutTemplate, WorkoutTemplateCreate, WorkoutTemplateRead,
-    TemplateExercise, TemplateSet,
-    Exercise, User, ExerciseRead
+    User
 )
 from backend.auth import get_current_user
-from datetime import datetime
+from backend import exercise_targets, program_generator
+from backend.history_export import YamlDumper
+from backend.template_writer import ExerciseSpec, SetSpec, update_template_in_place, write_template
 import yaml
 import json
 
@@ -24,7 +25,7 @@ async def list_templates(
 ):
     statement = select(WorkoutTemplate).where(WorkoutTemplate.user_id == current_user.id)
     templates = session.exec(statement).all()
-    return templates
+    return _with_targets(session, current_user.id, templates)
 
 
 @router.get("/{template_id}", response_model=WorkoutTemplateRead)
@@ -41,7 +42,30 @@ async def get_template(
     ).first()
     if not template:
         raise HTTPException(status_code=404, detail="Template not found")
-    return template
+    return _with_targets(session, current_user.id, [template])[0]
+
+
+def _with_targets(session: Session, user_id: int, templates: list) -> List[WorkoutTemplateRead]:
+    """Read models with each exercise's next-session target (one query for all templates)."""
+    reads = [t if isinstance(t, WorkoutTemplateRead) else WorkoutTemplateRead.model_validate(t) for t in templates]
+    return exercise_targets.attach_targets(session, user_id, reads)
+
+
+def _specs(data: WorkoutTemplateCreate) -> List[ExerciseSpec]:
+    return [
+        ExerciseSpec(
+            exercise_id=ex_data.exercise_id,
+            sets=[SetSpec(goal_weight=s.goal_weight, goal_reps=s.goal_reps) for s in ex_data.sets],
+        )
+        for ex_data in data.exercises
+    ]
+
+
+def _write(session: Session, user_id: int, name: str, specs: List[ExerciseSpec]) -> WorkoutTemplateRead:
+    try:
+        return _with_targets(session, user_id, [write_template(session, user_id, name, specs)])[0]
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 
 @router.post("/", response_model=WorkoutTemplateRead)
@@ -50,35 +74,7 @@ async def create_template(
     session: Session = Depends(get_session),
     current_user: User = Depends(get_current_user)
 ):
-    template = WorkoutTemplate(
-        name=data.name,
-        user_id=current_user.id
-    )
-    session.add(template)
-    session.commit()
-    session.refresh(template)
-
-    for order, ex_data in enumerate(data.exercises):
-        tex = TemplateExercise(
-            template_id=template.id,
-            exercise_id=ex_data.exercise_id,
-            order=order
-        )
-        session.add(tex)
-        session.commit()
-        session.refresh(tex)
-
-        for set_data in ex_data.sets:
-            tset = TemplateSet(
-                template_exercise_id=tex.id,
-                goal_weight=set_data.goal_weight,
-                goal_reps=set_data.goal_reps
-            )
-            session.add(tset)
-
-    session.commit()
-    session.refresh(template)
-    return template
+    return _write(session, current_user.id, data.name, _specs(data))
 
 
 @router.put("/{template_id}", response_model=WorkoutTemplateRead)
@@ -97,37 +93,11 @@ async def update_template(
     if not template:
         raise HTTPException(status_code=404, detail="Template not found")
 
-    # Delete existing exercises (cascades to sets)
-    for ex in list(template.exercises):
-        session.delete(ex)
-    session.commit()
-
-    # Update template
-    template.name = data.name
-    template.updated_at = datetime.utcnow()
-
-    # Recreate exercises and sets
-    for order, ex_data in enumerate(data.exercises):
-        tex = TemplateExercise(
-            template_id=template.id,
-            exercise_id=ex_data.exercise_id,
-            order=order
-        )
-        session.add(tex)
-        session.commit()
-        session.refresh(tex)
-
-        for set_data in ex_data.sets:
-            tset = TemplateSet(
-                template_exercise_id=tex.id,
-                goal_weight=set_data.goal_weight,
-                goal_reps=set_data.goal_reps
-            )
-            session.add(tset)
-
-    session.commit()
-    session.refresh(template)
-    return template
+    try:
+        read, _ = update_template_in_place(session, template, current_user.id, data.name, _specs(data))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return _with_targets(session, current_user.id, [read])[0]
 
 
 @router.delete("/{template_id}")
@@ -180,7 +150,7 @@ async def export_template(
         }
         yaml_data["exercises"].append(exercise_data)
 
-    return yaml.dump(yaml_data, default_flow_style=False, sort_keys=False, allow_unicode=True)
+    return yaml.dump(yaml_data, Dumper=YamlDumper, default_flow_style=False, sort_keys=False, allow_unicode=True)
 
 
 class YamlImport(BaseModel):
@@ -202,54 +172,33 @@ async def import_template(
     if not parsed or "name" not in parsed or "exercises" not in parsed:
         raise HTTPException(status_code=400, detail="YAML must have 'name' and 'exercises' fields")
 
-    template = WorkoutTemplate(
-        name=parsed["name"],
-        user_id=current_user.id
-    )
-    session.add(template)
-    session.commit()
-    session.refresh(template)
-
-    for order, ex_yaml in enumerate(parsed["exercises"]):
-        ex_name = ex_yaml.get("name", "Unknown")
-        ex_category = ex_yaml.get("category", "Other")
-
-        # Find existing exercise or create
-        exercise = session.exec(
-            select(Exercise).where(
-                Exercise.name == ex_name,
-                (Exercise.user_id == current_user.id) | (Exercise.user_id == None)  # noqa: E711
-            )
-        ).first()
-
-        if not exercise:
-            exercise = Exercise(
-                name=ex_name,
-                category=ex_category,
-                is_custom=True,
-                user_id=current_user.id
-            )
-            session.add(exercise)
-            session.commit()
-            session.refresh(exercise)
-
-        tex = TemplateExercise(
-            template_id=template.id,
-            exercise_id=exercise.id,
-            order=order
+    specs = [
+        ExerciseSpec(
+            name=ex_yaml.get("name", "Unknown"),
+            category=ex_yaml.get("category", "Other"),
+            sets=[SetSpec(goal_weight=s_yaml.get("weight", 0), goal_reps=s_yaml.get("reps", 0))
+                  for s_yaml in ex_yaml.get("sets", [])],
         )
-        session.add(tex)
-        session.commit()
-        session.refresh(tex)
-
-        for s_yaml in ex_yaml.get("sets", []):
-            tset = TemplateSet(
-                template_exercise_id=tex.id,
-                goal_weight=s_yaml.get("weight", 0),
-                goal_reps=s_yaml.get("reps", 0)
-            )
-            session.add(tset)
+        for ex_yaml in parsed["exercises"]
+    ]
+    return _write(session, current_user.id, parsed["name"], specs)
 
-    session.commit()
-    session.refresh(template)
-    return template
+
+class ProgramRequest(BaseModel):
+    goal: str = "hypertrophy"
+    weeks: int = Field(8, ge=program_generator.MIN_WEEKS, le=program_generator.MAX_WEEKS)
+    days_per_week: int = Field(4, ge=program_generator.MIN_DAYS, le=program_generator.MAX_DAYS)
+    experience_level: str = "intermediate"
+    available_minutes: int = Field(60, ge=15, le=180)
+    equipment: Optional[List[str]] = None
+    name: Optional[str] = None
+
+
+@router.post("/program")
+async def create_program(
+    data: ProgramRequest,
+    session: Session = Depends(get_session),
+    current_user: User = Depends(get_current_user)
+):
+    """Generate a multi-week program and save one template per training day and week."""
+    return program_generator.create_program(session, current_user.id, **data.model_dump())
@@ -0,0 +1,318 @@
+"""Per-user retrieval index over training sessions for coach context.
+
+When a chat request names no ``session_ids``, the coach picks the past
+sessions most relevant to the question instead of sending none. Each user
+gets an in-memory index, built from one query on first use and then kept
+current as sessions are written or deleted:
+
+- a lexical BM25 index over (lightly stemmed) exercise-name tokens,
+- a muscle-group vector per session, weighted by each group's share of sets,
+- session date and training volume.
+
+A question is scored against all of a user's sessions with NumPy, and the
+best ones are taken greedily until ``COACH_CONTEXT_TOKEN_BUDGET`` (estimated
+prompt tokens) or ``COACH_CONTEXT_MAX_SESSIONS`` is reached.
+"""
+import math
+import os
+import re
+import threading
+import weakref
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import datetime
+from functools import lru_cache
+from typing import Dict, List, Optional
+
+import numpy as np
+from sqlmodel import Session, select
+
+from backend.models import Exercise, SessionExercise, TrainingSession, TrainingSet
+
+TOKEN_BUDGET = int(os.environ.get("COACH_CONTEXT_TOKEN_BUDGET", "1500"))
+MAX_SESSIONS = int(os.environ.get("COACH_CONTEXT_MAX_SESSIONS", "5"))
+RECENCY_HALF_LIFE_DAYS = 21.0
+
+MUSCLE_GROUPS = ("chest", "back", "shoulders", "legs", "arms", "core")
+# Question words that point at a muscle group without naming an exercise
+MUSCLE_SYNONYMS = {
+    "chest": "chest", "pec": "chest", "push": "chest",
+    "back": "back", "lat": "back", "pull": "back", "row": "back",
+    "shoulder": "shoulders", "delt": "shoulders",
+    "leg": "legs", "quad": "legs", "hamstring": "legs", "glute": "legs", "calf": "legs", "squat": "legs",
+    "arm": "arms", "bicep": "arms", "tricep": "arms", "curl": "arms",
+    "core": "core", "ab": "core", "abs": "core",
+}
+STOPWORDS = {
+    "a", "an", "and", "are", "at", "be", "can", "do", "for", "how", "i", "in", "is", "it", "me", "my",
+    "of", "on", "or", "should", "the", "to", "was", "what", "with", "you", "your", "last", "workout",
+    "session", "sessions", "training", "week", "today",
+}
+
+# Prompt cost estimate for format_sessions_as_markdown (~4 characters per token)
+TOKENS_PER_SESSION = 12
+TOKENS_PER_EXERCISE = 25
+TOKENS_PER_SET = 10
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+WEIGHTS = {"lexical": 0.45, "muscle": 0.3, "recency": 0.2, "volume": 0.05}
+
+
+def tokenize(text: str) -> List[str]:
+    tokens = []
+    for word in re.findall(r"[a-z0-9]+", text.lower()):
+        if word in STOPWORDS:
+            continue
+        if len(word) > 4 and word.endswith("es") and word[-4:-2] in ("ss", "sh", "ch"):
+            word = word[:-2]
+        elif len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+            word = word[:-1]
+        tokens.append(word)
+    return tokens
+
+
+@lru_cache(maxsize=1024)
+def muscle_group(name: str, category: str) -> Optional[str]:
+    """Map an exercise onto one of MUSCLE_GROUPS (category first, then known names)."""
+    from backend.mcp_server import EXERCISE_DATABASE
+
+    cat = (category or "").lower()
+    for group in MUSCLE_GROUPS:
+        if cat and (cat in group or group in cat):
+            return group
+    lowered = name.lower()
+    for group, data in EXERCISE_DATABASE.items():
+        if any(e["name"].lower() == lowered for e in data.get("compound", []) + data.get("isolation", [])):
+            return group
+    return None
+
+
+@lru_cache(maxsize=1)
+def _name_token_groups() -> Dict[str, str]:
+    """Exercise-name tokens that belong to exactly one muscle group ("squat" -> legs, not "press")."""
+    from backend.mcp_server import EXERCISE_DATABASE
+
+    groups = defaultdict(set)
+    for group, data in EXERCISE_DATABASE.items():
+        for exercise in data.get("compound", []) + data.get("isolation", []):
+            for token in tokenize(exercise["name"]):
+                groups[token].add(group)
+    return {token: next(iter(found)) for token, found in groups.items() if len(found) == 1}
+
+
+@dataclass
+class SessionDoc:
+    session_id: int
+    date: datetime
+    tokens: List[str] = field(default_factory=list)
+    muscles: np.ndarray = field(default_factory=lambda: np.zeros(len(MUSCLE_GROUPS), dtype=np.float32))
+    volume: float = 0.0
+    cost: int = TOKENS_PER_SESSION
+
+
+def _load_docs(db: Session, user_id: int, session_id: Optional[int] = None) -> List[SessionDoc]:
+    """Session documents for a user (or one session) from a single joined query."""
+    query = (
+        select(TrainingSession.id, TrainingSession.date, SessionExercise.id, Exercise.name,
+               Exercise.category, TrainingSet.weight, TrainingSet.reps)
+        .join(SessionExercise, SessionExercise.session_id == TrainingSession.id, isouter=True)
+        .join(Exercise, Exercise.id == SessionExercise.exercise_id, isouter=True)
+        .join(TrainingSet, TrainingSet.session_exercise_id == SessionExercise.id, isouter=True)
+        .where(TrainingSession.user_id == user_id)
+    )
+    if session_id is not None:
+        query = query.where(TrainingSession.id == session_id)
+
+    docs: Dict[int, SessionDoc] = {}
+    seen_exercises = set()
+    for sid, date, se_id, name, category, weight, reps in db.exec(query):
+        doc = docs.get(sid)
+        if doc is None:
+            doc = docs[sid] = SessionDoc(sid, date)
+        if se_id is None:
+            continue
+        group = muscle_group(name or "", category or "")
+        if se_id not in seen_exercises:
+            seen_exercises.add(se_id)
+            doc.tokens.extend(tokenize(name or ""))
+            doc.cost += TOKENS_PER_EXERCISE
+        if weight is not None:
+            doc.cost += TOKENS_PER_SET
+            doc.volume += (weight or 0) * (reps or 0)
+            if group:
+                doc.muscles[MUSCLE_GROUPS.index(group)] += 1
+
+    for doc in docs.values():
+        total = doc.muscles.sum()
+        if total:
+            doc.muscles /= total
+    return list(docs.values())
+
+
+class SessionIndex:
+    """Column-oriented index over one user's sessions; rows are append-only."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.ids: List[int] = []
+        self.rows: Dict[int, int] = {}
+        capacity = 16
+        self.dates = np.zeros(capacity, dtype=np.float64)
+        self.muscles = np.zeros((capacity, len(MUSCLE_GROUPS)), dtype=np.float32)
+        self.volume = np.zeros(capacity, dtype=np.float64)
+        self.cost = np.zeros(capacity, dtype=np.int32)
+        self.doc_len = np.zeros(capacity, dtype=np.float32)
+        self.alive = np.zeros(capacity, dtype=bool)
+        self.postings: Dict[str, Dict[int, int]] = defaultdict(dict)  # token -> {row: term frequency}
+
+    def __len__(self):
+        return int(self.alive[:len(self.ids)].sum())
+
+    def _grow(self):
+        for name in ("dates", "muscles", "volume", "cost", "doc_len", "alive"):
+            array = getattr(self, name)
+            grown = np.zeros((array.shape[0] * 2,) + array.shape[1:], dtype=array.dtype)
+            grown[:array.shape[0]] = array
+            setattr(self, name, grown)
+
+    def add(self, doc: SessionDoc):
+        with self._lock:
+            if doc.session_id in self.rows:
+                self._remove(doc.session_id)
+            row = len(self.ids)
+            if row == self.dates.shape[0]:
+                self._grow()
+            self.ids.append(doc.session_id)
+            self.rows[doc.session_id] = row
+            self.dates[row] = doc.date.timestamp()
+            self.muscles[row] = doc.muscles
+            self.volume[row] = doc.volume
+            self.cost[row] = doc.cost
+            self.doc_len[row] = len(doc.tokens)
+            self.alive[row] = True
+            for token in doc.tokens:
+                self.postings[token][row] = self.postings[token].get(row, 0) + 1
+
+    def _remove(self, session_id: int):
+        row = self.rows.pop(session_id, None)
+        if row is not None:
+            self.alive[row] = False
+
+    def remove(self, session_id: int):
+        with self._lock:
+            self._remove(session_id)
+
+    def _query_muscles(self, tokens: List[str]) -> np.ndarray:
+        vector = np.zeros(len(MUSCLE_GROUPS), dtype=np.float32)
+        for token in tokens:
+            group = MUSCLE_SYNONYMS.get(token) or _name_token_groups().get(token)
+            if group is not None:
+                vector[MUSCLE_GROUPS.index(group)] = 1.0
+        return vector
+
+    def score(self, question: str, now: Optional[datetime] = None) -> np.ndarray:
+        """Relevance of every row to ``question`` (dead rows score -inf)."""
+        n = len(self.ids)
+        tokens = tokenize(question)
+        alive = self.alive[:n]
+        scores = np.zeros(n, dtype=np.float64)
+
+        # Lexical: BM25 over exercise-name tokens
+        lexical = np.zeros(n, dtype=np.float64)
+        live = max(1, int(alive.sum()))
+        avg_len = float(self.doc_len[:n][alive].mean()) if alive.any() else 1.0
+        for token in set(tokens):
+            posting = self.postings.get(token)
+            if not posting:
+                continue
+            rows = np.fromiter(posting.keys(), dtype=np.int64)
+            tf = np.fromiter(posting.values(), dtype=np.float64)
+            df = int(alive[rows].sum())
+            idf = math.log(1 + (live - df + 0.5) / (df + 0.5))
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * self.doc_len[rows] / max(avg_len, 1e-6))
+            lexical[rows] += idf * tf * (BM25_K1 + 1) / (tf + norm)
+        if lexical.max() > 0:
+            scores += WEIGHTS["lexical"] * lexical / lexical.max()
+
+        wanted = self._query_muscles(tokens)
+        if wanted.any():
+            scores += WEIGHTS["muscle"] * (self.muscles[:n] @ wanted)
+
+        now_ts = (now or datetime.utcnow()).timestamp()
+        age_days = np.maximum(0.0, (now_ts - self.dates[:n]) / 86400)
+        scores += WEIGHTS["recency"] * np.exp(-math.log(2) * age_days / RECENCY_HALF_LIFE_DAYS)
+
+        volume = np.log1p(self.volume[:n])
+        if volume.max() > 0:
+            scores += WEIGHTS["volume"] * volume / volume.max()
+
+        scores[~alive] = -np.inf
+        return scores
+
+    def select(self, question: str, token_budget: int = TOKEN_BUDGET, k: int = MAX_SESSIONS,
+               now: Optional[datetime] = None) -> List[int]:
+        """Ids of the top sessions for ``question`` that fit ``token_budget``, oldest first."""
+        with self._lock:
+            n = len(self.ids)
+            if not n or not self.alive[:n].any():
+                return []
+            scores = self.score(question, now)
+            chosen, spent = [], 0
+            for row in np.argsort(-scores, kind="stable"):
+                if not np.isfinite(scores[row]) or len(chosen) >= k:
+                    break
+                if spent + self.cost[row] > token_budget:
+                    continue
+                chosen.append(row)
+                spent += int(self.cost[row])
+            chosen.sort(key=lambda row: self.dates[row])
+            return [self.ids[row] for row in chosen]
+
+
+# engine -> user_id -> index; keyed by engine so separate databases never share an index
+_indexes: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+_indexes_lock = threading.Lock()
+
+
+def _user_indexes(db: Session) -> Dict[int, SessionIndex]:
+    with _indexes_lock:
+        return _indexes.setdefault(db.get_bind(), {})
+
+
+def get_index(db: Session, user_id: int) -> SessionIndex:
+    """The user's index, built from the database on first use."""
+    indexes = _user_indexes(db)
+    index = indexes.get(user_id)
+    if index is None:
+        index = SessionIndex()
+        for doc in _load_docs(db, user_id):
+            index.add(doc)
+        indexes[user_id] = index
+    return index
+
+
+def index_session(db: Session, training_session: TrainingSession):
+    """Add (or refresh) a just-written session; a user without a loaded index is built lazily later."""
+    index = _user_indexes(db).get(training_session.user_id)
+    if index is None:
+        return
+    for doc in _load_docs(db, training_session.user_id, training_session.id):
+        index.add(doc)
+
+
+def unindex_session(db: Session, user_id: int, session_id: int):
+    index = _user_indexes(db).get(user_id)
+    if index is not None:
+        index.remove(session_id)
+
+
+def forget_user(db: Session, user_id: int):
+    """Drop the user's index after bulk writes; it is rebuilt from the database on next use."""
+    _user_indexes(db).pop(user_id, None)
+
+
+def select_sessions(db: Session, user_id: int, question: str, token_budget: int = TOKEN_BUDGET,
+                    k: int = MAX_SESSIONS) -> List[int]:
+    """Session ids to use as coach context when the user picked none."""
+    return get_index(db, user_id).select(question, token_budget, k)
@@ -0,0 +1,139 @@
+"""Server-sent event framing for the coach stream.
+
+``coalesce`` turns a generator of event dicts into SSE frames. Consecutive
+``content``/``thinking`` events are merged into one ``data:`` frame per
+time window (or earlier once a byte threshold is reached), so an answer goes
+out as a few dozen writes instead of one per token. Heartbeat comments keep
+proxies from timing out while tools run, and a bounded queue between the
+producer and the socket pauses upstream reads when the client is slow.
+Given the ASGI ``receive`` callable, a client disconnect cancels the producer
+(and with it the upstream LLM request and tool loop) immediately rather than
+at the next failed write.
+
+    SSE_COALESCE_MS      frame window (default 30)
+    SSE_MAX_FRAME_BYTES  flush early once this much text is buffered (default 2048)
+    SSE_HEARTBEAT_S      idle time before a ": ping" comment (default 5)
+"""
+import asyncio
+import json
+import os
+from typing import AsyncIterator, Awaitable, Callable, Optional
+
+from backend import metrics
+
+COALESCE_MS = float(os.environ.get("SSE_COALESCE_MS", "30"))
+MAX_FRAME_BYTES = int(os.environ.get("SSE_MAX_FRAME_BYTES", "2048"))
+HEARTBEAT_S = float(os.environ.get("SSE_HEARTBEAT_S", "5"))
+QUEUE_SIZE = 256  # events buffered before the producer has to wait for the client
+
+MERGEABLE = ("content", "thinking")
+HEARTBEAT = ": ping\n\n"
+
+
+def format_event(event: dict) -> str:
+    return f"data: {json.dumps(event)}\n\n"
+
+
+def _merge(items: list) -> list:
+    """Merge runs of same-type content/thinking events, keeping order."""
+    frames = []
+    for item in items:
+        last = frames[-1] if frames else None
+        # Only plain {"type", "text"} events merge; anything carrying extra fields stays whole
+        if last is not None and item["type"] in MERGEABLE and last["type"] == item["type"] \
+                and len(last) == 2 and len(item) == 2:
+            last["text"] += item["text"]
+        else:
+            frames.append(dict(item))
+    return frames
+
+
+async def coalesce(events: AsyncIterator[dict], window: float = COALESCE_MS / 1000,
+                   max_bytes: int = MAX_FRAME_BYTES, heartbeat: float = HEARTBEAT_S,
+                   queue_size: int = QUEUE_SIZE, source: str = "coach",
+                   receive: Optional[Callable[[], Awaitable[dict]]] = None) -> AsyncIterator[str]:
+    """Yield SSE frames for ``events``, coalescing token events per ``window``.
+
+    The first content frame is sent immediately so time-to-first-token is not
+    delayed by the window. ``events`` runs in its own task, which is cancelled
+    when ``receive`` reports ``http.disconnect`` or this generator is closed.
+    """
+    queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+    ready = asyncio.Event()   # something is queued
+    urgent = asyncio.Event()  # flush without waiting for the window
+    # The producer reports its end through ``state`` rather than the queue, so
+    # finishing never waits for room behind a stalled client
+    state = {"bytes": 0, "done": False, "error": None}
+
+    async def produce():
+        try:
+            async for event in events:
+                if event["type"] in MERGEABLE:
+                    state["bytes"] += len(event["text"])
+                    if state["bytes"] >= max_bytes:
+                        urgent.set()
+                else:
+                    urgent.set()
+                await queue.put(event)  # blocks while the client is behind
+                ready.set()
+        except Exception as e:  # surfaced to the consumer
+            state["error"] = e
+        finally:
+            state["done"] = True
+            urgent.set()
+            ready.set()
+
+    async def watch_disconnect():
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                producer.cancel()
+                return
+
+    producer = asyncio.create_task(produce())
+    watcher = asyncio.create_task(watch_disconnect()) if receive is not None else None
+    frames_sent = 0
+    events_seen = 0
+    text_started = False
+    try:
+        while True:
+            if queue.empty() and not state["done"]:
+                ready.clear()
+                try:
+                    await asyncio.wait_for(ready.wait(), heartbeat)
+                except asyncio.TimeoutError:
+                    yield HEARTBEAT
+                    continue
+
+            if text_started and not urgent.is_set():
+                try:
+                    await asyncio.wait_for(urgent.wait(), window)
+                except asyncio.TimeoutError:
+                    pass
+            urgent.clear()
+
+            finished = state["done"]
+            items = []
+            while not queue.empty():
+                items.append(queue.get_nowait())
+            state["bytes"] = 0
+            events_seen += len(items)
+
+            for frame in _merge(items):
+                frames_sent += 1
+                text_started = text_started or frame["type"] in MERGEABLE
+                yield format_event(frame)
+            if finished:
+                break
+        if state["error"] is not None:
+            raise state["error"]
+    finally:
+        if watcher is not None:
+            watcher.cancel()
+        if not producer.done() or producer.cancelled():
+            metrics.COACH_CANCELLED.inc(source=source)
+        producer.cancel()
+        if events_seen:
+            metrics.SSE_FRAMES.observe(frames_sent, source=source)
+            metrics.SSE_EVENTS.observe(events_seen, source=source)
+
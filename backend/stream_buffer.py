@@ -0,0 +1,254 @@
+"""Replay buffers that let a dropped coach stream be resumed.
+
+A chat generation runs in its own task and appends every SSE frame, tagged
+``id: <stream>:<seq>``, to a ``StreamBuffer``. Clients read from the buffer
+rather than from the generator, so a reconnect carrying ``Last-Event-ID``
+gets the frames it missed and then follows the same upstream generation
+live. The generation is pulled at the pace of the slowest attached reader
+(at most ``STREAM_READER_LAG_FRAMES`` ahead of it), so a slow client still
+pauses upstream reads. When the last reader goes away the generation keeps
+running for a grace period; if nobody resumes by then it is cancelled like
+any other disconnect. Buffers are evicted by age and by a memory cap.
+
+    STREAM_RESUME_GRACE_S     how long an unattended generation keeps running (default 20)
+    STREAM_BUFFER_TTL_S       how long a buffer stays resumable after its last event (default 300)
+    STREAM_BUFFER_MAX_BYTES   replay cap per stream; older frames are dropped (default 1 MB)
+    STREAM_BUFFERS_MAX_BYTES  cap across all buffers; oldest finished streams go first (default 16 MB)
+    STREAM_READER_LAG_FRAMES  frames the generation may run ahead of an attached reader (default 64)
+"""
+import asyncio
+import logging
+import os
+import time
+import uuid
+from collections import OrderedDict, deque
+from typing import AsyncIterator, Awaitable, Callable, Deque, Dict, Optional, Tuple
+
+from backend import metrics
+from backend.sse import HEARTBEAT, HEARTBEAT_S, format_event
+
+logger = logging.getLogger(__name__)
+
+RESUME_GRACE_S = float(os.environ.get("STREAM_RESUME_GRACE_S", "20"))
+BUFFER_TTL_S = float(os.environ.get("STREAM_BUFFER_TTL_S", "300"))
+BUFFER_MAX_BYTES = int(os.environ.get("STREAM_BUFFER_MAX_BYTES", str(1024 * 1024)))
+BUFFERS_MAX_BYTES = int(os.environ.get("STREAM_BUFFERS_MAX_BYTES", str(16 * 1024 * 1024)))
+READER_LAG_FRAMES = int(os.environ.get("STREAM_READER_LAG_FRAMES", "64"))
+
+
+class ReplayGapError(Exception):
+    """The requested position has already been dropped from the buffer."""
+
+
+def parse_event_id(value: Optional[str]) -> Tuple[Optional[str], int]:
+    """Split a ``Last-Event-ID`` value (``<stream>:<seq>`` or ``<seq>``) into its parts."""
+    if not value:
+        return None, 0
+    stream_id, _, seq = value.strip().rpartition(":")
+    try:
+        return stream_id or None, max(0, int(seq))
+    except ValueError:
+        return None, 0
+
+
+class StreamBuffer:
+    """Frames of one generation plus the bookkeeping to replay and follow them."""
+
+    def __init__(self, stream_id: str, user_id: int, max_bytes: int = BUFFER_MAX_BYTES,
+                 grace: float = RESUME_GRACE_S, max_lag: int = READER_LAG_FRAMES):
+        self.id = stream_id
+        self.user_id = user_id
+        self.max_bytes = max_bytes
+        self.grace = grace
+        self.max_lag = max_lag
+        self.frames: Deque[Tuple[int, str]] = deque()
+        self.next_seq = 1
+        self.bytes = 0
+        self.done = False
+        self.readers = 0
+        self.updated = time.monotonic()
+        self.task: Optional[asyncio.Task] = None
+        self._changed = asyncio.Event()
+        self._positions: Dict[object, int] = {}  # attached reader -> last seq it consumed
+        self._progress = asyncio.Event()
+        self._grace_timer: Optional[asyncio.TimerHandle] = None
+
+    @property
+    def first_seq(self) -> int:
+        return self.frames[0][0] if self.frames else self.next_seq
+
+    def append(self, frame: str):
+        seq = self.next_seq
+        self.next_seq += 1
+        tagged = f"id: {self.id}:{seq}\n{frame}"
+        self.frames.append((seq, tagged))
+        self.bytes += len(tagged)
+        while self.bytes > self.max_bytes and len(self.frames) > 1:
+            _, dropped = self.frames.popleft()
+            self.bytes -= len(dropped)
+        self._touch()
+
+    def finish(self):
+        self.done = True
+        self._touch()
+
+    def _touch(self):
+        self.updated = time.monotonic()
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    def _advance(self, reader: object, seq: int):
+        self._positions[reader] = seq
+        self._progress.set()
+        self._progress = asyncio.Event()
+
+    async def wait_for_readers(self):
+        """Block while the slowest attached reader is more than ``max_lag`` frames behind."""
+        while self._positions and self.next_seq - 1 - min(self._positions.values()) > self.max_lag:
+            await self._progress.wait()
+
+    def since(self, after: int) -> list:
+        """``(seq, frame)`` pairs with a sequence number above ``after``."""
+        if after + 1 < self.first_seq:
+            raise ReplayGapError(f"events up to {self.first_seq - 1} of stream {self.id} were dropped")
+        return [(seq, frame) for seq, frame in self.frames if seq > after]
+
+    def attach(self):
+        self.readers += 1
+        if self._grace_timer is not None:
+            self._grace_timer.cancel()
+            self._grace_timer = None
+
+    def detach(self):
+        self.readers -= 1
+        if self.readers == 0 and not self.done and self.task is not None:
+            self._grace_timer = asyncio.get_running_loop().call_later(self.grace, self._abandon)
+
+    def _abandon(self):
+        self._grace_timer = None
+        if self.readers == 0 and self.task is not None and not self.task.done():
+            logger.info(f"[stream] No client resumed stream {self.id}; cancelling generation")
+            self.task.cancel()
+
+    async def follow(self, after: int = 0, receive: Optional[Callable[[], Awaitable[dict]]] = None,
+                     heartbeat: float = HEARTBEAT_S) -> AsyncIterator[str]:
+        """Replay frames after ``after``, then yield new ones until the generation ends.
+
+        Raises ReplayGapError before yielding anything if ``after`` is too old.
+        If frames are dropped later, while this reader lags, it gets an
+        ``error`` event with ``code: "gap"`` and the stream ends there.
+        With ``receive``, returns as soon as the client disconnects.
+        """
+        pending = self.since(after)
+        gone = asyncio.Event()
+
+        async def watch_disconnect():
+            while True:
+                message = await receive()
+                if message["type"] == "http.disconnect":
+                    gone.set()
+                    return
+
+        watcher = asyncio.create_task(watch_disconnect()) if receive is not None else None
+        reader = object()
+        self._advance(reader, after)
+        self.attach()
+        try:
+            position = after
+            while True:
+                for position, frame in pending:
+                    yield frame
+                    self._advance(reader, position)
+                if gone.is_set() or (self.done and self.next_seq - 1 <= position):
+                    return
+                if self.next_seq - 1 <= position:
+                    changed = asyncio.create_task(self._changed.wait())
+                    waiters = {changed} | ({asyncio.create_task(gone.wait())} if watcher is not None else set())
+                    try:
+                        finished, _ = await asyncio.wait(waiters, timeout=heartbeat,
+                                                         return_when=asyncio.FIRST_COMPLETED)
+                    finally:
+                        for waiter in waiters:
+                            waiter.cancel()
+                    if not finished:
+                        yield HEARTBEAT
+                try:
+                    pending = self.since(position)
+                except ReplayGapError:
+                    # The cap dropped frames this reader had not seen; resuming cannot help
+                    logger.warning(f"[stream] Reader of stream {self.id} fell behind the replay cap at {position}")
+                    yield format_event({"type": "error", "code": "gap",
+                                        "text": "Part of this reply was dropped before it reached you. Please ask again."})
+                    return
+        finally:
+            if watcher is not None:
+                watcher.cancel()
+            del self._positions[reader]
+            self._progress.set()
+            self.detach()
+
+
+async def _pump(buffer: StreamBuffer, frames: AsyncIterator[str]):
+    try:
+        async for frame in frames:
+            if frame != HEARTBEAT:  # readers send their own while idle
+                buffer.append(frame)
+                await buffer.wait_for_readers()
+    except Exception:
+        logger.exception(f"[stream] Generation for stream {buffer.id} failed")
+    finally:
+        buffer.finish()
+
+
+class StreamRegistry:
+    """Resumable streams by id, bounded by age and total size."""
+
+    def __init__(self, ttl: float = BUFFER_TTL_S, max_bytes: int = BUFFERS_MAX_BYTES,
+                 stream_max_bytes: int = BUFFER_MAX_BYTES, grace: float = RESUME_GRACE_S):
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.stream_max_bytes = stream_max_bytes
+        self.grace = grace
+        self._streams: "OrderedDict[str, StreamBuffer]" = OrderedDict()
+
+    def __len__(self):
+        return len(self._streams)
+
+    def start(self, user_id: int, frames: AsyncIterator[str]) -> StreamBuffer:
+        """Run ``frames`` in a background task that fills a new buffer."""
+        self.evict()
+        buffer = StreamBuffer(uuid.uuid4().hex[:16], user_id, self.stream_max_bytes, self.grace)
+        self._streams[buffer.id] = buffer
+        buffer.task = asyncio.create_task(_pump(buffer, frames))
+        return buffer
+
+    def get(self, stream_id: str, user_id: int) -> Optional[StreamBuffer]:
+        self.evict()
+        buffer = self._streams.get(stream_id)
+        return buffer if buffer is not None and buffer.user_id == user_id else None
+
+    def _drop(self, stream_id: str):
+        buffer = self._streams.pop(stream_id)
+        # An unwatched generation nobody can resume any more is not worth finishing
+        if buffer.readers == 0 and buffer.task is not None and not buffer.task.done():
+            buffer.task.cancel()
+
+    def evict(self):
+        now = time.monotonic()
+        for stream_id, buffer in list(self._streams.items()):
+            if now - buffer.updated > self.ttl:
+                self._drop(stream_id)
+
+        total = sum(b.bytes for b in self._streams.values())
+        if total <= self.max_bytes:
+            return
+        # Finished streams first, then the least recently active
+        for stream_id, buffer in sorted(self._streams.items(), key=lambda kv: (not kv[1].done, kv[1].updated)):
+            if total <= self.max_bytes:
+                break
+            total -= buffer.bytes
+            self._drop(stream_id)
+            metrics.STREAM_EVICTIONS.inc()
+
+
+streams = StreamRegistry()
@@ -0,0 +1,379 @@
+"""One write path for workout templates.
+
+The API (create, update, YAML import), the coach's ``save_generated_template``
+and the MCP ``create_workout_template`` tool all describe a template as a
+list of ``ExerciseSpec``. ``write_template`` turns that into rows with a
+fixed number of statements regardless of template size: names resolved by
+``exercise_resolver`` and loaded with one IN query, one executemany insert
+for missing exercises, one for TemplateExercise rows and one for
+TemplateSet rows, all committed together. It returns the
+``WorkoutTemplateRead`` built from what was written, so callers do not
+reload the template through its relationships. ``write_templates`` does the
+same for many templates at once (multi-week programs).
+
+``update_template_in_place`` diffs the submitted template against the
+stored rows and writes only what changed (reorders, set edits, inserts,
+deletes), so ids stay stable for untouched rows. Rows written per table
+and operation are counted in ``template_rows_written_total``.
+"""
+import logging
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Deque, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import delete, insert, update
+from sqlmodel import Session, select
+
+from backend import exercise_resolver
+from backend.exercise_resolver import normalize_exercise_name
+from backend.models import (
+    Exercise, ExerciseRead, TemplateExerciseRead, TemplateExercise, TemplateSet, TemplateSetRead,
+    WorkoutTemplate, WorkoutTemplateRead,
+)
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class SetSpec:
+    goal_weight: float = 0
+    goal_reps: int = 0
+
+
+@dataclass
+class ExerciseSpec:
+    """One template exercise, by id or by name (created for the user if unknown)."""
+    exercise_id: Optional[int] = None
+    name: Optional[str] = None
+    category: str = "Uncategorized"
+    video_url: Optional[str] = None
+    sets: List[SetSpec] = field(default_factory=list)
+
+
+def resolve_exercises(db: Session, specs: Iterable[ExerciseSpec], user_id: int) -> Dict[str, Exercise]:
+    """Map normalized name -> Exercise for every named spec, creating missing exercises.
+
+    Names go through the exercise resolver (exact, alias, fuzzy; global
+    exercises and the user's own); matched rows are loaded with one query
+    and missing names are inserted in one batch as the user's custom
+    exercises. A spec's ``video_url`` fills an exercise that has none.
+    """
+    from backend.media_cache import local_url
+
+    wanted: Dict[str, ExerciseSpec] = {}
+    for spec in specs:
+        if spec.exercise_id is None and spec.name and spec.name.strip():
+            wanted.setdefault(normalize_exercise_name(spec.name), spec)
+    wanted.pop("", None)
+    if not wanted:
+        return {}
+
+    matches = exercise_resolver.resolve(db, [spec.name for spec in wanted.values()], user_id)
+    loaded = load_exercises(db, [m.exercise_id for m in matches.values()], user_id)
+    found: Dict[str, Exercise] = {
+        key: loaded[match.exercise_id] for key, match in matches.items() if match.exercise_id in loaded
+    }
+
+    new_rows = [
+        {"name": spec.name.strip(), "normalized_name": key, "category": spec.category or "Uncategorized",
+         "is_custom": True, "user_id": user_id, "video_url": local_url(db, spec.video_url)}
+        for key, spec in wanted.items() if key not in found
+    ]
+    for key, spec in wanted.items():
+        exercise = found.get(key)
+        if exercise is not None and spec.video_url and not exercise.video_url:
+            exercise.video_url = local_url(db, spec.video_url)
+            db.add(exercise)
+    if new_rows:
+        db.execute(insert(Exercise), new_rows)  # one executemany
+        created = db.exec(
+            select(Exercise).where(Exercise.user_id == user_id,
+                                   Exercise.normalized_name.in_([r["normalized_name"] for r in new_rows]))
+            .order_by(Exercise.id)
+        ).all()
+        exercise_resolver.record_created(db, created)
+        for exercise in created:
+            found.setdefault(exercise.normalized_name, exercise)
+    return found
+
+
+def newest_ids(db: Session, column, where, count: int) -> List[int]:
+    """Ids of the ``count`` rows just inserted with one executemany, in insertion order.
+
+    SQLite hands out rowids above the current maximum in insertion order, and
+    the transaction holds the write lock, so the newest ``count`` rows are ours.
+    """
+    return sorted(db.exec(select(column).where(where).order_by(column.desc()).limit(count)).all())
+
+
+def _insert_rows(db: Session, template_ids: List[int], specs: List[ExerciseSpec],
+                 exercise_ids: List[int], orders: List[int]) -> List[int]:
+    """Batched inserts of the TemplateExercise and TemplateSet rows; returns the new exercise row ids.
+
+    ``template_ids`` gives the template of each spec, so one call can fill many templates.
+    """
+    if not specs:
+        return []
+    db.execute(insert(TemplateExercise), [
+        {"template_id": template_id, "exercise_id": ex_id, "order": order}
+        for template_id, ex_id, order in zip(template_ids, exercise_ids, orders)
+    ])
+    row_ids = newest_ids(db, TemplateExercise.id, TemplateExercise.template_id.in_(set(template_ids)), len(specs))
+    set_rows = [
+        {"template_exercise_id": row_id, "goal_weight": s.goal_weight, "goal_reps": s.goal_reps}
+        for row_id, spec in zip(row_ids, specs) for s in spec.sets
+    ]
+    if set_rows:
+        db.execute(insert(TemplateSet), set_rows)
+    return row_ids
+
+
+def _resolve_specs(db: Session, exercises: List[ExerciseSpec], user_id: int):
+    """(specs, exercise_ids, exercises by id): specs without an exercise are dropped; raises ValueError for bad ids."""
+    by_name = resolve_exercises(db, exercises, user_id)
+    specs, exercise_ids = [], []
+    for spec in exercises:
+        if spec.exercise_id is not None:
+            exercise_id = spec.exercise_id
+        elif normalize_exercise_name(spec.name or "") in by_name:
+            exercise_id = by_name[normalize_exercise_name(spec.name)].id
+        else:
+            continue
+        specs.append(spec)
+        exercise_ids.append(exercise_id)
+
+    known = load_exercises(db, exercise_ids, user_id)
+    unknown = sorted(set(exercise_ids) - set(known))
+    if unknown:
+        raise ValueError(f"Unknown exercise id(s): {', '.join(map(str, unknown))}")
+    return specs, exercise_ids, known
+
+
+def write_template(db: Session, user_id: int, name: str, exercises: List[ExerciseSpec],
+                   is_ai_generated: bool = False) -> WorkoutTemplateRead:
+    """Create a template with its exercises and sets in one transaction."""
+    return write_templates(db, user_id, [(name, exercises)], is_ai_generated)[0]
+
+
+def write_templates(db: Session, user_id: int, templates: List[Tuple[str, List[ExerciseSpec]]],
+                    is_ai_generated: bool = False) -> List[WorkoutTemplateRead]:
+    """Create several templates in one transaction with the same fixed number of statements.
+
+    Names are resolved once across all templates, and the WorkoutTemplate,
+    TemplateExercise and TemplateSet rows are each inserted with one
+    executemany, so a multi-week program costs what a single template does.
+    """
+    if not templates:
+        return []
+    try:
+        now = datetime.utcnow()
+        db.execute(insert(WorkoutTemplate), [
+            {"user_id": user_id, "name": name, "created_at": now, "updated_at": now, "is_ai_generated": is_ai_generated}
+            for name, _ in templates
+        ])
+        template_ids = newest_ids(db, WorkoutTemplate.id, WorkoutTemplate.user_id == user_id, len(templates))
+        rows = [WorkoutTemplate(id=template_id, user_id=user_id, name=name, created_at=now, updated_at=now,
+                                is_ai_generated=is_ai_generated)
+                for template_id, (name, _) in zip(template_ids, templates)]
+
+        specs, exercise_ids, known = _resolve_specs(db, [spec for _, exercises in templates for spec in exercises],
+                                                    user_id)
+        # _resolve_specs drops unnamed specs; split the kept ones back per template
+        kept = {id(spec) for spec in specs}
+        owners, orders, per_template = [], [], []
+        for template, (_, exercises) in zip(rows, templates):
+            count = sum(1 for spec in exercises if id(spec) in kept)
+            owners.extend([template.id] * count)
+            orders.extend(range(count))
+            per_template.append(count)
+
+        row_ids = _insert_rows(db, owners, specs, exercise_ids, orders)
+        set_ids = _set_ids(db, row_ids)
+        reads, start = [], 0
+        for template, count in zip(rows, per_template):
+            end = start + count
+            reads.append(_read_model(db, template, specs[start:end], exercise_ids[start:end], row_ids[start:end],
+                                     known, set_ids))
+            start = end
+        db.commit()
+        sets = sum(len(spec.sets) for spec in specs)
+        _record_writes(TemplateDiff(exercises_inserted=len(row_ids), sets_inserted=sets))
+        logger.info(f"Saved template(s) {', '.join(map(str, template_ids))} ({len(row_ids)} exercises, {sets} sets)")
+    except Exception:
+        db.rollback()
+        raise
+    return reads
+
+
+@dataclass
+class TemplateDiff:
+    """Rows touched by one template write."""
+    exercises_inserted: int = 0
+    exercises_deleted: int = 0
+    exercises_reordered: int = 0
+    sets_inserted: int = 0
+    sets_updated: int = 0
+    sets_deleted: int = 0
+
+    @property
+    def rows_written(self) -> int:
+        return (self.exercises_inserted + self.exercises_deleted + self.exercises_reordered
+                + self.sets_inserted + self.sets_updated + self.sets_deleted)
+
+
+def _record_writes(diff: TemplateDiff):
+    from backend import metrics
+
+    for table, op, count in (
+        ("templateexercise", "insert", diff.exercises_inserted),
+        ("templateexercise", "delete", diff.exercises_deleted),
+        ("templateexercise", "update", diff.exercises_reordered),
+        ("templateset", "insert", diff.sets_inserted),
+        ("templateset", "update", diff.sets_updated),
+        ("templateset", "delete", diff.sets_deleted),
+    ):
+        if count:
+            metrics.TEMPLATE_ROWS_WRITTEN.inc(count, table=table, op=op)
+
+
+def update_template_in_place(db: Session, template: WorkoutTemplate, user_id: int, name: str,
+                    exercises: List[ExerciseSpec]) -> Tuple[WorkoutTemplateRead, TemplateDiff]:
+    """Apply only the changes between the stored template and ``exercises``, in one transaction.
+
+    Submitted exercises are matched to stored rows by exercise id (repeats
+    pair up in order), so unchanged rows and their sets keep their ids. A
+    matched row is updated if its position changed; its sets are compared
+    by position and updated, appended or trimmed. Unmatched stored rows are
+    deleted and unmatched submitted exercises inserted.
+    """
+    diff = TemplateDiff()
+    try:
+        specs, exercise_ids, known = _resolve_specs(db, exercises, user_id)
+
+        stored = db.exec(
+            select(TemplateExercise.id, TemplateExercise.exercise_id, TemplateExercise.order)
+            .where(TemplateExercise.template_id == template.id)
+            .order_by(TemplateExercise.order, TemplateExercise.id)
+        ).all()
+        stored_sets: Dict[int, list] = {}
+        if stored:
+            for set_id, row_id, weight, reps in db.exec(
+                select(TemplateSet.id, TemplateSet.template_exercise_id, TemplateSet.goal_weight, TemplateSet.goal_reps)
+                .where(TemplateSet.template_exercise_id.in_([row.id for row in stored]))
+                .order_by(TemplateSet.id)
+            ):
+                stored_sets.setdefault(row_id, []).append((set_id, weight, reps))
+
+        unmatched: Dict[int, Deque] = {}
+        for row in stored:
+            unmatched.setdefault(row.exercise_id, deque()).append(row)
+
+        row_ids: List[Optional[int]] = []
+        reorders, set_updates, set_inserts, set_deletes = [], [], [], []
+        for order, (spec, exercise_id) in enumerate(zip(specs, exercise_ids)):
+            candidates = unmatched.get(exercise_id)
+            if not candidates:
+                row_ids.append(None)
+                continue
+            row = candidates.popleft()
+            row_ids.append(row.id)
+            if row.order != order:
+                reorders.append({"id": row.id, "order": order})
+            old_sets = stored_sets.get(row.id, [])
+            for (set_id, weight, reps), new in zip(old_sets, spec.sets):
+                if (weight, reps) != (new.goal_weight, new.goal_reps):
+                    set_updates.append({"id": set_id, "goal_weight": new.goal_weight, "goal_reps": new.goal_reps})
+            set_deletes.extend(set_id for set_id, _, _ in old_sets[len(spec.sets):])
+            set_inserts.extend(
+                {"template_exercise_id": row.id, "goal_weight": s.goal_weight, "goal_reps": s.goal_reps}
+                for s in spec.sets[len(old_sets):]
+            )
+
+        removed = [row.id for rows in unmatched.values() for row in rows]
+        set_deletes.extend(set_id for row_id in removed for set_id, _, _ in stored_sets.get(row_id, []))
+        if set_deletes:
+            db.execute(delete(TemplateSet).where(TemplateSet.id.in_(set_deletes)))
+        if removed:
+            db.execute(delete(TemplateExercise).where(TemplateExercise.id.in_(removed)))
+        if reorders:
+            db.execute(update(TemplateExercise), reorders)  # executemany by primary key
+        if set_updates:
+            db.execute(update(TemplateSet), set_updates)
+        if set_inserts:
+            db.execute(insert(TemplateSet), set_inserts)
+
+        new_positions = [i for i, row_id in enumerate(row_ids) if row_id is None]
+        new_ids = _insert_rows(db, [template.id] * len(new_positions), [specs[i] for i in new_positions],
+                               [exercise_ids[i] for i in new_positions], new_positions)
+        for i, row_id in zip(new_positions, new_ids):
+            row_ids[i] = row_id
+
+        template.name = name
+        template.updated_at = datetime.utcnow()
+        db.add(template)
+        db.flush()
+        read = _read_model(db, template, specs, exercise_ids, row_ids, known)
+        db.commit()
+
+        diff.exercises_inserted = len(new_ids)
+        diff.exercises_deleted = len(removed)
+        diff.exercises_reordered = len(reorders)
+        diff.sets_inserted = len(set_inserts) + sum(len(specs[i].sets) for i in new_positions)
+        diff.sets_updated = len(set_updates)
+        diff.sets_deleted = len(set_deletes)
+        _record_writes(diff)
+        logger.info(f"Updated template {template.id}: {diff}")
+    except Exception:
+        db.rollback()
+        raise
+    db.expire(template, ["exercises"])
+    return read, diff
+
+
+def load_exercises(db: Session, exercise_ids: Iterable[int], user_id: int) -> Dict[int, Exercise]:
+    """Exercises by id that ``user_id`` may use (global or their own), in one query."""
+    ids = set(exercise_ids)
+    if not ids:
+        return {}
+    return {e.id: e for e in db.exec(
+        select(Exercise).where(Exercise.id.in_(ids))
+        .where((Exercise.user_id == None) | (Exercise.user_id == user_id))  # noqa: E711
+    )}
+
+
+def _set_ids(db: Session, row_ids: List[int]) -> Dict[int, List[int]]:
+    """TemplateSet ids per TemplateExercise row, in one query."""
+    set_ids: Dict[int, List[int]] = {}
+    if row_ids:
+        for set_id, row_id in db.exec(
+            select(TemplateSet.id, TemplateSet.template_exercise_id)
+            .where(TemplateSet.template_exercise_id.in_(row_ids))
+            .order_by(TemplateSet.id)
+        ):
+            set_ids.setdefault(row_id, []).append(set_id)
+    return set_ids
+
+
+def _read_model(db: Session, template: WorkoutTemplate, specs: List[ExerciseSpec], exercise_ids: List[int],
+                row_ids: List[int], exercises: Dict[int, Exercise],
+                set_ids: Optional[Dict[int, List[int]]] = None) -> WorkoutTemplateRead:
+    """WorkoutTemplateRead from the rows just written (set ids come from one query unless given)."""
+    if set_ids is None:
+        set_ids = _set_ids(db, row_ids)
+    return WorkoutTemplateRead(
+        id=template.id,
+        name=template.name,
+        created_at=template.created_at,
+        updated_at=template.updated_at,
+        exercises=[
+            TemplateExerciseRead(
+                id=row_id,
+                order=order,
+                exercise=ExerciseRead.model_validate(exercises[ex_id]),
+                sets=[TemplateSetRead(id=set_id, goal_weight=s.goal_weight, goal_reps=s.goal_reps)
+                      for set_id, s in zip(set_ids.get(row_id, []), spec.sets)],
+            )
+            for order, (spec, ex_id, row_id) in enumerate(zip(specs, exercise_ids, row_ids))
+        ],
+    )
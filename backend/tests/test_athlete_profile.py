@@ -0,0 +1,89 @@
+import json
+from datetime import datetime, timedelta
+
+from fastapi.testclient import TestClient
+from sqlmodel import Session, select
+
+from backend import athlete_profile
+from backend.models import AthleteProfile, Exercise
+from backend.routers import coach
+
+NOW = datetime(2026, 3, 2, 12, 0)
+
+
+def _squat(weight, reps=5):
+    return {"name": "Squat", "category": "Legs", "sets": [{"weight": weight, "reps": reps}] * 3}
+
+
+def test_digest_reports_prs_trends_and_weak_points():
+    data = {}
+    for i, weight in enumerate([100, 102.5, 105, 110]):
+        athlete_profile.apply_session(data, NOW - timedelta(days=21 - 7 * i), [
+            _squat(weight),
+            {"name": "Bench Press", "category": "Chest", "sets": [{"weight": 80, "reps": 5}] * 3},
+            {"name": "Pull Up", "category": "Back", "sets": [{"weight": 0, "reps": 8}] * 3},
+        ])
+
+    digest = athlete_profile.render_digest(data, 4, now=NOW)
+    assert digest.startswith("## Athlete profile")
+    assert "4 sessions" in digest and "1.0 sessions/week" in digest
+    assert "Squat: 110 kg × 5 · e1RM 128.3 kg (PR 110 kg × 5, 2026-03-02) · ↑ +6%" in digest
+    assert "Bench Press: 80 kg × 5" in digest and "· flat" in digest
+    assert "Pull Up: 8 reps · best 8 reps" in digest
+    assert "Weak points (last 4 weeks): arms (0% of sets), core (0% of sets), shoulders (0% of sets)" in digest
+    assert len(digest) < 1200
+
+
+def test_profile_is_maintained_on_session_writes(client: TestClient, auth_headers: dict,
+                                                 session: Session, test_user):
+    squat = Exercise(name="Squat", category="Legs")
+    session.add(squat)
+    session.commit()
+    session.refresh(squat)
+
+    ids = []
+    for days_ago, weight in [(14, 100), (7, 105), (0, 95)]:
+        response = client.post("/sessions/", json={
+            "date": (datetime.utcnow() - timedelta(days=days_ago)).isoformat(),
+            "duration_seconds": 3600,
+            "exercises": [{"exercise_id": squat.id, "sets": [{"weight": weight, "reps": 5}]}],
+        }, headers=auth_headers)
+        ids.append(response.json()["id"])
+
+    profile = session.exec(select(AthleteProfile).where(AthleteProfile.user_id == test_user.id)).one()
+    lift = json.loads(profile.data)["lifts"]["Squat"]
+    assert profile.sessions_count == 3
+    assert lift["pr_weight"] == 105 and lift["working_weight"] == 95
+
+    # Incremental updates match a full rebuild
+    incremental = profile.data
+    assert athlete_profile.rebuild_profile(session, test_user.id).data == incremental
+
+    client.delete(f"/sessions/{ids[1]}", headers=auth_headers)
+    session.refresh(profile)
+    assert profile.sessions_count == 2
+    assert json.loads(profile.data)["lifts"]["Squat"]["pr_weight"] == 100
+
+
+def test_chat_prompt_includes_profile(client: TestClient, auth_headers: dict, session: Session,
+                                      test_user, monkeypatch):
+    prompts = []
+
+    async def fake_stream(messages, system_prompt, user_id=1, saved_templates=None):
+        prompts.append(system_prompt)
+        yield "ok"
+
+    monkeypatch.setattr(coach, "stream_web_llm", fake_stream)
+    client.post("/coach/chat", json={"question": "hi"}, headers=auth_headers)
+    assert "Athlete profile" not in prompts[0]
+
+    squat = Exercise(name="Squat", category="Legs")
+    session.add(squat)
+    session.commit()
+    session.refresh(squat)
+    client.post("/sessions/", json={
+        "date": datetime.utcnow().isoformat(), "duration_seconds": 3600,
+        "exercises": [{"exercise_id": squat.id, "sets": [{"weight": 100, "reps": 5}]}],
+    }, headers=auth_headers)
+    client.post("/coach/chat", json={"question": "hi"}, headers=auth_headers)
+    assert "## Athlete profile" in prompts[1] and "Squat: 100 kg × 5" in prompts[1]
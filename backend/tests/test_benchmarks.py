@@ -0,0 +1,35 @@
+import json
+
+from fastapi.testclient import TestClient
+
+from backend.benchmarks import stub_llm_server
+from backend.benchmarks.load_coach import parse_histogram, percentile
+
+
+def _events(response):
+    return [json.loads(line[6:]) for line in response.text.splitlines()
+            if line.startswith("data: ") and line != "data: [DONE]"]
+
+
+def test_stub_streams_tool_call_deltas_then_content(monkeypatch):
+    monkeypatch.setattr(stub_llm_server, "CONFIG", stub_llm_server.StubConfig(ttft_ms=0, tokens_per_sec=10_000, response_tokens=5))
+    client = TestClient(stub_llm_server.app)
+    tools = [{"type": "function", "function": {"name": "x"}}]
+
+    first = _events(client.post("/v1/chat/completions", json={"messages": [], "tools": tools}))
+    deltas = [e["choices"][0]["delta"]["tool_calls"][0] for e in first if e["choices"] and e["choices"][0]["delta"]]
+    assert deltas[0]["function"]["name"] == "get_training_recommendations"
+    assert json.loads("".join(d["function"]["arguments"] for d in deltas)) == {}
+
+    done = [{"role": "tool", "content": "ok"}] * len(stub_llm_server.TOOL_SCRIPT)
+    final = _events(client.post("/v1/chat/completions", json={"messages": done, "tools": tools}))
+    text = "".join(e["choices"][0]["delta"].get("content", "") for e in final if e["choices"])
+    assert len(text.split()) == 5
+    assert final[-1]["usage"]["completion_tokens"] == 5
+
+
+def test_report_helpers():
+    assert percentile([], 50) is None
+    assert percentile([1, 2, 3, 4], 50) in (2, 3)
+    text = 'x_bucket{le="0.05"} 3\nx_bucket{le="+Inf"} 4\nx_sum 0.5\nx_count 4\n'
+    assert parse_histogram(text, "x") == (0.5, 4.0, {"0.05": 3.0, "+Inf": 4.0})
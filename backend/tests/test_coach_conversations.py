@@ -0,0 +1,148 @@
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlmodel import Session, select
+
+from backend import conversation_store
+from backend.models import Conversation, ConversationMessage
+from backend.routers import coach
+
+
+@pytest.fixture(name="fake_llm")
+def fake_llm_fixture(monkeypatch):
+    """Replace the web LLM with a stub that records the messages it was given."""
+    calls = []
+
+    async def fake_stream(messages, system_prompt, user_id=1, saved_templates=None):
+        calls.append({"messages": list(messages), "system_prompt": system_prompt})
+        yield "Great "
+        yield "question!"
+
+    monkeypatch.setattr(coach, "stream_web_llm", fake_stream)
+    return calls
+
+
+def parse_events(response):
+    return [json.loads(line[6:]) for line in response.text.splitlines() if line.startswith("data: ")]
+
+
+def test_chat_creates_conversation_and_stores_turns(client: TestClient, auth_headers: dict,
+                                                     session: Session, fake_llm):
+    response = client.post("/coach/chat", json={"question": "How do I improve?"}, headers=auth_headers)
+    assert response.status_code == 200
+    events = parse_events(response)
+    assert events[0]["type"] == "conversation"
+    conversation_id = events[0]["id"]
+
+    # Second turn only sends the new question
+    response = client.post(
+        "/coach/chat",
+        json={"question": "And my squat?", "conversation_id": conversation_id},
+        headers=auth_headers,
+    )
+    assert response.status_code == 200
+    history = fake_llm[1]["messages"]
+    assert ("human", "How do I improve?") in history
+    assert ("ai", "Great question!") in history
+    assert history[-1] == ("human", "And my squat?")
+
+    messages = session.exec(
+        select(ConversationMessage).where(ConversationMessage.conversation_id == conversation_id)
+    ).all()
+    assert [m.role for m in messages] == ["user", "assistant", "user", "assistant"]
+
+    detail = client.get(f"/coach/conversations/{conversation_id}", headers=auth_headers).json()
+    assert detail["title"] == "How do I improve?"
+    assert len(detail["messages"]) == 4
+
+
+def test_unknown_conversation_is_404(client: TestClient, auth_headers: dict, fake_llm):
+    response = client.post("/coach/chat", json={"question": "hi", "conversation_id": 999}, headers=auth_headers)
+    assert response.status_code == 404
+
+
+def test_compaction_folds_old_turns_into_summary(session: Session, test_user):
+    conversation = conversation_store.create_conversation(session, test_user.id, "Plan my week")
+    for i in range(conversation_store.COMPACT_AFTER + 2):
+        role = "user" if i % 2 == 0 else "assistant"
+        conversation_store.append_message(session, conversation, role, f"Message {i}. More detail here.")
+
+    assert conversation_store.compact(session, conversation)
+    summary, history = conversation_store.prompt_history(session, conversation)
+    assert len(history) == conversation_store.KEEP_RECENT
+    assert "- User: Message 0." in summary
+    assert "More detail" not in summary
+
+    # Nothing new to fold: the prompt prefix stays stable
+    assert not conversation_store.compact(session, conversation)
+    assert session.get(Conversation, conversation.id).summary == summary
+
+
+def test_split_assistant_output_strips_think_and_template_blocks():
+    content, thinking = conversation_store.split_assistant_output(
+        "<think>plan it</think>Do squats.<workout_template>{}</workout_template>"
+    )
+    assert content == "Do squats."
+    assert thinking == "plan it"
+
+
+def test_deleted_turns_are_not_replayed(client: TestClient, auth_headers: dict, session: Session, fake_llm):
+    events = parse_events(client.post("/coach/chat", json={"question": "Bench tips?"}, headers=auth_headers))
+    conversation_id = events[0]["id"]
+    user_id, assistant_id = next(e["ids"] for e in events if e["type"] == "saved")
+
+    url = f"/coach/conversations/{conversation_id}/messages"
+    assert client.delete(f"{url}/{assistant_id}", headers=auth_headers).status_code == 200
+    assert client.delete(f"{url}/{user_id}", headers=auth_headers).status_code == 200
+    assert client.delete(f"{url}/{user_id}", headers=auth_headers).status_code == 404
+
+    client.post("/coach/chat", json={"question": "Squat tips?", "conversation_id": conversation_id},
+                headers=auth_headers)
+    assert fake_llm[1]["messages"][1:] == [("human", "Squat tips?")]
+
+
+def test_failed_turn_stores_nothing(client: TestClient, auth_headers: dict, session: Session, monkeypatch):
+    async def failing_stream(messages, system_prompt, user_id=1, saved_templates=None):
+        raise RuntimeError("provider down")
+        yield
+
+    monkeypatch.setattr(coach, "stream_web_llm", failing_stream)
+    events = parse_events(client.post("/coach/chat", json={"question": "Hello?"}, headers=auth_headers))
+    assert any(e["type"] == "error" for e in events)
+    assert session.exec(select(ConversationMessage)).all() == []
+
+
+def test_deleting_a_folded_message_rebuilds_the_summary(session: Session, test_user):
+    conversation = conversation_store.create_conversation(session, test_user.id, "Plan my week")
+    messages = [conversation_store.append_message(session, conversation, "user", f"Message {i}.")
+                for i in range(conversation_store.COMPACT_AFTER + 2)]
+    conversation_store.compact(session, conversation)
+
+    assert conversation_store.delete_message(session, conversation, messages[0].id)
+    assert "Message 0." not in conversation.summary
+    assert "- User: Message 1." in conversation.summary
+
+
+def test_system_prompt_stays_stable_across_turns(client: TestClient, auth_headers: dict, session: Session,
+                                                 fake_llm):
+    from backend.models import Exercise
+
+    squat = Exercise(name="Squat", category="Legs")
+    session.add(squat)
+    session.commit()
+    log = {"date": "2024-03-01T09:00:00", "duration_seconds": 3000,
+           "exercises": [{"exercise_id": squat.id, "sets": [{"weight": 100, "reps": 5, "completed": True}]}]}
+    assert client.post("/sessions/", json=log, headers=auth_headers).status_code == 200
+
+    events = parse_events(client.post("/coach/chat", json={"question": "How is my squat going?"},
+                                      headers=auth_headers))
+    client.post("/coach/chat", json={"question": "Any tips for sleep?", "conversation_id": events[0]["id"]},
+                headers=auth_headers)
+
+    first, second = fake_llm
+    assert first["system_prompt"] == second["system_prompt"]
+    assert "workout history" not in first["system_prompt"]
+    # Retrieved sessions ride along with the question; the stored history keeps it bare
+    assert "workout history" in first["messages"][-1][1] and first["messages"][-1][1].endswith("How is my squat going?")
+    assert ("human", "How is my squat going?") in second["messages"]
@@ -0,0 +1,81 @@
+from datetime import datetime, timedelta
+
+import httpx
+import pytest
+from sqlmodel import Session
+
+from backend import exercise_catalog, mcp_server, metrics
+from backend.models import CatalogLookup
+
+LIVE_RECORD = {
+    "id": "9999", "name": "nordic hamstring curl", "bodyPart": "upper legs", "target": "hamstrings",
+    "equipment": "barbell", "gifUrl": "https://v2.exercisedb.io/image/9999.gif",
+    "secondaryMuscles": ["abs"], "instructions": ["Walk."],
+}
+
+
+@pytest.fixture
+def catalog(session: Session):
+    engine = session.get_bind()
+    exercise_catalog.import_catalog(engine=engine)
+    return engine
+
+
+def test_import_and_search_the_dump(catalog):
+    hits = exercise_catalog.search("bench press", 5, catalog)
+    assert hits and all("bench" in h.name.lower() for h in hits)
+
+    core = exercise_catalog.search("core", 5, catalog)
+    assert len(core) == 5 and {h.body_part for h in core} == {"waist"}
+    assert core[0].media_url.startswith(exercise_catalog.IMAGE_BASE)
+
+    # Re-importing replaces rows instead of duplicating them
+    count = exercise_catalog.import_catalog(engine=catalog)
+    assert len(exercise_catalog.search("bench press", 500, catalog)) <= count
+
+
+def test_list_exercises_works_offline(catalog, monkeypatch):
+    monkeypatch.delenv("RAPID_API_KEY", raising=False)
+    monkeypatch.setattr(mcp_server, "engine", catalog)
+
+    result = mcp_server.list_exercises_logic("chest")
+    assert result.startswith("Found 10 exercises")
+    assert "BodyPart: chest" in result and "Visual: /media/" in result
+    assert "Visual: http" not in result  # remote media goes through the proxy
+    assert mcp_server.list_exercises_logic("qwertyuiop") == "No exercises found for 'qwertyuiop'."
+
+
+def test_live_lookup_is_read_through_with_ttl(catalog, monkeypatch):
+    monkeypatch.setenv("RAPID_API_KEY", "test")
+    calls = []
+
+    def fetch(query, limit):
+        calls.append(query)
+        return [LIVE_RECORD]
+
+    monkeypatch.setattr(exercise_catalog, "_fetch_live", fetch)
+    first = exercise_catalog.lookup("nordic", 10, catalog)
+    second = exercise_catalog.lookup("nordic", 10, catalog)
+    assert calls == ["nordic"]
+    assert [h.name for h in first] == [h.name for h in second] == ["nordic hamstring curl"]
+    assert first[0].source == "exercisedb"
+
+    with Session(catalog) as db:
+        db.get(CatalogLookup, "nordic").fetched_at = datetime.utcnow() - timedelta(
+            seconds=exercise_catalog.LIVE_TTL_S + 1)
+        db.commit()
+    exercise_catalog.lookup("nordic", 10, catalog)
+    assert calls == ["nordic", "nordic"]
+
+
+def test_live_failure_serves_local_results(catalog, monkeypatch):
+    monkeypatch.setenv("RAPID_API_KEY", "test")
+
+    def unreachable(query, limit):
+        raise httpx.ConnectError("offline")
+
+    monkeypatch.setattr(exercise_catalog, "_fetch_live", unreachable)
+    before = metrics.CATALOG_LOOKUPS.get(source="error")
+    hits = exercise_catalog.lookup("deadlift", 50, catalog)
+    assert hits and all("deadlift" in h.name.lower() for h in hits)
+    assert metrics.CATALOG_LOOKUPS.get(source="error") == before + 1
@@ -0,0 +1,83 @@
+from sqlmodel import Session, text
+
+from backend import exercise_resolver, migrate_exercise_names
+from backend.exercise_resolver import normalize_exercise_name, resolve
+from backend.models import Exercise
+
+
+def _add(session: Session, name: str, user_id=None) -> Exercise:
+    exercise = Exercise(name=name, category="Chest", user_id=user_id)
+    session.add(exercise)
+    session.commit()
+    session.refresh(exercise)
+    return exercise
+
+
+def _resolve(session: Session, name: str, user_id=None):
+    return resolve(session, [name], user_id).get(normalize_exercise_name(name))
+
+
+def test_exact_alias_and_fuzzy_matches(session: Session):
+    bench = _add(session, "Barbell Bench Press")
+    incline = _add(session, "Incline Bench Press")
+    curl = _add(session, "Dumbbell Curl")
+    _add(session, "Incline 30 Degree Press")
+    assert bench.normalized_name == "barbell bench press"
+
+    assert _resolve(session, "BARBELL bench-press") == exercise_resolver.Match(bench.id, "exact")
+    assert _resolve(session, "Bench press").how == "alias"
+    assert _resolve(session, "DB curls").exercise_id == curl.id
+    fuzzy = _resolve(session, "Incline bench")
+    assert (fuzzy.exercise_id, fuzzy.how) == (incline.id, "fuzzy")
+    assert _resolve(session, "Incline 45 Degree Press") is None  # numbers must agree
+
+
+def test_fuzzy_rejects_a_different_variant(session: Session):
+    incline = _add(session, "Incline Bench Press")
+    _add(session, "Front Squat")
+    _add(session, "Seated Dumbbell Shoulder Press")
+
+    assert _resolve(session, "Decline Bench Press") is None
+    assert _resolve(session, "Back Squat") is None
+    assert _resolve(session, "Standing Dumbbell Shoulder Press") is None
+    assert _resolve(session, "Cable Incline Bench Press") is None
+    # Spelling slips and plurals still resolve
+    assert _resolve(session, "Inclne Bench Press").exercise_id == incline.id
+    assert _resolve(session, "incline bench presses").exercise_id == incline.id
+
+
+def test_custom_exercises_are_scoped_to_their_user(session: Session):
+    mine = _add(session, "Landmine Press", user_id=1)
+    assert _resolve(session, "landmine press", user_id=1).exercise_id == mine.id
+    assert _resolve(session, "landmine press", user_id=2) is None
+    assert _resolve(session, "landmine press") is None
+
+
+def test_index_follows_commits_and_ignores_rollbacks(session: Session):
+    exercise_resolver.get_index(session)  # built before the writes below
+    sled = _add(session, "Sled Push")
+    assert _resolve(session, "sled push").exercise_id == sled.id
+
+    sled.name = "Prowler Push"
+    session.add(sled)
+    session.commit()
+    assert _resolve(session, "prowler push").exercise_id == sled.id
+    assert _resolve(session, "sled push") is None
+
+    session.add(Exercise(name="Sled Drag", category="Legs"))
+    session.flush()
+    session.rollback()
+    assert _resolve(session, "sled drag") is None
+
+    session.delete(sled)
+    session.commit()
+    assert _resolve(session, "prowler push") is None
+
+
+def test_migration_backfills_normalized_names(session: Session, monkeypatch):
+    monkeypatch.setattr(migrate_exercise_names, "engine", session.get_bind())
+    session.exec(text("INSERT INTO exercise (name, category, is_custom) VALUES ('Pull-Ups', 'Back', 0)"))
+    session.commit()
+    migrate_exercise_names.migrate_db()
+    migrate_exercise_names.migrate_db()
+    assert session.exec(text("SELECT normalized_name FROM exercise")).one()[0] == "pull ups"
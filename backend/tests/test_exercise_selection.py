@@ -0,0 +1,66 @@
+import json
+
+from sqlmodel import Session
+
+from backend import exercise_catalog, exercise_selection, mcp_server
+from backend.benchmarks import exercise_selection as selection_benchmark
+from backend.exercise_selection import SelectionIndex
+from backend.models import AthleteProfile
+
+CATALOG = [
+    ("Kettlebell Goblet Squat", "upper legs", "kettlebell", "compound", "strength"),
+    ("Kettlebell Swing", "upper legs", "kettlebells", "", "strength"),
+    ("Band Leg Curl", "upper legs", "bands", "isolation", "strength"),
+    ("Quad Stretch", "upper legs", "body only", "isolation", "stretching"),
+    ("Neck Flexion", "neck", "body only", "isolation", "strength"),
+]
+
+
+def _names(exercises):
+    return [e["name"] for e in exercises]
+
+
+def test_equipment_filter_and_catalog_candidates():
+    index = SelectionIndex(mcp_server.EXERCISE_DATABASE, CATALOG)
+    # Curated exercises keep their order, catalog entries follow
+    assert _names(index.candidates("legs", "compound", None, 3)) == ["Squat", "Front Squat", "Romanian Deadlift"]
+    assert _names(index.candidates("legs", "compound", ["kettlebell"])) == ["Lunge", "Kettlebell Goblet Squat"]
+    # Without a mechanic the name decides: no compound word, so an isolation exercise
+    assert _names(index.candidates("legs", "isolation", ["kettlebell"])) == ["Calf Raise", "Kettlebell Swing"]
+    assert _names(index.candidates("legs", "isolation", ["bands"])) == ["Calf Raise", "Band Leg Curl"]
+    assert index.group_of("Kettlebell Swing") == "legs" and index.group_of("Quad Stretch") is None
+    assert index.group_of("Anything", "Upper Chest") == "chest"
+
+
+def test_history_moves_trained_exercises_first():
+    index = SelectionIndex(mcp_server.EXERCISE_DATABASE, CATALOG)
+    history = {"front squat": 3, "leg press": 8, "kettlebell swing": 20}
+    assert _names(index.candidates("legs", "compound", ["barbell", "machine"], 3, history)) == [
+        "Leg Press", "Front Squat", "Squat",  # the swing needs a kettlebell
+    ]
+
+
+def test_design_uses_catalog_and_history(session: Session, test_user, monkeypatch, tmp_path):
+    engine = session.get_bind()
+    monkeypatch.setattr(mcp_server, "engine", engine)
+    plan = json.loads(mcp_server.design_workout_logic("legs", equipment=["kettlebell"]))
+    assert "Kettlebell Goblet Squat" not in _names(plan["exercises"])
+
+    dump = tmp_path / "exercises.json"
+    dump.write_text(json.dumps([{"id": "kgs", "name": "Kettlebell Goblet Squat", "primaryMuscles": ["quadriceps"],
+                                 "equipment": "kettlebells", "mechanic": "compound", "category": "strength"}]))
+    exercise_catalog.import_catalog(str(dump), engine)  # invalidates the selection index
+    plan = json.loads(mcp_server.design_workout_logic("legs", equipment=["kettlebell"]))
+    assert _names(plan["exercises"])[:2] == ["Lunge", "Kettlebell Goblet Squat"]
+
+    session.add(AthleteProfile(user_id=test_user.id, data=json.dumps({"lifts": {"Leg Press": {"sessions": 4}}})))
+    session.commit()
+    plan = json.loads(mcp_server.design_workout_logic("legs", user_id=test_user.id))
+    assert _names(plan["exercises"])[0] == "Leg Press"
+    assert exercise_selection.user_history(None, engine) == {}
+
+
+def test_benchmark_selection_is_sub_millisecond():
+    report = selection_benchmark.run(catalog=1500, runs=20)
+    assert report["exercises"] > 1500
+    assert report["indexed"] < 1.0
@@ -0,0 +1,69 @@
+from datetime import datetime, timedelta
+
+from fastapi.testclient import TestClient
+from sqlmodel import Session, select
+
+from backend import migrate_exercise_targets
+from backend.exercise_targets import suggest, working_sets
+from backend.models import Exercise, ExerciseTarget, WorkoutTemplate
+from backend.template_writer import ExerciseSpec, SetSpec, write_template
+
+
+def test_working_sets_and_suggestions():
+    sets = [(60, 10, True), (100, 5, True), (100, 5, True), (100, 4, False)]
+    assert working_sets(sets) == [(100, 5), (100, 5)]  # warm-up and the uncompleted set dropped
+    assert suggest([(100, 5), (100, 5)], 116.7, 5) == (102.5, 5)   # every set hit 5: add weight
+    assert suggest([(100, 5), (100, 4)], 116.7, 5) == (100, 5)     # repeat until it does
+    assert suggest([(100, 5), (100, 5)], 116.7, 10) == (85, 10)    # other rep range: from the e1RM
+    assert suggest([(0, 12)], 0, 12) == (0, 13)                    # bodyweight: one more rep
+
+
+def _log(client, headers, exercise_id, sets, days_ago=0):
+    payload = {"date": (datetime.now() - timedelta(days=days_ago)).isoformat(), "duration_seconds": 600,
+               "exercises": [{"exercise_id": exercise_id,
+                              "sets": [{"weight": w, "reps": r, "completed": True} for w, r in sets]}]}
+    response = client.post("/sessions/", json=payload, headers=headers)
+    assert response.status_code == 200
+    return response.json()["id"]
+
+
+def test_targets_follow_sessions_and_are_served_with_templates(client: TestClient, auth_headers: dict,
+                                                               session: Session, test_user):
+    squat = Exercise(name="Squat", category="Legs")
+    session.add(squat)
+    session.commit()
+    template = write_template(session, test_user.id, "Legs", [ExerciseSpec(exercise_id=squat.id,
+                                                                           sets=[SetSpec(0, 5)] * 3)])
+    assert client.get(f"/templates/{template.id}", headers=auth_headers).json()["exercises"][0]["target"] is None
+
+    first = _log(client, auth_headers, squat.id, [(100, 5)] * 3, days_ago=3)
+    _log(client, auth_headers, squat.id, [(60, 8), (80, 5)], days_ago=7)  # back-dated: ignored
+    target = client.get(f"/templates/{template.id}", headers=auth_headers).json()["exercises"][0]["target"]
+    assert target["e1rm"] == 116.7 and target["last_sets"] == [{"weight": 100, "reps": 5}] * 3
+    assert (target["suggested_weight"], target["suggested_reps"]) == (102.5, 5)
+
+    _log(client, auth_headers, squat.id, [(102.5, 5), (102.5, 3)])
+    listed = client.get("/templates/", headers=auth_headers).json()
+    assert listed[0]["exercises"][0]["target"]["suggested_weight"] == 102.5
+
+    # Deleting sessions recomputes the targets from what is left
+    client.delete(f"/sessions/{first}", headers=auth_headers)
+    stored = session.exec(select(ExerciseTarget)).one()
+    assert stored.suggested_weight == 102.5 and stored.e1rm == round(102.5 * (1 + 5 / 30), 1)
+
+
+def test_migration_builds_targets_for_existing_history(client: TestClient, auth_headers: dict, session: Session,
+                                                      monkeypatch):
+    monkeypatch.setattr(migrate_exercise_targets, "engine", session.get_bind())
+    bench = Exercise(name="Bench Press", category="Chest")
+    session.add(bench)
+    session.commit()
+    _log(client, auth_headers, bench.id, [(80, 8)] * 3)
+    for target in session.exec(select(ExerciseTarget)).all():
+        session.delete(target)
+    session.commit()
+
+    migrate_exercise_targets.migrate_db()
+    migrate_exercise_targets.migrate_db()
+    assert session.exec(select(ExerciseTarget.suggested_weight)).all() == [82.5]
+    assert session.exec(select(WorkoutTemplate)).all() == []
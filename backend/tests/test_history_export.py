@@ -0,0 +1,104 @@
+import csv
+import gzip
+import io
+import json
+import tracemalloc
+from datetime import datetime, timedelta
+
+import yaml
+from fastapi.testclient import TestClient
+from sqlmodel import Session
+
+from backend import history_export
+from backend.models import Exercise, SessionExercise, TrainingSession, TrainingSet, User
+from backend.template_writer import ExerciseSpec, SetSpec, write_template
+
+
+def _history(session: Session, user_id: int, sessions: int, sets: int = 3):
+    squat = Exercise(name="Squat", category="Legs")
+    session.add(squat)
+    session.commit()
+    start = datetime(2025, 1, 1)
+    for day in range(sessions):
+        training = TrainingSession(user_id=user_id, date=start + timedelta(days=day), duration_seconds=3600)
+        session.add(training)
+        session.flush()
+        row = SessionExercise(session_id=training.id, exercise_id=squat.id)
+        session.add(row)
+        session.flush()
+        session.add_all(TrainingSet(session_exercise_id=row.id, weight=100 + day, reps=5, completed=True)
+                        for _ in range(sets))
+    session.commit()
+    return squat
+
+
+def test_sets_export_round_trips_in_every_format(client: TestClient, auth_headers: dict, session: Session,
+                                                 test_user):
+    _history(session, test_user.id, 2)
+    other = User(name="Other", email="other@example.com", password_hash="x")
+    session.add(other)
+    session.commit()
+    session.add(TrainingSession(user_id=other.id, date=datetime(2025, 1, 1), duration_seconds=60))
+    session.commit()
+
+    response = client.get("/history/export/sets", headers=auth_headers)
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert len(rows) == 6 and rows[0]["exercise"] == "Squat" and rows[0]["date"] == "2025-01-01T00:00:00"
+    assert [r["weight"] for r in rows] == [100] * 3 + [101] * 3
+
+    response = client.get("/history/export/sets?format=csv", headers=auth_headers)
+    assert "sets-" in response.headers["content-disposition"]
+    assert list(csv.DictReader(io.StringIO(response.text)))[3]["weight"] == "101.0"
+
+    documents = list(yaml.safe_load_all(client.get("/history/export/sets?format=yaml", headers=auth_headers).text))
+    assert documents == rows
+
+    response = client.get("/history/export/sessions?format=ndjson&gzip=true", headers=auth_headers)
+    assert response.headers["content-type"] == "application/gzip"
+    assert response.headers["content-disposition"].endswith('.ndjson.gz"')
+    sessions = [json.loads(line) for line in gzip.decompress(response.content).decode().splitlines()]
+    assert [(s["exercises"], s["sets"]) for s in sessions] == [(1, 3), (1, 3)]
+
+    assert client.get("/history/export/passwords", headers=auth_headers).status_code == 422
+
+
+def test_template_export_reimports(client: TestClient, auth_headers: dict, session: Session, test_user):
+    squat = _history(session, test_user.id, 0)
+    write_template(session, test_user.id, "Legs", [ExerciseSpec(exercise_id=squat.id, sets=[SetSpec(100, 5)] * 2),
+                                                   ExerciseSpec(name="Lunge", category="Legs")])
+    text = client.get("/history/export/templates?format=yaml", headers=auth_headers).text
+    document = next(yaml.safe_load_all(text))
+    assert document == {"name": "Legs", "exercises": [
+        {"name": "Squat", "category": "Legs", "sets": [{"weight": 100, "reps": 5}] * 2},
+        {"name": "Lunge", "category": "Legs", "sets": []}]}
+    imported = client.post("/templates/import", headers=auth_headers, json={"yaml_content": text})
+    assert imported.status_code == 200 and len(imported.json()["exercises"]) == 2
+
+
+def _peak(engine, user_id: int):
+    """(peak traced memory, bytes, chunks) of a streamed YAML sets export."""
+    tracemalloc.start()
+    total, chunks = 0, 0
+    for chunk in history_export.stream_export(engine, user_id, "sets", "yaml"):
+        total, chunks = total + len(chunk), chunks + 1
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak, total, chunks
+
+
+def test_large_export_streams_in_bounded_memory(session: Session, test_user, monkeypatch):
+    monkeypatch.setattr(history_export, "BATCH_ROWS", 200)
+    monkeypatch.setattr(history_export, "CHUNK_BYTES", 16 * 1024)
+    engine = session.get_bind()
+    _history(session, test_user.id, 200, sets=5)
+    _peak(engine, test_user.id)  # warm the statement cache
+    small_peak, small_total, _ = _peak(engine, test_user.id)
+    _history(session, test_user.id, 800, sets=5)
+    peak, total, chunks = _peak(engine, test_user.id)
+
+    assert total > 4 * small_total and chunks >= 25
+    assert peak < small_peak * 1.5  # five times the rows, about the same peak
+
+    compressed = b"".join(history_export.stream_export(engine, test_user.id, "sets", "csv", True))
+    assert gzip.decompress(compressed).decode().count("\n") == 5001
@@ -0,0 +1,138 @@
+import gzip
+import io
+import json
+from datetime import datetime
+
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+from sqlmodel import Session, select
+
+from backend import history_export, history_import
+from backend.history_import import detect_format, parse_date, parse_seconds
+from backend.models import AthleteProfile, Exercise, ExerciseTarget, TrainingSession, TrainingSet, User
+
+STRONG_CSV = """Date,Workout Name,Duration,Exercise Name,Set Order,Weight,Reps,Distance,Seconds,Notes
+2024-03-01 18:00:00,Push,1h 5m,Bench Press (Barbell),1,60,10,0,0,
+2024-03-01 18:00:00,Push,1h 5m,Bench Press (Barbell),2,80,5,0,0,
+2024-03-01 18:00:00,Push,1h 5m,Zercher Squat,1,70,8,0,0,
+2024-03-04 18:30:00,Push,45m,Bench Press (Barbell),1,82.5,5,0,0,
+,Push,45m,Bench Press (Barbell),1,82.5,5,0,0,
+"""
+
+HEVY_CSV = """title,start_time,end_time,exercise_title,set_index,set_type,weight_lbs,reps,duration_seconds
+Legs,"5 Mar 2024, 07:00","5 Mar 2024, 08:00",Squat,0,normal,225,5,
+"""
+
+
+def _import(client, headers, content: bytes, filename: str, **params):
+    response = client.post("/history/import", headers=headers, params=params,
+                           files={"file": (filename, content)})
+    assert response.status_code == 200
+    return [json.loads(line) for line in response.text.splitlines()]
+
+
+def test_parsing_helpers():
+    assert parse_seconds("1h 5m") == 3900 and parse_seconds("45m") == 2700 and parse_seconds("1:30") == 90
+    assert parse_seconds(120) == 120 and parse_seconds("") == 0 and parse_seconds("soon") == 0
+    assert parse_date("5 Mar 2024, 07:00") == datetime(2024, 3, 5, 7)
+    assert parse_date("2024-03-05T07:00:00Z") == datetime(2024, 3, 5, 7)
+    assert parse_date("05.03.2024") == datetime(2024, 3, 5) and parse_date("someday") is None
+    assert detect_format("strong.csv.gz", b"\x1f\x8b") == "csv"
+    assert detect_format(None, b'{"date": 1}') == "ndjson" and detect_format("upload", b"---\n") == "yaml"
+
+
+def test_csv_import_maps_sessions_and_skips_duplicates(client: TestClient, auth_headers: dict, session: Session,
+                                                       test_user):
+    session.add(Exercise(name="Bench Press", category="Chest"))
+    session.commit()
+
+    updates = _import(client, auth_headers, STRONG_CSV.encode(), "strong.csv")
+    assert updates[-1] == {"rows": 5, "sessions": 2, "sets": 4, "exercises_created": 1, "duplicates": 0,
+                           "skipped": 1, "done": True}
+    sessions = session.exec(select(TrainingSession).order_by(TrainingSession.date)).all()
+    assert [(s.date, s.duration_seconds) for s in sessions] == [(datetime(2024, 3, 1, 18), 3900),
+                                                               (datetime(2024, 3, 4, 18, 30), 2700)]
+    first = {se.exercise.name: [(s.weight, s.reps, s.completed) for s in se.sets] for se in sessions[0].exercises}
+    assert first == {"Bench Press": [(60, 10, True), (80, 5, True)], "Zercher Squat": [(70, 8, True)]}
+
+    # Derived data follows the imported history
+    assert session.exec(select(AthleteProfile)).one().sessions_count == 2
+    bench = session.exec(select(Exercise).where(Exercise.name == "Bench Press")).one()
+    assert session.exec(select(ExerciseTarget).where(ExerciseTarget.exercise_id == bench.id)).one().suggested_weight == 85
+
+    # Re-importing the same file (gzipped this time) adds nothing
+    again = _import(client, auth_headers, gzip.compress(STRONG_CSV.encode()), "strong.csv.gz")
+    assert (again[-1]["sessions"], again[-1]["duplicates"]) == (0, 2)
+    assert len(session.exec(select(TrainingSet)).all()) == 4
+
+    hevy = _import(client, auth_headers, HEVY_CSV.encode(), "hevy.csv")[-1]
+    squat = session.exec(select(TrainingSession).where(TrainingSession.date == datetime(2024, 3, 5, 7))).one()
+    assert hevy["sets"] == 1 and squat.duration_seconds == 3600
+    assert squat.exercises[0].sets[0].weight == 102.06
+
+    broken = _import(client, auth_headers, b'{"date": "2024-04-01", "exercise": "Squat", "reps": 5}\n{oops\n',
+                     "broken.ndjson")
+    assert "Invalid ndjson" in broken[-1]["error"] and broken[-1]["done"]
+
+
+def test_export_import_round_trip_in_batches(client: TestClient, auth_headers: dict, session: Session, test_user):
+    squat = Exercise(name="Squat", category="Legs")
+    other = User(name="Other", email="other@example.com", password_hash="x")
+    session.add_all([squat, other])
+    session.commit()
+    for day in range(12):
+        _log = {"date": datetime(2024, 1, 1 + day, 9).isoformat(), "duration_seconds": 3000,
+                "exercises": [{"exercise_id": squat.id, "sets": [
+                    {"weight": 100 + day, "reps": 5, "completed": True, "rest_seconds": 120}] * 3}]}
+        assert client.post("/sessions/", json=_log, headers=auth_headers).status_code == 200
+    engine = session.get_bind()
+    exported = b"".join(history_export.stream_export(engine, test_user.id, "sets", "yaml"))
+
+    statements = []
+    listener = lambda conn, cursor, statement, *args: statements.append(statement)  # noqa: E731
+    event.listen(engine, "before_cursor_execute", listener)
+    try:
+        updates = list(history_import.import_history(engine, other.id, io.BytesIO(exported), "yaml", batch_sets=10))
+    finally:
+        event.remove(engine, "before_cursor_execute", listener)
+    assert [u["sets"] for u in updates] == [12, 24, 36, 36]  # three batches, then the summary
+    assert sum(s.startswith("INSERT INTO trainingset") for s in statements) == 3
+
+    def rows(user_id):
+        text = b"".join(history_export.stream_export(engine, user_id, "sets", "ndjson")).decode()
+        return [{k: v for k, v in json.loads(line).items() if k != "session_id"} for line in text.splitlines()]
+
+    assert rows(other.id) == rows(test_user.id)
+    assert session.exec(select(Exercise).where(Exercise.name == "Squat")).all() == [squat]
+
+
+def test_failures_keep_written_batches_and_rebuild_derived_data(session: Session, test_user, monkeypatch):
+    engine = session.get_bind()
+    rows = b"".join(json.dumps({"date": f"2024-05-0{day}", "exercise": "Squat", "weight": 100, "reps": 5}).encode()
+                    + b"\n" for day in range(1, 4))
+    nested = b'{"date": "2024-05-09", "exercise": "Squat", "weight": {"kg": 100}, "reps": 5}\n'
+
+    summary = list(history_import.import_history(engine, test_user.id, io.BytesIO(nested), "ndjson"))[-1]
+    assert "error" not in summary and summary["sets"] == 1
+
+    write_batch, calls = history_import.write_batch, []
+
+    def failing_write(*args):
+        calls.append(1)
+        if len(calls) == 2:
+            raise RuntimeError("disk full")
+        write_batch(*args)
+
+    monkeypatch.setattr(history_import, "write_batch", failing_write)
+    summary = list(history_import.import_history(engine, test_user.id, io.BytesIO(rows), "ndjson", batch_sets=1))[-1]
+    assert summary["error"] == "Import failed: disk full" and summary["sessions"] == 1 and summary["done"]
+    assert session.exec(select(AthleteProfile)).one().sessions_count == 2
+
+    # A client that stops reading after the first batch still gets its derived data rebuilt
+    monkeypatch.setattr(history_import, "write_batch", write_batch)
+    updates = history_import.import_history(engine, test_user.id, io.BytesIO(rows), "ndjson", batch_sets=1)
+    assert next(updates)["sessions"] == 0  # 2024-05-01 was imported above
+    assert next(updates)["sessions"] == 1
+    updates.close()
+    session.expire_all()
+    assert session.exec(select(AthleteProfile)).one().sessions_count == 3
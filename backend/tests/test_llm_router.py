@@ -0,0 +1,223 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from backend.llm_router import LLMRouter, LLMUnavailableError, Provider
+
+
+def stub_provider(tokens=("Hello", " world"), first_token_delay=0.0, status=200,
+                  fail_after=None, tool_call=None):
+    """Behaviour of a local OpenAI-compatible stub with injectable latency/errors."""
+    return {
+        "tokens": tokens,
+        "first_token_delay": first_token_delay,
+        "status": status,
+        "fail_after": fail_after,
+        "tool_call": tool_call,
+    }
+
+
+def stub_transport(behaviours: dict, calls: list):
+    """Route requests by host to the configured stub behaviour."""
+
+    async def handler(request: httpx.Request):
+        host = request.url.host
+        calls.append(host)
+        b = behaviours[host]
+        if b["status"] != 200:
+            return httpx.Response(b["status"], content=b"upstream error")
+
+        async def body():
+            await asyncio.sleep(b["first_token_delay"])
+            if b["tool_call"]:
+                delta = {"tool_calls": [{"index": 0, "id": "call_1", "function": b["tool_call"]}]}
+                yield f"data: {json.dumps({'choices': [{'delta': delta}]})}\n\n".encode()
+            for i, tok in enumerate(b["tokens"]):
+                if b["fail_after"] is not None and i >= b["fail_after"]:
+                    yield f"data: {json.dumps({'error': {'message': 'stub failure'}})}\n\n".encode()
+                    return
+                yield f"data: {json.dumps({'choices': [{'delta': {'content': tok}}]})}\n\n".encode()
+            yield b"data: [DONE]\n\n"
+
+        return httpx.Response(200, content=body())
+
+    return httpx.MockTransport(handler)
+
+
+def make_router(behaviours, calls, **kwargs):
+    providers = [
+        Provider(name=host.split(".")[0], url=f"http://{host}/v1/chat/completions",
+                 model="stub", supports_tools=True)
+        for host in behaviours
+    ]
+    return LLMRouter(providers, transport=stub_transport(behaviours, calls), **kwargs)
+
+
+async def collect(router, tools=None):
+    events = []
+    async for event in router.stream([{"role": "user", "content": "hi"}], tools=tools):
+        events.append(event)
+    return events
+
+
+def content_of(events):
+    return "".join(e["text"] for e in events if e["type"] == "content")
+
+
+def test_streams_from_primary_and_records_ttft():
+    calls = []
+    router = make_router({"primary.test": stub_provider(first_token_delay=0.01)}, calls)
+    events = asyncio.run(collect(router))
+    assert content_of(events) == "Hello world"
+    assert events[0]["provider"] == "primary"
+    stats = router.snapshot()[0]
+    assert stats["ttft_p50"] is not None and stats["error_rate"] == 0.0
+
+
+def test_fails_over_on_error_status():
+    calls = []
+    router = make_router({
+        "primary.test": stub_provider(status=500),
+        "backup.test": stub_provider(tokens=("ok",)),
+    }, calls)
+    events = asyncio.run(collect(router))
+    assert content_of(events) == "ok"
+    assert calls == ["primary.test", "backup.test"]
+    assert router.snapshot()[0]["error_rate"] == 1.0
+
+
+def test_breaker_opens_and_skips_provider():
+    calls = []
+    router = make_router({
+        "primary.test": stub_provider(status=503),
+        "backup.test": stub_provider(tokens=("ok",)),
+    }, calls, breaker_threshold=2, breaker_cooldown=60)
+    for _ in range(3):
+        asyncio.run(collect(router))
+    assert calls.count("primary.test") == 2
+    assert router.snapshot()[0]["breaker"] == "open"
+
+
+def test_half_open_breaker_hands_out_one_probe():
+    from backend.llm_router import CircuitBreaker
+
+    breaker = CircuitBreaker(failure_threshold=1, cooldown=0)
+    breaker.record_failure()
+    assert breaker.available() and breaker.state == "open"  # reading does not change state
+    assert breaker.allow() and breaker.state == "half_open"
+    assert not breaker.allow() and not breaker.available()  # probe in flight
+    breaker.release()
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == "closed" and breaker.allow() and breaker.allow()
+
+    calls = []
+    router = make_router({
+        "primary.test": stub_provider(status=503),
+        "backup.test": stub_provider(tokens=("ok",)),
+    }, calls, breaker_threshold=1, breaker_cooldown=0)
+    asyncio.run(collect(router))
+    router.candidates()
+    router.candidates()
+    assert router.snapshot()[0]["breaker"] == "open"  # ranking never moves a breaker
+
+
+def test_tool_loop_skips_providers_without_tools():
+    calls = []
+    router = make_router({
+        "primary.test": stub_provider(status=500),
+        "plain.test": stub_provider(tokens=("ok",)),
+    }, calls)
+    router.providers[1].supports_tools = False
+    messages = [{"role": "user", "content": "hi"},
+                {"role": "assistant", "content": None, "tool_calls": [{"id": "call_1"}]},
+                {"role": "tool", "tool_call_id": "call_1", "content": "[]"}]
+    assert [p.name for p in router.candidates([{"type": "function"}], messages)] == ["primary"]
+
+    async def run():
+        return [e async for e in router.stream(messages, tools=[{"type": "function"}])]
+
+    with pytest.raises(LLMUnavailableError):
+        asyncio.run(run())
+    assert calls == ["primary.test"]
+
+
+def test_hedges_slow_primary_and_cancels_loser():
+    calls = []
+    router = make_router({
+        "slow.test": stub_provider(tokens=("slow",), first_token_delay=1.0),
+        "fast.test": stub_provider(tokens=("fast",)),
+    }, calls, hedge_after=0.05)
+
+    async def run():
+        start = asyncio.get_running_loop().time()
+        events = await collect(router)
+        return events, asyncio.get_running_loop().time() - start
+
+    events, elapsed = asyncio.run(run())
+    assert content_of(events) == "fast"
+    assert elapsed < 0.5
+    assert calls == ["slow.test", "fast.test"]
+
+
+def test_mid_stream_failure_after_tool_deltas_fails_over_with_reset():
+    calls = []
+    router = make_router({
+        "primary.test": stub_provider(tokens=("x",), fail_after=0,
+                                      tool_call={"name": "list_exercises", "arguments": "{"}),
+        "backup.test": stub_provider(tokens=("ok",)),
+    }, calls)
+    events = asyncio.run(collect(router, tools=[{"type": "function"}]))
+    types = [e["type"] for e in events]
+    assert "reset" in types
+    assert types.index("reset") > types.index("tool_call")
+    assert content_of(events) == "ok"
+
+
+def test_failure_after_content_is_not_retried():
+    calls = []
+    router = make_router({
+        "primary.test": stub_provider(tokens=("a", "b"), fail_after=1),
+        "backup.test": stub_provider(tokens=("ok",)),
+    }, calls)
+    with pytest.raises(LLMUnavailableError):
+        asyncio.run(collect(router))
+    assert calls == ["primary.test"]
+
+
+def test_cancelled_consumer_aborts_upstream_request():
+    from backend import metrics
+
+    closed = []
+
+    async def handler(request):
+        async def body():
+            try:
+                for i in range(1000):
+                    yield f"data: {json.dumps({'choices': [{'delta': {'content': str(i)}}]})}\n\n".encode()
+                    await asyncio.sleep(0.005)
+            finally:
+                closed.append(True)
+        return httpx.Response(200, content=body())
+
+    router = LLMRouter([Provider(name="cancelme", url="http://cancelme.test/v1/chat/completions", model="stub")],
+                       transport=httpx.MockTransport(handler))
+    before = metrics.LLM_REQUESTS.get(provider="cancelme", model="stub", outcome="cancelled")
+
+    async def consume():
+        async for event in router.stream([{"role": "user", "content": "hi"}]):
+            pass
+
+    async def run():
+        task = asyncio.create_task(consume())
+        await asyncio.sleep(0.05)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        await asyncio.sleep(0.01)
+
+    asyncio.run(run())
+    assert closed == [True]
+    assert metrics.LLM_REQUESTS.get(provider="cancelme", model="stub", outcome="cancelled") == before + 1
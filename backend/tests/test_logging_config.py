@@ -0,0 +1,79 @@
+import gzip
+import json
+import logging
+
+from fastapi.testclient import TestClient
+
+from backend import logging_config
+from backend.logging_config import JsonFormatter, log_trace, request_id_var, rotating_file_handler
+
+
+class _Capture(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+
+def _capture_logger(name):
+    logger = logging.getLogger(name)
+    handler = _Capture()
+    handler.addFilter(logging_config.RequestIdFilter())
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    return logger, handler
+
+
+def test_json_record_has_request_id_and_capped_payload(monkeypatch):
+    monkeypatch.setattr(logging_config, "PAYLOAD_MAX_CHARS", 50)
+    logger, handler = _capture_logger("test.json_record")
+    token = request_id_var.set("req-123")
+    try:
+        logger.info("hello", extra={"payload": "x" * 500, "iteration": 2})
+    finally:
+        request_id_var.reset(token)
+
+    entry = json.loads(JsonFormatter().format(handler.records[0]))
+    assert entry["request_id"] == "req-123"
+    assert entry["msg"] == "hello"
+    assert entry["iteration"] == 2
+    assert entry["payload"].startswith("x" * 50) and entry["payload"].endswith("(+450 chars)")
+
+
+def test_log_trace_samples_payload():
+    logger, handler = _capture_logger("test.trace")
+    messages = [{"role": "user", "content": "hi"}] * 3
+
+    log_trace(logger, "sampled", messages, sample_rate=1.0)
+    log_trace(logger, "skipped", messages, sample_rate=0.0)
+    messages.append({"role": "assistant", "content": "mutated later"})
+
+    sampled, skipped = handler.records
+    assert json.loads(sampled.payload) == messages[:3]
+    assert not hasattr(skipped, "payload") and skipped.payload_items == 3
+
+
+def test_rotated_files_are_gzipped(tmp_path):
+    path = tmp_path / "app.log"
+    handler = rotating_file_handler(str(path), max_bytes=200, backups=2)
+    handler.setFormatter(JsonFormatter())
+    logger = logging.getLogger("test.rotation")
+    logger.addHandler(handler)
+    logger.propagate = False
+    for i in range(20):
+        logger.warning(f"line {i} " + "y" * 40)
+    handler.close()
+
+    rotated = sorted(tmp_path.glob("app.log.*.gz"))
+    assert [p.name for p in rotated] == ["app.log.1.gz", "app.log.2.gz"]
+    first = gzip.decompress(rotated[0].read_bytes()).decode().splitlines()
+    assert json.loads(first[0])["level"] == "WARNING"
+
+
+def test_request_id_header_round_trip(client: TestClient):
+    response = client.get("/", headers={"X-Request-ID": "trace-me"})
+    assert response.headers["x-request-id"] == "trace-me"
+    assert len(client.get("/").headers["x-request-id"]) == 12
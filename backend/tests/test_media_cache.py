@@ -0,0 +1,115 @@
+import asyncio
+import os
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+from sqlmodel import Session
+
+from backend import media_cache, metrics
+from backend.models import MediaAsset
+
+GIF_URL = "https://v2.exercisedb.io/image/0001.gif"
+BODY = b"GIF89a" + bytes(range(256)) * 8
+
+
+@pytest.fixture
+def upstream(tmp_path, monkeypatch):
+    requests = []
+
+    def handler(request: httpx.Request):
+        requests.append(str(request.url))
+        if request.url.path.endswith("missing.gif"):
+            return httpx.Response(404)
+        if request.url.path.endswith("moved.gif"):
+            return httpx.Response(302, headers={"location": "http://169.254.169.254/latest/meta-data"})
+        return httpx.Response(200, content=BODY, headers={"content-type": "image/gif"})
+
+    cache = media_cache.MediaCache(str(tmp_path / "media"), max_bytes=10 * len(BODY),
+                                   transport=httpx.MockTransport(handler))
+    monkeypatch.setattr(media_cache, "cache", cache)
+    return requests
+
+
+def test_local_url_only_rewrites_allowed_remote_media(session: Session):
+    local = media_cache.local_url(session, GIF_URL)
+    assert local == media_cache.PREFIX + media_cache.media_key(GIF_URL) and local.endswith(".gif")
+    assert media_cache.local_url(session, GIF_URL) == local  # idempotent
+    session.commit()
+    assert session.get(MediaAsset, local[len(media_cache.PREFIX):]).url == GIF_URL
+
+    youtube = "https://www.youtube.com/watch?v=abc"
+    assert media_cache.local_url(session, youtube) == youtube
+    assert media_cache.local_url(session, local) == local
+    assert media_cache.local_url(session, None) is None
+
+
+def test_media_is_fetched_once_and_served_with_etag_and_range(client: TestClient, session: Session, upstream):
+    url = media_cache.local_url(session, GIF_URL)
+    session.commit()
+
+    first = client.get(url)
+    assert first.status_code == 200 and first.content == BODY
+    assert first.headers["content-type"] == "image/gif"
+    etag = first.headers["etag"]
+
+    cached = client.get(url, headers={"If-None-Match": etag})
+    assert cached.status_code == 304
+
+    partial = client.get(url, headers={"Range": "bytes=0-5"})
+    assert partial.status_code == 206 and partial.content == b"GIF89a"
+    assert partial.headers["content-range"] == f"bytes 0-5/{len(BODY)}"
+    assert upstream == [GIF_URL]
+
+
+def test_accel_redirect_hands_the_file_to_nginx(client: TestClient, session: Session, upstream, monkeypatch):
+    monkeypatch.setattr(media_cache, "ACCEL_PREFIX", "/media-cache/")
+    url = media_cache.local_url(session, GIF_URL)
+    session.commit()
+
+    response = client.get(url)
+    assert response.status_code == 200 and response.content == b""
+    assert response.headers["x-accel-redirect"] == "/media-cache/" + media_cache.media_key(GIF_URL)
+
+
+def test_errors_and_missing_posters(client: TestClient, session: Session, upstream, monkeypatch):
+    assert client.get("/media/not-a-key").status_code == 404
+    missing = media_cache.local_url(session, "https://v2.exercisedb.io/image/missing.gif")
+    session.commit()
+    assert client.get(missing).status_code == 502
+
+    monkeypatch.setattr(media_cache, "Image", None)
+    assert client.get(media_cache.local_url(session, GIF_URL) + "/poster").status_code == 404
+
+
+def test_redirects_off_the_allowed_hosts_are_refused(client: TestClient, session: Session, upstream):
+    moved = media_cache.local_url(session, "https://v2.exercisedb.io/image/moved.gif")
+    session.commit()
+    assert client.get(moved).status_code == 502
+    assert upstream == ["https://v2.exercisedb.io/image/moved.gif"]
+
+
+def test_lru_evicts_least_recently_used(session: Session, upstream):
+    cache = media_cache.cache
+    cache.max_bytes = 2 * len(BODY)
+    keys = [media_cache.local_url(session, f"https://v2.exercisedb.io/image/{i}.gif")[len(media_cache.PREFIX):]
+            for i in range(3)]
+    session.commit()
+    before = metrics.MEDIA_CACHE_EVICTIONS.get()
+
+    async def fetch(key):
+        return await cache.get(session, session.get(MediaAsset, key))
+
+    asyncio.run(fetch(keys[0]))
+    asyncio.run(fetch(keys[1]))
+    asyncio.run(fetch(keys[0]))  # hit: keys[1] is now the oldest
+    asyncio.run(fetch(keys[2]))
+
+    assert sorted(os.listdir(cache.directory)) == sorted([keys[0], keys[2]])
+    assert cache.total_bytes == 2 * len(BODY)
+    assert metrics.MEDIA_CACHE_EVICTIONS.get() == before + 1
+    assert len(upstream) == 3
+
+    # The order is rebuilt from the directory after a restart
+    restarted = media_cache.MediaCache(cache.directory, max_bytes=cache.max_bytes)
+    assert restarted.cached(keys[2]) and restarted.cached(keys[1]) is None
@@ -0,0 +1,48 @@
+import asyncio
+
+from fastapi.testclient import TestClient
+from sqlmodel import Session
+
+from backend import mcp_server, metrics
+from backend.routers.coach import _execute_tool_call
+from backend.tests.test_llm_router import collect, make_router, stub_provider
+
+
+def test_histogram_and_counter_render_prometheus_text():
+    hist = metrics.Histogram("test_latency_seconds", "Test latency.", ("tool",), buckets=(0.1, 1))
+    hist.observe(0.05, tool="a")
+    hist.observe(0.5, tool="a")
+    counter = metrics.Counter("test_events_total", "Test events.", ("kind",))
+    counter.inc(kind='we"ird')
+
+    text = metrics.render()
+    assert "# TYPE test_latency_seconds histogram" in text
+    assert 'test_latency_seconds_bucket{tool="a",le="0.1"} 1' in text
+    assert 'test_latency_seconds_bucket{tool="a",le="+Inf"} 2' in text
+    assert 'test_latency_seconds_count{tool="a"} 2' in text
+    assert 'test_events_total{kind="we\\"ird"} 1' in text
+
+
+def test_router_records_ttft_and_throughput_per_provider():
+    before = metrics.LLM_TTFT.count(provider="metricsprimary", model="stub")
+    router = make_router({"metricsprimary.test": stub_provider(tokens=("a", "b", "c"))}, [])
+    asyncio.run(collect(router))
+
+    assert metrics.LLM_TTFT.count(provider="metricsprimary", model="stub") == before + 1
+    assert metrics.LLM_TOKENS.get(provider="metricsprimary", model="stub", kind="completion") >= 3
+    assert metrics.LLM_REQUESTS.get(provider="metricsprimary", model="stub", outcome="success") >= 1
+
+
+def test_tool_latency_is_recorded(session: Session, monkeypatch):
+    monkeypatch.setattr(mcp_server, "engine", session.get_bind())
+    before = metrics.COACH_TOOL_DURATION.count(tool="design_workout")
+    _execute_tool_call("design_workout", {"goal": "push"}, user_id=1)
+    assert metrics.COACH_TOOL_DURATION.count(tool="design_workout") == before + 1
+    assert metrics.COACH_TOOL_CALLS.get(tool="design_workout", outcome="success") >= 1
+
+
+def test_metrics_endpoint(client: TestClient):
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert "# TYPE llm_time_to_first_token_seconds histogram" in response.text
@@ -0,0 +1,96 @@
+import asyncio
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlmodel import Session
+
+from backend import mcp_server, metrics
+from backend.llm_router import LLMUnavailableError
+from backend.offline_coach import OfflineAnswer, classify_offline_intent, offline_answer, with_deadline
+from backend.routers import coach
+
+
+@pytest.mark.parametrize("question, intent", [
+    ("Create a push workout for me", "design"),
+    ("What should I train today?", "today"),
+    ("Am I stagnating on bench press?", "stagnation"),
+    ("Is creatine safe?", "general"),
+])
+def test_classifies_offline_intents(question, intent):
+    assert classify_offline_intent(question) == intent
+
+
+def test_design_answer_uses_set_rep_schemes(session: Session, test_user, monkeypatch):
+    monkeypatch.setattr(mcp_server, "engine", session.get_bind())
+    intent, text = offline_answer("Create a heavy leg workout for me", test_user.id)
+    scheme = mcp_server.SET_REP_SCHEMES["strength"]["intermediate"]
+    assert intent == "design"
+    assert "**Squat** (Legs): " f"{scheme['sets']} × {scheme['reps']}" in text
+
+
+async def _collect(tokens, **kwargs):
+    return [t async for t in with_deadline(tokens, "What should I train today?", 1, **kwargs)]
+
+
+def test_deadline_cancels_upstream_and_answers_offline(monkeypatch):
+    monkeypatch.setattr("backend.offline_coach.offline_answer", lambda q, u, saved: ("today", "Rest day."))
+    closed = []
+
+    async def slow():
+        try:
+            await asyncio.sleep(5)
+            yield "too late"
+        finally:
+            closed.append(True)
+
+    before = metrics.COACH_OFFLINE.get(intent="today", reason="deadline")
+    result = asyncio.run(asyncio.wait_for(_collect(slow(), budget=0.05), 2))
+    assert len(result) == 1 and isinstance(result[0], OfflineAnswer)
+    assert result[0].reason == "deadline" and result[0].text.endswith("Rest day.")
+    assert closed == [True]
+    assert metrics.COACH_OFFLINE.get(intent="today", reason="deadline") == before + 1
+
+    async def started_then_slow():
+        yield "Hi"
+        await asyncio.sleep(0.1)  # past the budget, but the answer already started
+        yield " there"
+
+    assert asyncio.run(_collect(started_then_slow(), budget=0.05)) == ["Hi", " there"]
+
+
+def test_deadline_is_lifted_once_a_template_is_saved(session: Session, test_user, monkeypatch):
+    saved = []
+
+    async def tool_loop():
+        await asyncio.sleep(0.02)
+        saved.append("Push Day")  # create_workout_template ran
+        await asyncio.sleep(0.1)  # explanation arrives past the budget
+        yield "Saved your plan."
+
+    result = asyncio.run(_collect(tool_loop(), budget=0.05, saved_templates=saved))
+    assert result == ["Saved your plan."]
+
+    monkeypatch.setattr(mcp_server, "engine", session.get_bind())
+    intent, text = offline_answer("Create a push workout for me", test_user.id, ["Push Day"])
+    assert intent == "design" and "Not saved" not in text
+    assert "**Saved as a template:** Push Day" in text
+
+
+def test_chat_falls_back_when_providers_are_down(client: TestClient, auth_headers: dict, session: Session,
+                                                 monkeypatch):
+    monkeypatch.setattr(mcp_server, "engine", session.get_bind())
+
+    async def unavailable(messages, system_prompt, user_id=1, saved_templates=None):
+        raise LLMUnavailableError("circuit open")
+        yield  # pragma: no cover
+
+    monkeypatch.setattr(coach, "stream_web_llm", unavailable)
+    response = client.post("/coach/chat", json={"question": "What should I train today?"}, headers=auth_headers)
+    events = [json.loads(line[6:]) for line in response.text.splitlines() if line.startswith("data: ")]
+    offline = [e for e in events if e["type"] == "offline"]
+    text = "".join(e.get("text", "") for e in events if e["type"] == "content")
+
+    assert offline == [{"type": "offline", "reason": "unavailable", "intent": "today"}]
+    assert "Offline coach" in text and "Suggested session" in text
+    assert events[-1]["type"] == "done"
@@ -0,0 +1,88 @@
+import json
+
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+from sqlmodel import Session, select
+
+from backend import mcp_server
+from backend.models import AthleteProfile, TemplateExercise, WorkoutTemplate
+from backend.program_generator import SPLITS, plan_program, plan_weeks
+
+DAY_CATEGORIES = {
+    "Push": {"Chest", "Shoulders", "Arms"},
+    "Pull": {"Back", "Arms"},
+    "Legs": {"Legs", "Core"},
+    "Upper": {"Chest", "Back", "Shoulders", "Arms"},
+    "Lower": {"Legs", "Core"},
+    "Full Body": {"Chest", "Back", "Legs", "Shoulders", "Arms", "Core"},
+}
+
+
+def test_blocks_end_in_deload_weeks():
+    deloads = lambda weeks: [w.number for w in plan_weeks(weeks) if w.deload]  # noqa: E731
+    assert deloads(4) == [4]
+    assert deloads(6) == [3, 6]
+    assert deloads(7) == [4, 7]
+    assert deloads(12) == [4, 8, 12]
+
+
+def test_every_day_trains_what_its_label_says(session: Session, monkeypatch):
+    monkeypatch.setattr(mcp_server, "engine", session.get_bind())
+    for goal in ("strength", "hypertrophy", "endurance"):
+        for days_per_week in SPLITS:
+            program = plan_program(goal, weeks=4, days_per_week=days_per_week)
+            for day in program.days:
+                label = day.label.rstrip(" AB")
+                categories = {ex["category"] for ex in day.exercises}
+                assert categories and categories <= DAY_CATEGORIES[label], (goal, days_per_week, day.label)
+
+
+def test_program_api_writes_every_template_at_once(client: TestClient, auth_headers: dict, session: Session,
+                                                   test_user, monkeypatch):
+    monkeypatch.setattr(mcp_server, "engine", session.get_bind())
+    session.add(AthleteProfile(user_id=test_user.id, data=json.dumps(
+        {"lifts": {"Bench Press": {"sessions": 5, "working_weight": 100, "working_reps": 5}}})))
+    session.commit()
+
+    inserts = []
+    listener = lambda conn, cursor, statement, *args: inserts.append(statement)  # noqa: E731
+    event.listen(session.get_bind(), "before_cursor_execute", listener)
+    try:
+        response = client.post("/templates/program", headers=auth_headers, json={
+            "goal": "strength", "weeks": 6, "days_per_week": 4, "equipment": ["barbell", "bench"]})
+    finally:
+        event.remove(session.get_bind(), "before_cursor_execute", listener)
+    summary = response.json()
+    assert response.status_code == 200
+    assert summary["templates_created"] == 24 and summary["deload_weeks"] == [3, 6]
+    assert [d["label"] for d in summary["split"]] == ["Upper A", "Lower A", "Upper B", "Lower B"]
+    assert [d["style"] for d in summary["split"]] == ["strength", "strength", "hypertrophy", "hypertrophy"]
+    assert summary["progression"][0]["scheme"] == {"strength": "4×4 @ RPE 8", "hypertrophy": "3×10 @ RPE 8"}
+    assert summary["progression"][1]["scheme"] == {"strength": "4×3 @ RPE 9", "hypertrophy": "4×10 @ RPE 9"}
+    assert sum(s.startswith("INSERT INTO workouttemplate") for s in inserts) == 1
+
+    templates = {t.name: t for t in session.exec(select(WorkoutTemplate)).all()}
+    assert sorted(t.id for t in templates.values()) == sorted(summary["template_ids"])
+
+    def bench_sets(name):
+        row = next(tex for tex in templates[name].exercises if tex.exercise.name == "Bench Press")
+        return [(s.goal_weight, s.goal_reps) for s in row.sets]
+
+    assert bench_sets("Strength Mesocycle · W1 D1 Upper A") == [(100, 4)] * 4
+    assert bench_sets("Strength Mesocycle · W2 D1 Upper A") == [(102.5, 3)] * 4
+    assert bench_sets("Strength Mesocycle · W3 D1 Upper A (Deload)") == [(90, 4)] * 2
+    assert bench_sets("Strength Mesocycle · W4 D1 Upper A") == [(102.5, 4)] * 4  # second block starts heavier
+    assert len(session.exec(select(TemplateExercise)).all()) == sum(
+        len(d["exercises"]) for d in summary["split"]) * 6
+
+    bad = client.post("/templates/program", headers=auth_headers, json={"goal": "strength", "weeks": 20})
+    assert bad.status_code == 422
+
+
+def test_mcp_tool_returns_compact_summary(session: Session, test_user, monkeypatch):
+    monkeypatch.setattr(mcp_server, "engine", session.get_bind())
+    summary = json.loads(mcp_server.generate_program_logic("hypertrophy", weeks=4, days_per_week=3,
+                                                           user_id=test_user.id))
+    assert [d["label"] for d in summary["split"]] == ["Push", "Pull", "Legs"]
+    assert summary["templates_created"] == 12 and summary["deload_weeks"] == [4]
+    assert summary["progression"][3] == {"week": 4, "phase": "deload", "scheme": {"hypertrophy": "2×10 @ RPE 6"}}
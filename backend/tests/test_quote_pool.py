@@ -0,0 +1,112 @@
+import asyncio
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlmodel import Session, select
+
+from backend import quote_pool
+from backend.models import MotivationQuote, User, WorkoutTemplate
+from backend.routers.coach import FALLBACK_QUOTES
+
+
+@pytest.fixture(autouse=True)
+def empty_pools():
+    quote_pool._pools.clear()
+    quote_pool._consumed.clear()
+    yield
+    quote_pool._pools.clear()
+    quote_pool._consumed.clear()
+
+
+def test_take_prefers_template_quote(session: Session, test_user):
+    quote_pool._store_quotes(session, test_user.id, [
+        ("Generic push! 💪", None),
+        ("Leg Day crushed! 🦵", "Leg Day"),
+    ])
+
+    assert quote_pool.take_quote(test_user.id, "leg day") == "Leg Day crushed! 🦵"
+    assert quote_pool.take_quote(test_user.id) == "Generic push! 💪"
+    assert quote_pool.take_quote(test_user.id) is None
+
+
+def test_take_is_sub_millisecond(session: Session, test_user):
+    quote_pool._store_quotes(session, test_user.id, [(f"Quote {i}", None) for i in range(50)])
+    timings = []
+    for _ in range(20):
+        start = time.perf_counter()
+        quote_pool.take_quote(test_user.id, "Push Day")
+        timings.append(time.perf_counter() - start)
+    assert sorted(timings)[len(timings) // 2] < 0.001
+
+
+def test_motivate_serves_pool_then_falls_back(client: TestClient, auth_headers: dict, session: Session, test_user):
+    quote_pool._store_quotes(session, test_user.id, [("From the pool 🔥", None)])
+
+    first = client.post("/coach/motivate", json={"total_sets": 12}, headers=auth_headers).json()
+    assert first["quote"] == "From the pool 🔥"
+    second = client.post("/coach/motivate", json={"total_sets": 12}, headers=auth_headers).json()
+    assert second["quote"] in FALLBACK_QUOTES
+
+
+def test_parse_quotes_handles_fences_and_unknown_templates():
+    raw = '```json\n[{"template": "push day", "quote": "Pushed it! 💪"}, {"template": "Nope", "quote": "Go! 🚀"}, "Plain 🎯"]\n```'
+    assert quote_pool.parse_quotes(raw, ["Push Day"]) == [
+        ("Pushed it! 💪", "Push Day"),
+        ("Go! 🚀", None),
+        ("Plain 🎯", None),
+    ]
+    assert quote_pool.parse_quotes("no json here", []) == []
+
+
+def test_refill_batches_per_user_and_flushes_consumed(session: Session, test_user, monkeypatch):
+    monkeypatch.setattr(quote_pool, "engine", session.get_bind())
+    session.add(WorkoutTemplate(name="Push Day", user_id=test_user.id))
+    session.commit()
+
+    calls = []
+
+    async def fake_generate(context, count):
+        calls.append((context, count))
+        return [(f"Quote {i}", None) for i in range(count)]
+
+    monkeypatch.setattr(quote_pool, "generate_quotes", fake_generate)
+    asyncio.run(quote_pool.refill_once())
+
+    assert len(calls) == 1
+    assert calls[0][0]["template_names"] == ["Push Day"]
+    assert quote_pool.pool_size(test_user.id) == quote_pool.POOL_TARGET
+
+    quote_pool.take_quote(test_user.id)
+    asyncio.run(quote_pool.refill_once())
+    stored = session.exec(select(MotivationQuote).where(MotivationQuote.user_id == test_user.id)).all()
+    assert len(stored) == quote_pool.POOL_TARGET - 1
+
+
+def test_served_quote_is_deleted_at_once(client: TestClient, auth_headers: dict, session: Session, test_user):
+    quote_pool._store_quotes(session, test_user.id, [("Served once 🔥", None), ("Still here 💪", None)])
+
+    assert client.post("/coach/motivate", json={}, headers=auth_headers).json()["quote"] == "Served once 🔥"
+    # A restart reloads only what was not served
+    quote_pool.load_pools(session)
+    assert [q.text for q in session.exec(select(MotivationQuote)).all()] == ["Still here 💪"]
+    assert quote_pool.pool_size(test_user.id) == 1
+
+
+def test_refill_failure_skips_only_that_user(session: Session, test_user, monkeypatch):
+    monkeypatch.setattr(quote_pool, "engine", session.get_bind())
+    other = User(name="Other", email="other@example.com", password_hash="x")
+    session.add(other)
+    session.commit()
+
+    async def flaky_generate(context, count):
+        if not flaky_generate.failed:
+            flaky_generate.failed = True
+            raise RuntimeError("provider down")
+        return [("Quote", None)] * count
+
+    flaky_generate.failed = False
+    monkeypatch.setattr(quote_pool, "generate_quotes", flaky_generate)
+    asyncio.run(quote_pool.refill_once())
+
+    assert sorted(quote_pool.pool_size(uid) for uid in (test_user.id, other.id)) == [0, quote_pool.POOL_TARGET]
@@ -0,0 +1,90 @@
+from datetime import datetime, timedelta
+
+from fastapi.testclient import TestClient
+from sqlmodel import Session
+
+from backend import session_index
+from backend.models import Exercise
+from backend.routers import coach
+
+
+def _exercises(session: Session) -> dict:
+    exercises = {}
+    for name, category in [("Squat", "Legs"), ("Bench Press", "Chest"), ("Barbell Row", "Back"),
+                           ("Overhead Press", "Shoulders")]:
+        ex = Exercise(name=name, category=category)
+        session.add(ex)
+        session.commit()
+        session.refresh(ex)
+        exercises[name] = ex.id
+    return exercises
+
+
+def _log(client, auth_headers, exercise_ids, days_ago, sets=3, weight=80):
+    response = client.post("/sessions/", json={
+        "date": (datetime.utcnow() - timedelta(days=days_ago)).isoformat(),
+        "duration_seconds": 3600,
+        "exercises": [{"exercise_id": ex_id, "sets": [{"weight": weight, "reps": 5}] * sets}
+                      for ex_id in exercise_ids],
+    }, headers=auth_headers)
+    assert response.status_code == 200, response.text
+    return response.json()["id"]
+
+
+def test_tokenize_stems_and_drops_stopwords():
+    assert session_index.tokenize("How are my Squats and bench presses?") == ["squat", "bench", "press"]
+
+
+def test_select_ranks_by_exercise_muscle_and_recency(client: TestClient, auth_headers: dict,
+                                                     session: Session, test_user):
+    ex = _exercises(session)
+    squat_old = _log(client, auth_headers, [ex["Squat"]], days_ago=30)
+    bench = _log(client, auth_headers, [ex["Bench Press"]], days_ago=3)
+    row = _log(client, auth_headers, [ex["Barbell Row"]], days_ago=2)
+    squat_new = _log(client, auth_headers, [ex["Squat"]], days_ago=10)
+
+    picked = session_index.select_sessions(session, test_user.id, "How is my squat progressing?", k=2)
+    assert picked == [squat_old, squat_new]  # oldest first, for the prompt
+
+    assert session_index.select_sessions(session, test_user.id, "Are my legs recovered?", k=1) == [squat_new]
+    assert session_index.select_sessions(session, test_user.id, "Anything else?", k=1) == [row]
+
+    # Incremental: new and deleted sessions are reflected without a rebuild
+    index = session_index.get_index(session, test_user.id)
+    press = _log(client, auth_headers, [ex["Overhead Press"]], days_ago=0)
+    assert len(index) == 5
+    assert session_index.select_sessions(session, test_user.id, "overhead press form", k=1) == [press]
+    client.delete(f"/sessions/{press}", headers=auth_headers)
+    assert press not in session_index.select_sessions(session, test_user.id, "overhead press form")
+    assert bench in session_index.select_sessions(session, test_user.id, "bench press")
+
+
+def test_select_respects_token_budget(client: TestClient, auth_headers: dict, session: Session, test_user):
+    ex = _exercises(session)
+    big = _log(client, auth_headers, list(ex.values()), days_ago=1, sets=5)
+    small = _log(client, auth_headers, [ex["Squat"]], days_ago=2)
+
+    index = session_index.get_index(session, test_user.id)
+    big_cost = int(index.cost[index.rows[big]])
+    small_cost = int(index.cost[index.rows[small]])
+    assert big_cost > small_cost
+
+    assert session_index.select_sessions(session, test_user.id, "squat", token_budget=small_cost) == [small]
+    assert session_index.select_sessions(session, test_user.id, "squat",
+                                         token_budget=big_cost + small_cost) == [small, big]
+
+
+def test_chat_attaches_auto_selected_sessions(client: TestClient, auth_headers: dict,
+                                              session: Session, test_user, monkeypatch):
+    calls = []
+
+    async def fake_stream(messages, system_prompt, user_id=1, saved_templates=None):
+        calls.append(messages[-1][1])  # retrieved sessions travel with the new question
+        yield "ok"
+
+    monkeypatch.setattr(coach, "stream_web_llm", fake_stream)
+    ex = _exercises(session)
+    _log(client, auth_headers, [ex["Squat"]], days_ago=1)
+
+    client.post("/coach/chat", json={"question": "How was my squat?"}, headers=auth_headers)
+    assert "### Squat (Legs)" in calls[0]
@@ -0,0 +1,140 @@
+import asyncio
+import json
+
+from backend.sse import HEARTBEAT, coalesce
+
+
+async def _frames(events, **kwargs):
+    return [frame async for frame in coalesce(events, **kwargs)]
+
+
+def _data(frames):
+    return [json.loads(f[6:]) for f in frames if f.startswith("data: ")]
+
+
+def test_tokens_are_coalesced_per_window():
+    async def tokens():
+        yield {"type": "conversation", "id": 1}
+        for i in range(50):
+            yield {"type": "content", "text": f"t{i} "}
+            await asyncio.sleep(0.001)
+        yield {"type": "done"}
+
+    frames = _data(asyncio.run(_frames(tokens(), window=0.02)))
+    content = [f for f in frames if f["type"] == "content"]
+    assert frames[0] == {"type": "conversation", "id": 1}
+    assert frames[-1] == {"type": "done"}
+    assert "".join(f["text"] for f in content) == "".join(f"t{i} " for i in range(50))
+    assert content[0]["text"] == "t0 "  # first token is not held back by the window
+    assert len(content) < 15
+
+
+def test_types_and_extra_fields_are_not_merged():
+    async def events():
+        yield {"type": "thinking", "text": "a"}
+        yield {"type": "thinking", "text": "b"}
+        yield {"type": "content", "text": "c"}
+        yield {"type": "content", "text": "d", "offline": True}
+
+    frames = _data(asyncio.run(_frames(events(), window=0.01)))
+    assert frames == [
+        {"type": "thinking", "text": "ab"},
+        {"type": "content", "text": "c"},
+        {"type": "content", "text": "d", "offline": True},
+    ]
+
+
+def test_heartbeat_while_idle():
+    async def slow_tool():
+        yield {"type": "content", "text": "Working"}
+        await asyncio.sleep(0.08)
+        yield {"type": "done"}
+
+    frames = asyncio.run(_frames(slow_tool(), heartbeat=0.02))
+    assert HEARTBEAT in frames
+    assert _data(frames)[-1] == {"type": "done"}
+
+
+def test_slow_client_pauses_the_producer():
+    produced = []
+
+    async def fast():
+        for i in range(100):
+            produced.append(i)
+            yield {"type": "content", "text": "x"}
+        yield {"type": "done"}
+
+    async def run():
+        stream = coalesce(fast(), window=0, queue_size=4)
+        first = await stream.__anext__()
+        await asyncio.sleep(0.05)  # client stalls
+        stalled_at = len(produced)
+        rest = [frame async for frame in stream]
+        return first, stalled_at, rest
+
+    first, stalled_at, rest = asyncio.run(run())
+    assert stalled_at <= 10
+    assert "".join(f["text"] for f in _data([first] + rest) if f["type"] == "content") == "x" * 100
+
+
+def test_producer_errors_surface_after_pending_frames():
+    async def broken():
+        yield {"type": "content", "text": "partial"}
+        raise RuntimeError("upstream died")
+
+    async def run():
+        frames = []
+        try:
+            async for frame in coalesce(broken(), window=0):
+                frames.append(frame)
+        except RuntimeError as e:
+            return frames, str(e)
+
+    frames, error = asyncio.run(run())
+    assert _data(frames) == [{"type": "content", "text": "partial"}]
+    assert error == "upstream died"
+
+
+def test_disconnect_cancels_the_producer():
+    from backend import metrics
+
+    cleaned_up = []
+    before = metrics.COACH_CANCELLED.get(source="test")
+
+    async def endless():
+        try:
+            while True:
+                yield {"type": "content", "text": "x"}
+                await asyncio.sleep(0.005)
+        finally:
+            cleaned_up.append(True)
+
+    async def receive():
+        await asyncio.sleep(0.03)
+        return {"type": "http.disconnect"}
+
+    frames = asyncio.run(asyncio.wait_for(_frames(endless(), window=0.01, receive=receive, source="test"), 2))
+    assert frames and cleaned_up == [True]
+    assert metrics.COACH_CANCELLED.get(source="test") == before + 1
+
+
+def test_cancelled_producer_finishes_while_the_queue_is_full():
+    async def endless():
+        while True:
+            yield {"type": "content", "text": "x"}
+
+    async def receive():
+        await asyncio.sleep(0.02)
+        return {"type": "http.disconnect"}
+
+    async def run():
+        stream = coalesce(endless(), window=0, queue_size=2, receive=receive)
+        await stream.__anext__()
+        await asyncio.sleep(0.05)  # client stalls; the queue is full when the disconnect lands
+        pending = [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
+        rest = [frame async for frame in stream]
+        return pending, rest
+
+    pending, rest = asyncio.run(run())
+    assert pending == []
+    assert len(_data(rest)) <= 2
@@ -0,0 +1,191 @@
+import asyncio
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+from backend.routers import coach
+from backend.sse import format_event
+from backend.stream_buffer import ReplayGapError, StreamBuffer, StreamRegistry, parse_event_id
+
+
+async def _frames(count, delay=0.0, cleaned_up=None):
+    try:
+        for i in range(count):
+            yield format_event({"type": "content", "text": str(i)})
+            await asyncio.sleep(delay)
+    finally:
+        if cleaned_up is not None:
+            cleaned_up.append(True)
+
+
+def _texts(frames):
+    return [json.loads(f.split("data: ", 1)[1])["text"] for f in frames if "data: " in f]
+
+
+def test_parse_event_id():
+    assert parse_event_id("abc:12") == ("abc", 12)
+    assert parse_event_id("7") == (None, 7)
+    assert parse_event_id(None) == (None, 0)
+    assert parse_event_id("abc:x") == (None, 0)
+
+
+def test_resume_replays_missed_frames_then_follows_live():
+    async def run():
+        registry = StreamRegistry(grace=5)
+        buffer = registry.start(1, _frames(10, delay=0.01))
+        first = []
+        async for frame in buffer.follow():
+            first.append(frame)
+            if len(first) == 3:
+                break  # connection dropped
+        last_id = first[-1].split("\n", 1)[0][len("id: "):]
+        stream_id, after = parse_event_id(last_id)
+        assert stream_id == buffer.id
+        resumed = [frame async for frame in registry.get(buffer.id, 1).follow(after)]
+        return first, resumed
+
+    first, resumed = asyncio.run(run())
+    assert _texts(first) + _texts(resumed) == [str(i) for i in range(10)]
+
+
+def test_unresumed_stream_is_cancelled_after_grace():
+    cleaned_up = []
+
+    async def run(resume: bool):
+        registry = StreamRegistry(grace=0.05)
+        buffer = registry.start(1, _frames(1000, delay=0.005, cleaned_up=cleaned_up))
+        async for _ in buffer.follow():
+            break
+        if resume:
+            await asyncio.sleep(0.02)
+            async for _ in buffer.follow(buffer.next_seq - 1):
+                pass
+        else:
+            await asyncio.sleep(0.2)
+        return buffer
+
+    buffer = asyncio.run(run(resume=False))
+    assert buffer.done and buffer.next_seq < 100 and cleaned_up == [True]
+
+    cleaned_up.clear()
+    buffer = asyncio.run(asyncio.wait_for(run(resume=True), 10))
+    assert buffer.done and buffer.next_seq == 1001 and cleaned_up == [True]
+
+
+def test_per_stream_cap_drops_oldest_frames():
+    async def run():
+        buffer = StreamBuffer("s", 1, max_bytes=200)
+        for i in range(20):
+            buffer.append(format_event({"type": "content", "text": str(i)}))
+        return buffer
+
+    buffer = asyncio.run(run())
+    assert buffer.bytes <= 200 and buffer.first_seq > 1
+    with pytest.raises(ReplayGapError):
+        buffer.since(0)
+    assert buffer.since(buffer.first_seq - 1)
+
+
+def test_lagging_follower_sees_the_gap():
+    async def run():
+        buffer = StreamBuffer("s", 1, max_bytes=200, max_lag=1000)
+        buffer.append(format_event({"type": "content", "text": "0"}))
+        follower = buffer.follow()
+        first = await follower.__anext__()
+        for i in range(1, 20):
+            buffer.append(format_event({"type": "content", "text": str(i)}))
+        gap = await follower.__anext__()
+        with pytest.raises(StopAsyncIteration):
+            await follower.__anext__()
+        return first, gap
+
+    first, gap = asyncio.run(run())
+    assert _texts([first]) == ["0"]
+    assert json.loads(gap.split("data: ", 1)[1])["code"] == "gap"
+
+
+def test_cap_smaller_than_reader_lag_ends_with_a_gap_event():
+    async def run():
+        registry = StreamRegistry(stream_max_bytes=300)
+        buffer = registry.start(1, _frames(50))
+        assert buffer.max_lag * 40 > buffer.max_bytes  # the cap holds fewer frames than max_lag
+        follower = buffer.follow()
+        frames = [await follower.__anext__()]
+        await asyncio.sleep(0.05)  # reader stalls while the generation runs ahead
+        frames += [frame async for frame in follower]
+        await buffer.task
+        return frames
+
+    frames = asyncio.run(asyncio.wait_for(run(), 10))
+    last = json.loads(frames[-1].split("data: ", 1)[1])
+    assert last["type"] == "error" and last["code"] == "gap"
+    assert _texts(frames[:1]) == ["0"]
+
+
+def test_slow_reader_pauses_the_generation():
+    produced = []
+
+    async def counted():
+        for i in range(50):
+            produced.append(i)
+            yield format_event({"type": "content", "text": str(i)})
+
+    async def run():
+        registry = StreamRegistry()
+        buffer = registry.start(1, counted())
+        buffer.max_lag = 4
+        follower = buffer.follow()
+        frames = [await follower.__anext__()]
+        await asyncio.sleep(0.05)  # reader stalls
+        stalled_at = len(produced)
+        frames += [frame async for frame in follower]
+        return stalled_at, frames
+
+    stalled_at, frames = asyncio.run(run())
+    assert stalled_at <= 8
+    assert _texts(frames) == [str(i) for i in range(50)]
+
+
+def test_registry_evicts_by_age_and_memory():
+    async def run():
+        registry = StreamRegistry(ttl=0.05, max_bytes=800)
+        old = registry.start(1, _frames(3))
+        await asyncio.sleep(0.1)
+        fresh = registry.start(1, _frames(3))
+        assert registry.get(old.id, 1) is None
+        assert registry.get(fresh.id, 2) is None  # other users cannot resume it
+        await asyncio.sleep(0.01)
+
+        registry.ttl = 60
+        big = [registry.start(1, _frames(5)) for _ in range(4)]
+        await asyncio.sleep(0.01)
+        registry.evict()
+        return registry, fresh, big
+
+    registry, fresh, big = asyncio.run(run())
+    assert sum(b.bytes for b in registry._streams.values()) <= 800
+    assert registry.get(big[-1].id, 1) is not None
+    assert registry.get(fresh.id, 1) is None  # oldest finished stream went first
+
+
+def test_resume_endpoint(client: TestClient, auth_headers: dict, monkeypatch):
+    async def fake_stream(messages, system_prompt, user_id=1, saved_templates=None):
+        for word in ("one ", "two ", "three"):
+            yield word
+
+    monkeypatch.setattr(coach, "stream_web_llm", fake_stream)
+    response = client.post("/coach/chat", json={"question": "hi"}, headers=auth_headers)
+    stream_id = response.headers["x-stream-id"]
+    ids = [line[len("id: "):] for line in response.text.splitlines() if line.startswith("id: ")]
+    assert ids[0] == f"{stream_id}:1"
+
+    # Reconnect after the first event: everything after it is replayed
+    resumed = client.get(f"/coach/chat/streams/{stream_id}",
+                         headers={**auth_headers, "Last-Event-ID": ids[0]})
+    assert resumed.status_code == 200
+    assert resumed.text == response.text.split("\n\n", 1)[1]
+
+    assert client.get("/coach/chat/streams/nope", headers=auth_headers).status_code == 404
+    assert client.get(f"/coach/chat/streams/{stream_id}",
+                      headers={**auth_headers, "Last-Event-ID": "other:1"}).status_code == 400
@@ -0,0 +1,133 @@
+from sqlalchemy import event
+from fastapi.testclient import TestClient
+from sqlmodel import Session, select
+
+from backend import mcp_server
+from backend.benchmarks import template_import
+from backend.models import Exercise, TemplateExercise, TemplateSet, WorkoutTemplate
+from backend.routers.template_helper import save_generated_template
+from backend.template_writer import ExerciseSpec, SetSpec, update_template_in_place, write_template
+
+
+def _exercise(session: Session, name: str, user_id=None) -> Exercise:
+    exercise = Exercise(name=name, category="Chest", user_id=user_id)
+    session.add(exercise)
+    session.commit()
+    session.refresh(exercise)
+    return exercise
+
+
+def test_create_and_update_template(client: TestClient, auth_headers: dict, session: Session):
+    bench, fly = _exercise(session, "Bench Press"), _exercise(session, "Dumbbell Flyes")
+    payload = {"name": "Push", "exercises": [
+        {"exercise_id": bench.id, "sets": [{"goal_weight": 80, "goal_reps": 5}] * 3},
+        {"exercise_id": fly.id, "sets": [{"goal_weight": 14, "goal_reps": 12}]},
+    ]}
+    created = client.post("/templates/", json=payload, headers=auth_headers).json()
+    assert [e["exercise"]["name"] for e in created["exercises"]] == ["Bench Press", "Dumbbell Flyes"]
+    assert [len(e["sets"]) for e in created["exercises"]] == [3, 1]
+    assert created == client.get(f"/templates/{created['id']}", headers=auth_headers).json()
+
+    payload["name"] = "Push B"
+    payload["exercises"].reverse()
+    updated = client.put(f"/templates/{created['id']}", json=payload, headers=auth_headers).json()
+    assert updated["name"] == "Push B"
+    assert [e["exercise"]["name"] for e in updated["exercises"]] == ["Dumbbell Flyes", "Bench Press"]
+    assert len(session.exec(select(TemplateSet)).all()) == 4
+
+    payload["exercises"][0]["exercise_id"] = 9999
+    response = client.put(f"/templates/{created['id']}", json=payload, headers=auth_headers)
+    assert response.status_code == 400
+    # The failed update left the template untouched
+    assert client.get(f"/templates/{created['id']}", headers=auth_headers).json() == updated
+
+
+def test_import_resolves_names_case_insensitively(client: TestClient, auth_headers: dict, session: Session):
+    bench = _exercise(session, "Bench Press")
+    other_users = _exercise(session, "Cable Crossover", user_id=999)
+    yaml_content = (
+        "name: Imported\n"
+        "exercises:\n"
+        "  - name: bench press\n    sets: [{weight: 60, reps: 8}]\n"
+        "  - name: Cable Crossover\n    category: Chest\n    sets: [{weight: 10, reps: 15}]\n"
+        "  - name: BENCH PRESS\n    sets: []\n"
+    )
+    imported = client.post("/templates/import", json={"yaml_content": yaml_content}, headers=auth_headers).json()
+    ids = [e["exercise"]["id"] for e in imported["exercises"]]
+    assert ids[0] == ids[2] == bench.id
+    assert ids[1] != other_users.id  # another user's custom exercise is not reused
+    assert imported["exercises"][0]["sets"][0]["goal_weight"] == 60
+
+
+def test_writer_uses_a_fixed_number_of_statements(session: Session, test_user):
+    statements = []
+    engine = session.get_bind()
+    listener = lambda *args: statements.append(args[2])  # noqa: E731
+    event.listen(engine, "before_cursor_execute", listener)
+    user_id = test_user.id
+    write_template(session, user_id, "Warm-up", template_import.make_specs(1, 0))  # builds the name index
+    counts = {}
+    try:
+        for count in (5, 50):
+            statements.clear()
+            read = write_template(session, user_id, f"T{count}", template_import.make_specs(count, count))
+            assert len(read.exercises) == count and all(len(e.sets) == 4 for e in read.exercises)
+            counts[count] = len(statements)
+    finally:
+        event.remove(engine, "before_cursor_execute", listener)
+    assert counts[50] == counts[5] <= 10
+
+
+def test_generated_and_mcp_templates_share_the_writer(session: Session, test_user, monkeypatch):
+    monkeypatch.setattr(mcp_server, "engine", session.get_bind())
+    plan = {"name": "AI Legs", "exercises": [
+        {"name": "Squat", "category": "Legs", "order": 2, "sets": [{"goal_weight": 100, "goal_reps": 5}]},
+        {"name": "Leg Curl", "category": "Legs", "order": 1, "sets": []},
+    ]}
+    template_id = save_generated_template(session, test_user.id, plan)
+    rows = session.exec(select(TemplateExercise).where(TemplateExercise.template_id == template_id)
+                        .order_by(TemplateExercise.order)).all()
+    assert [r.exercise.name for r in rows] == ["Leg Curl", "Squat"]
+
+    result = mcp_server.create_workout_template_logic("MCP Legs", [
+        mcp_server.ExerciseInput(name="squat", sets=[mcp_server.SetInput(goal_weight=90, goal_reps=6)]),
+    ], user_id=test_user.id)
+    assert "created successfully" in result
+    assert len(session.exec(select(Exercise).where(Exercise.name == "Squat")).all()) == 1
+
+    read = write_template(session, test_user.id, "Mixed", [
+        ExerciseSpec(name="Squat", sets=[SetSpec(100, 3)]), ExerciseSpec(name="  "),
+    ])
+    assert [e.exercise.name for e in read.exercises] == ["Squat"]
+
+
+def test_update_writes_only_the_diff(client: TestClient, auth_headers: dict, session: Session, test_user):
+    bench, fly, dip = (_exercise(session, n) for n in ("Bench Press", "Dumbbell Flyes", "Dips"))
+    specs = [ExerciseSpec(exercise_id=e.id, sets=[SetSpec(50, 10)] * 3) for e in (bench, fly, bench)]
+    original = write_template(session, test_user.id, "Push", specs)
+    template = session.get(WorkoutTemplate, original.id)
+    ids = [e.id for e in original.exercises]
+    set_ids = [s.id for e in original.exercises for s in e.sets]
+
+    # Move the flyes to the end and edit one of their sets
+    edited_fly = ExerciseSpec(exercise_id=fly.id, sets=[SetSpec(50, 10), SetSpec(55, 8), SetSpec(50, 10)])
+    specs = [specs[0], specs[2], edited_fly]
+    read, diff = update_template_in_place(session, template, test_user.id, "Push", specs)
+    assert [e.id for e in read.exercises] == [ids[0], ids[2], ids[1]]
+    assert sorted(s.id for e in read.exercises for s in e.sets) == sorted(set_ids)
+    assert (diff.exercises_reordered, diff.sets_updated, diff.rows_written) == (2, 1, 3)
+
+    # Swap the second bench press for dips (4 sets), drop a set of the flyes
+    specs = [specs[0], ExerciseSpec(exercise_id=dip.id, sets=[SetSpec(0, 12)] * 4),
+             ExerciseSpec(exercise_id=fly.id, sets=[SetSpec(50, 10), SetSpec(55, 8)])]
+    read, diff = update_template_in_place(session, template, test_user.id, "Push", specs)
+    assert read.exercises[0].id == ids[0] and read.exercises[2].id == ids[1]
+    assert (diff.exercises_deleted, diff.exercises_inserted, diff.sets_deleted, diff.sets_inserted) == (1, 1, 4, 4)
+
+    # The API returns what is stored
+    stored = client.get(f"/templates/{template.id}", headers=auth_headers).json()
+    assert stored == read.model_dump(mode="json")
+    assert len(session.exec(select(TemplateSet)).all()) == 9
+
+    _, diff = update_template_in_place(session, template, test_user.id, "Push", specs)
+    assert diff.rows_written == 0
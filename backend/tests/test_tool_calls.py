@@ -0,0 +1,77 @@
+import asyncio
+import json
+import time
+
+from backend import metrics
+from backend.routers import coach
+from backend.tool_calls import IncrementalJSON, ToolCallAccumulator
+
+
+def test_incremental_json_completes_on_closing_brace():
+    parser = IncrementalJSON()
+    chunks = ['{"name": "Push {A}", ', '"note": "say \\"hi\\" ]"', ', "sets": [{"reps": 8}', ']', '}']
+    states = [parser.feed(chunk) for chunk in chunks]
+    assert states == [False, False, False, False, True]
+    assert parser.value()["note"] == 'say "hi" ]'
+
+    trailing = IncrementalJSON()
+    assert trailing.feed('{"a": 1}  ')
+    assert not trailing.feed("x")
+
+
+def test_accumulator_reports_each_call_once():
+    acc = ToolCallAccumulator()
+    deltas = [
+        {"index": 0, "id": "c0", "function": {"name": "list_", "arguments": ""}},
+        {"index": 0, "function": {"name": "exercises", "arguments": '{"category"'}},
+        {"index": 0, "function": {"arguments": ': "Legs"}'}},
+        {"index": 1, "id": "c1", "function": {"name": "design_workout", "arguments": "{}"}},
+    ]
+    completed = [acc.feed(d) for d in deltas]
+    assert completed[:2] == [None, None]
+    assert (completed[2].name, completed[2].parsed_arguments()) == ("list_exercises", {"category": "Legs"})
+    assert completed[3].index == 1
+    assert [c.id for c in acc.ordered()] == ["c0", "c1"]
+
+
+class ScriptedRouter:
+    """Streams a list_exercises call, slow trailing output, then a create call; then answers."""
+
+    def __init__(self, marks):
+        self.marks = marks
+        self.turn = 0
+
+    def snapshot(self):
+        return {}
+
+    async def stream(self, messages, tools=None):
+        self.turn += 1
+        yield {"type": "provider", "provider": "stub", "model": "stub", "ttft": 0.0, "supports_tools": True}
+        if self.turn > 1:
+            yield {"type": "content", "text": "Done."}
+            return
+        yield {"type": "tool_call", "delta": {"index": 0, "id": "a", "function": {"name": "list_exercises", "arguments": '{"cate'}}}
+        yield {"type": "tool_call", "delta": {"index": 0, "function": {"arguments": 'gory": "Legs"}'}}}
+        create_args = json.dumps({"name": "Legs", "exercises": []})
+        yield {"type": "tool_call", "delta": {"index": 1, "id": "b", "function": {"name": "create_workout_template", "arguments": create_args}}}
+        await asyncio.sleep(0.2)  # the model is still finishing its turn
+        self.marks["stream_end"] = time.monotonic()
+
+
+def test_read_only_tools_start_before_the_turn_ends(monkeypatch):
+    marks = {}
+    monkeypatch.setattr(coach, "get_llm_router", lambda: ScriptedRouter(marks))
+
+    def fake_tool(name, args, user_id):
+        marks[name] = time.monotonic()
+        return "ok"
+
+    monkeypatch.setattr(coach, "_execute_tool_call", fake_tool)
+    used = metrics.COACH_SPECULATIVE_TOOLS.get(tool="list_exercises", outcome="used")
+
+    async def run():
+        return [chunk async for chunk in coach.stream_web_llm([], "system", user_id=1)]
+
+    assert asyncio.run(run()) == ["Done."]
+    assert marks["list_exercises"] < marks["stream_end"] <= marks["create_workout_template"]
+    assert metrics.COACH_SPECULATIVE_TOOLS.get(tool="list_exercises", outcome="used") == used + 1
@@ -0,0 +1,71 @@
+import json
+import os
+import time
+
+from sqlmodel import Session
+
+from backend.models import Exercise
+from backend.workout_extractor import extract_workout, known_exercise_names
+
+FIXTURE_DIR = os.path.join(os.path.dirname(__file__), "fixtures", "coach_markdown")
+
+
+def load_corpus():
+    with open(os.path.join(FIXTURE_DIR, "expected.json")) as f:
+        expected = json.load(f)
+    for filename, exp in expected.items():
+        with open(os.path.join(FIXTURE_DIR, filename)) as f:
+            yield filename, f.read(), exp
+
+
+def test_extraction_accuracy_and_latency_on_corpus():
+    known = known_exercise_names()
+    total = correct = 0
+    elapsed = 0.0
+
+    for filename, text, exp in load_corpus():
+        start = time.perf_counter()
+        result = extract_workout(text, known)
+        elapsed += time.perf_counter() - start
+
+        assert result.template["name"] == exp["name"], filename
+        got = [
+            (e["name"], len(e["sets"]), e["sets"][0]["goal_reps"], e["sets"][0]["goal_weight"])
+            for e in result.template["exercises"]
+        ]
+        for i, (name, sets, reps, weight) in enumerate(exp["exercises"]):
+            total += 1
+            if i < len(got) and got[i] == (name, sets, reps, weight):
+                correct += 1
+        assert len(got) == len(exp["exercises"]), filename
+
+    accuracy = correct / total
+    per_doc_ms = elapsed / len(list(load_corpus())) * 1000
+    assert accuracy >= 0.95
+    assert per_doc_ms < 20
+
+
+def test_confidence_separates_plans_from_prose():
+    known = known_exercise_names()
+    plan = extract_workout("1. **Squat**: 5x5 @ 100kg\n2. **Bench Press**: 3x8", known)
+    assert plan.confidence == 1.0
+
+    prose = extract_workout("Rowing is great cardio. Make sure to squat deep and sleep well!", known)
+    assert prose.confidence < 0.6
+
+    mention = extract_workout("If your knees feel fine, squat 3x5 twice a week.", known)
+    assert mention.confidence == 0.5
+    two_lines = extract_workout("Squat 3x5 to start.\nThen bench press 3x8.", known)
+    assert two_lines.confidence == 1.0
+    listed = extract_workout("- Squat 3x5", known)
+    assert listed.confidence == 1.0
+
+
+def test_matches_user_exercises_from_db(session: Session, test_user):
+    session.add(Exercise(name="Zercher Squat", category="Legs", is_custom=True, user_id=test_user.id))
+    session.commit()
+
+    result = extract_workout("- **Zercher Squat**: 4x6", known_exercise_names(session, test_user.id))
+    assert result.template["exercises"][0]["name"] == "Zercher Squat"
+    assert result.template["exercises"][0]["category"] == "Legs"
+    assert result.confidence == 1.0
@@ -0,0 +1,113 @@
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlmodel import Session, select
+
+from backend import mcp_server, metrics
+from backend.models import TemplateExercise, WorkoutTemplate
+from backend.routers import coach
+from backend.tests.test_llm_router import make_router, stub_provider
+from backend.workout_pipeline import classify_workout_request, goal_for
+
+
+@pytest.mark.parametrize("text, focus, style", [
+    ("Create a push workout for me", "push", None),
+    ("Can you design a heavy full body routine?", "full_body", "strength"),
+    ("Give me a leg day template for hypertrophy", "legs", "hypertrophy"),
+    ("Build me a workout", None, None),
+])
+def test_classifies_create_requests(text, focus, style):
+    intent = classify_workout_request(text)
+    assert intent is not None
+    assert (intent.focus, intent.style) == (focus, style)
+
+
+@pytest.mark.parametrize("text", [
+    "How do I make my workout harder?",
+    "What should I eat after a workout?",
+    "Analyze my last workouts and build on that",
+    "My bench press is stuck at 80kg",
+    "Create a 12 week workout program for hypertrophy",
+    "Give me a 4 week push pull legs routine",
+    "Make a workout plan for the next 6 weeks",
+])
+def test_ignores_other_requests(text):
+    assert classify_workout_request(text) is None
+
+
+def test_extracts_design_parameters():
+    intent = classify_workout_request("Create a 45 min beginner upper body strength workout with dumbbells and a bench")
+    assert intent.design_args("push") == {
+        "goal": "upper_body_strength",
+        "experience_level": "beginner",
+        "available_minutes": 45,
+        "equipment": ["bench", "dumbbell"],
+    }
+    assert goal_for(None, None, "pull") == "pull"
+    assert goal_for("legs", "strength", "push") == "legs_strength"
+
+
+def test_create_request_uses_one_llm_round_trip(client: TestClient, auth_headers: dict, session: Session,
+                                                 test_user, monkeypatch):
+    monkeypatch.setattr(mcp_server, "engine", session.get_bind())
+    calls = []
+    router = make_router({"fastpath.test": stub_provider(tokens=("Here ", "is ", "why."))}, calls)
+    monkeypatch.setattr(coach, "get_llm_router", lambda: router)
+    before = metrics.COACH_FAST_PATH.get(outcome="used")
+
+    response = client.post("/coach/chat", json={"question": "Create a push workout for me"}, headers=auth_headers)
+    events = [json.loads(line[6:]) for line in response.text.splitlines() if line.startswith("data: ")]
+    text = "".join(e.get("text", "") for e in events if e["type"] == "content")
+
+    assert calls == ["fastpath.test"]
+    assert text.startswith("Here is why.")
+    assert "Workout Template Saved!" in text and "Saving workout template" not in text
+    assert metrics.COACH_FAST_PATH.get(outcome="used") == before + 1
+
+    templates = session.exec(select(WorkoutTemplate).where(WorkoutTemplate.user_id == test_user.id)).all()
+    assert [t.name for t in templates] == ["Push"]
+    assert session.exec(select(TemplateExercise).where(TemplateExercise.template_id == templates[0].id)).all()
+
+
+def test_program_request_reaches_the_program_tool(client: TestClient, auth_headers: dict, session: Session,
+                                                  test_user, monkeypatch):
+    monkeypatch.setattr(mcp_server, "engine", session.get_bind())
+    programs = []
+
+    def fake_program(**kwargs):
+        programs.append(kwargs)
+        return json.dumps({"name": "Hypertrophy Mesocycle", "templates_created": 48})
+
+    tool_call = {"name": "generate_program", "arguments": json.dumps({"goal": "hypertrophy", "weeks": 12})}
+    router = make_router({"program.test": stub_provider(tokens=("Done.",), tool_call=tool_call)}, [])
+    monkeypatch.setattr(coach, "get_llm_router", lambda: router)
+    monkeypatch.setattr(coach, "generate_program_logic", fake_program)
+    monkeypatch.setenv("OPENROUTER_API_KEY", "test")
+    before = metrics.COACH_FAST_PATH.get(outcome="used")
+
+    client.post("/coach/chat", json={"question": "Create a 12 week workout program for hypertrophy"},
+                headers=auth_headers)
+    assert programs and programs[0]["weeks"] == 12
+    assert metrics.COACH_FAST_PATH.get(outcome="used") == before
+    assert session.exec(select(WorkoutTemplate)).all() == []  # no single workout was saved
+
+
+def test_stalled_explanation_falls_back_to_the_saved_plan(client: TestClient, auth_headers: dict, session: Session,
+                                                          test_user, monkeypatch):
+    from backend import offline_coach
+
+    monkeypatch.setattr(mcp_server, "engine", session.get_bind())
+    monkeypatch.setattr(offline_coach, "LATENCY_BUDGET_S", 0.1)
+    router = make_router({"stalled.test": stub_provider(tokens=("Too late.",), first_token_delay=5)}, [])
+    monkeypatch.setattr(coach, "get_llm_router", lambda: router)
+    before = metrics.COACH_OFFLINE.get(intent="design", reason="deadline")
+
+    response = client.post("/coach/chat", json={"question": "Create a push workout for me"}, headers=auth_headers)
+    events = [json.loads(line[6:]) for line in response.text.splitlines() if line.startswith("data: ")]
+    text = "".join(e.get("text", "") for e in events if e["type"] == "content")
+
+    assert {"type": "offline", "reason": "deadline", "intent": "design"} in events
+    assert "Your **Push** workout is ready" in text and "Workout Template Saved!" in text
+    assert "Too late." not in text
+    assert metrics.COACH_OFFLINE.get(intent="design", reason="deadline") == before + 1
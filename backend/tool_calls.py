@@ -0,0 +1,116 @@
+"""Assemble streamed tool calls and notice when each one is complete.
+
+OpenAI-style streams send a tool call as ``function.arguments`` fragments
+spread over many deltas. ``IncrementalJSON`` tracks bracket depth and string
+state as fragments arrive, so ``ToolCallAccumulator`` can report a call as
+soon as its arguments object closes, long before the provider finishes the
+turn. The coach uses this to start read-only tools speculatively.
+"""
+import json
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+
+class IncrementalJSON:
+    """Incremental scanner for one streamed JSON object or array."""
+
+    def __init__(self):
+        self.text = ""
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._started = False
+        self._closed = False
+        self._invalid = False
+
+    def feed(self, chunk: str) -> bool:
+        """Add a fragment; returns True once the value is complete."""
+        self.text += chunk
+        for char in chunk:
+            if self._invalid:
+                break
+            if self._closed:
+                if not char.isspace():
+                    self._invalid = True  # trailing garbage: let the final parse decide
+                continue
+            if not self._started:
+                if char in "{[":
+                    self._started = True
+                    self._depth = 1
+                elif not char.isspace():
+                    self._invalid = True
+                continue
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char in "{[":
+                self._depth += 1
+            elif char in "}]":
+                self._depth -= 1
+                if self._depth == 0:
+                    self._closed = True
+        return self.complete
+
+    @property
+    def complete(self) -> bool:
+        return self._closed and not self._invalid
+
+    def value(self):
+        """The parsed value; raises ValueError while incomplete or malformed."""
+        if not self.complete:
+            raise ValueError("incomplete JSON")
+        return json.loads(self.text)
+
+
+@dataclass
+class PendingToolCall:
+    index: int
+    id: str = ""
+    name: str = ""
+    arguments: IncrementalJSON = field(default_factory=IncrementalJSON)
+
+    def parsed_arguments(self) -> Optional[dict]:
+        try:
+            value = self.arguments.value()
+        except ValueError:
+            return None
+        return value if isinstance(value, dict) else None
+
+
+class ToolCallAccumulator:
+    """Collects tool-call deltas by index and reports calls whose arguments just completed."""
+
+    def __init__(self):
+        self.calls: Dict[int, PendingToolCall] = {}
+
+    def __bool__(self):
+        return bool(self.calls)
+
+    def reset(self):
+        self.calls = {}
+
+    def feed(self, delta: dict) -> Optional[PendingToolCall]:
+        """Apply one delta; returns the call if this delta completed its arguments."""
+        idx = delta.get("index", 0)
+        call = self.calls.get(idx)
+        if call is None:
+            call = self.calls[idx] = PendingToolCall(index=idx)
+        if delta.get("id"):
+            call.id = delta["id"]
+        func = delta.get("function", {})
+        if func.get("name"):
+            call.name += func["name"]
+        if func.get("arguments"):
+            was_complete = call.arguments.complete
+            if call.arguments.feed(func["arguments"]) and not was_complete:
+                return call
+        return None
+
+    def ordered(self) -> List[PendingToolCall]:
+        return [self.calls[idx] for idx in sorted(self.calls)]
@@ -0,0 +1,244 @@
+"""Deterministic extraction of workout plans from coach markdown.
+
+Turns the text the coach streams (numbered lists, bullet lists, headings,
+markdown tables) into the template JSON accepted by
+``save_generated_template`` without a second LLM round trip. Exercise names
+are matched against the Exercise table and EXERCISE_DATABASE; the returned
+confidence lets callers fall back to LLM extraction for unusual layouts.
+"""
+import re
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+from sqlmodel import Session
+
+from backend import exercise_resolver
+from backend.exercise_resolver import normalize_exercise_name
+
+LBS_TO_KG = 0.45359237
+
+# "4 sets x 8-10 reps", "4x8", "3 × 5", "4 sets of 8", "3 sets, 10 reps"
+SETS_X_REPS = re.compile(
+    r"(?P<sets>\d{1,2})\s*(?:sets?)?\s*(?:[x×*]|of|,)\s*(?P<reps>\d{1,3})(?:\s*[-–]\s*(?P<reps_hi>\d{1,3}))?(?!\d|[.,]\d|\s*(?:kg|lb|%|sec|s\b|min))",
+    re.IGNORECASE,
+)
+SETS_ONLY = re.compile(r"(?P<sets>\d{1,2})\s*(?:working\s+)?sets?\b", re.IGNORECASE)
+REPS_ONLY = re.compile(r"(?P<reps>\d{1,3})(?:\s*[-–]\s*(?P<reps_hi>\d{1,3}))?\s*reps?\b", re.IGNORECASE)
+WEIGHT = re.compile(r"(?P<weight>\d+(?:[.,]\d+)?)\s*(?P<unit>kgs?|lbs?|pounds?)\b", re.IGNORECASE)
+HEADING = re.compile(r"^\s*#{1,6}\s+(?P<text>.+?)\s*#*\s*$")
+LIST_ITEM = re.compile(r"^\s*(?:[-*+]|\d+[.)])\s+(?P<text>.+)$")
+BOLD = re.compile(r"\*\*(?P<text>[^*]+)\*\*")
+PROSE_ONLY_FACTOR = 0.5
+NAME_HINT = re.compile(r"\b(workout|day|plan|session|routine|program|split)\b", re.IGNORECASE)
+
+
+def known_exercise_names(db: Optional[Session] = None, user_id: Optional[int] = None) -> Dict[str, Tuple[str, str]]:
+    """Map normalized name -> (display name, category) from EXERCISE_DATABASE and the exercise index."""
+    from backend.mcp_server import EXERCISE_DATABASE
+
+    known = {}
+    for group in EXERCISE_DATABASE.values():
+        for ex in group.get("compound", []) + group.get("isolation", []):
+            known[normalize_exercise_name(ex["name"])] = (ex["name"], ex["category"])
+
+    if db is not None:
+        for normalized, value in exercise_resolver.known_names(db, user_id).items():
+            known.setdefault(normalized, value)
+    return known
+
+
+@dataclass
+class ExtractionResult:
+    template: Dict
+    confidence: float
+    matched: int = 0
+    unmatched: List[str] = field(default_factory=list)
+
+
+class _Candidate:
+    def __init__(self, raw_name: str, known: Optional[Tuple[str, str]]):
+        self.raw_name = raw_name
+        self.known = known
+        self.sets: Optional[int] = None
+        self.reps: Optional[int] = None
+        self.weight: float = 0
+        self.structured = False  # from a table row, heading or list item rather than prose
+
+    @property
+    def complete(self) -> bool:
+        return self.sets is not None and self.reps is not None
+
+    def absorb(self, text: str):
+        """Fill sets/reps/weight from a fragment of text, keeping values already found."""
+        m = SETS_X_REPS.search(text)
+        if m and self.sets is None:
+            self.sets = int(m.group("sets"))
+            self.reps = int(m.group("reps"))
+        if self.sets is None:
+            m = SETS_ONLY.search(text)
+            if m:
+                self.sets = int(m.group("sets"))
+        if self.reps is None:
+            m = REPS_ONLY.search(text)
+            if m:
+                self.reps = int(m.group("reps"))
+        m = WEIGHT.search(text)
+        if m and not self.weight:
+            value = float(m.group("weight").replace(",", "."))
+            if m.group("unit").lower().startswith(("lb", "pound")):
+                value = round(value * LBS_TO_KG, 1)
+            self.weight = value
+
+    def to_dict(self) -> Dict:
+        name, category = self.known if self.known else (self.raw_name, "Uncategorized")
+        sets = self.sets or 3
+        reps = self.reps or 10
+        return {
+            "name": name,
+            "category": category,
+            "sets": [{"goal_weight": self.weight, "goal_reps": reps} for _ in range(sets)],
+        }
+
+
+def _match_known(text: str, known: Dict[str, Tuple[str, str]]) -> Optional[Tuple[str, str]]:
+    """Longest known exercise name contained in the text (word-aligned)."""
+    norm = f" {normalize_exercise_name(text)} "
+    best = None
+    for key, value in known.items():
+        if f" {key} " in norm and (best is None or len(key) > len(best[0])):
+            best = (key, value)
+    return best[1] if best else None
+
+
+def _clean_name(text: str) -> str:
+    """Exercise-name part of a list item: bold text, or text before ':'/'-'/digits."""
+    bold = BOLD.search(text)
+    if bold:
+        return bold.group("text").strip(" :–-")
+    head = re.split(r"[:–—(]|\s-\s|\d", text, maxsplit=1)[0]
+    return head.strip(" *_`")
+
+
+def _split_row(line: str) -> List[str]:
+    return [c.strip().strip("*_` ") for c in line.strip().strip("|").split("|")]
+
+
+def extract_workout(text: str, known: Optional[Dict[str, Tuple[str, str]]] = None) -> ExtractionResult:
+    """Extract a template dict from coach markdown and score the extraction."""
+    if known is None:
+        known = known_exercise_names()
+
+    template_name = None
+    candidates: List[_Candidate] = []
+    heading_candidate: Optional[_Candidate] = None
+    table_cols: Optional[Dict[str, int]] = None
+
+    for line in text.splitlines():
+        if not line.strip():
+            continue
+
+        # --- Markdown tables ---
+        if line.lstrip().startswith("|"):
+            cells = _split_row(line)
+            lowered = [c.lower() for c in cells]
+            if any("exercise" in c for c in lowered):
+                table_cols = {}
+                for i, c in enumerate(lowered):
+                    for key in ("exercise", "sets", "reps", "weight"):
+                        if key in c and key not in table_cols:
+                            table_cols[key] = i
+                continue
+            if table_cols is None or all(set(c) <= set("-: ") for c in cells):
+                continue
+            name_cell = cells[table_cols["exercise"]] if table_cols.get("exercise", 99) < len(cells) else ""
+            if not name_cell:
+                continue
+            cand = _Candidate(name_cell, _match_known(name_cell, known))
+            cand.structured = True
+            for key in ("sets", "reps", "weight"):
+                idx = table_cols.get(key)
+                if idx is None or idx >= len(cells):
+                    continue
+                value = cells[idx]
+                if key == "sets" and re.match(r"^\d+", value):
+                    cand.sets = int(re.match(r"^\d+", value).group())
+                elif key == "reps" and re.match(r"^\d+", value):
+                    cand.reps = int(re.match(r"^\d+", value).group())
+                elif key == "weight":
+                    unit = "" if WEIGHT.search(value) else " kg"
+                    cand.absorb(value + unit)
+            if cand.sets is None or cand.reps is None:
+                cand.absorb(" ".join(cells[1:]))
+            candidates.append(cand)
+            continue
+        table_cols = None
+
+        # --- Headings: template name or an exercise section ---
+        heading = HEADING.match(line)
+        if heading:
+            heading_text = heading.group("text").strip("*_ ")
+            match = _match_known(heading_text, known)
+            if match:
+                heading_candidate = _Candidate(heading_text, match)
+                heading_candidate.structured = True
+                candidates.append(heading_candidate)
+            else:
+                heading_candidate = None
+                if template_name is None and NAME_HINT.search(heading_text):
+                    template_name = heading_text
+            continue
+
+        item = LIST_ITEM.match(line)
+        body = item.group("text") if item else line.strip()
+        match = _match_known(_clean_name(body), known) or _match_known(body, known)
+
+        if match and (heading_candidate is None or heading_candidate.known != match):
+            cand = _Candidate(_clean_name(body), match)
+            cand.structured = bool(item)
+            cand.absorb(body)
+            # A name dropped in prose only counts when it carries a set/rep scheme
+            if item or cand.sets is not None or cand.reps is not None:
+                candidates.append(cand)
+                heading_candidate = None
+        elif heading_candidate is not None:
+            # Detail lines under an exercise heading ("- 4 sets of 8 reps")
+            heading_candidate.absorb(body)
+        elif item and (BOLD.search(body) or ":" in body):
+            # Structured line naming an exercise we don't know
+            cand = _Candidate(_clean_name(body), None)
+            cand.structured = True
+            cand.absorb(body)
+            if cand.complete and cand.raw_name:
+                candidates.append(cand)
+        elif template_name is None and BOLD.search(body) and NAME_HINT.search(body):
+            template_name = BOLD.search(body).group("text").strip(" :")
+
+    # Collapse repeats of the same exercise (e.g. mentioned again in a summary)
+    exercises, seen = [], set()
+    for cand in candidates:
+        key = cand.known[0] if cand.known else normalize_exercise_name(cand.raw_name)
+        if key in seen:
+            continue
+        seen.add(key)
+        exercises.append(cand)
+
+    if not exercises:
+        return ExtractionResult(template={"name": template_name or "AI Workout", "exercises": []}, confidence=0.0)
+
+    # Known names weigh most; a parsed set/rep scheme adds the rest
+    score = sum((0.6 if c.known else 0.2) + (0.4 if c.complete else 0.0) for c in exercises)
+    confidence = score / len(exercises)
+    if len(exercises) < 2 and not any(c.structured for c in exercises):
+        # One scheme mentioned in prose ("squat 3x5") is advice, not a plan
+        confidence *= PROSE_ONLY_FACTOR
+    confidence = round(confidence, 3)
+
+    return ExtractionResult(
+        template={
+            "name": template_name or "AI Workout",
+            "exercises": [c.to_dict() for c in exercises],
+        },
+        confidence=confidence,
+        matched=sum(1 for c in exercises if c.known),
+        unmatched=[c.raw_name for c in exercises if not c.known],
+    )
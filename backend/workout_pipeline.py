@@ -0,0 +1,113 @@
+"""Server-side fast path for "create a workout" chat requests.
+
+The coach system prompt walks the LLM through a fixed pipeline
+(get_training_recommendations → design_workout → create_workout_template →
+explain), costing one full round trip per step. All three steps are
+deterministic, so when ``classify_workout_request`` recognises the intent the
+server runs them itself and the LLM is only asked for the explanation.
+"""
+import re
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+CREATE_VERB = re.compile(
+    r"\b(create|design|generate|build|make|put together|write|give me|set up)\b", re.IGNORECASE
+)
+WORKOUT_NOUN = re.compile(r"\b(workouts?|templates?|routines?|training (?:plan|session|day)|(?:push|pull|leg|arm|upper|lower|full[- ]body) day)\b",
+                          re.IGNORECASE)
+# Requests about something other than a new plan ("how do I make my workout harder?")
+NON_PLAN = re.compile(r"\b(habit|motivation|app|playlist|delete|remove|rename|history|analy[sz]e|review|form|technique)\b",
+                      re.IGNORECASE)
+QUESTION = re.compile(r"^\s*(how|why|what|when|which|is|are|should|does|do)\b", re.IGNORECASE)
+# Multi-week programs go through the coach's generate_program tool, not the single-workout path
+PROGRAM = re.compile(r"\b\d+\s*-?\s*weeks?\b|\b(?:few|several|multiple|multi[- ]?)\s*weeks?\b|\bprogram(?:me)?s?\b|\bmesocycles?\b",
+                     re.IGNORECASE)
+
+# Checked in order; the first match wins (more specific phrases first)
+GOAL_PATTERNS = [
+    ("push_pull_legs", re.compile(r"\b(ppl|push[ /,-]*pull[ /,-]*legs?)\b", re.IGNORECASE)),
+    ("full_body", re.compile(r"\bfull[- ]?body|total[- ]body\b", re.IGNORECASE)),
+    ("upper_body", re.compile(r"\bupper[- ]?body|\bupper\b", re.IGNORECASE)),
+    ("lower_body", re.compile(r"\blower[- ]?body|\blower\b", re.IGNORECASE)),
+    ("push", re.compile(r"\bpush\b|\bchest\b|\bshoulders?\b|\btriceps?\b", re.IGNORECASE)),
+    ("pull", re.compile(r"\bpull\b|\bback\b|\bbiceps?\b", re.IGNORECASE)),
+    ("legs", re.compile(r"\blegs?\b|\bleg day\b|\bglutes?\b|\bquads?\b|\bhamstrings?\b", re.IGNORECASE)),
+]
+STYLE_PATTERNS = [
+    ("strength", re.compile(r"\b(strength|strong(?:er)?|heavy|powerlifting|1rm|max(?:imal)?)\b", re.IGNORECASE)),
+    ("endurance", re.compile(r"\b(endurance|conditioning|high[- ]rep|stamina)\b", re.IGNORECASE)),
+    ("hypertrophy", re.compile(r"\b(hypertrophy|muscle|size|bodybuilding|mass|bigger)\b", re.IGNORECASE)),
+]
+LEVEL = re.compile(r"\b(beginner|novice|intermediate|advanced|experienced)\b", re.IGNORECASE)
+LEVEL_MAP = {"novice": "beginner", "experienced": "advanced"}
+MINUTES = re.compile(r"\b(\d{2,3})\s*(?:-?\s*)(?:min|mins|minutes?)\b", re.IGNORECASE)
+HOURS = re.compile(r"\b(an|one|1|1\.5|two|2)\s*(?:-?\s*)hours?\b", re.IGNORECASE)
+HOUR_VALUES = {"an": 60, "one": 60, "1": 60, "1.5": 90, "two": 120, "2": 120}
+EQUIPMENT = re.compile(r"\b(barbells?|dumbbells?|cables?|machines?|bench(?:es)?|bodyweight|no equipment|at home)\b", re.IGNORECASE)
+
+
+@dataclass
+class WorkoutIntent:
+    focus: Optional[str] = None        # muscle focus (push, legs, upper_body, ...); None = use recommendations
+    style: Optional[str] = None        # strength / hypertrophy / endurance
+    experience_level: str = "intermediate"
+    available_minutes: int = 60
+    equipment: Optional[List[str]] = field(default=None)
+
+    def design_args(self, suggested_focus: str) -> dict:
+        """Arguments for ``design_workout_logic``, filling gaps from the recommendations."""
+        return {
+            "goal": goal_for(self.focus, self.style, suggested_focus),
+            "experience_level": self.experience_level,
+            "available_minutes": self.available_minutes,
+            "equipment": self.equipment,
+        }
+
+
+def goal_for(focus: Optional[str], style: Optional[str], suggested_focus: str) -> str:
+    """Combine a muscle focus and training style into a design_workout goal key."""
+    goal = suggested_focus or "full_body_hypertrophy"
+    if focus:
+        goal = focus if focus in ("push", "pull", "legs", "push_pull_legs") else f"{focus}_hypertrophy"
+    if style and goal != "push_pull_legs":
+        # design_workout reads the style from the goal string; it fuzzy-matches the rest
+        goal = re.sub(r"_(strength|hypertrophy|endurance)$", "", goal) + f"_{style}"
+    return goal
+
+
+def classify_workout_request(text: str) -> Optional[WorkoutIntent]:
+    """Return a WorkoutIntent when ``text`` asks for a new workout, else None."""
+    if not text or QUESTION.search(text) or NON_PLAN.search(text) or PROGRAM.search(text):
+        return None
+    if not CREATE_VERB.search(text) or not WORKOUT_NOUN.search(text):
+        return None
+
+    intent = WorkoutIntent()
+    for goal, pattern in GOAL_PATTERNS:
+        if pattern.search(text):
+            intent.focus = goal
+            break
+    for style, pattern in STYLE_PATTERNS:
+        if pattern.search(text):
+            intent.style = style
+            break
+
+    level = LEVEL.search(text)
+    if level:
+        word = level.group(1).lower()
+        intent.experience_level = LEVEL_MAP.get(word, word)
+
+    minutes = MINUTES.search(text)
+    hours = HOURS.search(text)
+    if minutes:
+        intent.available_minutes = max(15, min(180, int(minutes.group(1))))
+    elif hours:
+        intent.available_minutes = HOUR_VALUES[hours.group(1).lower()]
+
+    equipment = {m.group(1).lower() for m in EQUIPMENT.finditer(text)}
+    if "no equipment" in equipment:
+        intent.equipment = ["bodyweight"]
+    elif equipment:
+        equipment = {"bodyweight" if e == "at home" else e for e in equipment}
+        intent.equipment = sorted({e[:-2] if e.endswith("ches") else e.rstrip("s") for e in equipment})
+    return intent
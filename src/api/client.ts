@@ -7,6 +7,9 @@ if (!BASE_URL) {
     }
 }
 
+// Exercise media cached by the backend is stored as a relative /media/... path
+export const mediaUrl = (url: string) => (url.startsWith('/media/') ? `${BASE_URL}${url}` : url);
+
 export const apiClient = {
     async request(endpoint: string, options: RequestInit = {}) {
         const token = localStorage.getItem('fitness_auth_token');
@@ -1,6 +1,6 @@
 import React, { useState, useEffect, useRef } from 'react';
 // @ts-ignore
-import { apiClient } from '../api/client';
+import { apiClient, mediaUrl } from '../api/client';
 import GlassCard from './ui/GlassCard';
 import { useData } from '../context/DataContext';
 import type { ChatMessage } from '../types/api';
@@ -15,7 +15,7 @@ import {
     Check,
     Plus
 } from 'lucide-react';
-import ReactMarkdown from 'react-markdown';
+import ReactMarkdown, { defaultUrlTransform } from 'react-markdown';
 import remarkGfm from 'remark-gfm';
 
 interface SessionOption {
@@ -30,7 +30,7 @@ interface CoachChatProps {
 }
 
 const CoachChat: React.FC<CoachChatProps> = ({ className = '' }) => {
-    const { chatMessages: messages, setChatMessages: setMessages, chatModelSource: modelSource, setChatModelSource: setModelSource } = useData();
+    const { chatMessages: messages, setChatMessages: setMessages, chatModelSource: modelSource, setChatModelSource: setModelSource, chatConversationId: conversationId, setChatConversationId: setConversationId } = useData();
     const [input, setInput] = useState('');
     const [isStreaming, setIsStreaming] = useState(false);
     const [sessions, setSessions] = useState<SessionOption[]>([]);
@@ -93,7 +93,17 @@ const CoachChat: React.FC<CoachChatProps> = ({ className = '' }) => {
         });
     };
 
-    const deleteMessage = (msgId: string) => {
+    const deleteMessage = async (msgId: string) => {
+        const msg = messages.find(m => m.id === msgId);
+        // Stored turns are replayed to the model, so remove them on the server too
+        if (conversationId && msg?.serverId) {
+            try {
+                await apiClient.delete(`/coach/conversations/${conversationId}/messages/${msg.serverId}`);
+            } catch (err) {
+                console.error('Failed to delete message:', err);
+                return;
+            }
+        }
         setMessages(prev => prev.filter(m => m.id !== msgId));
     };
 
@@ -119,13 +129,6 @@ const CoachChat: React.FC<CoachChatProps> = ({ className = '' }) => {
         setIsStreaming(true);
 
         try {
-            // Build message history (exclude current messages being sent)
-            const history = messages.map(m => ({
-                role: m.role,
-                content: m.content,
-                thinking: m.thinking || null,
-            }));
-
             const token = localStorage.getItem('fitness_auth_token');
             const baseUrl = import.meta.env.VITE_API_URL || 'http://127.0.0.1:8000';
             const response = await fetch(`${baseUrl}/coach/chat`, {
@@ -134,8 +137,9 @@ const CoachChat: React.FC<CoachChatProps> = ({ className = '' }) => {
                     'Content-Type': 'application/json',
                     'Authorization': `Bearer ${token}`,
                 },
+                // History lives on the server; only the new question is uploaded
                 body: JSON.stringify({
-                    messages: history,
+                    conversation_id: conversationId,
                     session_ids: selectedIds,
                     question,
                     model_source: modelSource,
@@ -144,51 +148,108 @@ const CoachChat: React.FC<CoachChatProps> = ({ className = '' }) => {
 
             if (!response.ok) throw new Error('Chat request failed');
 
-            const reader = response.body?.getReader();
-            const decoder = new TextDecoder();
-
-            if (!reader) throw new Error('No response stream');
+            // The server buffers each stream; after a dropped connection we resume
+            // from the last event id instead of asking the question again
+            const streamId = response.headers.get('X-Stream-ID');
+            let lastEventId = '';
+            let finished = false;
 
             let accContent = '';
             let accThinking = '';
 
-            while (true) {
-                const { done, value } = await reader.read();
-                if (done) break;
-
-                const chunk = decoder.decode(value, { stream: true });
-                const lines = chunk.split('\n');
-
-                for (const line of lines) {
-                    if (!line.startsWith('data: ')) continue;
-                    try {
-                        const data = JSON.parse(line.slice(6));
-                        if (data.type === 'content') {
-                            accContent += data.text;
-                            setMessages(prev => prev.map(m =>
-                                m.id === assistantMsg.id
-                                    ? { ...m, content: accContent }
-                                    : m
-                            ));
-                        } else if (data.type === 'thinking') {
-                            accThinking += data.text;
-                            setMessages(prev => prev.map(m =>
-                                m.id === assistantMsg.id
-                                    ? { ...m, thinking: accThinking }
-                                    : m
-                            ));
-                        } else if (data.type === 'error') {
-                            accContent += `\n\n⚠️ Error: ${data.text}`;
-                            setMessages(prev => prev.map(m =>
-                                m.id === assistantMsg.id
-                                    ? { ...m, content: accContent }
-                                    : m
-                            ));
+            const showError = (text: string) => {
+                accContent += `\n\n⚠️ Error: ${text}`;
+                setMessages(prev => prev.map(m =>
+                    m.id === assistantMsg.id
+                        ? { ...m, content: accContent }
+                        : m
+                ));
+            };
+
+            const readStream = async (res: Response) => {
+                const reader = res.body?.getReader();
+                const decoder = new TextDecoder();
+
+                if (!reader) throw new Error('No response stream');
+
+                let pending = '';
+
+                while (true) {
+                    const { done, value } = await reader.read();
+                    if (done) break;
+
+                    // Frames can be split across reads; keep the trailing partial line for the next chunk
+                    pending += decoder.decode(value, { stream: true });
+                    const lines = pending.split('\n');
+                    pending = lines.pop() ?? '';
+
+                    for (const line of lines) {
+                        if (line.startsWith('id: ')) {
+                            lastEventId = line.slice(4);
+                            continue;
+                        }
+                        if (!line.startsWith('data: ')) continue;
+                        try {
+                            const data = JSON.parse(line.slice(6));
+                            if (data.type === 'conversation') {
+                                setConversationId(data.id);
+                            } else if (data.type === 'content') {
+                                accContent += data.text;
+                                setMessages(prev => prev.map(m =>
+                                    m.id === assistantMsg.id
+                                        ? { ...m, content: accContent }
+                                        : m
+                                ));
+                            } else if (data.type === 'thinking') {
+                                accThinking += data.text;
+                                setMessages(prev => prev.map(m =>
+                                    m.id === assistantMsg.id
+                                        ? { ...m, thinking: accThinking }
+                                        : m
+                                ));
+                            } else if (data.type === 'error') {
+                                showError(data.text);
+                                // Frames the server no longer holds: resuming cannot recover them
+                                if (data.code === 'gap') finished = true;
+                            } else if (data.type === 'saved') {
+                                const [userId, assistantId] = data.ids;
+                                setMessages(prev => prev.map(m =>
+                                    m.id === userMsg.id ? { ...m, serverId: userId }
+                                        : m.id === assistantMsg.id ? { ...m, serverId: assistantId }
+                                            : m
+                                ));
+                            } else if (data.type === 'done') {
+                                finished = true;
+                            }
+                        } catch {
+                            // Skip malformed lines
                         }
-                    } catch {
-                        // Skip malformed lines
                     }
                 }
+            };
+
+            let res: Response = response;
+            for (let attempt = 0; ; attempt++) {
+                try {
+                    await readStream(res);
+                    if (finished || !streamId) break;
+                } catch (err) {
+                    if (!streamId || attempt >= 3) throw err;
+                }
+                if (attempt >= 3) break;
+                await new Promise(resolve => setTimeout(resolve, 1000 * (attempt + 1)));
+                res = await fetch(`${baseUrl}/coach/chat/streams/${streamId}`, {
+                    headers: {
+                        'Authorization': `Bearer ${token}`,
+                        ...(lastEventId ? { 'Last-Event-ID': lastEventId } : {}),
+                    },
+                });
+                if (!res.ok) {
+                    showError(res.status === 410
+                        ? 'The connection dropped and the rest of this reply is no longer available. Please ask again.'
+                        : 'The connection dropped and the reply could not be resumed.');
+                    break;
+                }
             }
         } catch (err: any) {
             setMessages(prev => prev.map(m =>
@@ -262,6 +323,7 @@ const CoachChat: React.FC<CoachChatProps> = ({ className = '' }) => {
                     <button
                         onClick={() => {
                             setMessages([]);
+                            setConversationId(null);
                             localStorage.removeItem('fitness_chat_messages');
                         }}
                         className="text-xs flex items-center gap-1 px-3 py-1.5 rounded-lg bg-surface-highlight hover:bg-red-500/20 text-muted hover:text-red-500 transition-colors border border-border"
@@ -378,6 +440,8 @@ const CoachChat: React.FC<CoachChatProps> = ({ className = '' }) => {
                                         <div className="markdown-body">
                                             <ReactMarkdown
                                                 remarkPlugins={[remarkGfm]}
+                                                // Exercise media is linked as /media/... on the API server
+                                                urlTransform={url => defaultUrlTransform(mediaUrl(url))}
                                                 components={{
                                                     // Customize markdown styling if needed, or use a prose class
                                                     p: ({ node, ...props }) => <p className="mb-2 last:mb-0 leading-relaxed" {...props} />,
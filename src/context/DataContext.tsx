@@ -38,6 +38,8 @@ interface DataContextType {
     // Chat Persistence
     chatMessages: ChatMessage[];
     setChatMessages: React.Dispatch<React.SetStateAction<ChatMessage[]>>;
+    chatConversationId: number | null;
+    setChatConversationId: React.Dispatch<React.SetStateAction<number | null>>;
     chatModelSource: 'web' | 'local';
     setChatModelSource: React.Dispatch<React.SetStateAction<'web' | 'local'>>;
 }
@@ -131,10 +133,12 @@ export const DataProvider: React.FC<{ children: React.ReactNode }> = ({ children
     const logout = () => {
         localStorage.removeItem('fitness_auth_token');
         localStorage.removeItem('fitness_chat_messages');
+        localStorage.removeItem('fitness_chat_conversation_id');
         setUser(null);
         setSessions([]);
         setExercises([]);
         setChatMessages([]);
+        setChatConversationId(null);
         window.location.href = '/login';
     };
 
@@ -362,12 +366,25 @@ export const DataProvider: React.FC<{ children: React.ReactNode }> = ({ children
         } catch { return []; }
     });
     const [chatModelSource, setChatModelSource] = useState<'web' | 'local'>('web');
+    // Server-side conversation the chat messages belong to
+    const [chatConversationId, setChatConversationId] = useState<number | null>(() => {
+        const saved = localStorage.getItem('fitness_chat_conversation_id');
+        return saved ? Number(saved) : null;
+    });
 
     // Persist chat messages whenever they change
     useEffect(() => {
         localStorage.setItem('fitness_chat_messages', JSON.stringify(chatMessages));
     }, [chatMessages]);
 
+    useEffect(() => {
+        if (chatConversationId === null) {
+            localStorage.removeItem('fitness_chat_conversation_id');
+        } else {
+            localStorage.setItem('fitness_chat_conversation_id', String(chatConversationId));
+        }
+    }, [chatConversationId]);
+
     return (
         <DataContext.Provider
             value={{
@@ -398,6 +415,8 @@ export const DataProvider: React.FC<{ children: React.ReactNode }> = ({ children
                 calculateSessionXP,
                 chatMessages,
                 setChatMessages,
+                chatConversationId,
+                setChatConversationId,
                 chatModelSource,
                 setChatModelSource,
             }}
@@ -269,17 +269,24 @@ export const WorkoutProvider: React.FC<{ children: React.ReactNode }> = ({ child
         setTemplateName(template.name);
 
         const exercises: LocalSessionExercise[] = template.exercises.map(tex => {
-            const lastW = getLastWeight(tex.exercise.id);
+            // Server-side targets replace the scan over past sessions and fill
+            // in goals the template leaves at 0 (design_workout, AI templates)
+            const target = tex.target;
+            const lastW = target ? target.suggested_weight : getLastWeight(tex.exercise.id);
             return {
                 exerciseId: tex.exercise.id,
-                sets: tex.sets.map(s => ({
-                    id: uuidv4(),
-                    weight: s.goal_weight > 0 ? s.goal_weight : lastW,
-                    reps: s.goal_reps,
-                    completed: false,
-                    goalWeight: s.goal_weight,
-                    goalReps: s.goal_reps,
-                }))
+                sets: tex.sets.map(s => {
+                    const goalWeight = s.goal_weight > 0 ? s.goal_weight : (target?.suggested_weight ?? 0);
+                    const goalReps = s.goal_reps > 0 ? s.goal_reps : (target?.suggested_reps ?? 0);
+                    return {
+                        id: uuidv4(),
+                        weight: goalWeight > 0 ? goalWeight : lastW,
+                        reps: goalReps,
+                        completed: false,
+                        goalWeight,
+                        goalReps,
+                    };
+                })
             };
         });
         setSessionExercises(exercises);
@@ -7,6 +7,7 @@ import { useWorkout } from '../../context/WorkoutContext';
 import ExerciseSelector from './ExerciseSelector';
 import TemplateSelector from './TemplateSelector';
 import type { WorkoutTemplate } from '../../types/api';
+import { mediaUrl } from '../../api/client';
 
 interface WorkoutSummary {
     duration: number;
@@ -239,7 +240,7 @@ const ActiveSession: React.FC = () => {
                                     {getExerciseName(sessionExercise.exerciseId)}
                                 </h3>
                                 {allExercises.find(e => e.id === sessionExercise.exerciseId)?.video_url && (
-                                    <a href={allExercises.find(e => e.id === sessionExercise.exerciseId)?.video_url}
+                                    <a href={mediaUrl(allExercises.find(e => e.id === sessionExercise.exerciseId)?.video_url ?? '')}
                                         target="_blank" rel="noopener noreferrer"
                                         className="text-xs text-primary hover:underline flex items-center gap-1 mt-1">
                                         <span className="i-lucide-external-link w-3 h-3" /> View Demo
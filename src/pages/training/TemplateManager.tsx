@@ -2,6 +2,7 @@ import React, { useState } from 'react';
 import { Plus, Trash2, Download, Upload, Edit3, ChevronDown, ChevronRight, X, Save, Dumbbell, Sparkles, Check } from 'lucide-react';
 import { useData } from '../../context/DataContext';
 import type { WorkoutTemplate, CreateWorkoutTemplate } from '../../types/api';
+import { mediaUrl } from '../../api/client';
 import ExerciseSelector from './ExerciseSelector';
 
 interface TemplateSetForm {
@@ -369,7 +370,7 @@ const TemplateManager: React.FC = () => {
                                         <div className="font-medium text-sm text-text flex items-center gap-2">
                                             {ex.exercise.name}
                                             {ex.exercise.video_url && (
-                                                <a href={ex.exercise.video_url} target="_blank" rel="noopener noreferrer"
+                                                <a href={mediaUrl(ex.exercise.video_url)} target="_blank" rel="noopener noreferrer"
                                                     className="text-xs text-primary hover:underline flex items-center gap-0.5"
                                                     onClick={e => e.stopPropagation()}>
                                                     <span className="i-lucide-external-link w-3 h-3" /> Demo
@@ -68,11 +68,20 @@ export interface TemplateSet {
     goal_reps: number;
 }
 
+export interface ExerciseTarget {
+    e1rm: number;
+    last_date: string;
+    last_sets: { weight: number; reps: number }[];
+    suggested_weight: number;
+    suggested_reps: number;
+}
+
 export interface TemplateExercise {
     id: number;
     exercise: Exercise;
     order: number;
     sets: TemplateSet[];
+    target?: ExerciseTarget | null;
 }
 
 export interface WorkoutTemplate {
@@ -99,4 +108,5 @@ export interface ChatMessage {
     role: 'user' | 'assistant';
     content: string;
     thinking?: string;
+    serverId?: number;  // stored message id once the turn is saved
 }